@@ -0,0 +1,33 @@
+"""add event_gaps for event ids a projection skipped
+
+Revision ID: a4c9e2f7b1d6
+Revises: c5d2a8f4e1b7
+Create Date: 2026-10-18 22:00:00.000000
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "a4c9e2f7b1d6"
+down_revision: str | None = "c5d2a8f4e1b7"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "event_gaps",
+        sa.Column("watermark_name", sa.String(), nullable=False),
+        sa.Column("event_id", sa.BigInteger(), nullable=False),
+        sa.Column("noted_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("watermark_name", "event_id"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("event_gaps")
@@ -0,0 +1,172 @@
+"""partition activity_logs by month and add activity_daily_rollups
+
+Revision ID: a9c4e2f7d1b6
+Revises: f2b8d5a7c391
+Create Date: 2026-10-18 16:00:00.000000
+
+On PostgreSQL, activity_logs is rebuilt as a table range-partitioned by month on
+created_at (primary key (id, created_at)); existing rows are copied into monthly
+partitions. Later partitions are created, and expired ones dropped, by the
+maintain_activity_logs_task job.
+
+"""
+
+from collections.abc import Sequence
+from datetime import date, datetime, timedelta
+
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "a9c4e2f7d1b6"
+down_revision: str | None = "f2b8d5a7c391"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+COLUMNS = (
+    "id, user_id, activity_type, message, details, broker_id, "
+    "deletion_request_id, response_id, email_scan_id, created_at"
+)
+
+# Single-column indexes from the initial schema
+INDEXED_COLUMNS = (
+    "activity_type",
+    "broker_id",
+    "created_at",
+    "deletion_request_id",
+    "email_scan_id",
+    "response_id",
+    "user_id",
+)
+
+# Monthly partitions created ahead of the current month
+PARTITIONS_AHEAD = 3
+
+
+def _next_month(month: date) -> date:
+    return (month.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def _create_indexes() -> None:
+    for column in INDEXED_COLUMNS:
+        op.create_index(op.f(f"ix_activity_logs_{column}"), "activity_logs", [column], unique=False)
+
+
+def _partition_activity_logs() -> None:
+    bind = op.get_bind()
+    op.execute("ALTER TABLE activity_logs RENAME TO activity_logs_unpartitioned")
+    op.execute(
+        "ALTER TABLE activity_logs_unpartitioned "
+        "RENAME CONSTRAINT activity_logs_pkey TO activity_logs_unpartitioned_pkey"
+    )
+    op.execute(
+        "CREATE TABLE activity_logs ("
+        "id UUID NOT NULL, "
+        "user_id UUID NOT NULL, "
+        "activity_type activitytype NOT NULL, "
+        "message VARCHAR NOT NULL, "
+        "details TEXT, "
+        "broker_id UUID, "
+        "deletion_request_id UUID, "
+        "response_id UUID, "
+        "email_scan_id UUID, "
+        "created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL, "
+        "CONSTRAINT activity_logs_pkey PRIMARY KEY (id, created_at)"
+        ") PARTITION BY RANGE (created_at)"
+    )
+
+    # One partition per month from the oldest entry through a few months ahead
+    oldest = bind.execute(sa.text("SELECT min(created_at) FROM activity_logs_unpartitioned"))
+    oldest = oldest.scalar() or datetime.utcnow()
+    month = oldest.date().replace(day=1)
+    last = datetime.utcnow().date().replace(day=1)
+    for _ in range(PARTITIONS_AHEAD):
+        last = _next_month(last)
+    while month <= last:
+        op.execute(
+            f"CREATE TABLE activity_logs_p{month.year:04d}_{month.month:02d} "
+            f"PARTITION OF activity_logs "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{_next_month(month).isoformat()}')"
+        )
+        month = _next_month(month)
+
+    op.execute(
+        f"INSERT INTO activity_logs ({COLUMNS}) SELECT {COLUMNS} FROM activity_logs_unpartitioned"
+    )
+    op.execute("DROP TABLE activity_logs_unpartitioned")
+    _create_indexes()
+
+
+def _unpartition_activity_logs() -> None:
+    op.execute("ALTER TABLE activity_logs RENAME TO activity_logs_partitioned")
+    op.execute(
+        "ALTER TABLE activity_logs_partitioned "
+        "RENAME CONSTRAINT activity_logs_pkey TO activity_logs_partitioned_pkey"
+    )
+    for column in INDEXED_COLUMNS:
+        op.execute(f"DROP INDEX ix_activity_logs_{column}")
+    op.execute(
+        "CREATE TABLE activity_logs ("
+        "id UUID NOT NULL, "
+        "user_id UUID NOT NULL, "
+        "activity_type activitytype NOT NULL, "
+        "message VARCHAR NOT NULL, "
+        "details TEXT, "
+        "broker_id UUID, "
+        "deletion_request_id UUID, "
+        "response_id UUID, "
+        "email_scan_id UUID, "
+        "created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL, "
+        "CONSTRAINT activity_logs_pkey PRIMARY KEY (id)"
+        ")"
+    )
+    op.execute(
+        f"INSERT INTO activity_logs ({COLUMNS}) SELECT {COLUMNS} FROM activity_logs_partitioned"
+    )
+    # Drops the partitions too
+    op.execute("DROP TABLE activity_logs_partitioned")
+    _create_indexes()
+
+
+def upgrade() -> None:
+    _partition_activity_logs()
+
+    op.create_index(
+        "ix_activity_logs_user_type_created",
+        "activity_logs",
+        ["user_id", "activity_type", "created_at"],
+        unique=False,
+    )
+
+    op.create_table(
+        "activity_daily_rollups",
+        sa.Column("user_id", sa.Uuid(), nullable=False),
+        sa.Column(
+            "activity_type",
+            postgresql.ENUM(name="activitytype", create_type=False),
+            nullable=False,
+        ),
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("count", sa.Integer(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("user_id", "activity_type", "day"),
+    )
+    op.create_index(
+        op.f("ix_activity_daily_rollups_day"), "activity_daily_rollups", ["day"], unique=False
+    )
+
+    # Roll up the existing history
+    op.execute(
+        "INSERT INTO activity_daily_rollups (user_id, activity_type, day, count, updated_at) "
+        "SELECT user_id, activity_type, date(created_at), count(*), CURRENT_TIMESTAMP "
+        "FROM activity_logs GROUP BY user_id, activity_type, date(created_at)"
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_activity_daily_rollups_day"), table_name="activity_daily_rollups")
+    op.drop_table("activity_daily_rollups")
+    op.drop_index("ix_activity_logs_user_type_created", table_name="activity_logs")
+    _unpartition_activity_logs()
@@ -0,0 +1,30 @@
+"""add a default partition to activity_logs
+
+Revision ID: b3e8d6a1f4c9
+Revises: a4c9e2f7b1d6
+Create Date: 2026-10-18 23:00:00.000000
+
+Without it, an entry for a month whose partition maintain_activity_logs_task hasn't
+created yet fails to insert, and takes the commit that wrote it down too. Rows that
+land here are moved into their month's partition when maintenance creates it.
+
+"""
+
+from collections.abc import Sequence
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "b3e8d6a1f4c9"
+down_revision: str | None = "a4c9e2f7b1d6"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE TABLE activity_logs_default PARTITION OF activity_logs DEFAULT")
+
+
+def downgrade() -> None:
+    # Run maintenance first: rows still here have no monthly partition and are lost
+    op.execute("DROP TABLE activity_logs_default")
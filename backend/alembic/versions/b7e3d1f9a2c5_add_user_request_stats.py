@@ -0,0 +1,71 @@
+"""add user_request_stats
+
+Revision ID: b7e3d1f9a2c5
+Revises: a9c4e2f7d1b6
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "b7e3d1f9a2c5"
+down_revision: str | None = "a9c4e2f7d1b6"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "user_request_stats",
+        sa.Column("user_id", sa.Uuid(), nullable=False),
+        sa.Column("total_requests", sa.Integer(), nullable=False),
+        sa.Column("pending_count", sa.Integer(), nullable=False),
+        sa.Column("sent_count", sa.Integer(), nullable=False),
+        sa.Column("action_required_count", sa.Integer(), nullable=False),
+        sa.Column("confirmed_count", sa.Integer(), nullable=False),
+        sa.Column("rejected_count", sa.Integer(), nullable=False),
+        sa.Column("response_count", sa.Integer(), nullable=False),
+        sa.Column("response_seconds_sum", sa.Float(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("user_id"),
+    )
+
+    # Same totals as RequestStatsService.rebuild()
+    op.execute(
+        """
+        INSERT INTO user_request_stats (
+            user_id, total_requests, pending_count, sent_count, action_required_count,
+            confirmed_count, rejected_count, response_count, response_seconds_sum, updated_at
+        )
+        SELECT
+            user_id,
+            count(*),
+            count(*) FILTER (WHERE status = 'PENDING'),
+            count(*) FILTER (WHERE status = 'SENT'),
+            count(*) FILTER (WHERE status = 'ACTION_REQUIRED'),
+            count(*) FILTER (WHERE status = 'CONFIRMED'),
+            count(*) FILTER (WHERE status = 'REJECTED'),
+            count(*) FILTER (
+                WHERE status = 'CONFIRMED' AND sent_at IS NOT NULL AND confirmed_at IS NOT NULL
+            ),
+            coalesce(
+                sum(extract(epoch FROM confirmed_at - sent_at)) FILTER (
+                    WHERE status = 'CONFIRMED' AND sent_at IS NOT NULL AND confirmed_at IS NOT NULL
+                ),
+                0
+            ),
+            now() AT TIME ZONE 'utc'
+        FROM deletion_requests
+        GROUP BY user_id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("user_request_stats")
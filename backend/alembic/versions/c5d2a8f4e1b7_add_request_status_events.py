@@ -0,0 +1,165 @@
+"""add request_status_events and their analytics projection
+
+Revision ID: c5d2a8f4e1b7
+Revises: b7e3d1f9a2c5
+Create Date: 2026-10-18 20:00:00.000000
+
+Existing requests get their history reconstructed from their timestamps (sent at
+sent_at, then on to their current status). The projection tables start empty and are
+filled from the events by the first catch-up (project_request_status_events_task, or
+the first analytics read). Response times are taken from confirmed_at only, so
+confirmations without one stay out of request_response_times.
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "c5d2a8f4e1b7"
+down_revision: str | None = "b7e3d1f9a2c5"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def _request_status(nullable: bool = False, name: str = "status") -> sa.Column:
+    return sa.Column(
+        name, postgresql.ENUM(name="requeststatus", create_type=False), nullable=nullable
+    )
+
+
+def upgrade() -> None:
+    op.create_table(
+        "request_status_events",
+        sa.Column("id", sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column("deletion_request_id", sa.Uuid(), nullable=False),
+        sa.Column("user_id", sa.Uuid(), nullable=False),
+        sa.Column("broker_id", sa.Uuid(), nullable=False),
+        _request_status(nullable=True, name="from_status"),
+        _request_status(name="to_status"),
+        sa.Column("source", sa.String(), nullable=False),
+        sa.Column("occurred_at", sa.DateTime(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "ix_request_status_events_request",
+        "request_status_events",
+        ["deletion_request_id", "id"],
+        unique=False,
+    )
+    op.create_index(
+        op.f("ix_request_status_events_user_id"),
+        "request_status_events",
+        ["user_id"],
+        unique=False,
+    )
+
+    op.create_table(
+        "request_status_daily",
+        sa.Column("user_id", sa.Uuid(), nullable=False),
+        sa.Column("broker_id", sa.Uuid(), nullable=False),
+        sa.Column("day", sa.Date(), nullable=False),
+        _request_status(),
+        sa.Column("entered", sa.Integer(), nullable=False),
+        sa.Column("exited", sa.Integer(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("user_id", "broker_id", "day", "status"),
+    )
+    op.create_index(
+        "ix_request_status_daily_user_day",
+        "request_status_daily",
+        ["user_id", "day"],
+        unique=False,
+    )
+
+    op.create_table(
+        "request_response_times",
+        sa.Column("deletion_request_id", sa.Uuid(), nullable=False),
+        sa.Column("user_id", sa.Uuid(), nullable=False),
+        sa.Column("broker_id", sa.Uuid(), nullable=False),
+        sa.Column("response_seconds", sa.Float(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("deletion_request_id"),
+    )
+    op.create_index(
+        op.f("ix_request_response_times_user_id"),
+        "request_response_times",
+        ["user_id"],
+        unique=False,
+    )
+    op.create_index(
+        op.f("ix_request_response_times_broker_id"),
+        "request_response_times",
+        ["broker_id"],
+        unique=False,
+    )
+
+    op.create_table(
+        "event_watermarks",
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("last_event_id", sa.BigInteger(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("name"),
+    )
+
+    # Same reconstruction as new requests get in app.services.request_transitions
+    op.execute(
+        """
+        INSERT INTO request_status_events (
+            deletion_request_id, user_id, broker_id, from_status, to_status, source,
+            occurred_at, created_at
+        )
+        SELECT
+            id, user_id, broker_id, from_status, to_status, source, occurred_at,
+            now() AT TIME ZONE 'utc'
+        FROM (
+            SELECT
+                id, user_id, broker_id, NULL::requeststatus AS from_status,
+                'SENT'::requeststatus AS to_status, source, sent_at AS occurred_at
+            FROM deletion_requests
+            WHERE sent_at IS NOT NULL AND status NOT IN ('PENDING', 'SENT')
+            UNION ALL
+            SELECT
+                id, user_id, broker_id,
+                CASE
+                    WHEN sent_at IS NOT NULL AND status NOT IN ('PENDING', 'SENT')
+                    THEN 'SENT'::requeststatus
+                END,
+                status, source,
+                CASE
+                    -- A confirmation found by a scan has no date of its own; date it
+                    -- by the sent email, as the scanner does, never by a later edit
+                    WHEN status = 'CONFIRMED' THEN coalesce(confirmed_at, sent_at, created_at)
+                    ELSE coalesce(
+                        CASE status
+                            WHEN 'PENDING' THEN created_at
+                            WHEN 'SENT' THEN sent_at
+                            WHEN 'REJECTED' THEN rejected_at
+                        END,
+                        updated_at,
+                        created_at,
+                        now() AT TIME ZONE 'utc'
+                    )
+                END
+            FROM deletion_requests
+        ) AS history
+        ORDER BY occurred_at
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("event_watermarks")
+    op.drop_index(op.f("ix_request_response_times_broker_id"), table_name="request_response_times")
+    op.drop_index(op.f("ix_request_response_times_user_id"), table_name="request_response_times")
+    op.drop_table("request_response_times")
+    op.drop_index("ix_request_status_daily_user_day", table_name="request_status_daily")
+    op.drop_table("request_status_daily")
+    op.drop_index(op.f("ix_request_status_events_user_id"), table_name="request_status_events")
+    op.drop_index("ix_request_status_events_request", table_name="request_status_events")
+    op.drop_table("request_status_events")
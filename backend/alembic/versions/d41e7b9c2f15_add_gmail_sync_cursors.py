@@ -0,0 +1,43 @@
+"""add gmail_sync_cursors for incremental history sync
+
+Revision ID: d41e7b9c2f15
+Revises: c8ada720b72d
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "d41e7b9c2f15"
+down_revision: str | None = "c8ada720b72d"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "gmail_sync_cursors",
+        sa.Column("id", sa.Uuid(), nullable=False),
+        sa.Column("user_id", sa.Uuid(), nullable=False),
+        sa.Column("scope", sa.String(), nullable=False),
+        sa.Column("history_id", sa.String(), nullable=False),
+        sa.Column("synced_at", sa.DateTime(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("user_id", "scope", name="uq_gmail_sync_cursors_user_scope"),
+    )
+    op.create_index(
+        op.f("ix_gmail_sync_cursors_user_id"), "gmail_sync_cursors", ["user_id"], unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_gmail_sync_cursors_user_id"), table_name="gmail_sync_cursors")
+    op.drop_table("gmail_sync_cursors")
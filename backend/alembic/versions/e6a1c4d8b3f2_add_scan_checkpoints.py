@@ -0,0 +1,55 @@
+"""add scan_checkpoints for resumable inbox scans
+
+Revision ID: e6a1c4d8b3f2
+Revises: d41e7b9c2f15
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "e6a1c4d8b3f2"
+down_revision: str | None = "d41e7b9c2f15"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "scan_checkpoints",
+        sa.Column("id", sa.Uuid(), nullable=False),
+        sa.Column("user_id", sa.Uuid(), nullable=False),
+        sa.Column("scan_id", sa.String(), nullable=False),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("phase", sa.String(), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("mode", sa.String(), nullable=True),
+        sa.Column("query", sa.String(), nullable=True),
+        sa.Column("page_token", sa.String(), nullable=True),
+        sa.Column("last_message_id", sa.String(), nullable=True),
+        sa.Column("messages_listed", sa.Integer(), nullable=False),
+        sa.Column("history_id", sa.String(), nullable=True),
+        sa.Column("sent_days_back", sa.Integer(), nullable=True),
+        sa.Column("emails_scanned", sa.Integer(), nullable=False),
+        sa.Column("broker_emails_found", sa.Integer(), nullable=False),
+        sa.Column("broker_message_ids", sa.JSON(), nullable=False),
+        sa.Column("completed_at", sa.DateTime(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("user_id", "scan_id", name="uq_scan_checkpoints_user_scan"),
+    )
+    op.create_index(
+        op.f("ix_scan_checkpoints_user_id"), "scan_checkpoints", ["user_id"], unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_scan_checkpoints_user_id"), table_name="scan_checkpoints")
+    op.drop_table("scan_checkpoints")
@@ -0,0 +1,28 @@
+"""add access token expiry to users
+
+Revision ID: f2b8d5a7c391
+Revises: e6a1c4d8b3f2
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "f2b8d5a7c391"
+down_revision: str | None = "e6a1c4d8b3f2"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    # Existing tokens have no known expiry; it's recorded on their next refresh
+    op.add_column("users", sa.Column("access_token_expires_at", sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("users", "access_token_expires_at")
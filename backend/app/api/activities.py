@@ -5,7 +5,7 @@ from app.database import get_db
 from app.dependencies.auth import get_current_user
 from app.models.activity_log import ActivityType
 from app.models.user import User
-from app.schemas.activity import ActivityLogResponse
+from app.schemas.activity import ActivityDailyCount, ActivityLogResponse
 from app.services.activity_log_service import ActivityLogService
 
 router = APIRouter()
@@ -46,3 +46,21 @@ def get_activities(
         )
         for activity in activities
     ]
+
+
+@router.get("/daily", response_model=list[ActivityDailyCount])
+def get_daily_activity_counts(
+    activity_type: ActivityType | None = Query(None),
+    days_back: int = Query(30, ge=1, le=3650),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Get activity counts per type and day, from the daily rollups"""
+    service = ActivityLogService(db)
+    rollups = service.get_daily_counts(
+        user_id=str(current_user.id), activity_type=activity_type, days_back=days_back
+    )
+    return [
+        ActivityDailyCount(day=rollup.day, activity_type=rollup.activity_type, count=rollup.count)
+        for rollup in rollups
+    ]
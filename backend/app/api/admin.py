@@ -2,9 +2,14 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 
 from app.database import get_db
-from app.dependencies.auth import get_current_user
+from app.dependencies.auth import get_current_user, require_admin
 from app.models.user import User
 from app.schemas.user import TokenRevokeResponse, UserRoleUpdate, UserSummary
+from app.services.auth_user_cache import AuthenticatedUser, auth_user_cache
+from app.services.gmail_client_cache import gmail_client_cache
+from app.services.gmail_quota import gmail_quota_governor
+from app.services.token_manager import token_manager
+from app.tasks.maintenance_tasks import rebuild_request_stats_task, rotate_encryption_keys_task
 
 router = APIRouter()
 
@@ -47,6 +52,7 @@ def update_user_role(
     db.add(user)
     db.commit()
     db.refresh(user)
+    auth_user_cache.invalidate(user.id)
 
     return UserSummary(
         id=str(user.id),
@@ -72,9 +78,36 @@ def revoke_user_tokens(
 
     user.encrypted_access_token = None
     user.encrypted_refresh_token = None
+    user.access_token_expires_at = None
     db.add(user)
     db.commit()
+    gmail_client_cache.invalidate(str(user.id))
+    token_manager.forget(str(user.id))
+    auth_user_cache.invalidate(user.id)
 
     return TokenRevokeResponse(
         message="User tokens revoked. They must reconnect Gmail on next login.",
     )
+
+
+@router.get("/gmail-quota")
+def get_gmail_quota_usage(
+    user_id: str | None = None,
+    current_user: AuthenticatedUser = Depends(require_admin),
+):
+    """Gmail quota budgets and units consumed per minute, for capacity planning."""
+    return gmail_quota_governor.usage(user_id)
+
+
+@router.post("/rotate-encryption-keys")
+def rotate_encryption_keys(current_user: AuthenticatedUser = Depends(require_admin)):
+    """Re-encrypt stored tokens and Gemini keys with the current ENCRYPTION_KEY."""
+    task = rotate_encryption_keys_task.delay()
+    return {"task_id": task.id, "status": "started"}
+
+
+@router.post("/rebuild-request-stats")
+def rebuild_request_stats(current_user: AuthenticatedUser = Depends(require_admin)):
+    """Recompute every user's dashboard request totals from their deletion requests."""
+    task = rebuild_request_stats_task.delay()
+    return {"task_id": task.id, "status": "started"}
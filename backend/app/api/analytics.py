@@ -51,9 +51,10 @@ def get_timeline(
     current_user: User = Depends(get_current_user),
 ) -> list[dict]:
     """
-    Get timeline data for requests sent and confirmations received
+    Get timeline data for request status changes
 
-    Returns daily counts for the specified time period
+    Returns daily counts of requests created, sent, needing action, confirmed and
+    rejected for the specified time period
     """
     service = AnalyticsService(db)
     return service.get_timeline_data(str(current_user.id), days)
@@ -12,7 +12,10 @@ from app.dependencies.auth import (
 )
 from app.models.user import User
 from app.schemas.auth import AuthStatus
+from app.services.auth_user_cache import auth_user_cache
+from app.services.gmail_client_cache import gmail_client_cache
 from app.services.gmail_service import GmailService
+from app.services.token_manager import token_manager
 
 router = APIRouter()
 gmail_service = GmailService()
@@ -71,9 +74,13 @@ def oauth_callback(code: str, state: str = None, db: Session = Depends(get_db)):
         # Update tokens
         user.set_access_token(token_data["access_token"])
         user.set_refresh_token(token_data["refresh_token"])
+        user.access_token_expires_at = token_data.get("expiry")
 
         db.commit()
         db.refresh(user)
+        gmail_client_cache.invalidate(str(user.id))
+        token_manager.forget(str(user.id))
+        auth_user_cache.invalidate(user.id)
 
         # Issue JWT token
         token = create_access_token(
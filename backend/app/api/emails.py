@@ -2,6 +2,8 @@ import json
 import re
 
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 
 from app.database import get_db
@@ -95,14 +97,7 @@ def _parse_scan_history(activity: ActivityLog) -> ScanHistoryEntry:
     )
 
 
-@router.post("/scan", response_model=ScanResult)
-def scan_emails(
-    request: ScanRequest = ScanRequest(),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
-):
-    """Scan user's Gmail inbox for data broker emails"""
-
+def _get_gmail_user(db: Session, current_user: User) -> User:
     user = db.query(User).filter(User.id == current_user.id).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
@@ -110,67 +105,97 @@ def scan_emails(
     if not user.encrypted_access_token:
         raise HTTPException(status_code=401, detail="User not authenticated with Gmail")
 
-    scanner = EmailScanner(db)
+    return user
+
+
+def _record_scan_result(
+    db: Session, user: User, request: ScanRequest, scans: list[EmailScanModel]
+) -> ScanResult:
     activity_service = ActivityLogService(db)
 
-    try:
-        scans = scanner.scan_inbox(user, days_back=request.days_back, max_emails=request.max_emails)
+    scan_responses = [
+        EmailScan(
+            id=str(scan.id),
+            user_id=str(scan.user_id),
+            broker_id=str(scan.broker_id) if scan.broker_id else None,
+            gmail_message_id=scan.gmail_message_id,
+            gmail_thread_id=scan.gmail_thread_id,
+            email_direction=scan.email_direction,
+            sender_email=scan.sender_email,
+            sender_domain=scan.sender_domain,
+            recipient_email=scan.recipient_email,
+            subject=scan.subject,
+            received_date=scan.received_date,
+            is_broker_email=scan.is_broker_email,
+            confidence_score=scan.confidence_score,
+            classification_notes=scan.classification_notes,
+            body_preview=scan.body_preview,
+            created_at=scan.created_at,
+        )
+        for scan in scans
+    ]
 
-        scan_responses = [
-            EmailScan(
-                id=str(scan.id),
-                user_id=str(scan.user_id),
-                broker_id=str(scan.broker_id) if scan.broker_id else None,
-                gmail_message_id=scan.gmail_message_id,
-                gmail_thread_id=scan.gmail_thread_id,
-                email_direction=scan.email_direction,
-                sender_email=scan.sender_email,
-                sender_domain=scan.sender_domain,
-                recipient_email=scan.recipient_email,
-                subject=scan.subject,
-                received_date=scan.received_date,
-                is_broker_email=scan.is_broker_email,
-                confidence_score=scan.confidence_score,
-                classification_notes=scan.classification_notes,
-                body_preview=scan.body_preview,
-                created_at=scan.created_at,
+    broker_emails = sum(1 for scan in scans if scan.is_broker_email)
+
+    activity_service.log_activity(
+        user_id=str(user.id),
+        activity_type=ActivityType.EMAIL_SCANNED,
+        message=f"Email scan completed: {len(scans)} emails scanned, {broker_emails} broker emails found",
+        details=f"Days back: {request.days_back}, Max emails: {request.max_emails}",
+    )
+
+    for scan in scans:
+        if scan.is_broker_email and scan.broker_id:
+            activity_service.log_activity(
+                user_id=str(user.id),
+                activity_type=ActivityType.BROKER_DETECTED,
+                message=f"Detected broker email from {scan.sender_email}",
+                details=f"Subject: {scan.subject}, Confidence: {scan.confidence_score}",
+                broker_id=str(scan.broker_id),
+                email_scan_id=str(scan.id),
             )
-            for scan in scans
-        ]
+    # Writes the scan's log entries in one insert
+    db.commit()
+
+    return ScanResult(
+        message="Inbox scan completed",
+        total_scanned=len(scans),
+        broker_emails_found=broker_emails,
+        scans=scan_responses,
+    )
 
-        broker_emails = sum(1 for scan in scans if scan.is_broker_email)
 
-        activity_service.log_activity(
-            user_id=str(user.id),
-            activity_type=ActivityType.EMAIL_SCANNED,
-            message=f"Email scan completed: {len(scans)} emails scanned, {broker_emails} broker emails found",
-            details=f"Days back: {request.days_back}, Max emails: {request.max_emails}",
-        )
+@router.post("/scan", response_model=ScanResult)
+async def scan_emails(
+    request: ScanRequest = ScanRequest(),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Scan user's Gmail inbox for data broker emails
 
-        for scan in scans:
-            if scan.is_broker_email and scan.broker_id:
-                activity_service.log_activity(
-                    user_id=str(user.id),
-                    activity_type=ActivityType.BROKER_DETECTED,
-                    message=f"Detected broker email from {scan.sender_email}",
-                    details=f"Subject: {scan.subject}, Confidence: {scan.confidence_score}",
-                    broker_id=str(scan.broker_id),
-                    email_scan_id=str(scan.id),
-                )
-
-        return ScanResult(
-            message="Inbox scan completed",
-            total_scanned=len(scans),
-            broker_emails_found=broker_emails,
-            scans=scan_responses,
+    Gmail calls are awaited rather than run on the request thread pool, so a long scan
+    doesn't hold a worker thread that other users' requests need.
+    """
+
+    user = await run_in_threadpool(_get_gmail_user, db, current_user)
+
+    scanner = EmailScanner(db)
+
+    try:
+        scans = await scanner.scan_inbox_async(
+            user, days_back=request.days_back, max_emails=request.max_emails
         )
+        return await run_in_threadpool(_record_scan_result, db, user, request, scans)
 
     except Exception as e:
-        activity_service.log_activity(
+        await run_in_threadpool(
+            ActivityLogService(db).log_activity,
             user_id=str(user.id),
             activity_type=ActivityType.ERROR,
             message="Email scan failed",
             details=str(e),
+            sync=True,
         )
         raise HTTPException(status_code=500, detail=f"Scan failed: {str(e)}")
 
@@ -300,13 +325,22 @@ def get_scan_history(
         ActivityLog.activity_type.in_([ActivityType.EMAIL_SCANNED, ActivityType.RESPONSE_SCANNED]),
     )
 
-    total = base_query.count()
-    activities = (
-        base_query.order_by(ActivityLog.created_at.desc()).offset(offset).limit(limit).all()
+    # The total comes from a window count over the same scan instead of a second query
+    rows = (
+        base_query.add_columns(func.count().over().label("total"))
+        .order_by(ActivityLog.created_at.desc())
+        .offset(offset)
+        .limit(limit)
+        .all()
     )
+    if rows:
+        total = rows[0].total
+    else:
+        # Past the last page (or no history); only then count separately
+        total = base_query.count() if offset else 0
 
     return ScanHistoryPage(
-        items=[_parse_scan_history(activity) for activity in activities],
+        items=[_parse_scan_history(activity) for activity, _ in rows],
         total=total,
         limit=limit,
         offset=offset,
@@ -22,6 +22,7 @@ from app.services.ai_settings import resolve_model
 from app.services.broker_service import BrokerService
 from app.services.deletion_request_service import DeletionRequestService
 from app.services.gemini_service import GeminiService, GeminiServiceError
+from app.services.request_transitions import transition_request
 
 router = APIRouter()
 
@@ -82,6 +83,7 @@ def create_deletion_request(
             broker_id=request.broker_id,
             deletion_request_id=str(deletion_request.id),
         )
+        db.commit()
 
         return serialize_request(deletion_request)
 
@@ -93,6 +95,7 @@ def create_deletion_request(
             message=f"Failed to create deletion request for {broker.name}",
             details=str(e),
             broker_id=request.broker_id,
+            sync=True,
         )
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -198,6 +201,7 @@ def delete_deletion_request(
             broker_id=str(req.broker_id),
             deletion_request_id=request_id,
         )
+        db.commit()
 
         return {"message": "Request deleted successfully"}
 
@@ -271,6 +275,7 @@ def send_deletion_request(
             broker_id=str(req.broker_id),
             deletion_request_id=request_id,
         )
+        db.commit()
 
         return serialize_request(req)
 
@@ -290,6 +295,7 @@ def send_deletion_request(
                     details=str(e),
                     broker_id=str(req.broker_id),
                     deletion_request_id=request_id,
+                    sync=True,
                 )
         except Exception:
             pass  # Don't fail on logging errors
@@ -412,12 +418,20 @@ def ai_classify_request_responses(
     action_required = [r for r in responses if r.response_type == ResponseType.ACTION_REQUIRED]
 
     if confirmations and req.status != RequestStatus.CONFIRMED:
-        req.status = RequestStatus.CONFIRMED
-        req.confirmed_at = max(r.received_date for r in confirmations if r.received_date)
+        transition_request(
+            req,
+            RequestStatus.CONFIRMED,
+            source="ai_classify",
+            at=max(r.received_date for r in confirmations if r.received_date),
+        )
         status_updated = True
     elif rejections and not confirmations and req.status != RequestStatus.REJECTED:
-        req.status = RequestStatus.REJECTED
-        req.rejected_at = max(r.received_date for r in rejections if r.received_date)
+        transition_request(
+            req,
+            RequestStatus.REJECTED,
+            source="ai_classify",
+            at=max(r.received_date for r in rejections if r.received_date),
+        )
         status_updated = True
     elif (
         action_required
@@ -425,7 +439,7 @@ def ai_classify_request_responses(
         and not rejections
         and req.status != RequestStatus.ACTION_REQUIRED
     ):
-        req.status = RequestStatus.ACTION_REQUIRED
+        transition_request(req, RequestStatus.ACTION_REQUIRED, source="ai_classify")
         status_updated = True
 
     db.commit()
@@ -441,6 +455,7 @@ def ai_classify_request_responses(
         else f"Model: {model}",
         deletion_request_id=request_id,
     )
+    db.commit()
 
     return AiClassifyResult(
         request_id=request_id,
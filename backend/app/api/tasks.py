@@ -5,8 +5,8 @@ from fastapi import APIRouter, Depends
 from pydantic import BaseModel
 
 from app.celery_app import celery_app
-from app.dependencies.auth import get_current_user
-from app.models.user import User
+from app.dependencies.auth import get_current_identity
+from app.services.auth_user_cache import AuthenticatedUser
 from app.tasks.email_tasks import scan_inbox_task
 
 router = APIRouter()
@@ -15,6 +15,7 @@ router = APIRouter()
 class ScanTaskRequest(BaseModel):
     days_back: int = 90
     max_emails: int = 100
+    incremental: bool = True
 
 
 class BatchRequestsTaskRequest(BaseModel):
@@ -56,17 +57,20 @@ class TaskQueueHealth(BaseModel):
 @router.post("/scan", response_model=TaskResponse)
 def start_scan_task(
     request: ScanTaskRequest,
-    current_user: User = Depends(get_current_user),
+    current_user: AuthenticatedUser = Depends(get_current_identity),
 ):
     """Start an async email scan task"""
     task = scan_inbox_task.delay(
-        str(current_user.id), days_back=request.days_back, max_emails=request.max_emails
+        str(current_user.id),
+        days_back=request.days_back,
+        max_emails=request.max_emails,
+        incremental=request.incremental,
     )
     return TaskResponse(task_id=task.id, status="started")
 
 
 @router.get("/health", response_model=TaskQueueHealth)
-def get_task_queue_health(current_user: User = Depends(get_current_user)):
+def get_task_queue_health(current_user: AuthenticatedUser = Depends(get_current_identity)):
     """Return basic Celery worker and queue stats"""
     inspect = celery_app.control.inspect()
     stats = inspect.stats() if inspect else None
@@ -125,7 +129,7 @@ def get_task_queue_health(current_user: User = Depends(get_current_user)):
 
 
 @router.get("/{task_id}", response_model=TaskStatusResponse)
-def get_task_status(task_id: str, current_user: User = Depends(get_current_user)):
+def get_task_status(task_id: str, current_user: AuthenticatedUser = Depends(get_current_identity)):
     """Get the status of a Celery task"""
     result = AsyncResult(task_id, app=celery_app)
 
@@ -142,7 +146,7 @@ def get_task_status(task_id: str, current_user: User = Depends(get_current_user)
 
 
 @router.delete("/{task_id}")
-def cancel_task(task_id: str, current_user: User = Depends(get_current_user)):
+def cancel_task(task_id: str, current_user: AuthenticatedUser = Depends(get_current_identity)):
     """Cancel/revoke a running task"""
     celery_app.control.revoke(task_id, terminate=True)
     return {"task_id": task_id, "status": "cancelled"}
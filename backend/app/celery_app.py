@@ -7,7 +7,7 @@ celery_app = Celery(
     "antispam",
     broker=settings.redis_url,
     backend=settings.redis_url,
-    include=["app.tasks.email_tasks"],
+    include=["app.tasks.email_tasks", "app.tasks.maintenance_tasks"],
 )
 
 celery_app.conf.update(
@@ -33,4 +33,16 @@ celery_app.conf.beat_schedule = {
         "task": "app.tasks.email_tasks.sync_brokers_task",
         "schedule": crontab(hour=1, minute=0),  # Run at 1 AM daily
     },
+    "maintain-activity-logs-daily": {
+        "task": "app.tasks.maintenance_tasks.maintain_activity_logs_task",
+        "schedule": crontab(hour=3, minute=0),  # Run at 3 AM daily
+    },
+    "purge-scan-checkpoints-daily": {
+        "task": "app.tasks.maintenance_tasks.purge_scan_checkpoints_task",
+        "schedule": crontab(hour=3, minute=30),  # Run at 3:30 AM daily
+    },
+    "project-request-status-events": {
+        "task": "app.tasks.maintenance_tasks.project_request_status_events_task",
+        "schedule": crontab(minute="*/5"),  # Run every 5 minutes
+    },
 }
@@ -17,6 +17,9 @@ class Settings(BaseSettings):
     # Security
     secret_key: str
     encryption_key: str
+    # Comma-separated keys that encrypted data before the current one; still decrypt
+    # until rotate_encryption_keys_task has re-encrypted everything with encryption_key
+    encryption_previous_keys: str = ""
 
     # Redis/Celery Configuration
     redis_url: str = "redis://localhost:6379/0"
@@ -40,6 +43,23 @@ class Settings(BaseSettings):
             return [origin.strip() for origin in v.split(",") if origin.strip()]
         return v
 
+    # Cache of the user fields API authorization needs (seconds; Redis tier, then per process)
+    auth_cache_ttl_seconds: int = 60
+    auth_cache_local_ttl_seconds: float = 5.0
+    auth_cache_size: int = 10_000
+
+    # Activity log entries buffered per session before they're written in one insert
+    activity_log_buffer_size: int = 500
+
+    # Activity logs older than this are dropped (whole monthly partitions on PostgreSQL);
+    # daily rollups are kept. 0 keeps logs forever.
+    activity_log_retention_days: int = 365
+    # Monthly partitions created ahead of time
+    activity_log_partitions_ahead: int = 3
+
+    # Scan checkpoints (finished or abandoned) not updated for this long are deleted
+    scan_checkpoint_retention_days: int = 7
+
     # Rate Limiting Configuration
     rate_limit_requests: int = 100
     rate_limit_period: int = 60  # seconds
@@ -56,6 +76,31 @@ class Settings(BaseSettings):
     task_trigger_rate_limit: int = 8
     task_trigger_rate_window_seconds: int = 60 * 60
 
+    # Gmail API client cache (per user, keyed by token fingerprint)
+    gmail_client_cache_size: int = 256
+    gmail_client_cache_ttl_seconds: int = 10 * 60
+
+    # Gmail I/O worker pool used inside scan tasks
+    gmail_scan_workers: int = 4
+    gmail_user_max_concurrency: int = 4  # concurrent Gmail calls per user, per process
+
+    # Async Gmail client used by API request handlers (shared HTTP/2 pool)
+    gmail_async_max_connections: int = 20
+    gmail_async_timeout_seconds: float = 30.0
+
+    # Longest Gmail search query sent; longer OR-queries are split into shards
+    gmail_max_query_length: int = 1500
+
+    # Gmail quota governor (Redis token buckets shared by every worker and API replica)
+    gmail_quota_enabled: bool = True
+    gmail_quota_user_units_per_second: int = 250  # Gmail's per-user limit
+    gmail_quota_project_units_per_second: int = 20_000  # 1.2M units/minute per project
+    gmail_quota_max_wait_seconds: float = 60.0
+
+    # OAuth token refresh: one worker per user refreshes, the others wait for its result
+    gmail_token_refresh_lock_seconds: int = 30
+    gmail_token_refresh_wait_seconds: float = 10.0
+
     # Gemini AI configuration
     gemini_timeout_seconds: int = 20
 
@@ -72,5 +117,11 @@ class Settings(BaseSettings):
     def is_production(self) -> bool:
         return self.environment == "production"
 
+    @property
+    def encryption_keys(self) -> list[str]:
+        """Fernet keys, current first"""
+        previous = [key.strip() for key in self.encryption_previous_keys.split(",")]
+        return [self.encryption_key] + [key for key in previous if key]
+
 
 settings = Settings()
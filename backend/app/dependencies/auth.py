@@ -8,6 +8,7 @@ from sqlalchemy.orm import Session
 from app.config import settings
 from app.database import get_db
 from app.models.user import User
+from app.services.auth_user_cache import AuthenticatedUser, auth_user_cache
 
 ALGORITHM = "HS256"
 
@@ -28,10 +29,8 @@ def decode_token(token: str) -> dict:
     return payload
 
 
-def get_current_user(
-    authorization: str | None = Header(None, alias="Authorization"),
-    db: Session = Depends(get_db),
-) -> User:
+def _authenticated_user_id(authorization: str | None) -> UUID:
+    """The user ID of a valid bearer token"""
     if not authorization or not authorization.lower().startswith("bearer "):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -48,30 +47,70 @@ def get_current_user(
         )
 
     try:
-        user_id = UUID(user_id_str)
+        return UUID(user_id_str)
     except ValueError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid user ID format",
         )
 
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
+
+def _ensure_not_revoked(has_tokens: bool) -> None:
+    # Optional token revocation: ensure tokens still stored
+    if not has_tokens:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="User not found",
+            detail="User must re-authenticate",
         )
 
-    # Optional token revocation: ensure tokens still stored
-    if not user.encrypted_access_token or not user.encrypted_refresh_token:
+
+def get_current_user(
+    authorization: str | None = Header(None, alias="Authorization"),
+    db: Session = Depends(get_db),
+) -> User:
+    user_id = _authenticated_user_id(authorization)
+
+    user = db.query(User).filter(User.id == user_id).first()
+    if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="User must re-authenticate",
+            detail="User not found",
         )
 
+    _ensure_not_revoked(bool(user.encrypted_access_token and user.encrypted_refresh_token))
+
     return user
 
 
+def get_current_identity(
+    authorization: str | None = Header(None, alias="Authorization"),
+    db: Session = Depends(get_db),
+) -> AuthenticatedUser:
+    """
+    Like get_current_user, but returns only the fields authorization needs
+
+    They come from the auth user cache, so endpoints that don't need the full user row
+    (task polling, admin checks) usually authenticate without a database query.
+    """
+    user_id = _authenticated_user_id(authorization)
+
+    identity = auth_user_cache.get(user_id)
+    if identity is None:
+        generation = auth_user_cache.generation(user_id)
+        user = db.query(User).filter(User.id == user_id).first()
+        if not user:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="User not found",
+            )
+        identity = AuthenticatedUser.from_user(user)
+        auth_user_cache.put(identity, generation)
+
+    _ensure_not_revoked(identity.has_tokens)
+
+    return identity
+
+
 def ensure_user_matches(
     user_id: str = Query(..., alias="user_id"),
     current_user: User = Depends(get_current_user),
@@ -84,7 +123,9 @@ def ensure_user_matches(
     return current_user
 
 
-def require_admin(current_user: User = Depends(get_current_user)) -> User:
+def require_admin(
+    current_user: AuthenticatedUser = Depends(get_current_identity),
+) -> AuthenticatedUser:
     if not current_user.is_admin:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -1,6 +1,21 @@
 class GmailQuotaExceededError(Exception):
     """Raised when Gmail API returns a quota or rate limit error."""
 
-    def __init__(self, message: str, retry_after: int | None = None):
+    def __init__(self, message: str, retry_after: int | None = None, project_wide: bool = False):
         super().__init__(message)
         self.retry_after = retry_after
+        # Whether the limit hit was the Cloud project's rather than the user's
+        self.project_wide = project_wide
+
+
+class GmailHistoryUnavailableError(Exception):
+    """Raised when an incremental sync cursor can't be used (expired or too far behind)."""
+
+
+class GmailApiError(Exception):
+    """Raised when a Gmail REST call made by the async client fails."""
+
+    def __init__(self, message: str, status: int | None = None, reasons: list[str] | None = None):
+        super().__init__(message)
+        self.status = status
+        self.reasons = reasons or []
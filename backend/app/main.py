@@ -57,6 +57,10 @@ async def lifespan(app: FastAPI):
     yield
     logger.info("Shutting down Data Deletion Assistant API")
 
+    from app.services.async_gmail_client import close_async_http_client
+
+    await close_async_http_client()
+
 
 app = FastAPI(
     title="Data Deletion Assistant API",
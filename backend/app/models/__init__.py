@@ -1,9 +1,18 @@
+from app.models.activity_daily_rollup import ActivityDailyRollup
 from app.models.activity_log import ActivityLog
 from app.models.broker_response import BrokerResponse
 from app.models.data_broker import DataBroker
 from app.models.deletion_request import DeletionRequest
 from app.models.email_scan import EmailScan
+from app.models.event_gap import EventGap
+from app.models.event_watermark import EventWatermark
+from app.models.gmail_sync_cursor import GmailSyncCursor
+from app.models.request_response_time import RequestResponseTime
+from app.models.request_status_daily import RequestStatusDaily
+from app.models.request_status_event import RequestStatusEvent
+from app.models.scan_checkpoint import ScanCheckpoint
 from app.models.user import User
+from app.models.user_request_stats import UserRequestStats
 
 __all__ = [
     "User",
@@ -11,5 +20,19 @@ __all__ = [
     "DeletionRequest",
     "EmailScan",
     "ActivityLog",
+    "ActivityDailyRollup",
     "BrokerResponse",
+    "GmailSyncCursor",
+    "ScanCheckpoint",
+    "UserRequestStats",
+    "RequestStatusEvent",
+    "RequestStatusDaily",
+    "RequestResponseTime",
+    "EventWatermark",
+    "EventGap",
 ]
+
+# Register the flush listeners that keep user_request_stats current and append
+# request_status_events
+import app.services.request_stats  # noqa: E402, F401
+import app.services.request_transitions  # noqa: E402, F401
@@ -0,0 +1,25 @@
+from datetime import datetime
+
+from sqlalchemy import Column, Date, DateTime, Integer, PrimaryKeyConstraint, Uuid
+from sqlalchemy import Enum as SQLEnum
+
+from app.database import Base
+from app.models.activity_log import ActivityType
+
+
+class ActivityDailyRollup(Base):
+    """Number of activity log entries per user, type and day, kept after the logs expire"""
+
+    __tablename__ = "activity_daily_rollups"
+    # Natural key, so rollups can be recomputed with INSERT ... SELECT ... ON CONFLICT
+    __table_args__ = (PrimaryKeyConstraint("user_id", "activity_type", "day"),)
+
+    user_id = Column(Uuid, nullable=False)
+    activity_type = Column(
+        SQLEnum(ActivityType, values_callable=lambda x: [e.value for e in x]),
+        nullable=False,
+    )
+    day = Column(Date, nullable=False, index=True)
+    count = Column(Integer, nullable=False, default=0)
+
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
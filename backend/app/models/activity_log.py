@@ -2,7 +2,7 @@ import enum
 import uuid
 from datetime import datetime
 
-from sqlalchemy import Column, DateTime, String, Text, Uuid
+from sqlalchemy import Column, DateTime, Index, String, Text, Uuid
 from sqlalchemy import Enum as SQLEnum
 
 from app.database import Base
@@ -24,7 +24,16 @@ class ActivityType(str, enum.Enum):
 
 
 class ActivityLog(Base):
+    """
+    On PostgreSQL the table is range-partitioned by month on created_at (see the
+    migration and ActivityLogMaintenance), so its primary key there is (id, created_at).
+    """
+
     __tablename__ = "activity_logs"
+    __table_args__ = (
+        # Serves the per-user, per-type, newest-first reads (/activities, scan history)
+        Index("ix_activity_logs_user_type_created", "user_id", "activity_type", "created_at"),
+    )
 
     id = Column(Uuid, primary_key=True, default=uuid.uuid4)
     user_id = Column(Uuid, nullable=False, index=True)
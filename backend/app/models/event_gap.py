@@ -0,0 +1,22 @@
+from datetime import datetime
+
+from sqlalchemy import BigInteger, Column, DateTime, String
+
+from app.database import Base
+
+
+class EventGap(Base):
+    """
+    An event id a projection's watermark has moved past without seeing
+
+    Ids are taken when an event is inserted but become visible at commit, so a later
+    id can be read first. The projection remembers the ones it skipped and applies them
+    if they show up; a gap still open after the retention period was rolled back.
+    """
+
+    __tablename__ = "event_gaps"
+
+    watermark_name = Column(String, primary_key=True)
+    event_id = Column(BigInteger, primary_key=True)
+
+    noted_at = Column(DateTime, default=datetime.utcnow, nullable=False)
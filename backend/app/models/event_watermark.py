@@ -0,0 +1,16 @@
+from datetime import datetime
+
+from sqlalchemy import BigInteger, Column, DateTime, String
+
+from app.database import Base
+
+
+class EventWatermark(Base):
+    """Id of the last event a projection has consumed, per projection"""
+
+    __tablename__ = "event_watermarks"
+
+    name = Column(String, primary_key=True)
+    last_event_id = Column(BigInteger, nullable=False, default=0)
+
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
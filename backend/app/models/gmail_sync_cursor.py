@@ -0,0 +1,28 @@
+import uuid
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, ForeignKey, String, UniqueConstraint, Uuid
+
+from app.database import Base
+
+
+class GmailSyncCursor(Base):
+    """Last Gmail historyId a scan has processed, per user and scan scope"""
+
+    __tablename__ = "gmail_sync_cursors"
+    __table_args__ = (
+        UniqueConstraint("user_id", "scope", name="uq_gmail_sync_cursors_user_scope"),
+    )
+
+    id = Column(Uuid, primary_key=True, default=uuid.uuid4)
+
+    # Foreign keys
+    user_id = Column(Uuid, ForeignKey("users.id"), nullable=False, index=True)
+
+    # Cursor details
+    scope = Column(String, nullable=False)  # 'inbox' or 'responses'
+    history_id = Column(String, nullable=False)
+    synced_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -0,0 +1,23 @@
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Float, Uuid
+
+from app.database import Base
+
+
+class RequestResponseTime(Base):
+    """
+    Seconds from sending to confirmation, for each currently confirmed request
+
+    Projected from request_status_events by RequestStatusProjection, for the broker
+    compliance response time average and percentiles.
+    """
+
+    __tablename__ = "request_response_times"
+
+    deletion_request_id = Column(Uuid, primary_key=True)
+    user_id = Column(Uuid, nullable=False, index=True)
+    broker_id = Column(Uuid, nullable=False, index=True)
+    response_seconds = Column(Float, nullable=False)
+
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
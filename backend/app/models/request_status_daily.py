@@ -0,0 +1,30 @@
+from datetime import datetime
+
+from sqlalchemy import Column, Date, DateTime, Enum, Index, Integer, PrimaryKeyConstraint, Uuid
+
+from app.database import Base
+from app.models.deletion_request import RequestStatus
+
+
+class RequestStatusDaily(Base):
+    """
+    Requests entering and leaving each status, per user, broker and day
+
+    Projected from request_status_events by RequestStatusProjection. A status's
+    entered minus exited, summed over all days, is the number of requests currently in it.
+    """
+
+    __tablename__ = "request_status_daily"
+    __table_args__ = (
+        PrimaryKeyConstraint("user_id", "broker_id", "day", "status"),
+        Index("ix_request_status_daily_user_day", "user_id", "day"),
+    )
+
+    user_id = Column(Uuid, nullable=False)
+    broker_id = Column(Uuid, nullable=False)
+    day = Column(Date, nullable=False)
+    status = Column(Enum(RequestStatus), nullable=False)
+    entered = Column(Integer, nullable=False, default=0)
+    exited = Column(Integer, nullable=False, default=0)
+
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
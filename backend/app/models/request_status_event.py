@@ -0,0 +1,34 @@
+from datetime import datetime
+
+from sqlalchemy import BigInteger, Column, DateTime, Enum, Index, Integer, String, Uuid
+
+from app.database import Base
+from app.models.deletion_request import RequestStatus
+
+
+class RequestStatusEvent(Base):
+    """
+    One deletion request status change, appended and never updated
+
+    Written by the flush listener in app.services.request_transitions, in the same
+    transaction as the change. The increasing id lets readers consume events
+    incrementally (see RequestStatusProjection).
+    """
+
+    __tablename__ = "request_status_events"
+    __table_args__ = (Index("ix_request_status_events_request", "deletion_request_id", "id"),)
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+
+    # No foreign keys: the history outlives the rows it describes
+    deletion_request_id = Column(Uuid, nullable=False)
+    user_id = Column(Uuid, nullable=False, index=True)
+    broker_id = Column(Uuid, nullable=False)
+
+    # Transition details; from_status is None when the request was created
+    from_status = Column(Enum(RequestStatus), nullable=True)
+    to_status = Column(Enum(RequestStatus), nullable=False)
+    source = Column(String, nullable=False)  # e.g. 'manual', 'email_sent', 'response_scan'
+    occurred_at = Column(DateTime, nullable=False)
+
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
@@ -0,0 +1,44 @@
+import uuid
+from datetime import datetime
+
+from sqlalchemy import JSON, Column, DateTime, ForeignKey, Integer, String, UniqueConstraint, Uuid
+
+from app.database import Base
+
+
+class ScanCheckpoint(Base):
+    """Progress of one inbox scan, committed with each chunk so a retry can resume it"""
+
+    __tablename__ = "scan_checkpoints"
+    __table_args__ = (UniqueConstraint("user_id", "scan_id", name="uq_scan_checkpoints_user_scan"),)
+
+    id = Column(Uuid, primary_key=True, default=uuid.uuid4)
+
+    # Foreign keys
+    user_id = Column(Uuid, ForeignKey("users.id"), nullable=False, index=True)
+
+    # Identifies the scan across retries (the Celery task ID)
+    scan_id = Column(String, nullable=False)
+    status = Column(String, nullable=False, default="running")  # 'running' or 'completed'
+    phase = Column(String, nullable=False, default="received")  # 'received' or 'sent'
+    attempts = Column(Integer, nullable=False, default=0)
+
+    # Where the received listing stands; the query is kept because page tokens are tied to it
+    mode = Column(String, nullable=True)  # 'history' or 'full', once chosen
+    query = Column(String, nullable=True)
+    page_token = Column(String, nullable=True)
+    last_message_id = Column(String, nullable=True)
+    messages_listed = Column(Integer, nullable=False, default=0)
+
+    # Values the finished scan needs, fixed by the first attempt
+    history_id = Column(String, nullable=True)
+    sent_days_back = Column(Integer, nullable=True)
+
+    # Running totals across attempts
+    emails_scanned = Column(Integer, nullable=False, default=0)
+    broker_emails_found = Column(Integer, nullable=False, default=0)
+    broker_message_ids = Column(JSON, nullable=False, default=list)
+
+    completed_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
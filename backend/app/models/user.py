@@ -1,12 +1,11 @@
 import uuid
 from datetime import datetime
 
-from cryptography.fernet import Fernet
 from sqlalchemy import Boolean, Column, DateTime, String, Text, Uuid
 from sqlalchemy.orm import relationship
 
-from app.config import settings
 from app.database import Base
+from app.utils.encryption import decrypt_token, encrypt_token
 
 
 class User(Base):
@@ -19,6 +18,7 @@ class User(Base):
     # Encrypted OAuth tokens
     encrypted_access_token = Column(Text, nullable=True)
     encrypted_refresh_token = Column(Text, nullable=True)
+    access_token_expires_at = Column(DateTime, nullable=True)  # UTC, as google-auth reports it
     encrypted_gemini_api_key = Column(Text, nullable=True)
     gemini_key_updated_at = Column(DateTime, nullable=True)
     gemini_model = Column(String, nullable=True)
@@ -35,13 +35,11 @@ class User(Base):
 
     def encrypt_token(self, token: str) -> str:
         """Encrypt a token using Fernet encryption"""
-        fernet = Fernet(settings.encryption_key.encode())
-        return fernet.encrypt(token.encode()).decode()
+        return encrypt_token(token)
 
     def decrypt_token(self, encrypted_token: str) -> str:
-        """Decrypt a token using Fernet encryption"""
-        fernet = Fernet(settings.encryption_key.encode())
-        return fernet.decrypt(encrypted_token.encode()).decode()
+        """Decrypt a token using Fernet encryption (current or previous keys)"""
+        return decrypt_token(encrypted_token)
 
     def set_access_token(self, token: str):
         """Set encrypted access token"""
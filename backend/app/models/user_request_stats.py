@@ -0,0 +1,32 @@
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Float, ForeignKey, Integer, Uuid
+
+from app.database import Base
+
+
+class UserRequestStats(Base):
+    """
+    Running totals of a user's deletion requests, for the dashboard stats
+
+    Kept current by a flush listener in app.services.request_stats, in the same
+    transaction as the request changes; RequestStatsService.rebuild() recomputes it.
+    """
+
+    __tablename__ = "user_request_stats"
+
+    user_id = Column(Uuid, ForeignKey("users.id"), primary_key=True)
+
+    # Requests per status
+    total_requests = Column(Integer, nullable=False, default=0)
+    pending_count = Column(Integer, nullable=False, default=0)
+    sent_count = Column(Integer, nullable=False, default=0)
+    action_required_count = Column(Integer, nullable=False, default=0)
+    confirmed_count = Column(Integer, nullable=False, default=0)
+    rejected_count = Column(Integer, nullable=False, default=0)
+
+    # Confirmed requests with both timestamps, and the sum of their sent-to-confirmed times
+    response_count = Column(Integer, nullable=False, default=0)
+    response_seconds_sum = Column(Float, nullable=False, default=0.0)
+
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
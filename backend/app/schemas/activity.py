@@ -1,4 +1,4 @@
-from datetime import datetime
+from datetime import date, datetime
 
 from pydantic import BaseModel
 
@@ -19,3 +19,12 @@ class ActivityLogResponse(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+class ActivityDailyCount(BaseModel):
+    day: date
+    activity_type: ActivityType
+    count: int
+
+    class Config:
+        from_attributes = True
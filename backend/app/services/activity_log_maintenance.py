@@ -0,0 +1,249 @@
+"""
+Activity Log Maintenance
+Monthly partitions, retention and daily rollups for activity_logs
+"""
+
+import logging
+import re
+from dataclasses import dataclass, field
+from datetime import date, datetime, time, timedelta
+
+from sqlalchemy import DateTime, delete, func, literal, select, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.activity_daily_rollup import ActivityDailyRollup
+from app.models.activity_log import ActivityLog
+
+logger = logging.getLogger(__name__)
+
+# Monthly partitions are named activity_logs_pYYYY_MM (as in the partitioning migration)
+_PARTITION_NAME = re.compile(r"^activity_logs_p(\d{4})_(\d{2})$")
+
+# Catches entries for months without a partition, so inserts never fail if maintenance
+# falls behind
+DEFAULT_PARTITION = "activity_logs_default"
+
+
+def _month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def _next_month(month: date) -> date:
+    return (month.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def partition_name(month: date) -> str:
+    return f"activity_logs_p{month.year:04d}_{month.month:02d}"
+
+
+def _midnight(day: date) -> datetime:
+    return datetime.combine(day, time.min)
+
+
+@dataclass
+class ActivityLogMaintenanceResult:
+    """What a maintenance run changed"""
+
+    partitions_created: list[str] = field(default_factory=list)
+    partitions_dropped: list[str] = field(default_factory=list)
+    rows_deleted: int = 0  # Unpartitioned tables and the default partition only
+    rollups_written: int = 0
+
+
+class ActivityLogMaintenance:
+    """
+    Keeps activity_logs bounded and its daily rollups current
+
+    On PostgreSQL, activity_logs is partitioned by month: partitions are created a few
+    months ahead, and partitions entirely older than the retention period are dropped,
+    which is instant and leaves no bloat (so logs are kept up to a month past the
+    retention period). Entries for a month without a partition land in the default
+    partition until its partition is created. Elsewhere (SQLite in development and tests) expired rows are
+    deleted. Days are rolled up into activity_daily_rollups before their logs go, so
+    counts stay available after the logs themselves expire.
+    """
+
+    def __init__(
+        self,
+        db: Session,
+        retention_days: int | None = None,
+        partitions_ahead: int | None = None,
+    ):
+        self.db = db
+        self.retention_days = (
+            settings.activity_log_retention_days if retention_days is None else retention_days
+        )
+        self.partitions_ahead = (
+            settings.activity_log_partitions_ahead if partitions_ahead is None else partitions_ahead
+        )
+
+    def run(self, today: date | None = None) -> ActivityLogMaintenanceResult:
+        """Create upcoming partitions, refresh recent rollups and apply retention"""
+        today = today or datetime.utcnow().date()
+        result = ActivityLogMaintenanceResult()
+
+        if self._partitioned():
+            result.partitions_created = self.ensure_partitions(today)
+            self.db.commit()
+
+        # Yesterday may still have been receiving entries at the last run
+        result.rollups_written = self.rollup(today - timedelta(days=1), today + timedelta(days=1))
+        self.db.commit()
+
+        if self.retention_days > 0:
+            self._apply_retention(today, result)
+
+        logger.info(
+            f"Activity log maintenance: {len(result.partitions_created)} partitions created, "
+            f"{len(result.partitions_dropped)} dropped, {result.rows_deleted} rows deleted, "
+            f"{result.rollups_written} rollups written"
+        )
+        return result
+
+    def rollup(self, start: date, end: date) -> int:
+        """
+        Recompute the rollups of days start (inclusive) to end (exclusive)
+
+        One INSERT ... SELECT ... GROUP BY, upserting each (user, type, day) count, so
+        re-running a day just overwrites it.
+
+        Returns:
+            Number of rollup rows written
+        """
+        dialect = self.db.get_bind().dialect.name
+        if dialect == "postgresql":
+            insert = postgresql.insert
+        elif dialect == "sqlite":
+            insert = sqlite.insert
+        else:
+            raise NotImplementedError(f"Activity log rollups do not support {dialect}")
+
+        day = func.date(ActivityLog.created_at)
+        counts = (
+            select(
+                ActivityLog.user_id,
+                ActivityLog.activity_type,
+                day,
+                func.count(),
+                literal(datetime.utcnow(), DateTime),
+            )
+            .where(
+                ActivityLog.created_at >= _midnight(start),
+                ActivityLog.created_at < _midnight(end),
+            )
+            .group_by(ActivityLog.user_id, ActivityLog.activity_type, day)
+        )
+        table = ActivityDailyRollup.__table__
+        stmt = insert(table).from_select(
+            ["user_id", "activity_type", "day", "count", "updated_at"], counts
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["user_id", "activity_type", "day"],
+            set_={"count": stmt.excluded["count"], "updated_at": stmt.excluded.updated_at},
+        )
+        return self.db.execute(stmt).rowcount
+
+    def ensure_partitions(self, today: date) -> list[str]:
+        """Create the current month's partition and the next partitions_ahead months'"""
+        created = []
+        existing = set(self._partitions())
+        month = _month_start(today)
+        for _ in range(self.partitions_ahead + 1):
+            name = partition_name(month)
+            if name not in existing:
+                self._create_partition(name, month)
+                created.append(name)
+            month = _next_month(month)
+        return created
+
+    def _create_partition(self, name: str, month: date) -> None:
+        """
+        Create and attach one month's partition
+
+        A month's range can't be attached while the default partition holds rows in it,
+        so any that landed there (while maintenance wasn't running) are moved in first.
+        """
+        start, end = month.isoformat(), _next_month(month).isoformat()
+        self.db.execute(text(f"CREATE TABLE {name} (LIKE activity_logs INCLUDING DEFAULTS)"))
+        moved = self.db.execute(
+            text(
+                f"WITH moved AS ("
+                f"DELETE FROM {DEFAULT_PARTITION} "
+                f"WHERE created_at >= '{start}' AND created_at < '{end}' RETURNING *"
+                f") INSERT INTO {name} SELECT * FROM moved"
+            )
+        ).rowcount
+        if moved:
+            logger.warning(f"Moved {moved} activity logs from {DEFAULT_PARTITION} into {name}")
+        self.db.execute(
+            text(
+                f"ALTER TABLE activity_logs ATTACH PARTITION {name} "
+                f"FOR VALUES FROM ('{start}') TO ('{end}')"
+            )
+        )
+
+    def _apply_retention(self, today: date, result: ActivityLogMaintenanceResult) -> None:
+        cutoff = today - timedelta(days=self.retention_days)
+
+        if not self._partitioned():
+            oldest = self.db.execute(select(func.min(ActivityLog.created_at))).scalar()
+            if oldest is None or oldest.date() >= cutoff:
+                return
+            result.rollups_written += self.rollup(oldest.date(), cutoff)
+            result.rows_deleted = self.db.execute(
+                delete(ActivityLog).where(ActivityLog.created_at < _midnight(cutoff))
+            ).rowcount
+            self.db.commit()
+            return
+
+        for name, month in sorted(self._partitions().items(), key=lambda item: item[1]):
+            month_end = _next_month(month)
+            if month_end > cutoff:
+                break
+            # Make sure the month's rollups are complete before its logs go
+            result.rollups_written += self.rollup(month, month_end)
+            self.db.execute(text(f"DROP TABLE {name}"))
+            self.db.commit()
+            result.partitions_dropped.append(name)
+
+        # Months that never got a partition expire from the default one
+        oldest = self.db.execute(text(f"SELECT min(created_at) FROM {DEFAULT_PARTITION}")).scalar()
+        if oldest is not None and oldest.date() < cutoff:
+            result.rollups_written += self.rollup(oldest.date(), cutoff)
+            result.rows_deleted = self.db.execute(
+                text(f"DELETE FROM {DEFAULT_PARTITION} WHERE created_at < :cutoff"),
+                {"cutoff": _midnight(cutoff)},
+            ).rowcount
+            self.db.commit()
+
+    def _partitioned(self) -> bool:
+        if self.db.get_bind().dialect.name != "postgresql":
+            return False
+        return bool(
+            self.db.execute(
+                text(
+                    "SELECT 1 FROM pg_partitioned_table pt "
+                    "JOIN pg_class c ON c.oid = pt.partrelid "
+                    "WHERE c.relname = 'activity_logs'"
+                )
+            ).scalar()
+        )
+
+    def _partitions(self) -> dict[str, date]:
+        """Monthly partitions of activity_logs, by name"""
+        names = self.db.execute(
+            text(
+                "SELECT child.relname FROM pg_inherits "
+                "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+                "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+                "WHERE parent.relname = 'activity_logs'"
+            )
+        ).scalars()
+        partitions = {}
+        for name in names:
+            match = _PARTITION_NAME.match(name)
+            if match:
+                partitions[name] = date(int(match[1]), int(match[2]), 1)
+        return partitions
@@ -1,16 +1,36 @@
+import uuid
 from datetime import datetime, timedelta
 from uuid import UUID
 
+from sqlalchemy import event, insert
 from sqlalchemy.orm import Session
 
+from app.config import settings
+from app.models.activity_daily_rollup import ActivityDailyRollup
 from app.models.activity_log import ActivityLog, ActivityType
 
+# Session.info key holding entries not yet written
+BUFFER_KEY = "activity_log_buffer"
+
+
+def _as_uuid(value: UUID | str | None) -> UUID | None:
+    return UUID(value) if value and isinstance(value, str) else value
+
 
 class ActivityLogService:
-    """Service for creating and querying activity logs"""
+    """
+    Service for creating and querying activity logs
+
+    Entries are buffered on the session (so every service sharing a session shares the
+    buffer) and written in one multi-row insert when the session commits or the buffer
+    fills, instead of a commit per entry. Entries only reach the database with the
+    caller's unit of work, so callers that log and then return must commit.
+    log_activity(sync=True) writes and commits the entry immediately.
+    """
 
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, buffer_size: int | None = None):
         self.db = db
+        self.buffer_size = buffer_size or settings.activity_log_buffer_size
 
     def log_activity(
         self,
@@ -22,30 +42,51 @@ class ActivityLogService:
         deletion_request_id: str | None = None,
         response_id: str | None = None,
         email_scan_id: str | None = None,
+        sync: bool = False,
     ) -> ActivityLog:
-        """Create an activity log entry"""
+        """
+        Create an activity log entry
+
+        Buffered by default: the returned entry has its ID and timestamp but isn't
+        attached to the session. With sync=True it's written and committed (along with
+        any buffered entries and other pending work) and returned persistent.
+        """
         # Convert string UUIDs to UUID objects for database
-        activity = ActivityLog(
-            user_id=UUID(user_id) if user_id and isinstance(user_id, str) else user_id,
-            activity_type=activity_type,
-            message=message,
-            details=details,
-            broker_id=UUID(broker_id) if broker_id and isinstance(broker_id, str) else broker_id,
-            deletion_request_id=UUID(deletion_request_id)
-            if deletion_request_id and isinstance(deletion_request_id, str)
-            else deletion_request_id,
-            response_id=UUID(response_id)
-            if response_id and isinstance(response_id, str)
-            else response_id,
-            email_scan_id=UUID(email_scan_id)
-            if email_scan_id and isinstance(email_scan_id, str)
-            else email_scan_id,
-        )
-        self.db.add(activity)
-        self.db.commit()
-        self.db.refresh(activity)
+        row = {
+            "id": uuid.uuid4(),
+            "user_id": _as_uuid(user_id),
+            "activity_type": activity_type,
+            "message": message,
+            "details": details,
+            "broker_id": _as_uuid(broker_id),
+            "deletion_request_id": _as_uuid(deletion_request_id),
+            "response_id": _as_uuid(response_id),
+            "email_scan_id": _as_uuid(email_scan_id),
+            "created_at": datetime.utcnow(),
+        }
+        activity = ActivityLog(**row)
+
+        if sync:
+            self.db.add(activity)
+            self.db.commit()
+            self.db.refresh(activity)
+            return activity
+
+        buffer = self.db.info.setdefault(BUFFER_KEY, [])
+        buffer.append(row)
+        if len(buffer) >= self.buffer_size:
+            self.flush()
         return activity
 
+    def flush(self) -> int:
+        """
+        Write buffered entries in one insert, within the current transaction
+
+        Returns:
+            Number of entries written
+        """
+        return _flush_buffer(self.db)
+
     def get_user_activities(
         self,
         user_id: str,
@@ -55,6 +96,9 @@ class ActivityLogService:
         limit: int = 100,
     ) -> list[ActivityLog]:
         """Get activity logs for a user"""
+        # Include entries logged earlier in this unit of work
+        self.flush()
+
         # Convert string UUIDs to UUID objects
         user_uuid = UUID(user_id) if isinstance(user_id, str) else user_id
         query = self.db.query(ActivityLog).filter(ActivityLog.user_id == user_uuid)
@@ -70,3 +114,47 @@ class ActivityLogService:
         query = query.filter(ActivityLog.created_at >= cutoff_date)
 
         return query.order_by(ActivityLog.created_at.desc()).limit(limit).all()
+
+    def get_daily_counts(
+        self,
+        user_id: str,
+        activity_type: ActivityType | None = None,
+        days_back: int = 30,
+    ) -> list[ActivityDailyRollup]:
+        """
+        Get a user's activity counts per type and day, oldest day first
+
+        Read from the daily rollups, which outlive the logs and are refreshed by the
+        maintenance task, so the current day's counts can lag behind.
+        """
+        user_uuid = UUID(user_id) if isinstance(user_id, str) else user_id
+        query = self.db.query(ActivityDailyRollup).filter(
+            ActivityDailyRollup.user_id == user_uuid,
+            ActivityDailyRollup.day >= datetime.utcnow().date() - timedelta(days=days_back),
+        )
+        if activity_type:
+            query = query.filter(ActivityDailyRollup.activity_type == activity_type)
+
+        return query.order_by(ActivityDailyRollup.day, ActivityDailyRollup.activity_type).all()
+
+
+def _flush_buffer(session: Session) -> int:
+    rows = session.info.pop(BUFFER_KEY, None)
+    if not rows:
+        return 0
+    session.execute(insert(ActivityLog).values(rows))
+    return len(rows)
+
+
+@event.listens_for(Session, "before_commit")
+def _flush_on_commit(session: Session) -> None:
+    """Write buffered entries as part of every commit"""
+    _flush_buffer(session)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_on_rollback(session: Session, previous_transaction) -> None:
+    """Drop buffered entries with the rest of a rolled-back unit of work"""
+    # Fires even if the session never touched the database, unlike after_rollback
+    if not previous_transaction.nested:
+        session.info.pop(BUFFER_KEY, None)
@@ -6,12 +6,32 @@ Provides statistical analysis and insights about deletion requests and broker re
 from datetime import datetime, timedelta
 from uuid import UUID
 
-from sqlalchemy import case, func
+from sqlalchemy import Integer, case, cast, func, select
 from sqlalchemy.orm import Session
 
 from app.models.broker_response import BrokerResponse
 from app.models.data_broker import DataBroker
-from app.models.deletion_request import DeletionRequest, RequestStatus
+from app.models.deletion_request import RequestStatus
+from app.models.request_response_time import RequestResponseTime
+from app.models.request_status_daily import RequestStatusDaily
+from app.services.request_stats import SECONDS_PER_DAY, RequestStatsService
+from app.services.request_status_projection import RequestStatusProjection
+
+# Timeline entry key counting the requests that reached each status
+TIMELINE_KEYS = {
+    RequestStatus.PENDING: "requests_created",
+    RequestStatus.SENT: "requests_sent",
+    RequestStatus.ACTION_REQUIRED: "actions_required",
+    RequestStatus.CONFIRMED: "confirmations_received",
+    RequestStatus.REJECTED: "rejections_received",
+}
+
+
+def _days(seconds: float | None) -> float | None:
+    """Seconds as days, rounded for display (None stays None)"""
+    if seconds is None:
+        return None
+    return round(float(seconds) / SECONDS_PER_DAY, 1)
 
 
 class AnalyticsService:
@@ -20,45 +40,102 @@ class AnalyticsService:
     def __init__(self, db: Session):
         self.db = db
 
+    @property
+    def _dialect(self) -> str:
+        return self.db.get_bind().dialect.name
+
+    def _catch_up_projection(self) -> None:
+        """
+        Apply new status events before reading the projection
+
+        Runs on a session of its own, since catching up commits: the caller's pending
+        work is neither flushed nor committed by a read.
+        """
+        with Session(bind=self.db.get_bind()) as session:
+            RequestStatusProjection(session).catch_up()
+
+    def _response_times(self, user_uuid: UUID | None):
+        """
+        Per-broker average, median and p90 response seconds, as a subquery
+
+        PostgreSQL computes the percentiles with percentile_cont. SQLite has no
+        percentile_cont, so there each broker's response times are ranked with window
+        functions and interpolated between the two ranks around each percentile the same
+        way percentile_cont does.
+        """
+        times = RequestResponseTime
+        if self._dialect == "postgresql":
+            query = select(
+                times.broker_id.label("broker_id"),
+                func.avg(times.response_seconds).label("avg_seconds"),
+                func.percentile_cont(0.5)
+                .within_group(times.response_seconds)
+                .label("median_seconds"),
+                func.percentile_cont(0.9).within_group(times.response_seconds).label("p90_seconds"),
+            )
+            if user_uuid:
+                query = query.where(times.user_id == user_uuid)
+            return query.group_by(times.broker_id).subquery()
+
+        ranked = select(
+            times.broker_id.label("broker_id"),
+            times.response_seconds.label("seconds"),
+            (
+                func.row_number().over(
+                    partition_by=times.broker_id, order_by=times.response_seconds
+                )
+                - 1
+            ).label("rank"),
+            func.count().over(partition_by=times.broker_id).label("n"),
+        )
+        if user_uuid:
+            ranked = ranked.where(times.user_id == user_uuid)
+        ranked = ranked.subquery()
+
+        def percentile(fraction: float):
+            position = fraction * (ranked.c.n - 1)
+            lower = cast(position, Integer)  # floor, positions being non-negative
+            weight = position - lower
+            return func.sum(
+                case(
+                    (ranked.c.rank == lower, ranked.c.seconds * (1 - weight)),
+                    (ranked.c.rank == lower + 1, ranked.c.seconds * weight),
+                    else_=0,
+                )
+            )
+
+        return (
+            select(
+                ranked.c.broker_id,
+                func.avg(ranked.c.seconds).label("avg_seconds"),
+                percentile(0.5).label("median_seconds"),
+                percentile(0.9).label("p90_seconds"),
+            )
+            .group_by(ranked.c.broker_id)
+            .subquery()
+        )
+
     def get_user_stats(self, user_id: str) -> dict:
         """
         Get overall statistics for a user
 
+        Read from the user's user_request_stats row, so the cost doesn't depend on how
+        many requests they have.
+
         Returns:
             Dict with total_requests, confirmed, sent, rejected, pending,
             success_rate, average_response_time_days
         """
-        # Convert string UUID to UUID object
-        user_uuid = UUID(user_id) if isinstance(user_id, str) else user_id
-
-        # Count requests by status
-        status_counts = (
-            self.db.query(DeletionRequest.status, func.count(DeletionRequest.id).label("count"))
-            .filter(DeletionRequest.user_id == user_uuid)
-            .group_by(DeletionRequest.status)
-            .all()
-        )
+        totals = RequestStatsService(self.db).get_stats(user_id)
 
-        # Convert to dict
         stats = {
-            "total_requests": 0,
-            "confirmed_deletions": 0,
-            "sent_requests": 0,
-            "rejected": 0,
-            "pending_requests": 0,
+            "total_requests": totals.total_requests if totals else 0,
+            "confirmed_deletions": totals.confirmed_count if totals else 0,
+            "sent_requests": totals.sent_count + totals.action_required_count if totals else 0,
+            "rejected": totals.rejected_count if totals else 0,
+            "pending_requests": totals.pending_count if totals else 0,
         }
 
-        for status, count in status_counts:
-            stats["total_requests"] += count
-            if status == RequestStatus.CONFIRMED:
-                stats["confirmed_deletions"] = count
-            elif status in (RequestStatus.SENT, RequestStatus.ACTION_REQUIRED):
-                stats["sent_requests"] += count
-            elif status == RequestStatus.REJECTED:
-                stats["rejected"] = count
-            elif status == RequestStatus.PENDING:
-                stats["pending_requests"] = count
-
         # Calculate success rate
         total_sent = stats["confirmed_deletions"] + stats["sent_requests"] + stats["rejected"]
         if total_sent > 0:
@@ -66,21 +143,10 @@ class AnalyticsService:
         else:
             stats["success_rate"] = 0.0
 
-        # Calculate average response time
-        confirmed_requests = (
-            self.db.query(DeletionRequest)
-            .filter(
-                DeletionRequest.user_id == user_uuid,
-                DeletionRequest.status == RequestStatus.CONFIRMED,
-                DeletionRequest.sent_at.isnot(None),
-                DeletionRequest.confirmed_at.isnot(None),
+        if totals and totals.response_count:
+            stats["avg_response_time_days"] = _days(
+                totals.response_seconds_sum / totals.response_count
             )
-            .all()
-        )
-
-        if confirmed_requests:
-            total_days = sum((req.confirmed_at - req.sent_at).days for req in confirmed_requests)
-            stats["avg_response_time_days"] = round(total_days / len(confirmed_requests), 1)
         else:
             stats["avg_response_time_days"] = None
 
@@ -90,61 +156,62 @@ class AnalyticsService:
         """
         Get broker compliance ranking
 
+        Reads the request status projection (caught up with the latest events first):
+        counts from request_status_daily and response times from request_response_times,
+        joined in one query, with the average, median and p90 computed by the database.
+
         Args:
             user_id: Optional user ID to filter by specific user's requests
 
         Returns:
             List of dicts with broker_id, broker_name, total_requests,
-            confirmed, rejected, success_rate, average_response_days
+            confirmed, rejected, success_rate, average, median and p90 response days
             Sorted by success_rate descending
         """
         # Convert string UUID to UUID object if provided
         user_uuid = UUID(user_id) if user_id and isinstance(user_id, str) else user_id
 
-        query = self.db.query(
-            DataBroker.id.label("broker_id"),
-            DataBroker.name.label("broker_name"),
-            func.count(DeletionRequest.id).label("total_requests"),
-            func.sum(case((DeletionRequest.status == RequestStatus.CONFIRMED, 1), else_=0)).label(
-                "confirmed"
-            ),
-            func.sum(case((DeletionRequest.status == RequestStatus.REJECTED, 1), else_=0)).label(
-                "rejected"
-            ),
-        ).join(DeletionRequest, DeletionRequest.broker_id == DataBroker.id)
-
+        self._catch_up_projection()
+
+        # Requests currently in a status: entered minus exited over all days
+        current = RequestStatusDaily.entered - RequestStatusDaily.exited
+        counts = select(
+            RequestStatusDaily.broker_id.label("broker_id"),
+            func.sum(current).label("total_requests"),
+            func.sum(
+                case((RequestStatusDaily.status == RequestStatus.CONFIRMED, current), else_=0)
+            ).label("confirmed"),
+            func.sum(
+                case((RequestStatusDaily.status == RequestStatus.REJECTED, current), else_=0)
+            ).label("rejected"),
+        )
         if user_uuid:
-            query = query.filter(DeletionRequest.user_id == user_uuid)
+            counts = counts.where(RequestStatusDaily.user_id == user_uuid)
+        counts = counts.group_by(RequestStatusDaily.broker_id).subquery()
+        times = self._response_times(user_uuid)
 
-        results = query.group_by(DataBroker.id, DataBroker.name).all()
+        results = (
+            self.db.query(
+                DataBroker.id.label("broker_id"),
+                DataBroker.name.label("broker_name"),
+                counts.c.total_requests,
+                counts.c.confirmed,
+                counts.c.rejected,
+                times.c.avg_seconds,
+                times.c.median_seconds,
+                times.c.p90_seconds,
+            )
+            .join(counts, counts.c.broker_id == DataBroker.id)
+            .outerjoin(times, times.c.broker_id == DataBroker.id)
+            .filter(counts.c.total_requests > 0)
+            .all()
+        )
 
-        # Calculate success rates and average response times
         rankings = []
         for row in results:
             total_completed = row.confirmed + row.rejected
             success_rate = (row.confirmed / total_completed * 100) if total_completed > 0 else 0
 
-            # Get average response time for this broker
-            confirmed_requests = self.db.query(DeletionRequest).filter(
-                DeletionRequest.broker_id == row.broker_id,
-                DeletionRequest.status == RequestStatus.CONFIRMED,
-                DeletionRequest.sent_at.isnot(None),
-                DeletionRequest.confirmed_at.isnot(None),
-            )
-
-            if user_uuid:
-                confirmed_requests = confirmed_requests.filter(DeletionRequest.user_id == user_uuid)
-
-            confirmed_requests = confirmed_requests.all()
-
-            if confirmed_requests:
-                total_days = sum(
-                    (req.confirmed_at - req.sent_at).days for req in confirmed_requests
-                )
-                avg_response_days = round(total_days / len(confirmed_requests), 1)
-            else:
-                avg_response_days = 0.0
-
             rankings.append(
                 {
                     "broker_id": str(row.broker_id),
@@ -153,7 +220,9 @@ class AnalyticsService:
                     "confirmations": row.confirmed,
                     "rejected": row.rejected,
                     "success_rate": round(success_rate, 1),
-                    "avg_response_time_days": avg_response_days if avg_response_days > 0 else None,
+                    "avg_response_time_days": _days(row.avg_seconds),
+                    "median_response_time_days": _days(row.median_seconds),
+                    "p90_response_time_days": _days(row.p90_seconds),
                 }
             )
 
@@ -164,72 +233,49 @@ class AnalyticsService:
 
     def get_timeline_data(self, user_id: str, days: int = 30) -> list[dict]:
         """
-        Get timeline data for requests sent and confirmations received
+        Get timeline data for request status changes
+
+        Reads request_status_daily (caught up with the latest events first), so each
+        day counts every request that reached a status that day, whichever status it
+        has now.
 
         Args:
             user_id: User ID
             days: Number of days to look back
 
         Returns:
-            List of dicts with date, requests_sent, confirmations_received
+            List of dicts with date, requests_created, requests_sent, actions_required,
+            confirmations_received and rejections_received
         """
         # Convert string UUID to UUID object
         user_uuid = UUID(user_id) if isinstance(user_id, str) else user_id
-        cutoff_date = datetime.now() - timedelta(days=days)
+        cutoff_date = (datetime.utcnow() - timedelta(days=days)).date()
 
-        # Get requests sent per day
-        sent_by_day = (
-            self.db.query(
-                func.date(DeletionRequest.sent_at).label("date"),
-                func.count(DeletionRequest.id).label("count"),
-            )
-            .filter(
-                DeletionRequest.user_id == user_uuid,
-                DeletionRequest.sent_at >= cutoff_date,
-                DeletionRequest.sent_at.isnot(None),
-            )
-            .group_by(func.date(DeletionRequest.sent_at))
-            .all()
-        )
+        self._catch_up_projection()
 
-        # Get confirmations received per day
-        confirmed_by_day = (
+        results = (
             self.db.query(
-                func.date(DeletionRequest.confirmed_at).label("date"),
-                func.count(DeletionRequest.id).label("count"),
+                RequestStatusDaily.day,
+                RequestStatusDaily.status,
+                func.sum(RequestStatusDaily.entered).label("count"),
             )
             .filter(
-                DeletionRequest.user_id == user_uuid,
-                DeletionRequest.confirmed_at >= cutoff_date,
-                DeletionRequest.confirmed_at.isnot(None),
+                RequestStatusDaily.user_id == user_uuid,
+                RequestStatusDaily.day >= cutoff_date,
             )
-            .group_by(func.date(DeletionRequest.confirmed_at))
+            .group_by(RequestStatusDaily.day, RequestStatusDaily.status)
             .all()
         )
 
         # Merge data by date
         timeline = {}
-
-        for row in sent_by_day:
-            # Handle both date objects (PostgreSQL) and strings (SQLite)
-            date_str = row.date.isoformat() if hasattr(row.date, "isoformat") else row.date
-            timeline[date_str] = {
-                "date": date_str,
-                "requests_sent": row.count,
-                "confirmations_received": 0,
-            }
-
-        for row in confirmed_by_day:
-            # Handle both date objects (PostgreSQL) and strings (SQLite)
-            date_str = row.date.isoformat() if hasattr(row.date, "isoformat") else row.date
-            if date_str in timeline:
-                timeline[date_str]["confirmations_received"] = row.count
-            else:
-                timeline[date_str] = {
-                    "date": date_str,
-                    "requests_sent": 0,
-                    "confirmations_received": row.count,
-                }
+        for row in results:
+            if not row.count:
+                continue
+            date_str = row.day.isoformat()
+            if date_str not in timeline:
+                timeline[date_str] = {"date": date_str, **dict.fromkeys(TIMELINE_KEYS.values(), 0)}
+            timeline[date_str][TIMELINE_KEYS[row.status]] = row.count
 
         # Convert to sorted list
         result = sorted(timeline.values(), key=lambda x: x["date"])
@@ -0,0 +1,313 @@
+"""
+Async Gmail Client
+httpx-based Gmail REST client for async request handlers
+"""
+
+import asyncio
+from collections.abc import AsyncIterator
+
+import anyio
+import httpx
+from google.auth.transport.requests import Request as GoogleAuthRequest
+from google.oauth2.credentials import Credentials
+
+from app.config import settings
+from app.exceptions import GmailApiError, GmailHistoryUnavailableError, GmailQuotaExceededError
+from app.models.user import User
+from app.services.gmail_quota import RATE_LIMIT_REASONS, gmail_quota_governor, is_project_limit
+from app.services.gmail_service import GmailService, MessageFetchResult, collect_added_messages
+
+GMAIL_API_URL = "https://gmail.googleapis.com/gmail/v1/users/me"
+
+_http_client: httpx.AsyncClient | None = None
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """Shared HTTP/2 connection pool for Gmail calls made from the event loop"""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            http2=True,
+            limits=httpx.Limits(
+                max_connections=settings.gmail_async_max_connections,
+                max_keepalive_connections=settings.gmail_async_max_connections,
+            ),
+            timeout=httpx.Timeout(settings.gmail_async_timeout_seconds),
+        )
+    return _http_client
+
+
+async def close_async_http_client() -> None:
+    """Close the shared connection pool (application shutdown)"""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+class AsyncGmailClient:
+    """
+    Async counterpart of GmailService for a single user.
+
+    Exposes the same read operations (plus send) as GmailService, without the user
+    argument. Requests share one HTTP/2 connection pool, so concurrent message fetches
+    are multiplexed instead of going through the batch endpoint. At most
+    max_concurrency requests are in flight for the user at any time, and every request
+    waits for its quota units from the shared GmailQuotaGovernor.
+    """
+
+    LIST_PAGE_SIZE = GmailService.LIST_PAGE_SIZE
+    MAX_LIST_PAGE_SIZE = GmailService.MAX_LIST_PAGE_SIZE
+
+    def __init__(
+        self,
+        credentials: Credentials,
+        http_client: httpx.AsyncClient | None = None,
+        max_concurrency: int | None = None,
+        user_id: str | None = None,
+    ):
+        self.credentials = credentials
+        # Quota budgets are per user; clients built from bare credentials share one bucket
+        self.user_id = user_id or "anonymous"
+        self.http_client = http_client or get_async_http_client()
+        self._semaphore = asyncio.Semaphore(
+            max(max_concurrency or settings.gmail_user_max_concurrency, 1)
+        )
+        self._refresh_lock = asyncio.Lock()
+
+    @classmethod
+    def for_user(cls, user: User, **kwargs) -> "AsyncGmailClient":
+        """Create a client from the user's stored OAuth tokens"""
+        return cls(GmailService().get_credentials(user), user_id=str(user.id), **kwargs)
+
+    async def _refresh_credentials(self, force: bool = False) -> None:
+        async with self._refresh_lock:
+            if force or not self.credentials.valid:
+                # google-auth refreshes synchronously; keep it off the event loop
+                await anyio.to_thread.run_sync(self.credentials.refresh, GoogleAuthRequest())
+
+    async def _request(
+        self, method: str, path: str, quota_method: str, quota_retries: int | None = None, **kwargs
+    ) -> dict:
+        """
+        Make an authorized Gmail API call within the quota budget
+
+        The access token is refreshed once on 401. Rate-limited calls block the user's
+        budget for the Retry-After period and are retried once it lifts (see
+        GmailService._execute).
+        """
+        if not self.credentials.valid:
+            await self._refresh_credentials()
+
+        retries = GmailService.QUOTA_RETRIES if quota_retries is None else quota_retries
+        for quota_attempt in range(retries + 1):
+            await gmail_quota_governor.acquire_async(self.user_id, quota_method)
+            for attempt in range(2):
+                headers = {"Authorization": f"Bearer {self.credentials.token}"}
+                async with self._semaphore:
+                    response = await self.http_client.request(
+                        method, f"{GMAIL_API_URL}/{path}", headers=headers, **kwargs
+                    )
+                if response.status_code == 401 and attempt == 0:
+                    await self._refresh_credentials(force=True)
+                    continue
+                break
+
+            if response.is_success:
+                return response.json() if response.content else {}
+
+            error = self._api_error(response)
+            if not isinstance(error, GmailQuotaExceededError) or quota_attempt == retries:
+                raise error
+            blocked = await anyio.to_thread.run_sync(
+                gmail_quota_governor.penalize,
+                None if error.project_wide else self.user_id,
+                error.retry_after,
+            )
+            if not blocked:
+                raise error
+
+    def _api_error(self, response: httpx.Response) -> Exception:
+        """Translate an error response into the exceptions GmailService callers expect"""
+        try:
+            error = response.json().get("error", {})
+        except ValueError:
+            error = {}
+        message = error.get("message") or response.reason_phrase or "Gmail API error"
+        reasons = [
+            detail.get("reason") for detail in error.get("errors", []) if detail.get("reason")
+        ]
+
+        if response.status_code in (403, 429) and RATE_LIMIT_REASONS & set(reasons):
+            retry_after = response.headers.get("Retry-After")
+            return GmailQuotaExceededError(
+                message=message,
+                retry_after=int(retry_after) if retry_after and retry_after.isdigit() else None,
+                project_wide=is_project_limit(reasons),
+            )
+        return GmailApiError(message, status=response.status_code, reasons=reasons)
+
+    async def iter_message_pages(
+        self, query: str = "", max_results: int = 100, page_size: int | None = None
+    ) -> AsyncIterator[list[dict]]:
+        """Stream message refs page by page, following nextPageToken"""
+        page_size = min(page_size or self.LIST_PAGE_SIZE, self.MAX_LIST_PAGE_SIZE)
+        remaining = max_results
+        page_token = None
+
+        while remaining > 0:
+            params = {"q": query, "maxResults": min(page_size, remaining)}
+            if page_token:
+                params["pageToken"] = page_token
+
+            results = await self._request("GET", "messages", "messages.list", params=params)
+
+            page = results.get("messages", [])[:remaining]
+            if page:
+                remaining -= len(page)
+                yield page
+
+            page_token = results.get("nextPageToken")
+            if not page_token:
+                break
+
+    async def list_messages(self, query: str = "", max_results: int = 100) -> list[dict]:
+        """List message refs matching a query"""
+        return [ref async for page in self.iter_message_pages(query, max_results) for ref in page]
+
+    def iter_sent_message_pages(
+        self, query: str = "", max_results: int = 100
+    ) -> AsyncIterator[list[dict]]:
+        """Stream sent message refs page by page (query is combined with 'in:sent')"""
+        return self.iter_message_pages(
+            f"{GmailService.SENT_QUERY_PREFIX}{query}".strip(), max_results
+        )
+
+    async def list_sent_messages(self, query: str = "", max_results: int = 100) -> list[dict]:
+        """List sent message refs matching a query"""
+        return [
+            ref async for page in self.iter_sent_message_pages(query, max_results) for ref in page
+        ]
+
+    async def get_message(self, message_id: str, format: str = "full") -> dict:
+        """Get a specific Gmail message"""
+        params = {"format": format}
+        if format == "metadata":
+            params["metadataHeaders"] = GmailService.METADATA_HEADERS
+        return await self._request("GET", f"messages/{message_id}", "messages.get", params=params)
+
+    async def get_messages_batch(
+        self, message_ids: list[str], format: str = "full"
+    ) -> list[MessageFetchResult]:
+        """
+        Fetch several messages concurrently over the shared HTTP/2 connection
+
+        Returns one MessageFetchResult per ID, in order; failures carry the error.
+        """
+
+        async def fetch(message_id: str) -> MessageFetchResult:
+            try:
+                message = await self.get_message(message_id, format=format)
+            except Exception as e:
+                return MessageFetchResult(message_id=message_id, error=e)
+            return MessageFetchResult(message_id=message_id, message=message)
+
+        return list(await asyncio.gather(*(fetch(message_id) for message_id in message_ids)))
+
+    async def search_messages(self, query: str, max_results: int = 50) -> list[dict]:
+        """Search for messages and fetch their full content, skipping failed fetches"""
+        messages = []
+        async for page in self.iter_message_pages(query, max_results):
+            fetched = await self.get_messages_batch([msg["id"] for msg in page])
+            messages.extend(result.message for result in fetched if result.ok)
+        return messages
+
+    async def get_history_id(self) -> str:
+        """Get the mailbox's current historyId"""
+        profile = await self._request("GET", "profile", "getProfile")
+        return str(profile["historyId"])
+
+    async def list_history(
+        self, start_history_id: str, max_messages: int = 500, label_id: str | None = None
+    ) -> tuple[list[dict], str]:
+        """List messages added since a historyId (see GmailService.list_history)"""
+        messages = []
+        seen_ids = set()
+        latest_history_id = str(start_history_id)
+        page_token = None
+
+        while True:
+            params = {
+                "startHistoryId": start_history_id,
+                "historyTypes": "messageAdded",
+                "maxResults": 500,
+            }
+            if label_id:
+                params["labelId"] = label_id
+            if page_token:
+                params["pageToken"] = page_token
+
+            try:
+                response = await self._request("GET", "history", "history.list", params=params)
+            except GmailApiError as api_error:
+                if api_error.status == 404:
+                    raise GmailHistoryUnavailableError(
+                        f"History cursor {start_history_id} has expired"
+                    )
+                raise
+
+            collect_added_messages(response, messages, seen_ids)
+
+            if len(messages) > max_messages:
+                raise GmailHistoryUnavailableError(
+                    f"More than {max_messages} messages added since history {start_history_id}"
+                )
+
+            latest_history_id = str(response.get("historyId", latest_history_id))
+            page_token = response.get("nextPageToken")
+            if not page_token:
+                break
+
+        return messages, latest_history_id
+
+    async def get_thread_messages(self, thread_id: str, format: str = "full") -> list[dict]:
+        """Get all messages in a thread (empty list if it can't be fetched)"""
+        params = {"format": format}
+        if format == "metadata":
+            params["metadataHeaders"] = GmailService.METADATA_HEADERS
+        try:
+            thread = await self._request(
+                "GET", f"threads/{thread_id}", "threads.get", params=params
+            )
+        except Exception:
+            return []
+        return thread.get("messages", [])
+
+    async def send_email(
+        self,
+        from_email: str,
+        to_email: str,
+        subject: str,
+        body: str,
+        reply_to: str | None = None,
+    ) -> dict[str, str]:
+        """Send a plain text email (see GmailService.send_email)"""
+        if "https://www.googleapis.com/auth/gmail.send" not in (self.credentials.scopes or []):
+            raise PermissionError("User has not granted gmail.send permission")
+
+        raw_message = GmailService.encode_message(from_email, to_email, subject, body, reply_to)
+        try:
+            # Rate-limited sends are not retried here; the caller reschedules them
+            sent_message = await self._request(
+                "POST", "messages/send", "messages.send", quota_retries=0, json={"raw": raw_message}
+            )
+        except GmailQuotaExceededError:
+            raise
+        except Exception as e:
+            raise Exception(f"Failed to send email: {str(e)}")
+
+        return {
+            "message_id": sent_message["id"],
+            "thread_id": sent_message.get("threadId"),
+            "label_ids": sent_message.get("labelIds", []),
+        }
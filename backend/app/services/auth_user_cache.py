@@ -0,0 +1,216 @@
+"""
+Auth User Cache
+Two-tier (process + Redis) cache of the user fields API authorization needs
+"""
+
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from uuid import UUID
+
+import redis
+from redis.exceptions import RedisError
+
+from app.config import settings
+from app.models.user import User
+
+# Stores the entry only if the user hasn't been invalidated since its row was read
+_PUT_SCRIPT = """
+if (redis.call('GET', KEYS[2]) or '0') == ARGV[1] then
+    redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+    return 1
+end
+return 0
+"""
+
+
+@dataclass(frozen=True)
+class AuthenticatedUser:
+    """The authorization-relevant fields of a user"""
+
+    id: UUID
+    email: str
+    is_admin: bool
+    has_tokens: bool  # False once the user's Gmail tokens are revoked
+
+    @classmethod
+    def from_user(cls, user: User) -> "AuthenticatedUser":
+        return cls(
+            id=user.id,
+            email=user.email,
+            is_admin=bool(user.is_admin),
+            has_tokens=bool(user.encrypted_access_token and user.encrypted_refresh_token),
+        )
+
+    def to_json(self) -> str:
+        return json.dumps({**asdict(self), "id": str(self.id)})
+
+    @classmethod
+    def from_json(cls, data: str) -> "AuthenticatedUser":
+        fields = json.loads(data)
+        return cls(**{**fields, "id": UUID(fields["id"])})
+
+
+class AuthUserCache:
+    """
+    Caches AuthenticatedUser per user ID, in-process and in Redis.
+
+    Process entries live a few seconds, Redis entries about a minute, so most requests
+    authenticate without a database query. invalidate() deletes the Redis entry, bumps
+    the user's generation (so a request that read the row before the change can't store
+    it again) and publishes the ID; every process subscribes and drops its own entry.
+    Like RateLimiter, it fails open to the database if Redis is unavailable; the short
+    process TTL then bounds how long a change takes to apply.
+    """
+
+    KEY_PREFIX = "auth_user"
+    CHANNEL = "auth_user:invalidate"
+
+    # After a Redis failure, stop trying Redis for this long
+    UNAVAILABLE_BACKOFF_SECONDS = 30
+
+    def __init__(
+        self,
+        client: redis.Redis | None = None,
+        local_ttl_seconds: float | None = None,
+        ttl_seconds: int | None = None,
+        max_size: int | None = None,
+    ) -> None:
+        self._logger = logging.getLogger(__name__)
+        self.local_ttl_seconds = local_ttl_seconds or settings.auth_cache_local_ttl_seconds
+        self.ttl_seconds = ttl_seconds or settings.auth_cache_ttl_seconds
+        self.max_size = max_size or settings.auth_cache_size
+        self._client = client
+        self._put_script = None
+        self._subscriber = None
+        self._unavailable_until = 0.0
+        self._entries: OrderedDict[str, tuple[float, AuthenticatedUser]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._connect_lock = threading.Lock()
+
+    def _redis(self) -> redis.Redis:
+        with self._connect_lock:
+            if self._client is None:
+                self._client = redis.Redis.from_url(settings.redis_url, decode_responses=True)
+            if self._put_script is None:
+                self._put_script = self._client.register_script(_PUT_SCRIPT)
+            if self._subscriber is None:
+                pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(**{self.CHANNEL: self._on_invalidate})
+                self._subscriber = pubsub.run_in_thread(
+                    sleep_time=1, daemon=True, exception_handler=self._on_subscriber_error
+                )
+            return self._client
+
+    def _available(self) -> bool:
+        return time.monotonic() >= self._unavailable_until
+
+    def _mark_unavailable(self, exc: Exception) -> None:
+        self._logger.warning("Auth user cache: Redis unavailable, using the database: %s", exc)
+        self._unavailable_until = time.monotonic() + self.UNAVAILABLE_BACKOFF_SECONDS
+
+    def _key(self, user_id: str) -> str:
+        return f"{self.KEY_PREFIX}:{user_id}"
+
+    def _generation_key(self, user_id: str) -> str:
+        return f"{self.KEY_PREFIX}:generation:{user_id}"
+
+    def get(self, user_id: UUID | str) -> AuthenticatedUser | None:
+        """The cached user, from this process or Redis (None on a miss)"""
+        user_id = str(user_id)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                expires_at, identity = entry
+                if expires_at > now:
+                    self._entries.move_to_end(user_id)
+                    return identity
+                del self._entries[user_id]
+
+        if not self._available():
+            return None
+        try:
+            data = self._redis().get(self._key(user_id))
+        except RedisError as exc:
+            self._mark_unavailable(exc)
+            return None
+        if data is None:
+            return None
+        identity = AuthenticatedUser.from_json(data)
+        self._store_local(identity)
+        return identity
+
+    def generation(self, user_id: UUID | str) -> str | None:
+        """Read before loading the user's row; pass to put() with what was loaded"""
+        if not self._available():
+            return None
+        try:
+            return self._redis().get(self._generation_key(str(user_id))) or "0"
+        except RedisError as exc:
+            self._mark_unavailable(exc)
+            return None
+
+    def put(self, identity: AuthenticatedUser, generation: str | None) -> None:
+        """Cache a user loaded from the database, unless it was invalidated meanwhile"""
+        user_id = str(identity.id)
+        if generation is not None and self._available():
+            try:
+                self._redis()
+                stored = self._put_script(
+                    keys=[self._key(user_id), self._generation_key(user_id)],
+                    args=[generation, identity.to_json(), self.ttl_seconds],
+                )
+            except RedisError as exc:
+                self._mark_unavailable(exc)
+            else:
+                if not stored:
+                    return
+        self._store_local(identity)
+
+    def invalidate(self, user_id: UUID | str) -> None:
+        """Drop a user's entries everywhere (role changed, tokens revoked or replaced)"""
+        user_id = str(user_id)
+        self._drop_local(user_id)
+        try:
+            client = self._redis()
+            pipeline = client.pipeline()
+            pipeline.incr(self._generation_key(user_id))
+            pipeline.expire(self._generation_key(user_id), self.ttl_seconds * 2)
+            pipeline.delete(self._key(user_id))
+            pipeline.publish(self.CHANNEL, user_id)
+            pipeline.execute()
+        except RedisError as exc:
+            self._mark_unavailable(exc)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def _store_local(self, identity: AuthenticatedUser) -> None:
+        user_id = str(identity.id)
+        with self._lock:
+            self._entries[user_id] = (time.monotonic() + self.local_ttl_seconds, identity)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def _drop_local(self, user_id: str) -> None:
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def _on_invalidate(self, message: dict) -> None:
+        self._drop_local(message["data"])
+
+    def _on_subscriber_error(self, exc: Exception, pubsub, thread) -> None:
+        # Invalidations may have been missed; start over and resubscribe on next use
+        self._logger.warning("Auth user cache: invalidation listener stopped: %s", exc)
+        thread.stop()
+        self._subscriber = None
+        self.clear()
+
+
+auth_user_cache = AuthUserCache()
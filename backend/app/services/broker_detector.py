@@ -1,8 +1,7 @@
-import re
-
-from bs4 import BeautifulSoup
-
 from app.models.data_broker import DataBroker
+from app.services.broker_domain_index import BrokerDomainIndex
+from app.services.keyword_automaton import get_keyword_automaton
+from app.services.message_parser import ParsedMessage, build_preview, html_to_text
 
 
 class BrokerDetector:
@@ -25,6 +24,13 @@ class BrokerDetector:
         "data deletion",
     ]
 
+    PRIVACY_CATEGORY = "privacy"
+
+    def __init__(self):
+        self.automaton = get_keyword_automaton(
+            ((self.PRIVACY_CATEGORY, tuple(self.PRIVACY_KEYWORDS)),)
+        )
+
     def detect_broker(
         self,
         sender_email: str,
@@ -33,34 +39,45 @@ class BrokerDetector:
         body_html: str,
         body_text: str,
         all_brokers: list[DataBroker],
+        domain_index: BrokerDomainIndex | None = None,
+        html_text: str | None = None,
     ) -> tuple[DataBroker | None, float, str]:
         """
         Detect if email is from a data broker
 
+        Args:
+            domain_index: Prebuilt index for all_brokers; built on the fly if omitted
+            html_text: Already-converted text of body_html, to skip converting it again
+
         Returns:
             (broker, confidence_score, notes)
         """
-        # First check if sender domain matches a known broker
-        for broker in all_brokers:
-            for domain in broker.domains:
-                if domain in sender_domain:
-                    return (broker, 1.0, f"Direct domain match: {domain}")
+        # First check if sender domain (or a parent domain) matches a known broker
+        if domain_index is None:
+            domain_index = BrokerDomainIndex(all_brokers)
+        match = domain_index.match_domain(sender_domain)
+        if match:
+            broker_id, domain = match
+            broker = next((b for b in all_brokers if b.id == broker_id), None)
+            if broker:
+                return (broker, 1.0, f"Direct domain match: {domain}")
 
         # Parse email body for keywords
         text_to_analyze = f"{subject or ''} {body_text or ''}"
 
         # Remove HTML if present
-        if body_html:
-            soup = BeautifulSoup(body_html, "html.parser")
-            text_to_analyze += " " + soup.get_text()
+        if html_text is None and body_html:
+            html_text = html_to_text(body_html)
+        if html_text:
+            text_to_analyze += " " + html_text
 
         text_to_analyze = text_to_analyze.lower()
 
-        # Count privacy keyword matches
-        keyword_matches = []
-        for keyword in self.PRIVACY_KEYWORDS:
-            if keyword in text_to_analyze:
-                keyword_matches.append(keyword)
+        # Count privacy keyword matches (single pass, reported in keyword list order)
+        matched = self.automaton.scan(text_to_analyze).matched_keywords(self.PRIVACY_CATEGORY)
+        keyword_matches = [
+            keyword for index, keyword in enumerate(self.PRIVACY_KEYWORDS) if index in matched
+        ]
 
         # Calculate confidence score
         if len(keyword_matches) >= 3:
@@ -78,6 +95,30 @@ class BrokerDetector:
 
         return (None, 0.0, "No broker indicators found")
 
+    def detect_broker_for_message(
+        self,
+        parsed: ParsedMessage,
+        sender_email: str,
+        sender_domain: str,
+        all_brokers: list[DataBroker],
+        domain_index: BrokerDomainIndex | None = None,
+    ) -> tuple[DataBroker | None, float, str]:
+        """
+        detect_broker for a parsed message, reusing its converted HTML text
+
+        Metadata-only messages are judged on their subject and snippet.
+        """
+        return self.detect_broker(
+            sender_email,
+            sender_domain,
+            parsed.subject,
+            parsed.body_html,
+            parsed.plain_text or parsed.snippet,
+            all_brokers,
+            domain_index,
+            html_text=parsed.html_text,
+        )
+
     def extract_domain_from_email(self, email: str) -> str:
         """Extract domain from email address"""
         if "@" in email:
@@ -86,18 +127,4 @@ class BrokerDetector:
 
     def get_body_preview(self, body_html: str, body_text: str, max_length: int = 200) -> str:
         """Get a preview of email body"""
-        if body_text:
-            preview = body_text[:max_length]
-        elif body_html:
-            soup = BeautifulSoup(body_html, "html.parser")
-            preview = soup.get_text()[:max_length]
-        else:
-            preview = ""
-
-        # Clean up preview
-        preview = re.sub(r"\s+", " ", preview).strip()
-
-        if len(preview) == max_length:
-            preview += "..."
-
-        return preview
+        return build_preview(body_text or html_to_text(body_html), max_length)
@@ -0,0 +1,119 @@
+import threading
+from collections.abc import Iterable
+from types import MappingProxyType
+from uuid import UUID
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.models.data_broker import DataBroker
+
+
+def normalize_domain(domain: str | None) -> str:
+    """Lowercase a domain and strip a leading '@' or trailing dot"""
+    return (domain or "").strip().lower().lstrip("@").rstrip(".")
+
+
+class BrokerDomainIndex:
+    """
+    Immutable lookup from domains and privacy emails to broker IDs.
+
+    A domain matches a broker when it equals one of the broker's domains or is a
+    subdomain of one (mail.spokeo.com -> spokeo.com). Lookups walk the domain's labels
+    from most to least specific, so each lookup is one dict probe per label no matter
+    how many brokers are loaded.
+
+    The index stores broker IDs rather than DataBroker instances so a single index can
+    be shared between sessions and threads.
+    """
+
+    def __init__(self, brokers: Iterable[DataBroker], version: tuple | None = None) -> None:
+        domains: dict[str, UUID] = {}
+        privacy_emails: dict[str, UUID] = {}
+
+        for broker in brokers:
+            for domain in broker.domains or []:
+                normalized = normalize_domain(domain)
+                if normalized:
+                    # First broker wins, matching the old linear scan order
+                    domains.setdefault(normalized, broker.id)
+            if broker.privacy_email:
+                privacy_emails.setdefault(broker.privacy_email.strip().lower(), broker.id)
+
+        self.version = version
+        self._domains = MappingProxyType(domains)
+        self._privacy_emails = MappingProxyType(privacy_emails)
+
+    def __len__(self) -> int:
+        return len(self._domains)
+
+    def match_domain(self, domain: str | None) -> tuple[UUID, str] | None:
+        """
+        Find the broker owning a domain or one of its parent domains
+
+        Returns:
+            (broker_id, matched_broker_domain), or None if no broker matches
+        """
+        labels = normalize_domain(domain).split(".")
+        for i in range(len(labels)):
+            candidate = ".".join(labels[i:])
+            broker_id = self._domains.get(candidate)
+            if broker_id is not None:
+                return broker_id, candidate
+        return None
+
+    def match_email(self, email: str | None) -> UUID | None:
+        """Find the broker for an address, by privacy email first and then by domain"""
+        email = (email or "").strip().lower()
+        if not email:
+            return None
+
+        broker_id = self._privacy_emails.get(email)
+        if broker_id is not None:
+            return broker_id
+
+        match = self.match_domain(email.rsplit("@", 1)[-1]) if "@" in email else None
+        return match[0] if match else None
+
+
+def broker_table_version(db: Session) -> tuple:
+    """Cheap fingerprint of the broker table that changes whenever a broker is added/edited"""
+    count, last_updated = db.query(func.count(DataBroker.id), func.max(DataBroker.updated_at)).one()
+    return (count, last_updated)
+
+
+class BrokerDomainIndexCache:
+    """
+    Process-wide holder for the current BrokerDomainIndex.
+
+    The index is rebuilt only when the broker table version changes, so API workers
+    and Celery workers pick up brokers added by another process without rebuilding
+    on every lookup.
+    """
+
+    def __init__(self) -> None:
+        self._index: BrokerDomainIndex | None = None
+        self._lock = threading.Lock()
+
+    def get(self, db: Session) -> BrokerDomainIndex:
+        """Return the index for the broker table as currently seen by this session"""
+        version = broker_table_version(db)
+        index = self._index
+        if index is not None and index.version == version:
+            return index
+
+        with self._lock:
+            index = self._index
+            if index is None or index.version != version:
+                brokers = db.query(DataBroker).order_by(DataBroker.name).all()
+                index = BrokerDomainIndex(brokers, version=version)
+                self._index = index
+            return index
+
+    def invalidate(self) -> None:
+        """Drop the current index so the next lookup rebuilds it"""
+        with self._lock:
+            self._index = None
+
+
+broker_domain_index = BrokerDomainIndexCache()
@@ -6,11 +6,13 @@ from sqlalchemy.orm import Session
 
 from app.models.data_broker import DataBroker
 from app.schemas.broker import BrokerCreate
+from app.services.broker_domain_index import BrokerDomainIndex, broker_domain_index
 
 
 class BrokerService:
     def __init__(self, db: Session):
         self.db = db
+        self._domain_index: BrokerDomainIndex | None = None
 
     def load_brokers_from_json(self) -> int:
         """Load data brokers from JSON file into database"""
@@ -47,21 +49,26 @@ class BrokerService:
                 count += 1
 
         self.db.commit()
+        self._invalidate_domain_index()
         return count
 
     def get_all_brokers(self) -> list[DataBroker]:
         """Get all data brokers"""
         return self.db.query(DataBroker).order_by(DataBroker.name).all()
 
-    def get_broker_by_domain(self, domain: str) -> DataBroker:
-        """Find broker by domain"""
-        brokers = self.db.query(DataBroker).all()
+    def get_domain_index(self) -> BrokerDomainIndex:
+        """Get the shared domain index (checked against the broker table once per service)"""
+        if self._domain_index is None:
+            self._domain_index = broker_domain_index.get(self.db)
+        return self._domain_index
 
-        for broker in brokers:
-            if domain in broker.domains or any(d in domain for d in broker.domains):
-                return broker
+    def get_broker_by_domain(self, domain: str) -> DataBroker:
+        """Find broker by domain (exact or parent-domain match)"""
+        match = self.get_domain_index().match_domain(domain)
+        if not match:
+            return None
 
-        return None
+        return self.db.get(DataBroker, match[0])
 
     def get_broker_by_id(self, broker_id: str) -> DataBroker | None:
         """Get broker by ID"""
@@ -102,4 +109,10 @@ class BrokerService:
         self.db.add(broker)
         self.db.commit()
         self.db.refresh(broker)
+        self._invalidate_domain_index()
         return broker
+
+    def _invalidate_domain_index(self) -> None:
+        """Rebuild the shared domain index after the broker table changes"""
+        self._domain_index = None
+        broker_domain_index.invalidate()
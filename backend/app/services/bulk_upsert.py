@@ -0,0 +1,105 @@
+"""
+Bulk Upserts
+Multi-row INSERT ... ON CONFLICT writes that report how many rows they inserted and updated
+"""
+
+from dataclasses import dataclass
+from datetime import datetime
+
+from sqlalchemy import literal_column, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+# Rows per INSERT statement; keeps bound parameters well under driver limits
+CHUNK_SIZE = 500
+
+
+@dataclass
+class UpsertResult:
+    """Rows written by bulk_upsert"""
+
+    inserted: int = 0
+    updated: int = 0
+
+    @property
+    def written(self) -> int:
+        return self.inserted + self.updated
+
+
+def bulk_upsert(
+    db: Session,
+    model,
+    rows: list[dict],
+    conflict_column: str = "gmail_message_id",
+    update_columns: list[str] | None = None,
+    chunk_size: int = CHUNK_SIZE,
+) -> UpsertResult:
+    """
+    Insert rows in multi-row statements, resolving unique-key conflicts in the database
+
+    Rows whose conflict_column value already exists are skipped (ON CONFLICT DO NOTHING),
+    or, with update_columns, have those columns overwritten (ON CONFLICT DO UPDATE, plus
+    updated_at when the model has it). Updates only apply to rows of the same user, so a
+    message ID stored for another account is never overwritten. Concurrent scans writing
+    the same messages therefore can't abort each other's transaction.
+
+    Works on PostgreSQL and SQLite. Rows must all have the same keys; columns left out
+    get their defaults. When rows repeat a conflict value, the last one wins.
+
+    Returns:
+        UpsertResult with the number of rows inserted and updated
+    """
+    result = UpsertResult()
+    if not rows:
+        return result
+
+    # A statement may not touch the same row twice
+    rows = list({row[conflict_column]: row for row in rows}.values())
+    keys = set(rows[0])
+    if any(set(row) != keys for row in rows):
+        raise ValueError("bulk_upsert rows must all have the same columns")
+
+    # The statements bypass the unit of work; write out pending ORM changes first
+    db.flush()
+
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        insert = postgresql.insert
+    elif dialect == "sqlite":
+        insert = sqlite.insert
+    else:
+        raise NotImplementedError(f"bulk_upsert does not support {dialect}")
+
+    table = model.__table__
+    conflict = table.c[conflict_column]
+
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start : start + chunk_size]
+        stmt = insert(table).values(chunk)
+
+        if update_columns:
+            set_ = {column: stmt.excluded[column] for column in update_columns}
+            if "updated_at" in table.c and "updated_at" not in set_:
+                set_["updated_at"] = datetime.utcnow()
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[conflict],
+                set_=set_,
+                where=table.c.user_id == stmt.excluded.user_id,
+            )
+        else:
+            stmt = stmt.on_conflict_do_nothing(index_elements=[conflict])
+
+        if dialect == "postgresql":
+            # xmax is 0 only for freshly inserted row versions
+            flags = db.execute(stmt.returning(literal_column("(xmax = 0)"))).scalars().all()
+            result.inserted += sum(1 for inserted in flags if inserted)
+            result.updated += sum(1 for inserted in flags if not inserted)
+        else:
+            # SQLite has no xmax; writers are serialized, so a lookup first is exact
+            chunk_keys = [row[conflict_column] for row in chunk]
+            existing = set(db.execute(select(conflict).where(conflict.in_(chunk_keys))).scalars())
+            written = db.execute(stmt.returning(conflict)).scalars().all()
+            result.inserted += sum(1 for key in written if key not in existing)
+            result.updated += sum(1 for key in written if key in existing)
+
+    return result
@@ -9,6 +9,7 @@ from app.models.data_broker import DataBroker
 from app.models.deletion_request import DeletionRequest, RequestStatus
 from app.models.user import User
 from app.services.activity_log_service import ActivityLogService
+from app.services.request_transitions import transition_request
 from app.utils.email_templates import EmailTemplates
 
 
@@ -83,19 +84,12 @@ class DeletionRequestService:
         if not request:
             raise Exception("Request not found")
 
-        request.status = status
+        # Sets the status's timestamp too
+        transition_request(request, status, source="manual")
 
         if notes:
             request.notes = notes
 
-        # Update timestamps based on status
-        if status == RequestStatus.SENT:
-            request.sent_at = datetime.utcnow()
-        elif status == RequestStatus.CONFIRMED:
-            request.confirmed_at = datetime.utcnow()
-        elif status == RequestStatus.REJECTED:
-            request.rejected_at = datetime.utcnow()
-
         self.db.commit()
         self.db.refresh(request)
 
@@ -150,8 +144,7 @@ class DeletionRequestService:
             )
 
             # Update request
-            request.status = RequestStatus.SENT
-            request.sent_at = datetime.utcnow()
+            transition_request(request, RequestStatus.SENT, source="email_sent")
             request.gmail_sent_message_id = result["message_id"]
             request.gmail_thread_id = result.get("thread_id")
             request.last_send_error = None  # Clear any previous errors
@@ -190,6 +183,7 @@ class DeletionRequestService:
                     details=request.last_send_error,
                     broker_id=str(request.broker_id),
                     deletion_request_id=str(request.id),
+                    sync=True,
                 )
             except Exception:
                 pass
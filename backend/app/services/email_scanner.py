@@ -1,26 +1,105 @@
-import base64
+import asyncio
+import functools
+import logging
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta
 
+import anyio
 from sqlalchemy.orm import Session
 
+from app.exceptions import GmailHistoryUnavailableError
 from app.models.deletion_request import DeletionRequest, RequestStatus
 from app.models.email_scan import EmailScan
+from app.models.scan_checkpoint import ScanCheckpoint
 from app.models.user import User
+from app.services.async_gmail_client import AsyncGmailClient
 from app.services.broker_detector import BrokerDetector
 from app.services.broker_service import BrokerService
-from app.services.gmail_service import GmailService
+from app.services.bulk_upsert import bulk_upsert
+from app.services.gmail_query_planner import gmail_query_planner
+from app.services.gmail_service import GmailService, MessageFetchResult
+from app.services.message_parser import ParsedMessage, parse_message
+from app.services.request_transitions import transition_request
 from app.services.response_detector import ResponseDetector
+from app.services.scan_checkpoint_service import (
+    FULL_MODE,
+    HISTORY_MODE,
+    RECEIVED_PHASE,
+    SENT_PHASE,
+    ScanCheckpointService,
+)
+from app.services.scan_pool import scan_io_pool
+from app.services.sync_cursor_service import INBOX_SCOPE, SyncCursorService
+
+logger = logging.getLogger(__name__)
+
+
+async def _run_sync(func, *args, **kwargs):
+    """Run blocking (database) work on a worker thread and await the result"""
+    return await anyio.to_thread.run_sync(functools.partial(func, *args, **kwargs))
+
+
+@dataclass
+class ScanSummary:
+    """What a streaming scan found, kept in place of the EmailScan objects themselves"""
+
+    emails_scanned: int = 0
+    broker_emails_found: int = 0
+    received_scanned: int = 0
+    sent_scanned: int = 0
+    # Gmail message IDs of broker-linked scans, reloaded for deletion-request creation
+    broker_message_ids: list[str] = field(default_factory=list)
+    # The same IDs as a set, so each page's duplicate check doesn't scan the whole list
+    _seen_broker_message_ids: set[str] = field(default_factory=set, init=False, repr=False)
+
+    def add(self, scans: list[EmailScan]) -> None:
+        for scan in scans:
+            self.emails_scanned += 1
+            if scan.email_direction == "sent":
+                self.sent_scanned += 1
+            else:
+                self.received_scanned += 1
+            if scan.is_broker_email:
+                self.broker_emails_found += 1
+            if scan.broker_id and scan.gmail_message_id not in self._seen_broker_message_ids:
+                self._seen_broker_message_ids.add(scan.gmail_message_id)
+                self.broker_message_ids.append(scan.gmail_message_id)
 
 
 class EmailScanner:
+    # Keeps IN (...) lists well below SQLite's bound-parameter limit
+    EXISTENCE_CHECK_CHUNK_SIZE = 500
+
+    # Threads are analyzed from headers and snippets; bodies are fetched per reply if needed
+    THREAD_FORMAT = "metadata"
+
+    # Minimum ResponseDetector confidence to act on a classification
+    RESPONSE_CONFIDENCE_THRESHOLD = 0.6
+
     def __init__(self, db: Session):
         self.db = db
         self.gmail_service = GmailService()
         self.broker_service = BrokerService(db)
         self.detector = BrokerDetector()
         self.response_detector = ResponseDetector()
-
-    def scan_inbox(self, user: User, days_back: int = 90, max_emails: int = 100) -> list[EmailScan]:
+        self.io_pool = scan_io_pool
+        self.query_planner = gmail_query_planner
+        self.checkpoint_service = ScanCheckpointService(db)
+        # Set while a streaming scan runs; processed chunks are counted here and expunged
+        self._summary: ScanSummary | None = None
+        # Per-scan caches: thread ID -> metadata messages (or the fetch error), and
+        # message ID -> full payload (None if it failed) of inconclusive broker replies
+        self._thread_cache: dict[str, list[dict] | Exception] = {}
+        self._reply_cache: dict[str, dict | None] = {}
+
+    def scan_inbox(
+        self,
+        user: User,
+        days_back: int = 90,
+        max_emails: int = 100,
+        incremental: bool = False,
+        scan_id: str | None = None,
+    ) -> list[EmailScan]:
         """
         Scan user's Gmail for data broker emails (both received and sent)
 
@@ -28,70 +107,555 @@ class EmailScanner:
         1. Received emails from all domains (existing functionality)
         2. Sent emails to known broker domains/privacy emails (new)
         3. Auto-creates deletion requests from ALL discovered broker emails (both sent and received)
+
+        With incremental=True and a stored history cursor, only messages added since the
+        previous scan are fetched. If the cursor has expired (or too much has changed) the
+        scan falls back to the regular date-window scan bounded by days_back/max_emails.
+
+        With a scan_id the scan is checkpointed: results are committed a listing page at a
+        time together with a ScanCheckpoint holding the page token, the last processed
+        message and running counts. Calling again with the same scan_id (a task retry)
+        resumes from the checkpoint instead of listing and fetching everything again.
+        Only the scans processed by this call are returned; the checkpoint has the totals.
         """
+        self._summary = None
+        return self._run_scan(user, days_back, max_emails, incremental, scan_id)
+
+    def scan_inbox_streaming(
+        self,
+        user: User,
+        days_back: int = 90,
+        max_emails: int = 100,
+        incremental: bool = False,
+        scan_id: str | None = None,
+    ) -> ScanSummary:
+        """
+        Memory-bounded variant of scan_inbox that returns counts instead of EmailScans
+
+        Each listing page is flushed and its EmailScans expunged from the session once
+        processed, so memory use doesn't grow with the number of messages scanned. Broker
+        scans are reloaded by ID for deletion-request creation. For a checkpointed scan
+        the counts cover every attempt.
+        """
+        self._summary = ScanSummary()
+        try:
+            self._run_scan(user, days_back, max_emails, incremental, scan_id)
+            summary = self._summary
+        finally:
+            self._summary = None
+
+        checkpoint = self.checkpoint_service.get_checkpoint(user.id, scan_id) if scan_id else None
+        if checkpoint is not None:
+            summary.emails_scanned = checkpoint.emails_scanned
+            summary.broker_emails_found = checkpoint.broker_emails_found
+        return summary
+
+    def _run_scan(
+        self,
+        user: User,
+        days_back: int,
+        max_emails: int,
+        incremental: bool,
+        scan_id: str | None,
+    ) -> list[EmailScan]:
+        """Body of scan_inbox and scan_inbox_streaming"""
+        self._reset_scan_caches()
+
+        checkpoint = self.checkpoint_service.start(user.id, scan_id) if scan_id else None
+        if checkpoint is not None and checkpoint.status == "completed":
+            return []
 
         # Get all known brokers
         all_brokers = self.broker_service.get_all_brokers()
+        cursor_service = SyncCursorService(self.db)
+
+        received_scans = []
+        sent_days_back = days_back
+        history_id = None
+
+        # A resumed scan keeps the listing, cursor and sent window of its first attempt
+        resuming = checkpoint is not None and checkpoint.mode is not None
+        if resuming:
+            history_id = checkpoint.history_id
+            sent_days_back = checkpoint.sent_days_back or days_back
+        mode = checkpoint.mode if resuming else (HISTORY_MODE if incremental else FULL_MODE)
+
+        if checkpoint is None or checkpoint.phase == RECEIVED_PHASE:
+            cursor = (
+                cursor_service.get_cursor(user.id, INBOX_SCOPE) if mode == HISTORY_MODE else None
+            )
+            mode = FULL_MODE
+            if cursor:
+                try:
+                    messages, latest_history_id = self.gmail_service.list_history(
+                        user, cursor.history_id, max_messages=max_emails
+                    )
+                    mode = HISTORY_MODE
+                    if not resuming:
+                        history_id = latest_history_id
+                        # Sent emails only need checking since the previous sync
+                        days_since_sync = (datetime.utcnow() - cursor.synced_at).days + 1
+                        sent_days_back = min(days_back, max(days_since_sync, 1))
+                        self._begin_listing(checkpoint, mode, history_id, sent_days_back)
+                    received_scans = self._process_history_messages(
+                        user, messages, all_brokers, checkpoint
+                    )
+                except GmailHistoryUnavailableError as e:
+                    logger.warning(
+                        f"Incremental sync unavailable, falling back to full scan: {str(e)}"
+                    )
 
-        # Scan received emails (existing logic)
-        received_scans = self._scan_received_emails(user, days_back, max_emails, all_brokers)
+            if mode == FULL_MODE:
+                if not (resuming and checkpoint.mode == FULL_MODE):
+                    # Take the cursor before listing so mail arriving mid-scan is picked up next time
+                    history_id = self._current_history_id(user)
+                    sent_days_back = days_back
+                    self._begin_listing(
+                        checkpoint,
+                        mode,
+                        history_id,
+                        sent_days_back,
+                        self._received_query(days_back),
+                    )
+
+                # Scan received emails (existing logic)
+                received_scans = self._scan_received_emails(
+                    user, days_back, max_emails, all_brokers, checkpoint
+                )
+
+            if checkpoint is not None:
+                self.checkpoint_service.begin_phase(checkpoint, SENT_PHASE)
 
         # Flush to database so sent email scan can see these scans
         self.db.flush()
 
         # Scan sent emails to broker domains (new)
-        sent_scans = self._scan_sent_broker_emails(user, days_back, max_emails, all_brokers)
+        sent_scans = self._scan_sent_broker_emails(
+            user, sent_days_back, max_emails, all_brokers, checkpoint
+        )
 
         # Flush again before auto-creation
         self.db.flush()
 
-        # Auto-create deletion requests from ALL discovered broker emails (sent + received)
-        all_broker_scans = [s for s in received_scans + sent_scans if s.broker_id]
+        # Auto-create deletion requests from ALL discovered broker emails (sent + received),
+        # including those found by earlier attempts of a resumed scan
+        if checkpoint is not None:
+            all_broker_scans = self.checkpoint_service.broker_scans(checkpoint)
+        elif self._summary is not None:
+            found = self._find_existing_scans(self._summary.broker_message_ids)
+            all_broker_scans = [
+                found[message_id]
+                for message_id in self._summary.broker_message_ids
+                if message_id in found
+            ]
+        else:
+            all_broker_scans = [s for s in received_scans + sent_scans if s.broker_id]
         self._auto_create_deletion_requests(user, all_broker_scans)
 
         # Update user's last scan timestamp
         user.last_scan_at = datetime.now()
 
+        # Advance the sync cursor together with the scan results
+        if history_id:
+            cursor_service.save_cursor(user.id, INBOX_SCOPE, history_id)
+
+        if checkpoint is not None:
+            self.checkpoint_service.complete(checkpoint)
+
         self.db.commit()
         return received_scans + sent_scans
 
+    async def scan_inbox_async(
+        self,
+        user: User,
+        days_back: int = 90,
+        max_emails: int = 100,
+        incremental: bool = False,
+        gmail_client: AsyncGmailClient | None = None,
+    ) -> list[EmailScan]:
+        """
+        Async variant of scan_inbox for request handlers
+
+        Gmail calls are awaited on the event loop through AsyncGmailClient, and database
+        work runs in short hops on a worker thread, so no thread is tied up for the
+        length of the crawl. Results are identical to scan_inbox.
+        """
+        client = gmail_client or AsyncGmailClient.for_user(user)
+        cursor_service = SyncCursorService(self.db)
+        self._reset_scan_caches()
+
+        all_brokers = await _run_sync(self.broker_service.get_all_brokers)
+
+        received_scans = None
+        sent_days_back = days_back
+        history_id = None
+
+        cursor = (
+            await _run_sync(cursor_service.get_cursor, user.id, INBOX_SCOPE)
+            if incremental
+            else None
+        )
+        if cursor:
+            try:
+                messages, history_id = await client.list_history(
+                    cursor.history_id, max_messages=max_emails
+                )
+                received_scans = await self._process_received_async(
+                    client, user, messages, all_brokers
+                )
+                # Sent emails only need checking since the previous sync
+                days_since_sync = (datetime.utcnow() - cursor.synced_at).days + 1
+                sent_days_back = min(days_back, max(days_since_sync, 1))
+            except GmailHistoryUnavailableError as e:
+                logger.warning(f"Incremental sync unavailable, falling back to full scan: {str(e)}")
+
+        if received_scans is None:
+            # Take the cursor before listing so mail arriving mid-scan is picked up next time
+            try:
+                history_id = await client.get_history_id()
+            except Exception as e:
+                logger.warning(f"Error fetching history ID: {str(e)}")
+                history_id = None
+
+            received_scans = []
+            pages = client.iter_message_pages(self._received_query(days_back), max_emails)
+            async for messages in self._aiter_pages(pages, "received emails"):
+                received_scans.extend(
+                    await self._process_received_async(client, user, messages, all_brokers)
+                )
+
+        # Flush to database so sent email scan can see these scans
+        await _run_sync(self.db.flush)
+
+        sent_scans = []
+        queries = self._sent_broker_queries(sent_days_back, all_brokers)
+        if queries:
+            try:
+                listing = await self.query_planner.alist_messages(
+                    queries, lambda query: client.list_sent_messages(query, max_emails), max_emails
+                )
+            except Exception as e:
+                raise Exception(f"Failed to fetch sent emails: {str(e)}")
+            logger.info(f"Sent email listing: {listing.summary()}")
+
+            for messages in listing.pages(GmailService.LIST_PAGE_SIZE):
+                sent_scans.extend(
+                    await self._process_messages_async(
+                        client, user, messages, all_brokers, self._build_sent_scans
+                    )
+                )
+
+        # Flush again before auto-creation
+        await _run_sync(self.db.flush)
+
+        # Download threads for new sent-email requests concurrently, then auto-create
+        all_broker_scans = [s for s in received_scans + sent_scans if s.broker_id]
+        thread_ids = [
+            thread_id
+            for thread_id in await _run_sync(self._threads_to_analyze, user, all_broker_scans)
+            if thread_id not in self._thread_cache
+        ]
+        threads = await asyncio.gather(
+            *(
+                client.get_thread_messages(thread_id, format=self.THREAD_FORMAT)
+                for thread_id in thread_ids
+            )
+        )
+        self._thread_cache.update(zip(thread_ids, threads, strict=True))
+        reply_ids = self._inconclusive_reply_ids(user, thread_ids)
+        for result in await client.get_messages_batch(reply_ids, format="full"):
+            self._reply_cache[result.message_id] = result.message if result.ok else None
+
+        await _run_sync(self._finish_async_scan, user, all_broker_scans, cursor_service, history_id)
+        return received_scans + sent_scans
+
+    async def _process_received_async(
+        self, client: AsyncGmailClient, user: User, messages: list[dict], all_brokers: list
+    ) -> list[EmailScan]:
+        """Async counterpart of _process_received_messages for one listing page"""
+        existing_scans, to_fetch = await _run_sync(self._plan_fetch, messages)
+        new_ids = [message_id for message_id in to_fetch if message_id not in existing_scans]
+        results = await client.get_messages_batch(new_ids, format="metadata")
+        metadata = {result.message_id: result for result in results}
+        full_ids = await _run_sync(
+            self._full_fetch_ids, to_fetch, existing_scans, metadata, all_brokers
+        )
+        results = await client.get_messages_batch(full_ids, format="full")
+        fetched = {result.message_id: result for result in results}
+        return await _run_sync(
+            self._build_received_scans,
+            user,
+            messages,
+            all_brokers,
+            existing_scans,
+            fetched,
+            metadata,
+        )
+
+    async def _process_messages_async(
+        self, client: AsyncGmailClient, user: User, messages: list[dict], all_brokers: list, build
+    ) -> list[EmailScan]:
+        """Async counterpart of _process_sent_messages for one listing page"""
+        existing_scans, to_fetch = await _run_sync(self._plan_fetch, messages)
+        results = await client.get_messages_batch(to_fetch, format="full")
+        fetched = {result.message_id: result for result in results}
+        return await _run_sync(build, user, messages, all_brokers, existing_scans, fetched)
+
+    async def _aiter_pages(self, pages, description: str):
+        """Async counterpart of _iter_pages"""
+        while True:
+            try:
+                page = await anext(pages)
+            except StopAsyncIteration:
+                return
+            except Exception as e:
+                raise Exception(f"Failed to fetch {description}: {str(e)}")
+            yield page
+
+    def _finish_async_scan(
+        self,
+        user: User,
+        broker_scans: list[EmailScan],
+        cursor_service: SyncCursorService,
+        history_id: str | None,
+    ) -> None:
+        """Database tail of scan_inbox_async, run on a worker thread"""
+        self._auto_create_deletion_requests(user, broker_scans, prefetch=False)
+
+        user.last_scan_at = datetime.now()
+        if history_id:
+            cursor_service.save_cursor(user.id, INBOX_SCOPE, history_id)
+
+        self.db.commit()
+
+    def _current_history_id(self, user: User) -> str | None:
+        """Get the mailbox historyId to use as the next sync cursor, if available"""
+        try:
+            return self.gmail_service.get_history_id(user)
+        except Exception as e:
+            logger.warning(f"Error fetching history ID: {str(e)}", exc_info=True)
+            return None
+
+    def _begin_listing(
+        self,
+        checkpoint: ScanCheckpoint | None,
+        mode: str,
+        history_id: str | None,
+        sent_days_back: int,
+        query: str | None = None,
+    ) -> None:
+        if checkpoint is not None:
+            self.checkpoint_service.begin_listing(
+                checkpoint, mode, history_id, sent_days_back, query
+            )
+
+    def _finish_chunk(
+        self,
+        checkpoint: ScanCheckpoint | None,
+        messages: list[dict],
+        scans: list[EmailScan],
+        page_token: str | None = None,
+    ) -> list[EmailScan]:
+        """
+        Wrap up a processed chunk of listed messages
+
+        Checkpointed scans commit the chunk with the checkpoint advanced past it. Streaming
+        scans count the chunk and expunge its scans from the session.
+
+        Returns:
+            The scans to keep in the scan's result (none when streaming)
+        """
+        # Count before committing: the commit expires the scans, and reading them after it
+        # would reload each one
+        if self._summary is not None:
+            self.db.flush()
+            self._summary.add(scans)
+
+        if checkpoint is not None:
+            self.checkpoint_service.record_chunk(checkpoint, messages, scans, page_token)
+            self.db.commit()
+
+        if self._summary is None:
+            return scans
+
+        for scan in scans:
+            if scan in self.db:
+                self.db.expunge(scan)
+        return []
+
     def _scan_received_emails(
-        self, user: User, days_back: int, max_emails: int, all_brokers: list
+        self,
+        user: User,
+        days_back: int,
+        max_emails: int,
+        all_brokers: list,
+        checkpoint: ScanCheckpoint | None = None,
+    ) -> list[EmailScan]:
+        """Scan received emails from Gmail inbox, continuing from the checkpoint if given"""
+
+        if checkpoint is not None and self.checkpoint_service.received_listing_done(checkpoint):
+            # Listing again would start over from the first page and count it all twice
+            return []
+
+        if checkpoint is not None and checkpoint.query:
+            pages = self.gmail_service.iter_message_pages(
+                user,
+                checkpoint.query,
+                max_emails - checkpoint.messages_listed,
+                page_token=checkpoint.page_token,
+            )
+        else:
+            pages = self.gmail_service.iter_message_pages(
+                user, self._received_query(days_back), max_emails
+            )
+
+        # Process each listed page before requesting the next one
+        scans = []
+        for messages in self._iter_pages(pages, "received emails"):
+            page_scans = self._process_received_messages(user, messages, all_brokers)
+            scans.extend(
+                self._finish_chunk(
+                    checkpoint, messages, page_scans, getattr(messages, "next_page_token", None)
+                )
+            )
+
+        return scans
+
+    def _process_history_messages(
+        self,
+        user: User,
+        messages: list[dict],
+        all_brokers: list,
+        checkpoint: ScanCheckpoint | None = None,
     ) -> list[EmailScan]:
-        """Scan received emails from Gmail inbox"""
+        """Process messages added since the history cursor, a listing page's worth at a time"""
+        messages = self.checkpoint_service.unprocessed(checkpoint, messages)
+        scans = []
+        for start in range(0, len(messages), GmailService.LIST_PAGE_SIZE):
+            chunk = messages[start : start + GmailService.LIST_PAGE_SIZE]
+            chunk_scans = self._process_received_messages(user, chunk, all_brokers)
+            scans.extend(self._finish_chunk(checkpoint, chunk, chunk_scans))
+        return scans
 
+    def _received_query(self, days_back: int) -> str:
+        """Gmail query for emails received in the last days_back days"""
         # Calculate date range
         after_date = datetime.now() - timedelta(days=days_back)
         after_str = after_date.strftime("%Y/%m/%d")
 
         # Query Gmail for recent emails
-        query = f"after:{after_str}"
+        return f"after:{after_str}"
 
-        try:
-            messages = self.gmail_service.list_messages(user, query, max_emails)
-        except Exception as e:
-            raise Exception(f"Failed to fetch received emails: {str(e)}")
+    def _iter_pages(self, pages, description: str):
+        """Yield listing pages, reporting listing failures the same way for every page"""
+        pages = iter(pages)
+        while True:
+            try:
+                page = next(pages)
+            except StopIteration:
+                return
+            except Exception as e:
+                raise Exception(f"Failed to fetch {description}: {str(e)}")
+            yield page
 
-        scans = []
+    def _plan_fetch(self, messages: list[dict]) -> tuple[dict[str, EmailScan], list[str]]:
+        """Find already-scanned messages and the IDs that still need downloading"""
+        # Check which emails we've already scanned
+        existing_scans = self._find_existing_scans([m["id"] for m in messages])
 
+        # Fetch new messages, and existing broker emails still missing a body
+        to_fetch = []
         for message_ref in messages:
-            message_id = message_ref["id"]
+            existing = existing_scans.get(message_ref["id"])
+            if existing is None or (
+                not existing.body_text and (existing.broker_id or existing.is_broker_email)
+            ):
+                to_fetch.append(message_ref["id"])
+        return existing_scans, to_fetch
+
+    def _process_received_messages(
+        self, user: User, messages: list[dict], all_brokers: list
+    ) -> list[EmailScan]:
+        """
+        Create or refresh EmailScan records for listed inbox messages
 
-            # Check if we've already scanned this email
-            existing = (
-                self.db.query(EmailScan).filter(EmailScan.gmail_message_id == message_id).first()
+        New messages are first fetched as metadata (headers and snippet) and screened;
+        only those that might be broker mail are downloaded in full.
+        """
+        existing_scans, to_fetch = self._plan_fetch(messages)
+        new_ids = [message_id for message_id in to_fetch if message_id not in existing_scans]
+        metadata = self._fetch_messages(user, new_ids, format="metadata")
+        full_ids = self._full_fetch_ids(to_fetch, existing_scans, metadata, all_brokers)
+        fetched = self._fetch_messages(user, full_ids)
+        return self._build_received_scans(
+            user, messages, all_brokers, existing_scans, fetched, metadata
+        )
+
+    def _full_fetch_ids(
+        self,
+        to_fetch: list[str],
+        existing_scans: dict[str, EmailScan],
+        metadata: dict[str, MessageFetchResult],
+        all_brokers: list,
+    ) -> list[str]:
+        """IDs whose full payload is needed: body backfills plus new messages passing screening"""
+        domain_index = self.broker_service.get_domain_index()
+
+        full_ids = []
+        for message_id in to_fetch:
+            if message_id in existing_scans:
+                full_ids.append(message_id)
+                continue
+
+            result = metadata.get(message_id)
+            if result is None or not result.ok:
+                continue
+            parsed = parse_message(result.message)
+            sender_email = self._extract_email(parsed.sender)
+            broker, confidence, _ = self.detector.detect_broker_for_message(
+                parsed,
+                sender_email,
+                self.detector.extract_domain_from_email(sender_email),
+                all_brokers,
+                domain_index,
             )
+            # Any broker signal in the headers or snippet earns a full download
+            if broker is not None or confidence > 0:
+                full_ids.append(message_id)
+        return full_ids
+
+    def _build_received_scans(
+        self,
+        user: User,
+        messages: list[dict],
+        all_brokers: list,
+        existing_scans: dict[str, EmailScan],
+        fetched: dict[str, MessageFetchResult],
+        metadata: dict[str, MessageFetchResult] | None = None,
+    ) -> list[EmailScan]:
+        """
+        Create EmailScan records for fetched inbox messages and refresh existing ones
+
+        Messages screened out on metadata (in metadata but not fetched) are recorded
+        from their headers and snippet, without a body.
+        """
+        domain_index = self.broker_service.get_domain_index()
+        metadata = metadata or {}
+
+        scans = []
+        new_rows = []
+
+        for message_ref in messages:
+            message_id = message_ref["id"]
+            existing = existing_scans.get(message_id)
 
             if existing:
                 if not existing.body_text:
                     try:
-                        message = self.gmail_service.get_message(user, message_id)
-                        body_html, body_text = self._extract_body(message)
-                        existing.body_text = body_text or None
+                        parsed = parse_message(self._fetched_message(fetched[message_id]))
+                        existing.body_text = parsed.body_text or None
                         if not existing.body_preview:
-                            existing.body_preview = self.detector.get_body_preview(
-                                body_html, body_text
-                            )
+                            existing.body_preview = parsed.preview
                     except Exception as e:
                         print(f"Error updating body for received message {message_id}: {str(e)}")
 
@@ -105,6 +669,7 @@ class EmailScanner:
                         "",  # We don't have body_html stored
                         existing.body_preview or "",
                         all_brokers,
+                        domain_index,
                     )
 
                     if broker:
@@ -120,75 +685,71 @@ class EmailScanner:
                 scans.append(existing)
                 continue
 
-            # Fetch full message
             try:
-                message = self.gmail_service.get_message(user, message_id)
-                headers = self.gmail_service.get_message_headers(message)
-
-                # Extract email details
-                sender = headers.get("from", "")
-                recipient = headers.get("to", "")
-                subject = headers.get("subject", "")
-                date_str = headers.get("date", "")
-
-                # Extract thread ID
-                gmail_thread_id = message.get("threadId")
+                # Decode headers and body once for detection, preview and storage
+                if message_id in fetched or message_id not in metadata:
+                    parsed = parse_message(self._fetched_message(fetched[message_id]))
+                    body_text = parsed.body_text
+                else:
+                    parsed = parse_message(self._fetched_message(metadata[message_id]))
+                    body_text = None
 
                 # Parse sender email
-                sender_email = self._extract_email(sender)
+                sender_email = self._extract_email(parsed.sender)
                 sender_domain = self.detector.extract_domain_from_email(sender_email)
 
                 # Parse recipient email
-                recipient_email = self._extract_email(recipient) if recipient else None
-
-                # Extract body
-                body_html, body_text = self._extract_body(message)
+                recipient_email = (
+                    self._extract_email(parsed.recipient) if parsed.recipient else None
+                )
 
                 # Detect if broker email
-                broker, confidence, notes = self.detector.detect_broker(
-                    sender_email, sender_domain, subject, body_html, body_text, all_brokers
+                broker, confidence, notes = self.detector.detect_broker_for_message(
+                    parsed, sender_email, sender_domain, all_brokers, domain_index
                 )
 
-                # Get body preview
-                body_preview = self.detector.get_body_preview(body_html, body_text)
-
                 # Parse date
-                received_date = self._parse_date(date_str)
+                received_date = self._parse_date(parsed.date)
 
                 # Determine email direction: check if sender is the user
                 # (emails sent by user appear in inbox if they're part of a thread)
                 email_direction = "sent" if sender_email == user.email else "received"
 
-                # Create scan record
-                scan = EmailScan(
-                    user_id=user.id,
-                    broker_id=broker.id if broker else None,
-                    gmail_message_id=message_id,
-                    gmail_thread_id=gmail_thread_id,
-                    email_direction=email_direction,
-                    sender_email=sender_email,
-                    sender_domain=sender_domain,
-                    recipient_email=recipient_email,
-                    subject=subject,
-                    received_date=received_date,
-                    is_broker_email=broker is not None or confidence > 0.5,
-                    confidence_score=confidence,
-                    classification_notes=notes,
-                    body_preview=body_preview,
-                    body_text=body_text,
+                # Queue the scan record for the bulk insert
+                new_rows.append(
+                    {
+                        "user_id": user.id,
+                        "broker_id": broker.id if broker else None,
+                        "gmail_message_id": message_id,
+                        "gmail_thread_id": parsed.thread_id,
+                        "email_direction": email_direction,
+                        "sender_email": sender_email,
+                        "sender_domain": sender_domain,
+                        "recipient_email": recipient_email,
+                        "subject": parsed.subject,
+                        "received_date": received_date,
+                        "is_broker_email": broker is not None or confidence > 0.5,
+                        "confidence_score": confidence,
+                        "classification_notes": notes,
+                        "body_preview": parsed.preview,
+                        "body_text": body_text,
+                    }
                 )
-
-                self.db.add(scan)
-                scans.append(scan)
+                scans.append(message_id)
 
             except Exception as e:
                 print(f"Error processing received message {message_id}: {str(e)}")
                 continue
 
-        return scans
+        return self._insert_scans(user, scans, new_rows)
 
     def _scan_sent_broker_emails(
-        self, user: User, days_back: int, max_emails: int, all_brokers: list
+        self,
+        user: User,
+        days_back: int,
+        max_emails: int,
+        all_brokers: list,
+        checkpoint: ScanCheckpoint | None = None,
     ) -> list[EmailScan]:
         """
         Scan sent emails to known broker domains/privacy emails
@@ -197,6 +758,34 @@ class EmailScanner:
         or before the system was set up.
         """
 
+        queries = self._sent_broker_queries(days_back, all_brokers)
+        if not queries:
+            return []  # No brokers configured yet
+
+        # Large broker lists are split into several queries, listed concurrently
+        try:
+            listing = self.query_planner.list_messages(
+                self.io_pool,
+                user,
+                queries,
+                lambda query: self.gmail_service.list_sent_messages(user, query, max_emails),
+                max_emails,
+            )
+        except Exception as e:
+            raise Exception(f"Failed to fetch sent emails: {str(e)}")
+        logger.info(f"Sent email listing: {listing.summary()}")
+
+        # Process the merged listing a page at a time, skipping pages a resumed scan has done
+        listing.messages = self.checkpoint_service.unprocessed(checkpoint, listing.messages)
+        scans = []
+        for messages in listing.pages(GmailService.LIST_PAGE_SIZE):
+            page_scans = self._process_sent_messages(user, messages, all_brokers)
+            scans.extend(self._finish_chunk(checkpoint, messages, page_scans))
+
+        return scans
+
+    def _sent_broker_queries(self, days_back: int, all_brokers: list) -> list[str]:
+        """Gmail queries for sent emails to broker domains/privacy emails (empty if no targets)"""
         # Calculate date range
         after_date = datetime.now() - timedelta(days=days_back)
         after_str = after_date.strftime("%Y/%m/%d")
@@ -212,39 +801,49 @@ class EmailScanner:
             if broker.privacy_email:
                 targets.add(broker.privacy_email)
 
-        if not targets:
-            return []  # No brokers configured yet
-
-        # Build Gmail query for sent emails to broker targets
+        # Build Gmail queries for sent emails to broker targets
         # Query: in:sent (to:@domain1.com OR to:@domain2.com OR to:privacy@...) after:date
-        target_queries = " OR ".join(f"to:{t}" for t in targets)
-        query = f"({target_queries}) after:{after_str}"
+        return self.query_planner.plan(
+            "to",
+            targets,
+            suffix=f"after:{after_str}",
+            prefix_length=len(GmailService.SENT_QUERY_PREFIX),
+        )
 
-        try:
-            messages = self.gmail_service.list_sent_messages(user, query, max_emails)
-        except Exception as e:
-            raise Exception(f"Failed to fetch sent emails: {str(e)}")
+    def _process_sent_messages(
+        self, user: User, messages: list[dict], all_brokers: list
+    ) -> list[EmailScan]:
+        """Create or refresh EmailScan records for listed sent messages"""
+        existing_scans, to_fetch = self._plan_fetch(messages)
+        fetched = self._fetch_messages(user, to_fetch)
+        return self._build_sent_scans(user, messages, all_brokers, existing_scans, fetched)
+
+    def _build_sent_scans(
+        self,
+        user: User,
+        messages: list[dict],
+        all_brokers: list,
+        existing_scans: dict[str, EmailScan],
+        fetched: dict[str, MessageFetchResult],
+    ) -> list[EmailScan]:
+        """Create EmailScan records for fetched sent messages and refresh existing ones"""
+        domain_index = self.broker_service.get_domain_index()
+        brokers_by_id = {b.id: b for b in all_brokers}
 
         scans = []
+        new_rows = []
 
         for message_ref in messages:
             message_id = message_ref["id"]
-
-            # Check if we've already scanned this email
-            existing = (
-                self.db.query(EmailScan).filter(EmailScan.gmail_message_id == message_id).first()
-            )
+            existing = existing_scans.get(message_id)
 
             if existing:
                 if not existing.body_text:
                     try:
-                        message = self.gmail_service.get_message(user, message_id)
-                        body_html, body_text = self._extract_body(message)
-                        existing.body_text = body_text or None
+                        parsed = parse_message(self._fetched_message(fetched[message_id]))
+                        existing.body_text = parsed.body_text or None
                         if not existing.body_preview:
-                            existing.body_preview = self.detector.get_body_preview(
-                                body_html, body_text
-                            )
+                            existing.body_preview = parsed.preview
                     except Exception as e:
                         print(f"Error updating body for sent message {message_id}: {str(e)}")
 
@@ -258,6 +857,7 @@ class EmailScanner:
                         "",  # We don't have body_html stored
                         existing.body_preview or "",
                         all_brokers,
+                        domain_index,
                     )
 
                     if broker:
@@ -273,82 +873,232 @@ class EmailScanner:
                 scans.append(existing)
                 continue
 
-            # Fetch full message
             try:
-                message = self.gmail_service.get_message(user, message_id)
-                headers = self.gmail_service.get_message_headers(message)
-
-                # Extract email details
-                sender = headers.get("from", "")
-                recipient = headers.get("to", "")
-                subject = headers.get("subject", "")
-                date_str = headers.get("date", "")
-
-                # Extract thread ID
-                gmail_thread_id = message.get("threadId")
+                parsed = parse_message(self._fetched_message(fetched[message_id]))
 
                 # Parse sender email (should be user's email)
-                sender_email = self._extract_email(sender)
+                sender_email = self._extract_email(parsed.sender)
                 sender_domain = self.detector.extract_domain_from_email(sender_email)
 
                 # Parse recipient email (broker contact)
-                recipient_email = self._extract_email(recipient) if recipient else None
-                recipient_domain = (
-                    self.detector.extract_domain_from_email(recipient_email)
-                    if recipient_email
-                    else None
+                recipient_email = (
+                    self._extract_email(parsed.recipient) if parsed.recipient else None
                 )
 
-                # Extract body
-                body_html, body_text = self._extract_body(message)
-
-                # Detect broker from recipient domain/email
-                broker = None
-                for b in all_brokers:
-                    # Match by privacy email
-                    if b.privacy_email and recipient_email == b.privacy_email:
-                        broker = b
-                        break
-                    # Match by domain
-                    if recipient_domain and b.domains and recipient_domain in b.domains:
-                        broker = b
-                        break
-
-                # Get body preview
-                body_preview = self.detector.get_body_preview(body_html, body_text)
+                # Detect broker from recipient privacy email or domain
+                broker = brokers_by_id.get(domain_index.match_email(recipient_email))
 
                 # Parse date
-                received_date = self._parse_date(date_str)
-
-                # Create scan record
-                scan = EmailScan(
-                    user_id=user.id,
-                    broker_id=broker.id if broker else None,
-                    gmail_message_id=message_id,
-                    gmail_thread_id=gmail_thread_id,
-                    email_direction="sent",
-                    sender_email=sender_email,
-                    sender_domain=sender_domain,
-                    recipient_email=recipient_email,
-                    subject=subject,
-                    received_date=received_date,
-                    is_broker_email=broker is not None,
-                    confidence_score=1.0 if broker else 0.5,
-                    classification_notes="Sent to broker domain/privacy email",
-                    body_preview=body_preview,
-                    body_text=body_text,
+                received_date = self._parse_date(parsed.date)
+
+                # Queue the scan record for the bulk insert
+                new_rows.append(
+                    {
+                        "user_id": user.id,
+                        "broker_id": broker.id if broker else None,
+                        "gmail_message_id": message_id,
+                        "gmail_thread_id": parsed.thread_id,
+                        "email_direction": "sent",
+                        "sender_email": sender_email,
+                        "sender_domain": sender_domain,
+                        "recipient_email": recipient_email,
+                        "subject": parsed.subject,
+                        "received_date": received_date,
+                        "is_broker_email": broker is not None,
+                        "confidence_score": 1.0 if broker else 0.5,
+                        "classification_notes": "Sent to broker domain/privacy email",
+                        "body_preview": parsed.preview,
+                        "body_text": parsed.body_text,
+                    }
                 )
-
-                self.db.add(scan)
-                scans.append(scan)
+                scans.append(message_id)
 
             except Exception as e:
                 print(f"Error processing sent message {message_id}: {str(e)}")
                 continue
 
-        return scans
+        return self._insert_scans(user, scans, new_rows)
 
-    def _auto_create_deletion_requests(self, user: User, broker_scans: list[EmailScan]) -> None:
+    def _insert_scans(
+        self, user: User, scans: list[EmailScan | str], new_rows: list[dict]
+    ) -> list[EmailScan]:
+        """
+        Bulk-insert new scan rows and put the loaded records in place of their message IDs
+
+        Rows another scan inserted first are left as they are (ON CONFLICT DO NOTHING),
+        so concurrent scans of the same mailbox don't abort each other's transaction.
+        """
+        if new_rows:
+            bulk_upsert(self.db, EmailScan, new_rows)
+            inserted = {
+                scan.gmail_message_id: scan
+                for scan in self.db.query(EmailScan).filter(
+                    EmailScan.user_id == user.id,
+                    EmailScan.gmail_message_id.in_([row["gmail_message_id"] for row in new_rows]),
+                )
+            }
+        else:
+            inserted = {}
+
+        result = []
+        for scan in scans:
+            if isinstance(scan, str):
+                scan = inserted.get(scan)
+            if scan is not None:
+                result.append(scan)
+        return result
+
+    def _find_existing_scans(self, message_ids: list[str]) -> dict[str, EmailScan]:
+        """Look up already-scanned messages with a few IN (...) queries instead of one per ID"""
+        existing_scans = {}
+        for start in range(0, len(message_ids), self.EXISTENCE_CHECK_CHUNK_SIZE):
+            chunk = message_ids[start : start + self.EXISTENCE_CHECK_CHUNK_SIZE]
+            for scan in self.db.query(EmailScan).filter(EmailScan.gmail_message_id.in_(chunk)):
+                existing_scans[scan.gmail_message_id] = scan
+        return existing_scans
+
+    def _fetch_messages(
+        self, user: User, message_ids: list[str], format: str = "full"
+    ) -> dict[str, MessageFetchResult]:
+        """Batch-fetch Gmail messages concurrently, keyed by message ID"""
+        results = self.io_pool.fetch_messages(self.gmail_service, user, message_ids, format=format)
+        return {result.message_id: result for result in results}
+
+    def _threads_to_analyze(self, user: User, broker_scans: list[EmailScan]) -> list[str]:
+        """
+        Thread IDs _auto_create_deletion_requests will analyze for these scans
+
+        Mirrors that loop's skip rules (one request per broker, existing requests kept)
+        so only threads of sent emails that will get a new request are downloaded.
+        """
+        requested_brokers = {
+            broker_id
+            for (broker_id,) in self.db.query(DeletionRequest.broker_id).filter(
+                DeletionRequest.user_id == user.id
+            )
+        }
+
+        thread_ids = []
+        for scan in broker_scans:
+            if not scan.broker_id or scan.broker_id in requested_brokers:
+                continue
+            requested_brokers.add(scan.broker_id)
+            if scan.email_direction == "sent" and scan.gmail_thread_id:
+                thread_ids.append(scan.gmail_thread_id)
+
+        return list(dict.fromkeys(thread_ids))
+
+    def _reset_scan_caches(self) -> None:
+        self._thread_cache = {}
+        self._reply_cache = {}
+
+    def _prefetch_threads(self, user: User, broker_scans: list[EmailScan]) -> None:
+        """
+        Fetch, concurrently, the threads _auto_create_deletion_requests will analyze
+
+        Threads come as metadata and snippets; full bodies are then batch-fetched only
+        for broker replies whose snippet doesn't classify them confidently.
+        """
+        thread_ids = [
+            thread_id
+            for thread_id in self._threads_to_analyze(user, broker_scans)
+            if thread_id not in self._thread_cache
+        ]
+        results = self.io_pool.map(
+            user,
+            lambda thread_id: self.gmail_service.get_thread_messages(
+                user, thread_id, format=self.THREAD_FORMAT
+            ),
+            thread_ids,
+        )
+        self._thread_cache.update(zip(thread_ids, results, strict=True))
+
+        reply_ids = self._inconclusive_reply_ids(user, thread_ids)
+        for result in self.io_pool.fetch_messages(
+            self.gmail_service, user, reply_ids, format="full"
+        ):
+            self._reply_cache[result.message_id] = result.message if result.ok else None
+
+    def _get_thread_messages(self, user: User, thread_id: str) -> list[dict]:
+        """Get a thread's messages, from the per-scan cache when already fetched"""
+        cached = self._thread_cache.get(thread_id)
+        if cached is None:
+            cached = self.gmail_service.get_thread_messages(
+                user, thread_id, format=self.THREAD_FORMAT
+            )
+            self._thread_cache[thread_id] = cached
+        if isinstance(cached, Exception):
+            raise cached
+        return cached
+
+    def _broker_replies(self, user: User, thread_messages: list[dict]) -> list[ParsedMessage]:
+        """Messages in a thread that weren't sent by the user"""
+        replies = []
+        for message in thread_messages:
+            parsed = parse_message(message)
+            if self._extract_email(parsed.sender).lower() != user.email.lower():
+                replies.append(parsed)
+        return replies
+
+    def _needs_reply_body(self, reply: ParsedMessage, confidence: float) -> bool:
+        """Whether a reply classified from its snippet should be re-read in full"""
+        return (
+            confidence < self.RESPONSE_CONFIDENCE_THRESHOLD
+            and not reply.body_text
+            and bool(reply.message_id)
+        )
+
+    def _inconclusive_reply_ids(self, user: User, thread_ids: list[str]) -> list[str]:
+        """IDs of cached thread replies whose snippet classification is inconclusive"""
+        reply_ids = []
+        for thread_id in thread_ids:
+            thread_messages = self._thread_cache.get(thread_id)
+            if not isinstance(thread_messages, list):
+                continue
+            for reply in self._broker_replies(user, thread_messages):
+                _, confidence = self.response_detector.detect_response_type(
+                    reply.subject, reply.preview
+                )
+                if self._needs_reply_body(reply, confidence):
+                    reply_ids.append(reply.message_id)
+        return [
+            reply_id for reply_id in dict.fromkeys(reply_ids) if reply_id not in self._reply_cache
+        ]
+
+    def _get_reply_message(self, user: User, message_id: str) -> dict | None:
+        """Full payload of a broker reply, from the per-scan cache when already fetched"""
+        if message_id not in self._reply_cache:
+            try:
+                self._reply_cache[message_id] = self.gmail_service.get_message(user, message_id)
+            except Exception as e:
+                logger.warning(f"Error fetching reply {message_id}: {str(e)}")
+                self._reply_cache[message_id] = None
+        return self._reply_cache[message_id]
+
+    def _classify_reply(self, user: User, reply: ParsedMessage) -> tuple:
+        """Classify a broker reply from its snippet, reading the full body only if inconclusive"""
+        response_type, confidence = self.response_detector.detect_response_type(
+            reply.subject, reply.preview
+        )
+        if not self._needs_reply_body(reply, confidence):
+            return response_type, confidence
+
+        full_message = self._get_reply_message(user, reply.message_id)
+        if full_message is None:
+            return response_type, confidence
+        return self.response_detector.detect_response_type(
+            reply.subject, parse_message(full_message).body_text
+        )
+
+    def _fetched_message(self, result: MessageFetchResult) -> dict:
+        """Return the message from a batch result, raising the per-item error if it failed"""
+        if result.error is not None:
+            raise result.error
+        return result.message
+
+    def _auto_create_deletion_requests(
+        self, user: User, broker_scans: list[EmailScan], prefetch: bool = True
+    ) -> None:
         """
         Auto-create deletion requests from discovered broker emails (sent or received)
 
@@ -360,6 +1110,10 @@ class EmailScanner:
         5. Create DeletionRequest with source='auto_discovered'
         """
 
+        # Download the threads that need analysis up front, in parallel
+        if prefetch:
+            self._prefetch_threads(user, broker_scans)
+
         for scan in broker_scans:
             # Skip if not linked to a broker
             if not scan.broker_id:
@@ -403,7 +1157,6 @@ class EmailScanner:
             request = DeletionRequest(
                 user_id=user.id,
                 broker_id=scan.broker_id,
-                status=status,
                 source="auto_discovered",
                 gmail_sent_message_id=gmail_sent_message_id,
                 gmail_thread_id=scan.gmail_thread_id,
@@ -411,6 +1164,15 @@ class EmailScanner:
                 generated_email_subject=scan.subject,
                 generated_email_body=scan.body_text or scan.body_preview,
             )
+            # A status read from a reply in the thread has no date of its own, so only
+            # stamp what the scanned email itself dates
+            transition_request(
+                request,
+                status,
+                source="auto_discovered",
+                at=scan.received_date,
+                stamp=scan.email_direction == "received" or status == RequestStatus.SENT,
+            )
 
             self.db.add(request)
             self.db.flush()  # Flush to get the request ID
@@ -502,7 +1264,7 @@ class EmailScanner:
 
         # Get all messages in thread
         try:
-            thread_messages = self.gmail_service.get_thread_messages(user, thread_id)
+            thread_messages = self._get_thread_messages(user, thread_id)
         except Exception as e:
             print(f"Error fetching thread {thread_id}: {str(e)}")
             return RequestStatus.SENT
@@ -511,22 +1273,7 @@ class EmailScanner:
             return RequestStatus.SENT
 
         # Find received emails in thread (responses from broker)
-        received_responses = []
-        for message in thread_messages:
-            headers = self.gmail_service.get_message_headers(message)
-            sender = headers.get("from", "")
-            sender_email = self._extract_email(sender)
-
-            # Skip if this is from the user (sent email)
-            if sender_email.lower() == user.email.lower():
-                continue
-
-            # This is a response from broker
-            subject = headers.get("subject", "")
-            body_html, body_text = self._extract_body(message)
-            body_preview = self.detector.get_body_preview(body_html, body_text)
-
-            received_responses.append({"subject": subject, "body": body_preview})
+        received_responses = self._broker_replies(user, thread_messages)
 
         # No responses yet - mark as sent
         if not received_responses:
@@ -535,12 +1282,10 @@ class EmailScanner:
         # Analyze each response with ResponseDetector
         has_action_required = False
         for response in received_responses:
-            response_type, confidence = self.response_detector.detect_response_type(
-                response["subject"], response["body"]
-            )
+            response_type, confidence = self._classify_reply(user, response)
 
             # High confidence classification
-            if confidence >= 0.6:
+            if confidence >= self.RESPONSE_CONFIDENCE_THRESHOLD:
                 if response_type == ResponseType.CONFIRMATION:
                     return RequestStatus.CONFIRMED
                 elif response_type == ResponseType.REJECTION:
@@ -563,58 +1308,6 @@ class EmailScanner:
             return match.group(0)
         return from_header
 
-    def _extract_body(self, message: dict) -> tuple[str, str]:
-        """Extract HTML and text body from Gmail message"""
-        body_html = ""
-        body_text = ""
-
-        def parse_parts(parts):
-            nonlocal body_html, body_text
-            for part in parts:
-                mime_type = part.get("mimeType", "")
-
-                if mime_type == "text/plain" and "data" in part.get("body", {}):
-                    body_text = base64.urlsafe_b64decode(part["body"]["data"]).decode(
-                        "utf-8", errors="ignore"
-                    )
-
-                elif mime_type == "text/html" and "data" in part.get("body", {}):
-                    body_html = base64.urlsafe_b64decode(part["body"]["data"]).decode(
-                        "utf-8", errors="ignore"
-                    )
-
-                if "parts" in part:
-                    parse_parts(part["parts"])
-
-        if "payload" in message:
-            payload = message["payload"]
-
-            # Single part message
-            if "body" in payload and "data" in payload["body"]:
-                mime_type = payload.get("mimeType", "")
-                if mime_type == "text/plain":
-                    body_text = base64.urlsafe_b64decode(payload["body"]["data"]).decode(
-                        "utf-8", errors="ignore"
-                    )
-                elif mime_type == "text/html":
-                    body_html = base64.urlsafe_b64decode(payload["body"]["data"]).decode(
-                        "utf-8", errors="ignore"
-                    )
-
-            # Multi-part message
-            if "parts" in payload:
-                parse_parts(payload["parts"])
-
-        if not body_text and body_html:
-            try:
-                from bs4 import BeautifulSoup
-
-                body_text = BeautifulSoup(body_html, "html.parser").get_text()
-            except Exception:
-                body_text = ""
-
-        return body_html, body_text
-
     def _parse_date(self, date_str: str) -> datetime:
         """Parse email date string"""
         from email.utils import parsedate_to_datetime
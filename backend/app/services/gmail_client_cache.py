@@ -0,0 +1,84 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any
+
+from app.config import settings
+from app.models.user import User
+
+
+def token_fingerprint(user: User) -> str:
+    """Fingerprint a user's stored (encrypted) OAuth tokens without decrypting them"""
+    digest = hashlib.sha256()
+    digest.update((user.encrypted_access_token or "").encode())
+    digest.update(b"\0")
+    digest.update((user.encrypted_refresh_token or "").encode())
+    return digest.hexdigest()
+
+
+class GmailClientCache:
+    """
+    Bounded, TTL-evicted cache of Gmail API clients.
+
+    Entries are keyed by (user ID, token fingerprint, thread), so a client built from old
+    tokens is never returned once the user's stored tokens change. Gmail clients wrap a
+    non-thread-safe httplib2 connection, so each thread gets its own client. Least
+    recently used entries are evicted first when the cache is full.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: int) -> None:
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[tuple[str, str, int], tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user: User) -> Any | None:
+        """Return this thread's cached client for the user's current tokens, if still fresh"""
+        key = (str(user.id), token_fingerprint(user), threading.get_ident())
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, client = entry
+            if expires_at <= now:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return client
+
+    def put(self, user: User, client: Any) -> None:
+        """Store this thread's client for the user's current tokens"""
+        user_id = str(user.id)
+        fingerprint = token_fingerprint(user)
+        key = (user_id, fingerprint, threading.get_ident())
+        expires_at = time.monotonic() + self.ttl_seconds
+        with self._lock:
+            # Only one set of tokens is live per user - drop clients built from older ones
+            for stale_key in [k for k in self._entries if k[0] == user_id and k[1] != fingerprint]:
+                del self._entries[stale_key]
+            self._entries[key] = (expires_at, client)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: str) -> None:
+        """Drop every cached client for a user (tokens refreshed or revoked)"""
+        user_id = str(user_id)
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == user_id]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+gmail_client_cache = GmailClientCache(
+    max_size=settings.gmail_client_cache_size,
+    ttl_seconds=settings.gmail_client_cache_ttl_seconds,
+)
@@ -0,0 +1,162 @@
+"""
+Gmail Query Planner
+Splits long OR-queries into length-bounded shards and lists them concurrently
+"""
+
+import asyncio
+import time
+from collections.abc import Awaitable, Callable, Iterable, Iterator
+from dataclasses import dataclass, field
+
+from app.config import settings
+from app.models.user import User
+from app.services.scan_pool import ScanIOPool
+
+
+@dataclass
+class ShardTiming:
+    """How one shard's list call went"""
+
+    query: str
+    terms: int
+    messages: int = 0
+    seconds: float = 0.0
+    error: Exception | None = None
+
+
+@dataclass
+class ShardedListing:
+    """Merged, de-duplicated message refs from every shard of a query"""
+
+    messages: list[dict] = field(default_factory=list)
+    timings: list[ShardTiming] = field(default_factory=list)
+
+    def pages(self, page_size: int) -> Iterator[list[dict]]:
+        """Yield the merged refs in pages, for page-at-a-time processing"""
+        for start in range(0, len(self.messages), page_size):
+            yield self.messages[start : start + page_size]
+
+    def summary(self) -> str:
+        """One-line description of the shards for logging"""
+        parts = [
+            f"#{i} {t.terms} terms/{t.messages} msgs/{t.seconds:.2f}s"
+            + (" failed" if t.error else "")
+            for i, t in enumerate(self.timings)
+        ]
+        return f"{len(self.messages)} messages from {len(self.timings)} shards ({', '.join(parts)})"
+
+
+class GmailQueryPlanner:
+    """
+    Builds Gmail queries of the form "(op:a OR op:b ...) suffix" that stay under
+    max_query_length, splitting the target list into as many shards as needed.
+
+    Each shard is listed separately (concurrently where the caller allows it) and the
+    results are merged round-robin, so when max_results cuts the merged list short every
+    shard's newest messages are kept rather than only the first shard's.
+    """
+
+    def __init__(self, max_query_length: int | None = None) -> None:
+        self.max_query_length = max_query_length or settings.gmail_max_query_length
+
+    def plan(
+        self, operator: str, targets: Iterable[str], suffix: str = "", prefix_length: int = 0
+    ) -> list[str]:
+        """
+        Queries matching any of the targets, each within max_query_length
+
+        prefix_length is how much the caller adds in front of each query (such as
+        "in:sent "), so the query it sends still fits.
+        """
+        terms = [f"{operator}:{target}" for target in sorted(set(targets))]
+        if not terms:
+            return []
+
+        # Room left for terms once the prefix, the parentheses and the suffix are accounted for
+        budget = self.max_query_length - prefix_length - len(suffix) - 3
+
+        shards: list[list[str]] = [[]]
+        length = 0
+        for term in terms:
+            added = len(term) + (4 if shards[-1] else 0)  # " OR "
+            if shards[-1] and length + added > budget:
+                shards.append([])
+                added = len(term)
+                length = 0
+            shards[-1].append(term)
+            length += added
+
+        return [f"({' OR '.join(shard)}) {suffix}".strip() for shard in shards]
+
+    def list_messages(
+        self,
+        pool: ScanIOPool,
+        user: User,
+        queries: list[str],
+        list_fn: Callable[[str], list[dict]],
+        max_results: int,
+    ) -> ShardedListing:
+        """
+        Run list_fn for every query on the scan I/O pool and merge the results
+
+        Raises the first shard's error if any shard failed.
+        """
+
+        def run(query: str) -> tuple[list[dict], ShardTiming]:
+            timing = ShardTiming(query=query, terms=query.count(" OR ") + 1)
+            started = time.perf_counter()
+            try:
+                messages = list_fn(query)
+            except Exception as e:
+                timing.error = e
+                messages = []
+            timing.seconds = time.perf_counter() - started
+            timing.messages = len(messages)
+            return messages, timing
+
+        return self._merge(pool.map(user, run, queries), max_results)
+
+    async def alist_messages(
+        self,
+        queries: list[str],
+        list_fn: Callable[[str], Awaitable[list[dict]]],
+        max_results: int,
+    ) -> ShardedListing:
+        """Async counterpart of list_messages; shards are awaited concurrently"""
+
+        async def run(query: str) -> tuple[list[dict], ShardTiming]:
+            timing = ShardTiming(query=query, terms=query.count(" OR ") + 1)
+            started = time.perf_counter()
+            try:
+                messages = await list_fn(query)
+            except Exception as e:
+                timing.error = e
+                messages = []
+            timing.seconds = time.perf_counter() - started
+            timing.messages = len(messages)
+            return messages, timing
+
+        return self._merge(await asyncio.gather(*(run(query) for query in queries)), max_results)
+
+    def _merge(
+        self, results: list[tuple[list[dict], ShardTiming]], max_results: int
+    ) -> ShardedListing:
+        timings = [timing for _, timing in results]
+        for timing in timings:
+            if timing.error is not None:
+                raise timing.error
+
+        listing = ShardedListing(timings=timings)
+        seen = set()
+        listings = [messages for messages, _ in results]
+        for position in range(max((len(messages) for messages in listings), default=0)):
+            for messages in listings:
+                if position < len(messages) and messages[position]["id"] not in seen:
+                    seen.add(messages[position]["id"])
+                    listing.messages.append(messages[position])
+                    if len(listing.messages) >= max_results:
+                        return listing
+        return listing
+
+
+gmail_query_planner = GmailQueryPlanner()
@@ -0,0 +1,353 @@
+"""
+Gmail Quota Governor
+Redis token buckets that pace Gmail API calls across all workers and API replicas
+"""
+
+import asyncio
+import logging
+import math
+import threading
+import time
+
+import anyio
+import redis
+from googleapiclient.errors import HttpError
+from redis.exceptions import RedisError
+
+from app.config import settings
+from app.exceptions import GmailQuotaExceededError
+
+# Quota units charged by Gmail per call (batch requests are charged per inner call)
+METHOD_COSTS = {
+    "messages.list": 5,
+    "messages.get": 5,
+    "messages.send": 100,
+    "threads.get": 10,
+    "history.list": 2,
+    "getProfile": 1,
+}
+
+RATE_LIMIT_REASONS = {"rateLimitExceeded", "userRateLimitExceeded", "quotaExceeded"}
+
+# Reasons that mean the whole project hit its limit (userRateLimitExceeded is per user)
+PROJECT_LIMIT_REASONS = {"rateLimitExceeded", "quotaExceeded"}
+
+# Wait this long after a rate-limit response that carries no Retry-After header
+DEFAULT_RETRY_AFTER_SECONDS = 5
+
+# Atomically refills both buckets and takes `cost` tokens from each, or takes nothing and
+# returns how many milliseconds to wait. Block keys set from Retry-After short-circuit it.
+_ACQUIRE_SCRIPT = """
+if redis.replicate_commands then redis.replicate_commands() end
+local blocked = math.max(redis.call('PTTL', KEYS[3]), redis.call('PTTL', KEYS[4]))
+if blocked > 0 then return blocked end
+
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+local cost = tonumber(ARGV[1])
+
+local function refill(key, rate, capacity)
+    local state = redis.call('HMGET', key, 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or capacity
+    local ts = tonumber(state[2]) or now
+    return math.min(capacity, tokens + math.max(now - ts, 0) * rate / 1000)
+end
+
+local user_rate, user_capacity = tonumber(ARGV[2]), tonumber(ARGV[3])
+local project_rate, project_capacity = tonumber(ARGV[4]), tonumber(ARGV[5])
+local user_tokens = refill(KEYS[1], user_rate, user_capacity)
+local project_tokens = refill(KEYS[2], project_rate, project_capacity)
+
+local wait = 0
+if user_tokens < cost then
+    wait = math.max(wait, math.ceil((cost - user_tokens) * 1000 / user_rate))
+end
+if project_tokens < cost then
+    wait = math.max(wait, math.ceil((cost - project_tokens) * 1000 / project_rate))
+end
+
+if wait == 0 then
+    user_tokens = user_tokens - cost
+    project_tokens = project_tokens - cost
+    redis.call('INCRBY', KEYS[5], cost)
+    redis.call('EXPIRE', KEYS[5], 3600)
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tostring(user_tokens), 'ts', now)
+redis.call('PEXPIRE', KEYS[1], 60000)
+redis.call('HSET', KEYS[2], 'tokens', tostring(project_tokens), 'ts', now)
+redis.call('PEXPIRE', KEYS[2], 60000)
+return wait
+"""
+
+
+def quota_error_from_http_error(http_error: HttpError) -> GmailQuotaExceededError | None:
+    """Translate a Gmail rate/quota HttpError into GmailQuotaExceededError (None otherwise)"""
+    status = getattr(http_error.resp, "status", None)
+    if status not in (403, 429):
+        return None
+
+    reasons = []
+    if getattr(http_error, "error_details", None):
+        for detail in http_error.error_details:
+            if isinstance(detail, dict) and detail.get("reason"):
+                reasons.append(detail["reason"])
+    if not reasons:
+        try:
+            reasons.append(http_error._get_reason())
+        except Exception:
+            pass
+
+    if not any(reason and any(r in reason for r in RATE_LIMIT_REASONS) for reason in reasons):
+        return None
+
+    retry_after = None
+    headers = getattr(http_error.resp, "headers", None)
+    retry_after_header = headers.get("Retry-After") if headers else None
+    if retry_after_header:
+        try:
+            retry_after = int(retry_after_header)
+        except ValueError:
+            retry_after = None
+
+    message = (
+        http_error._get_reason() if hasattr(http_error, "_get_reason") else "Gmail quota exceeded"
+    )
+    return GmailQuotaExceededError(
+        message=message, retry_after=retry_after, project_wide=is_project_limit(reasons)
+    )
+
+
+def is_project_limit(reasons: list[str]) -> bool:
+    """Whether rate-limit reasons point at the project's quota rather than a user's"""
+    reasons = [reason for reason in reasons if reason]
+    return any(reason in PROJECT_LIMIT_REASONS for reason in reasons) and not any(
+        "userRateLimitExceeded" in reason for reason in reasons
+    )
+
+
+class GmailQuotaGovernor:
+    """
+    Paces Gmail API calls with two Redis token buckets: one per user and one for the
+    whole Google Cloud project.
+
+    Before each call, acquire() takes the method's quota-unit cost from both buckets,
+    sleeping until enough budget has refilled. After a 403/429 rate-limit response,
+    penalize() blocks the user (or the project) for the Retry-After period, so every
+    process backs off together. Like RateLimiter, it fails open if Redis is unavailable.
+    """
+
+    KEY_PREFIX = "gmail_quota"
+
+    # After a Redis failure, stop trying Redis for this long
+    UNAVAILABLE_BACKOFF_SECONDS = 30
+
+    def __init__(
+        self,
+        client: redis.Redis | None = None,
+        enabled: bool | None = None,
+        user_units_per_second: int | None = None,
+        project_units_per_second: int | None = None,
+        max_wait_seconds: float | None = None,
+    ) -> None:
+        self._logger = logging.getLogger(__name__)
+        self.enabled = settings.gmail_quota_enabled if enabled is None else enabled
+        self.user_rate = user_units_per_second or settings.gmail_quota_user_units_per_second
+        self.project_rate = (
+            project_units_per_second or settings.gmail_quota_project_units_per_second
+        )
+        self.max_wait_seconds = (
+            settings.gmail_quota_max_wait_seconds if max_wait_seconds is None else max_wait_seconds
+        )
+        self._client = client
+        self._script = None
+        self._unavailable_until = 0.0
+        self._lock = threading.Lock()
+
+    def _redis(self) -> redis.Redis:
+        with self._lock:
+            if self._client is None:
+                self._client = redis.Redis.from_url(settings.redis_url, decode_responses=True)
+            if self._script is None:
+                self._script = self._client.register_script(_ACQUIRE_SCRIPT)
+            return self._client
+
+    def _user_key(self, user_id: str) -> str:
+        return f"{self.KEY_PREFIX}:user:{user_id}"
+
+    def _project_key(self) -> str:
+        return f"{self.KEY_PREFIX}:project"
+
+    def _block_key(self, user_id: str | None) -> str:
+        return f"{self.KEY_PREFIX}:blocked:{'user:' + user_id if user_id else 'project'}"
+
+    def _minute_key(self, minute: int) -> str:
+        return f"{self.KEY_PREFIX}:units:{minute}"
+
+    def _available(self) -> bool:
+        return self.enabled and time.monotonic() >= self._unavailable_until
+
+    def _mark_unavailable(self, exc: Exception) -> None:
+        self._logger.warning("Gmail quota governor unavailable, not pacing calls: %s", exc)
+        self._unavailable_until = time.monotonic() + self.UNAVAILABLE_BACKOFF_SECONDS
+
+    def _try_acquire(self, user_id: str, cost: int) -> float:
+        """Take cost units from both buckets; returns seconds to wait (0 if granted)"""
+        if not self._available():
+            return 0.0
+        try:
+            self._redis()
+            wait_ms = self._script(
+                keys=[
+                    self._user_key(user_id),
+                    self._project_key(),
+                    self._block_key(user_id),
+                    self._block_key(None),
+                    # Scripts may only touch keys passed in, so the minute is chosen here
+                    self._minute_key(int(time.time()) // 60),
+                ],
+                args=[
+                    cost,
+                    self.user_rate,
+                    self.user_rate,
+                    self.project_rate,
+                    self.project_rate,
+                ],
+            )
+        except RedisError as exc:
+            self._mark_unavailable(exc)
+            return 0.0
+        return max(int(wait_ms), 0) / 1000
+
+    def _cost(self, method: str, calls: int) -> int:
+        return METHOD_COSTS.get(method, 5) * max(calls, 1)
+
+    def _charges(self, cost: int) -> list[int]:
+        """
+        Split a cost into acquires no larger than the smaller bucket's capacity
+
+        A call costlier than a bucket could never be granted in one piece; charging it in
+        capacity-sized parts takes the full cost while still pacing it at the bucket rate.
+        """
+        step = min(self.user_rate, self.project_rate)
+        full, rest = divmod(cost, step)
+        return [step] * full + ([rest] if rest else [])
+
+    def _exhausted(self, user_id: str, method: str, wait: float) -> GmailQuotaExceededError:
+        return GmailQuotaExceededError(
+            message=f"Gmail quota budget exhausted for {method} (user {user_id})",
+            retry_after=math.ceil(wait),
+        )
+
+    def acquire(self, user_id: str, method: str, calls: int = 1) -> float:
+        """
+        Wait until the user and project budgets cover `calls` calls of `method`
+
+        Returns:
+            Seconds spent waiting
+
+        Raises:
+            GmailQuotaExceededError: If the budget won't be available within max_wait_seconds
+        """
+        user_id = str(user_id)
+        waited = 0.0
+        for charge in self._charges(self._cost(method, calls)):
+            while True:
+                wait = self._try_acquire(user_id, charge)
+                if wait <= 0:
+                    break
+                if waited + wait > self.max_wait_seconds:
+                    raise self._exhausted(user_id, method, wait)
+                time.sleep(wait)
+                waited += wait
+        return waited
+
+    async def acquire_async(self, user_id: str, method: str, calls: int = 1) -> float:
+        """acquire() for the event loop: Redis runs on a worker thread and waits don't block"""
+        user_id = str(user_id)
+        waited = 0.0
+        for charge in self._charges(self._cost(method, calls)):
+            while True:
+                wait = await anyio.to_thread.run_sync(self._try_acquire, user_id, charge)
+                if wait <= 0:
+                    break
+                if waited + wait > self.max_wait_seconds:
+                    raise self._exhausted(user_id, method, wait)
+                await asyncio.sleep(wait)
+                waited += wait
+        return waited
+
+    def penalize(self, user_id: str | None, retry_after: int | None = None) -> bool:
+        """
+        Block further calls after Gmail returned a rate-limit error
+
+        Args:
+            user_id: User who hit the limit, or None when the project limit was hit
+            retry_after: Seconds from the Retry-After header, if any
+
+        Returns:
+            True if the block was recorded, so acquire() will wait it out
+        """
+        if not self._available():
+            return False
+        seconds = retry_after if retry_after and retry_after > 0 else DEFAULT_RETRY_AFTER_SECONDS
+        try:
+            self._redis().set(
+                self._block_key(str(user_id) if user_id else None), 1, px=int(seconds * 1000)
+            )
+        except RedisError as exc:
+            self._mark_unavailable(exc)
+            return False
+        return True
+
+    def usage(self, user_id: str | None = None, minutes: int = 15) -> dict:
+        """
+        Current budget levels and recent consumption, for capacity planning
+
+        Returns:
+            Dict with each bucket's rate, capacity and available units, any active
+            Retry-After block, and units granted per minute for the last `minutes` minutes
+        """
+        usage = {
+            "enabled": self.enabled,
+            "available": self._available(),
+            "method_costs": dict(METHOD_COSTS),
+        }
+        if not self._available():
+            return usage
+
+        try:
+            client = self._redis()
+            seconds, microseconds = client.time()
+            now_ms = seconds * 1000 + microseconds // 1000
+
+            def bucket(key: str, block_key: str, rate: int) -> dict:
+                tokens, ts = client.hmget(key, "tokens", "ts")
+                available = rate
+                if tokens is not None and ts is not None:
+                    elapsed = max(now_ms - int(ts), 0)
+                    available = min(rate, float(tokens) + elapsed * rate / 1000)
+                blocked_ms = client.pttl(block_key)
+                return {
+                    "units_per_second": rate,
+                    "capacity": rate,
+                    "available_units": round(available, 1),
+                    "blocked_for_seconds": round(blocked_ms / 1000, 1) if blocked_ms > 0 else 0,
+                }
+
+            usage["project"] = bucket(self._project_key(), self._block_key(None), self.project_rate)
+            if user_id:
+                usage["user"] = bucket(
+                    self._user_key(str(user_id)), self._block_key(str(user_id)), self.user_rate
+                )
+
+            current_minute = now_ms // 60000
+            minute_keys = [self._minute_key(current_minute - offset) for offset in range(minutes)]
+            usage["units_per_minute"] = [int(value or 0) for value in client.mget(minute_keys)]
+        except RedisError as exc:
+            self._mark_unavailable(exc)
+            usage["available"] = False
+        return usage
+
+
+gmail_quota_governor = GmailQuotaGovernor()
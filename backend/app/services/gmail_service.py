@@ -1,17 +1,83 @@
+import json
+from collections.abc import Iterator
+from dataclasses import dataclass
+from functools import lru_cache
+
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import Flow
-from googleapiclient.discovery import build
+from googleapiclient import discovery_cache
+from googleapiclient.discovery import build_from_document
 from googleapiclient.errors import HttpError
 
 # IMPORTANT: Do NOT set OAUTHLIB_RELAX_TOKEN_SCOPE=1 in production
 # This would allow tokens without the required scopes to be accepted
 # os.environ["OAUTHLIB_RELAX_TOKEN_SCOPE"] = "1"
 from app.config import settings
-from app.exceptions import GmailQuotaExceededError
+from app.exceptions import GmailHistoryUnavailableError, GmailQuotaExceededError
 from app.models.user import User
+from app.services.gmail_client_cache import gmail_client_cache
+from app.services.gmail_quota import gmail_quota_governor, quota_error_from_http_error
+from app.services.message_parser import message_headers
+from app.services.token_manager import ManagedCredentials
+
+
+@lru_cache(maxsize=1)
+def _gmail_discovery_document() -> dict:
+    """Gmail v1 discovery document bundled with google-api-python-client, parsed once"""
+    return json.loads(discovery_cache.get_static_doc("gmail", "v1"))
+
+
+@dataclass
+class MessageFetchResult:
+    """Outcome of fetching a single message as part of a batch request."""
+
+    message_id: str
+    message: dict | None = None
+    error: Exception | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and self.message is not None
+
+
+class MessagePage(list):
+    """A page of listed message refs, carrying the token that lists the page after it"""
+
+    def __init__(self, refs: list[dict], next_page_token: str | None = None):
+        super().__init__(refs)
+        self.next_page_token = next_page_token
+
+
+def collect_added_messages(history_response: dict, messages: list[dict], seen_ids: set) -> None:
+    """Append the new, searchable messages from a history.list page to messages"""
+    for record in history_response.get("history", []):
+        for added in record.get("messagesAdded", []):
+            message = added.get("message", {})
+            labels = set(message.get("labelIds", []))
+            # Match the default search scope: skip drafts, spam and trash
+            if labels & {"DRAFT", "SPAM", "TRASH"} or message.get("id") in seen_ids:
+                continue
+            seen_ids.add(message["id"])
+            messages.append(message)
 
 
 class GmailService:
+    # Gmail accepts at most 100 calls per batch HTTP request
+    BATCH_SIZE = 100
+
+    # Headers returned by format="metadata" fetches; screening needs nothing else
+    METADATA_HEADERS = ["From", "To", "Subject", "Date"]
+
+    # messages.list allows up to 500 per page; 100 lines each page up with one batch fetch
+    LIST_PAGE_SIZE = 100
+    MAX_LIST_PAGE_SIZE = 500
+
+    # Put in front of sent-mail queries
+    SENT_QUERY_PREFIX = "in:sent "
+
+    # Read calls that hit a rate limit are retried this many times once the block lifts
+    QUOTA_RETRIES = 2
+
     SCOPES = [
         "openid",
         "https://www.googleapis.com/auth/userinfo.email",
@@ -63,24 +129,46 @@ class GmailService:
             "client_id": credentials.client_id,
             "client_secret": credentials.client_secret,
             "scopes": credentials.scopes,
+            "expiry": credentials.expiry,
         }
 
     def get_credentials(self, user: User) -> Credentials:
-        """Get Google credentials from user's encrypted tokens"""
+        """
+        Get Google credentials from user's encrypted tokens
+
+        When the access token expires (or is rejected), the credentials refresh through
+        the token manager, which stores the new token so other calls and workers reuse it.
+        """
         access_token = user.get_access_token()
         refresh_token = user.get_refresh_token()
 
-        credentials = Credentials(
+        credentials = ManagedCredentials(
             token=access_token,
             refresh_token=refresh_token,
             token_uri=self.client_config["web"]["token_uri"],
             client_id=self.client_config["web"]["client_id"],
             client_secret=self.client_config["web"]["client_secret"],
             scopes=self.SCOPES,
+            expiry=user.access_token_expires_at,
+            user_id=str(user.id),
         )
 
         return credentials
 
+    def get_gmail_client(self, user: User):
+        """
+        Get a Gmail API client for a user
+
+        Clients are cached per user and token fingerprint, so repeated calls skip token
+        decryption and discovery document parsing.
+        """
+        client = gmail_client_cache.get(user)
+        if client is None:
+            credentials = self.get_credentials(user)
+            client = build_from_document(_gmail_discovery_document(), credentials=credentials)
+            gmail_client_cache.put(user, client)
+        return client
+
     def get_user_info(self, credentials: Credentials) -> dict[str, str]:
         """Get user info from Google"""
         from googleapiclient.discovery import build
@@ -91,33 +179,143 @@ class GmailService:
 
     def list_messages(self, user: User, query: str = "", max_results: int = 100) -> list[dict]:
         """List Gmail messages for a user"""
-        credentials = self.get_credentials(user)
-        service = build("gmail", "v1", credentials=credentials)
+        return [ref for page in self.iter_message_pages(user, query, max_results) for ref in page]
+
+    def iter_message_pages(
+        self,
+        user: User,
+        query: str = "",
+        max_results: int = 100,
+        page_size: int | None = None,
+        page_token: str | None = None,
+    ) -> Iterator[MessagePage]:
+        """
+        Stream Gmail message refs page by page, following nextPageToken
 
-        results = (
-            service.users().messages().list(userId="me", q=query, maxResults=max_results).execute()
-        )
+        Each page is yielded as soon as it is listed, so callers can process it before
+        the next page is requested.
 
-        return results.get("messages", [])
+        Args:
+            user: User object
+            query: Gmail search query
+            max_results: Total number of message refs to yield across all pages
+            page_size: Refs requested per page (defaults to LIST_PAGE_SIZE, capped at 500)
+            page_token: Token of a page yielded by an earlier listing of the same query,
+                to resume that listing
+
+        Yields:
+            MessagePages of message refs (id, threadId); next_page_token resumes the
+            listing after the page
+        """
+        service = self.get_gmail_client(user)
+        page_size = min(page_size or self.LIST_PAGE_SIZE, self.MAX_LIST_PAGE_SIZE)
+        remaining = max_results
+
+        while remaining > 0:
+            params = {"userId": "me", "q": query, "maxResults": min(page_size, remaining)}
+            if page_token:
+                params["pageToken"] = page_token
+
+            results = self._execute(
+                user, "messages.list", service.users().messages().list(**params)
+            )
+
+            page_token = results.get("nextPageToken")
+            page = results.get("messages", [])[:remaining]
+            if page:
+                remaining -= len(page)
+                yield MessagePage(page, page_token)
+
+            if not page_token:
+                break
 
     def get_message(self, user: User, message_id: str) -> dict:
         """Get a specific Gmail message"""
-        credentials = self.get_credentials(user)
-        service = build("gmail", "v1", credentials=credentials)
+        service = self.get_gmail_client(user)
 
-        message = (
-            service.users().messages().get(userId="me", id=message_id, format="full").execute()
+        return self._execute(
+            user,
+            "messages.get",
+            service.users().messages().get(userId="me", id=message_id, format="full"),
         )
 
-        return message
+    def get_history_id(self, user: User) -> str:
+        """Get the mailbox's current historyId, used as the starting point for incremental sync"""
+        service = self.get_gmail_client(user)
+        profile = self._execute(user, "getProfile", service.users().getProfile(userId="me"))
+        return str(profile["historyId"])
+
+    def list_history(
+        self,
+        user: User,
+        start_history_id: str,
+        max_messages: int = 500,
+        label_id: str | None = None,
+    ) -> tuple[list[dict], str]:
+        """
+        List messages added to the mailbox since a historyId
+
+        Args:
+            user: User object
+            start_history_id: historyId recorded by the previous sync
+            max_messages: Upper bound on added messages; more than this means the cursor
+                is too far behind and a full scan is cheaper
+            label_id: Optional label to restrict history to (e.g. "INBOX")
+
+        Returns:
+            Tuple of (added message refs with id/threadId/labelIds, latest historyId)
+
+        Raises:
+            GmailHistoryUnavailableError: If the cursor expired or too much changed since it
+        """
+        service = self.get_gmail_client(user)
+
+        messages = []
+        seen_ids = set()
+        latest_history_id = str(start_history_id)
+        page_token = None
+
+        while True:
+            params = {
+                "userId": "me",
+                "startHistoryId": start_history_id,
+                "historyTypes": ["messageAdded"],
+                "maxResults": 500,
+            }
+            if label_id:
+                params["labelId"] = label_id
+            if page_token:
+                params["pageToken"] = page_token
+
+            try:
+                response = self._execute(
+                    user, "history.list", service.users().history().list(**params)
+                )
+            except HttpError as http_error:
+                # Gmail answers 404 once a startHistoryId falls outside its retention window
+                if getattr(http_error.resp, "status", None) == 404:
+                    raise GmailHistoryUnavailableError(
+                        f"History cursor {start_history_id} has expired"
+                    )
+                raise
+
+            collect_added_messages(response, messages, seen_ids)
+
+            if len(messages) > max_messages:
+                raise GmailHistoryUnavailableError(
+                    f"More than {max_messages} messages added since history {start_history_id}"
+                )
+
+            latest_history_id = str(response.get("historyId", latest_history_id))
+            page_token = response.get("nextPageToken")
+            if not page_token:
+                break
+
+        return messages, latest_history_id
 
     def get_message_headers(self, message: dict) -> dict[str, str]:
         """Extract headers from a Gmail message"""
-        headers = {}
-        if "payload" in message and "headers" in message["payload"]:
-            for header in message["payload"]["headers"]:
-                headers[header["name"].lower()] = header["value"]
-        return headers
+        return message_headers(message)
 
     def search_messages(self, user: User, query: str, max_results: int = 50) -> list[dict]:
         """
@@ -131,80 +329,160 @@ class GmailService:
         Returns:
             List of full message objects with content
         """
-        credentials = self.get_credentials(user)
-        service = build("gmail", "v1", credentials=credentials)
-
-        # List message IDs
-        results = (
-            service.users().messages().list(userId="me", q=query, maxResults=max_results).execute()
-        )
-
-        message_ids = results.get("messages", [])
+        service = self.get_gmail_client(user)
 
-        # Fetch full message content
         messages = []
-        for msg in message_ids:
-            try:
-                full_message = (
-                    service.users()
-                    .messages()
-                    .get(userId="me", id=msg["id"], format="full")
-                    .execute()
-                )
-                messages.append(full_message)
-            except Exception:
-                # Skip messages that can't be fetched
-                continue
+        for page in self.iter_message_pages(user, query, max_results):
+            # Fetch full message content, skipping messages that can't be fetched
+            fetched = self._batch_get_messages(
+                service, user, [msg["id"] for msg in page], format="full"
+            )
+            messages.extend(result.message for result in fetched if result.ok)
 
         return messages
 
-    def _extract_body(self, payload: dict) -> str:
+    def get_messages_batch(
+        self, user: User, message_ids: list[str], format: str = "full"
+    ) -> list[MessageFetchResult]:
         """
-        Extract plain text body from Gmail message payload
+        Fetch several Gmail messages using the batch HTTP endpoint
+
+        Up to BATCH_SIZE messages.get calls are grouped into a single HTTP round-trip.
 
         Args:
-            payload: Gmail message payload
+            user: User object
+            message_ids: Gmail message IDs to fetch
+            format: Gmail message format ("full", "metadata", "minimal" or "raw")
 
         Returns:
-            Extracted plain text body
+            One MessageFetchResult per requested ID, in the same order. Failed fetches
+            carry the error instead of raising so one bad message doesn't sink the batch.
+
+        Raises:
+            GmailQuotaExceededError: If the quota budget won't be available in time
         """
-        import base64
+        if not message_ids:
+            return []
 
-        body_text = ""
+        service = self.get_gmail_client(user)
 
-        def parse_parts(parts):
-            nonlocal body_text
-            for part in parts:
-                mime_type = part.get("mimeType", "")
+        return self._batch_get_messages(service, user, message_ids, format=format)
 
-                if mime_type == "text/plain" and "data" in part.get("body", {}):
-                    body_text = base64.urlsafe_b64decode(part["body"]["data"]).decode(
-                        "utf-8", errors="ignore"
-                    )
-                    return  # Use first text/plain part found
+    def _execute(self, user: User, method: str, request, retries: int | None = None):
+        """
+        Execute a Gmail API request within the quota budget
 
-                if "parts" in part:
-                    parse_parts(part["parts"])
+        Waits for the governor to grant the method's quota units first. A rate-limit
+        response blocks the user's budget for its Retry-After period and the request is
+        retried once the block lifts, up to `retries` (default QUOTA_RETRIES) times.
 
-        # Single part message
-        if "body" in payload and "data" in payload["body"]:
-            mime_type = payload.get("mimeType", "")
-            if mime_type == "text/plain":
-                body_text = base64.urlsafe_b64decode(payload["body"]["data"]).decode(
-                    "utf-8", errors="ignore"
+        Raises:
+            GmailQuotaExceededError: If Gmail still rate-limits the request, or the budget
+                won't be available within the governor's max wait
+        """
+        retries = self.QUOTA_RETRIES if retries is None else retries
+        for attempt in range(retries + 1):
+            gmail_quota_governor.acquire(user.id, method)
+            try:
+                return request.execute()
+            except HttpError as http_error:
+                quota_error = quota_error_from_http_error(http_error)
+                if quota_error is None:
+                    raise
+                # Without a shared block to wait on, retrying would only hit the limit again
+                blocked = gmail_quota_governor.penalize(
+                    None if quota_error.project_wide else user.id, quota_error.retry_after
                 )
+                if not blocked:
+                    raise quota_error from http_error
+                if attempt == retries:
+                    raise quota_error from http_error
+
+    def _batch_get_messages(
+        self, service, user: User, message_ids: list[str], format: str = "full"
+    ) -> list[MessageFetchResult]:
+        """Run messages.get for each ID through batch requests on an existing client"""
+        results = [MessageFetchResult(message_id=message_id) for message_id in message_ids]
+
+        def _on_response(request_id, response, exception):
+            result = results[int(request_id)]
+            if exception is not None:
+                result.error = exception
+            else:
+                result.message = response
+
+        get_kwargs = {"format": format}
+        if format == "metadata":
+            get_kwargs["metadataHeaders"] = self.METADATA_HEADERS
+
+        pending = list(range(len(message_ids)))
+        for attempt in range(self.QUOTA_RETRIES + 1):
+            for start in range(0, len(pending), self.BATCH_SIZE):
+                chunk = pending[start : start + self.BATCH_SIZE]
+                # Gmail charges a batch as the sum of the calls inside it
+                gmail_quota_governor.acquire(user.id, "messages.get", calls=len(chunk))
+                batch = service.new_batch_http_request(callback=_on_response)
+                for index in chunk:
+                    results[index].error = None
+                    batch.add(
+                        service.users()
+                        .messages()
+                        .get(userId="me", id=message_ids[index], **get_kwargs),
+                        request_id=str(index),
+                    )
 
-        # Multi-part message
-        if "parts" in payload:
-            parse_parts(payload["parts"])
+                try:
+                    batch.execute()
+                except Exception as e:
+                    # The whole batch request failed - attribute the error to every item in it
+                    for index in chunk:
+                        if results[index].message is None and results[index].error is None:
+                            results[index].error = e
+
+            # Retry the items Gmail rate-limited, once the user's block has lifted
+            quota_errors = {
+                index: quota_error_from_http_error(results[index].error)
+                for index in pending
+                if isinstance(results[index].error, HttpError)
+            }
+            pending = [index for index, error in quota_errors.items() if error is not None]
+            if not pending or attempt == self.QUOTA_RETRIES:
+                break
+            retry_after = max(quota_errors[index].retry_after or 0 for index in pending)
+            project_wide = any(quota_errors[index].project_wide for index in pending)
+            if not gmail_quota_governor.penalize(
+                None if project_wide else user.id, retry_after or None
+            ):
+                break
+
+        for result in results:
+            if result.message is None and result.error is None:
+                result.error = Exception(f"No response returned for message {result.message_id}")
 
-        return body_text
+        return results
 
     def has_send_permission(self, user: User) -> bool:
         """Check if user has granted gmail.send scope"""
         credentials = self.get_credentials(user)
         return "https://www.googleapis.com/auth/gmail.send" in (credentials.scopes or [])
 
+    @staticmethod
+    def encode_message(
+        from_email: str, to_email: str, subject: str, body: str, reply_to: str | None = None
+    ) -> str:
+        """Build a plain text MIME message, base64url-encoded for messages.send"""
+        import base64
+        from email.mime.text import MIMEText
+
+        message = MIMEText(body, "plain")
+        message["To"] = to_email
+        message["From"] = from_email
+        message["Subject"] = subject
+        if reply_to:
+            message["Reply-To"] = reply_to
+
+        return base64.urlsafe_b64encode(message.as_bytes()).decode()
+
     def send_email(
         self, user: User, to_email: str, subject: str, body: str, reply_to: str | None = None
     ) -> dict[str, str]:
@@ -229,28 +507,17 @@ class GmailService:
         if not self.has_send_permission(user):
             raise PermissionError("User has not granted gmail.send permission")
 
-        # Build credentials
-        credentials = self.get_credentials(user)
-        service = build("gmail", "v1", credentials=credentials)
-
-        # Create MIME message
-        import base64
-        from email.mime.text import MIMEText
-
-        message = MIMEText(body, "plain")
-        message["To"] = to_email
-        message["From"] = user.email
-        message["Subject"] = subject
-        if reply_to:
-            message["Reply-To"] = reply_to
+        service = self.get_gmail_client(user)
 
-        # Encode message
-        raw_message = base64.urlsafe_b64encode(message.as_bytes()).decode()
+        raw_message = self.encode_message(user.email, to_email, subject, body, reply_to)
 
-        # Send via API
+        # Send via API; rate-limited sends are not retried here, the caller reschedules them
         try:
-            sent_message = (
-                service.users().messages().send(userId="me", body={"raw": raw_message}).execute()
+            sent_message = self._execute(
+                user,
+                "messages.send",
+                service.users().messages().send(userId="me", body={"raw": raw_message}),
+                retries=0,
             )
 
             return {
@@ -258,46 +525,9 @@ class GmailService:
                 "thread_id": sent_message.get("threadId"),
                 "label_ids": sent_message.get("labelIds", []),
             }
+        except GmailQuotaExceededError:
+            raise
         except HttpError as http_error:
-            status = getattr(http_error.resp, "status", None)
-            retry_after_header = None
-            if hasattr(http_error, "resp") and getattr(http_error.resp, "headers", None):
-                retry_after_header = http_error.resp.headers.get("Retry-After")
-
-            rate_limit_reasons = {"rateLimitExceeded", "userRateLimitExceeded", "quotaExceeded"}
-            reasons = []
-            if getattr(http_error, "error_details", None):
-                for detail in http_error.error_details:
-                    reason = detail.get("reason")
-                    if reason:
-                        reasons.append(reason)
-
-            if not reasons:
-                try:
-                    reasons.append(http_error._get_reason())
-                except Exception:
-                    pass
-
-            # Determine if the error is due to Gmail quota/rate limit
-            if status in (403, 429) and any(
-                reason
-                for reason in reasons
-                if reason and any(r in reason for r in rate_limit_reasons)
-            ):
-                retry_after = None
-                if retry_after_header:
-                    try:
-                        retry_after = int(retry_after_header)
-                    except ValueError:
-                        retry_after = None
-
-                message = (
-                    http_error._get_reason()
-                    if hasattr(http_error, "_get_reason")
-                    else "Gmail quota exceeded"
-                )
-                raise GmailQuotaExceededError(message=message, retry_after=retry_after)
-
             raise Exception(f"Failed to send email: {http_error}")
         except Exception as e:
             # Handle other failures
@@ -315,38 +545,41 @@ class GmailService:
         Returns:
             List of message metadata (id, threadId)
         """
-        credentials = self.get_credentials(user)
-        service = build("gmail", "v1", credentials=credentials)
-
+        return [
+            ref for page in self.iter_sent_message_pages(user, query, max_results) for ref in page
+        ]
+
+    def iter_sent_message_pages(
+        self, user: User, query: str = "", max_results: int = 100
+    ) -> Iterator[list[dict]]:
+        """Stream sent message refs page by page (query is combined with 'in:sent')"""
         # Always search in sent folder
-        full_query = f"in:sent {query}".strip()
-
-        results = (
-            service.users()
-            .messages()
-            .list(userId="me", q=full_query, maxResults=max_results)
-            .execute()
-        )
+        full_query = f"{self.SENT_QUERY_PREFIX}{query}".strip()
+        return self.iter_message_pages(user, full_query, max_results)
 
-        return results.get("messages", [])
-
-    def get_thread_messages(self, user: User, thread_id: str) -> list[dict]:
+    def get_thread_messages(self, user: User, thread_id: str, format: str = "full") -> list[dict]:
         """
         Get all messages in a Gmail thread
 
         Args:
             user: User object
             thread_id: Gmail thread ID
+            format: "full", or "metadata" for METADATA_HEADERS plus snippets only
 
         Returns:
-            List of full message objects in the thread
+            List of message objects in the thread
         """
-        credentials = self.get_credentials(user)
-        service = build("gmail", "v1", credentials=credentials)
+        service = self.get_gmail_client(user)
+
+        get_kwargs = {"format": format}
+        if format == "metadata":
+            get_kwargs["metadataHeaders"] = self.METADATA_HEADERS
 
         try:
-            thread = (
-                service.users().threads().get(userId="me", id=thread_id, format="full").execute()
+            thread = self._execute(
+                user,
+                "threads.get",
+                service.users().threads().get(userId="me", id=thread_id, **get_kwargs),
             )
             return thread.get("messages", [])
         except Exception:
@@ -0,0 +1,128 @@
+"""
+Key Rotation
+Re-encrypts stored user secrets with the current encryption key, a batch at a time
+"""
+
+import logging
+from dataclasses import dataclass
+from uuid import UUID
+
+from cryptography.fernet import InvalidToken
+from sqlalchemy import bindparam, update
+from sqlalchemy.orm import Session
+
+from app.models.user import User
+from app.utils.encryption import needs_rotation, rotate_token
+
+logger = logging.getLogger(__name__)
+
+# User columns holding Fernet-encrypted secrets
+ENCRYPTED_COLUMNS = (
+    "encrypted_access_token",
+    "encrypted_refresh_token",
+    "encrypted_gemini_api_key",
+)
+
+
+@dataclass
+class KeyRotationResult:
+    """Progress of a re-encryption run"""
+
+    users_scanned: int = 0
+    values_rotated: int = 0
+    values_unreadable: int = 0
+    last_user_id: UUID | None = None  # Resume after this user
+    completed: bool = False
+
+
+class KeyRotationService:
+    """
+    Re-encrypts every stored token and Gemini API key with the current encryption key
+
+    Users are walked in ID order in batches, each updated and committed in its own short
+    transaction, so rotating a large table never holds locks for long. result.last_user_id
+    is where a failed run resumes (reencrypt(after_id=...)). Values already under the
+    current key are skipped, so re-running is cheap.
+    """
+
+    BATCH_SIZE = 500
+
+    def __init__(self, db: Session):
+        self.db = db
+        self.result = KeyRotationResult()
+
+    def reencrypt(self, after_id: UUID | str | None = None, batch_size: int | None = None):
+        """
+        Re-encrypt secrets of users after after_id (all users if None)
+
+        Returns:
+            KeyRotationResult with counts and the last user processed
+        """
+        batch_size = batch_size or self.BATCH_SIZE
+        if isinstance(after_id, str):
+            after_id = UUID(after_id)
+        self.result = KeyRotationResult(last_user_id=after_id)
+
+        while True:
+            query = self.db.query(User.id, *(getattr(User, c) for c in ENCRYPTED_COLUMNS))
+            if self.result.last_user_id is not None:
+                query = query.filter(User.id > self.result.last_user_id)
+            query = query.order_by(User.id).limit(batch_size)
+
+            # Stream the batch, collecting per-column changes
+            changes = {column: [] for column in ENCRYPTED_COLUMNS}
+            scanned = 0
+            batch_last_id = None
+            for row in query.yield_per(batch_size):
+                scanned += 1
+                batch_last_id = row.id
+                for column in ENCRYPTED_COLUMNS:
+                    change = self._rotated(row.id, column, getattr(row, column))
+                    if change:
+                        changes[column].append(change)
+            if not scanned:
+                break
+
+            self._apply(changes)
+            self.db.commit()
+            self.result.users_scanned += scanned
+            self.result.last_user_id = batch_last_id
+            logger.info(
+                f"Key rotation: {self.result.users_scanned} users scanned, "
+                f"{self.result.values_rotated} values re-encrypted"
+            )
+            if scanned < batch_size:
+                break
+
+        self.result.completed = True
+        return self.result
+
+    def _rotated(self, user_id: UUID, column: str, value: str | None) -> dict | None:
+        """The update re-encrypting one value, or None if it's current (or unreadable)"""
+        if not value or not needs_rotation(value):
+            return None
+        try:
+            rotated = rotate_token(value)
+        except InvalidToken:
+            # Encrypted with a key no longer configured; the user has to re-authenticate
+            # (or re-enter the Gemini key)
+            logger.warning(f"Key rotation: unreadable {column} for user {user_id}")
+            self.result.values_unreadable += 1
+            return None
+        return {"user_id": user_id, "old_value": value, "new_value": rotated}
+
+    def _apply(self, changes: dict[str, list[dict]]) -> None:
+        """Write the batch's re-encrypted values, one executemany per column"""
+        table = User.__table__
+        for column, column_changes in changes.items():
+            if not column_changes:
+                continue
+            # Only replace the value that was read; a concurrent sign-in's new token wins
+            stmt = (
+                update(table)
+                .where(table.c.id == bindparam("user_id"))
+                .where(table.c[column] == bindparam("old_value"))
+                .values({column: bindparam("new_value"), "updated_at": table.c.updated_at})
+            )
+            self.db.connection().execute(stmt, column_changes)
+            self.result.values_rotated += len(column_changes)
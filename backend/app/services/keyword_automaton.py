@@ -0,0 +1,131 @@
+"""
+Keyword Automaton
+Aho-Corasick matcher that finds every keyword of several categories in one pass
+"""
+
+from collections import deque
+from collections.abc import Hashable, Iterable
+from dataclasses import dataclass
+from functools import lru_cache
+
+
+@dataclass(frozen=True)
+class KeywordHit:
+    """One keyword occurrence in a scanned text"""
+
+    category: Hashable
+    keyword_index: int  # Position of the keyword in its category's list
+    start: int
+    end: int
+
+
+class KeywordScan:
+    """All keyword occurrences found in one text, grouped by category"""
+
+    def __init__(self, hits: list[KeywordHit]):
+        self._by_category: dict[Hashable, list[KeywordHit]] = {}
+        for hit in hits:
+            self._by_category.setdefault(hit.category, []).append(hit)
+
+    def hits(self, category: Hashable) -> list[KeywordHit]:
+        """Every occurrence for a category, overlapping ones included"""
+        return self._by_category.get(category, [])
+
+    def positions(self, category: Hashable) -> list[tuple[int, int]]:
+        """(start, end) spans counted by count(), in text order"""
+        spans = []
+        # At each start regex alternation picks the first listed keyword, not the longest
+        first_at_start: dict[int, KeywordHit] = {}
+        for hit in self.hits(category):
+            current = first_at_start.get(hit.start)
+            if current is None or hit.keyword_index < current.keyword_index:
+                first_at_start[hit.start] = hit
+
+        position = 0
+        for start in sorted(first_at_start):
+            if start < position:
+                continue
+            hit = first_at_start[start]
+            spans.append((hit.start, hit.end))
+            position = hit.end
+        return spans
+
+    def count(self, category: Hashable) -> int:
+        """Non-overlapping match count, identical to re.findall over an alternation"""
+        return len(self.positions(category))
+
+    def matched_keywords(self, category: Hashable) -> set[int]:
+        """Indexes of the category's keywords that occur anywhere in the text"""
+        return {hit.keyword_index for hit in self.hits(category)}
+
+    def has_match(self, category: Hashable, end: int | None = None) -> bool:
+        """Whether any keyword of the category occurs (optionally ending by `end`)"""
+        return any(end is None or hit.end <= end for hit in self.hits(category))
+
+
+class KeywordAutomaton:
+    """
+    Aho-Corasick automaton over groups of literal keywords.
+
+    The goto/failure functions are flattened into a deterministic transition table, so
+    scanning costs one dict lookup per character regardless of how many keywords
+    there are. Matching is exact and case-sensitive; callers normalize text first.
+    """
+
+    def __init__(self, groups: Iterable[tuple[Hashable, Iterable[str]]]):
+        transitions: list[dict[str, int]] = [{}]
+        outputs: list[list[tuple[Hashable, int, int]]] = [[]]
+
+        for category, keywords in groups:
+            for keyword_index, keyword in enumerate(keywords):
+                if not keyword:
+                    continue
+                state = 0
+                for char in keyword:
+                    next_state = transitions[state].get(char)
+                    if next_state is None:
+                        next_state = len(transitions)
+                        transitions[state][char] = next_state
+                        transitions.append({})
+                        outputs.append([])
+                    state = next_state
+                outputs[state].append((category, keyword_index, len(keyword)))
+
+        # Breadth-first pass: compute failure links and fill in missing transitions
+        alphabet = {char for state in transitions for char in state}
+        failure = [0] * len(transitions)
+        queue = deque(transitions[0].values())
+        while queue:
+            state = queue.popleft()
+            fail_state = failure[state]
+            outputs[state].extend(outputs[fail_state])
+            for char, next_state in list(transitions[state].items()):
+                failure[next_state] = transitions[fail_state].get(char, 0)
+                queue.append(next_state)
+            for char in alphabet - transitions[state].keys():
+                target = transitions[fail_state].get(char, 0)
+                if target:
+                    transitions[state][char] = target
+
+        self._transitions = transitions
+        self._outputs = [tuple(output) for output in outputs]
+
+    def scan(self, text: str) -> KeywordScan:
+        """Find every keyword occurrence in text in a single pass"""
+        transitions = self._transitions
+        outputs = self._outputs
+        hits = []
+        state = 0
+        for position, char in enumerate(text):
+            state = transitions[state].get(char, 0)
+            if outputs[state]:
+                end = position + 1
+                for category, keyword_index, length in outputs[state]:
+                    hits.append(KeywordHit(category, keyword_index, end - length, end))
+        return KeywordScan(hits)
+
+
+@lru_cache(maxsize=32)
+def get_keyword_automaton(groups: tuple[tuple[Hashable, tuple[str, ...]], ...]) -> KeywordAutomaton:
+    """Build (once per distinct keyword set) the automaton shared by detector instances"""
+    return KeywordAutomaton(groups)
@@ -0,0 +1,149 @@
+"""
+Message Parser
+Single-pass extraction of headers and body text from Gmail API messages
+"""
+
+import base64
+import binascii
+import re
+from dataclasses import dataclass, field
+from functools import cached_property
+from html import unescape
+
+import lxml.html
+from lxml.etree import ParserError
+
+PREVIEW_LENGTH = 200
+
+_UTF8_HTML_PARSER = lxml.html.HTMLParser(encoding="utf-8")
+
+
+def decode_part_data(data: str) -> str:
+    """Decode a base64url body part, tolerating missing padding and bad input"""
+    try:
+        return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4)).decode(
+            "utf-8", errors="ignore"
+        )
+    except (binascii.Error, ValueError):
+        return ""
+
+
+def html_to_text(html: str) -> str:
+    """Convert an HTML body to plain text with lxml (scripts and styles dropped)"""
+    if not html or not html.strip():
+        return ""
+    try:
+        document = lxml.html.fromstring(html)
+    except ValueError:
+        # lxml refuses str input that carries an XML encoding declaration
+        document = lxml.html.fromstring(html.encode("utf-8"), parser=_UTF8_HTML_PARSER)
+    except ParserError:
+        return ""
+    for element in document.iter("script", "style"):
+        element.drop_tree()
+    return document.text_content()
+
+
+def build_preview(text: str, max_length: int = PREVIEW_LENGTH) -> str:
+    """Whitespace-collapsed preview of text, with '...' appended when truncated"""
+    preview = re.sub(r"\s+", " ", (text or "")[:max_length]).strip()
+    if len(preview) == max_length:
+        preview += "..."
+    return preview
+
+
+def message_headers(message: dict) -> dict[str, str]:
+    """Headers of a Gmail message keyed by lowercased name"""
+    return {
+        header["name"].lower(): header["value"]
+        for header in message.get("payload", {}).get("headers", [])
+    }
+
+
+@dataclass
+class ParsedMessage:
+    """
+    Headers and body of a Gmail message, decoded once.
+
+    plain_text and body_html hold the first text/plain and text/html parts. Derived
+    text (HTML converted to text, the preview) is computed on first use and cached, so
+    detection, previews and persistence share a single conversion. Messages fetched
+    with format="metadata" have no body parts, only headers and the snippet.
+    """
+
+    message_id: str | None = None
+    thread_id: str | None = None
+    headers: dict[str, str] = field(default_factory=dict)
+    plain_text: str = ""
+    body_html: str = ""
+    snippet: str = ""
+
+    @property
+    def sender(self) -> str:
+        return self.headers.get("from", "")
+
+    @property
+    def recipient(self) -> str:
+        return self.headers.get("to", "")
+
+    @property
+    def subject(self) -> str:
+        return self.headers.get("subject", "")
+
+    @property
+    def date(self) -> str:
+        return self.headers.get("date", "")
+
+    @cached_property
+    def html_text(self) -> str:
+        """Text content of the HTML part"""
+        return html_to_text(self.body_html)
+
+    @cached_property
+    def body_text(self) -> str:
+        """Plain text body, falling back to the HTML part's text"""
+        return self.plain_text or self.html_text
+
+    @cached_property
+    def preview(self) -> str:
+        return build_preview(self.body_text or self.snippet)
+
+
+def parse_payload(payload: dict) -> tuple[str, str]:
+    """
+    Find the first text/plain and text/html bodies in a (possibly nested) payload
+
+    Returns:
+        (plain_text, html), empty strings for missing parts
+    """
+    plain_text = None
+    html = None
+
+    # Depth-first, in part order; only the parts that are used get decoded
+    stack = [payload]
+    while stack and (plain_text is None or html is None):
+        part = stack.pop()
+        data = part.get("body", {}).get("data")
+        if data:
+            mime_type = part.get("mimeType", "")
+            if mime_type == "text/plain" and plain_text is None:
+                plain_text = decode_part_data(data)
+            elif mime_type == "text/html" and html is None:
+                html = decode_part_data(data)
+        stack.extend(reversed(part.get("parts", [])))
+
+    return plain_text or "", html or ""
+
+
+def parse_message(message: dict) -> ParsedMessage:
+    """Parse a Gmail API message (full or metadata format) into a ParsedMessage"""
+    plain_text, body_html = parse_payload(message.get("payload", {}))
+    return ParsedMessage(
+        message_id=message.get("id"),
+        thread_id=message.get("threadId"),
+        headers=message_headers(message),
+        plain_text=plain_text,
+        body_html=body_html,
+        # Gmail returns the snippet HTML-escaped
+        snippet=unescape(message.get("snippet", "")),
+    )
@@ -0,0 +1,69 @@
+"""
+Request Snapshot
+The stored rows of the deletion requests a flush is about to change, read once per flush
+"""
+
+from uuid import UUID
+
+from sqlalchemy import event, select
+from sqlalchemy.engine import Row
+from sqlalchemy.orm import Session
+
+from app.models.deletion_request import DeletionRequest
+
+# Key in Session.info holding (flush context, rows) for the flush in progress
+_SNAPSHOT_KEY = "request_snapshot"
+
+
+def _flushed_ids(session: Session) -> list[UUID]:
+    """Ids of the stored requests this flush updates or deletes"""
+    changed = [
+        obj
+        for obj in session.dirty
+        if isinstance(obj, DeletionRequest) and session.is_modified(obj, include_collections=False)
+    ]
+    removed = [obj for obj in session.deleted if isinstance(obj, DeletionRequest)]
+    return sorted(obj.id for obj in changed + removed)
+
+
+def stored_requests(session: Session, flush_context) -> dict[UUID, Row]:
+    """
+    The rows, as stored, of the requests this flush updates or deletes
+
+    Read with SELECT ... FOR UPDATE the first time a before_flush listener asks, and
+    shared by the rest, so every listener sees the same old state and a concurrent
+    change to the same request waits for this transaction instead of being overwritten
+    after it was read.
+
+    Args:
+        session: The flushing session
+        flush_context: The flush_context passed to the before_flush listener
+
+    Returns:
+        id -> row with user_id, status, sent_at and confirmed_at
+    """
+    snapshot = session.info.get(_SNAPSHOT_KEY)
+    if snapshot is not None and snapshot[0] is flush_context:
+        return snapshot[1]
+
+    rows = {}
+    ids = _flushed_ids(session)
+    if ids:
+        table = DeletionRequest.__table__
+        result = session.connection().execute(
+            select(
+                table.c.id, table.c.user_id, table.c.status, table.c.sent_at, table.c.confirmed_at
+            )
+            .where(table.c.id.in_(ids))
+            .order_by(table.c.id)
+            .with_for_update()
+        )
+        rows = {row.id: row for row in result}
+    session.info[_SNAPSHOT_KEY] = (flush_context, rows)
+    return rows
+
+
+@event.listens_for(Session, "after_flush")
+def _drop_snapshot(session: Session, flush_context) -> None:
+    """The flush has written the new states; the snapshot is stale"""
+    session.info.pop(_SNAPSHOT_KEY, None)
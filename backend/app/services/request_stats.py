@@ -0,0 +1,189 @@
+"""
+Request Stats
+Keeps user_request_stats in step with deletion_requests, and rebuilds it
+"""
+
+import logging
+from collections import defaultdict
+from datetime import datetime
+from uuid import UUID
+
+from sqlalchemy import and_, case, delete, event, func, inspect, literal, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.models.deletion_request import DeletionRequest, RequestStatus
+from app.models.user_request_stats import UserRequestStats
+from app.services.request_snapshot import stored_requests
+
+logger = logging.getLogger(__name__)
+
+SECONDS_PER_DAY = 86400
+
+# Per-status counter column
+STATUS_COLUMNS = {
+    RequestStatus.PENDING: "pending_count",
+    RequestStatus.SENT: "sent_count",
+    RequestStatus.ACTION_REQUIRED: "action_required_count",
+    RequestStatus.CONFIRMED: "confirmed_count",
+    RequestStatus.REJECTED: "rejected_count",
+}
+
+COUNTER_COLUMNS = (
+    "total_requests",
+    *STATUS_COLUMNS.values(),
+    "response_count",
+    "response_seconds_sum",
+)
+
+# Request attributes the stats depend on
+TRACKED_ATTRIBUTES = ("user_id", "status", "sent_at", "confirmed_at")
+
+
+def _insert(db: Session):
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert
+    if dialect == "sqlite":
+        return sqlite.insert
+    raise NotImplementedError(f"Request stats do not support {dialect}")
+
+
+def response_seconds(dialect: str):
+    """Seconds from sending to confirmation; NULL unless the request was confirmed"""
+    if dialect == "postgresql":
+        seconds = func.extract("epoch", DeletionRequest.confirmed_at - DeletionRequest.sent_at)
+    else:
+        seconds = (
+            func.julianday(DeletionRequest.confirmed_at) - func.julianday(DeletionRequest.sent_at)
+        ) * SECONDS_PER_DAY
+    confirmed = and_(
+        DeletionRequest.status == RequestStatus.CONFIRMED,
+        DeletionRequest.sent_at.isnot(None),
+        DeletionRequest.confirmed_at.isnot(None),
+    )
+    return case((confirmed, seconds), else_=None)
+
+
+def _contribution(
+    status: RequestStatus | None, sent_at: datetime | None, confirmed_at: datetime | None
+) -> dict[str, float]:
+    """What one request in this state adds to its user's counters"""
+    status = RequestStatus(status) if status else RequestStatus.PENDING  # the column default
+    counters = {"total_requests": 1, STATUS_COLUMNS[status]: 1}
+    if status == RequestStatus.CONFIRMED and sent_at and confirmed_at:
+        counters["response_count"] = 1
+        counters["response_seconds_sum"] = (confirmed_at - sent_at).total_seconds()
+    return counters
+
+
+def _changed(request: DeletionRequest) -> bool:
+    state = inspect(request)
+    return any(state.attrs[name].history.has_changes() for name in TRACKED_ATTRIBUTES)
+
+
+@event.listens_for(Session, "before_flush")
+def _update_stats_on_flush(session: Session, flush_context, instances) -> None:
+    """
+    Apply the counter changes of the requests about to be flushed
+
+    Runs inside the flush's transaction, so the stats commit or roll back with the
+    requests. Old states come from the locked snapshot of the database rows, which still
+    hold them until this flush writes the new ones; a concurrent change to the same
+    request waits for this transaction instead of being counted against a state it
+    already replaced.
+    """
+    added = [obj for obj in session.new if isinstance(obj, DeletionRequest)]
+    changed = [obj for obj in session.dirty if isinstance(obj, DeletionRequest) and _changed(obj)]
+    removed = [obj for obj in session.deleted if isinstance(obj, DeletionRequest)]
+    if not (added or changed or removed):
+        return
+
+    deltas: dict[UUID, dict[str, float]] = defaultdict(lambda: defaultdict(float))
+
+    def apply(user_id: UUID, counters: dict[str, float], sign: int) -> None:
+        for column, value in counters.items():
+            deltas[user_id][column] += sign * value
+
+    previous = stored_requests(session, flush_context)
+    for obj in changed + removed:
+        row = previous.get(obj.id)
+        if row is not None:
+            apply(row.user_id, _contribution(row.status, row.sent_at, row.confirmed_at), -1)
+
+    for obj in added + changed:
+        apply(obj.user_id, _contribution(obj.status, obj.sent_at, obj.confirmed_at), 1)
+
+    for user_id, counters in deltas.items():
+        counters = {column: value for column, value in counters.items() if value}
+        if counters:
+            _increment(session, user_id, counters)
+
+
+def _increment(db: Session, user_id: UUID, counters: dict[str, float]) -> None:
+    """Add to a user's counters, creating their row if needed"""
+    table = UserRequestStats.__table__
+    now = datetime.utcnow()
+    stmt = _insert(db)(table).values(user_id=user_id, updated_at=now, **counters)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.user_id],
+        set_={
+            **{column: table.c[column] + stmt.excluded[column] for column in counters},
+            "updated_at": now,
+        },
+    )
+    db.connection().execute(stmt)
+
+
+class RequestStatsService:
+    """Reads and rebuilds the per-user deletion request totals"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get_stats(self, user_id: UUID | str) -> UserRequestStats | None:
+        """A user's totals (None if they've never had a request)"""
+        user_uuid = UUID(user_id) if isinstance(user_id, str) else user_id
+        # The row is updated with Core statements; don't trust a copy already loaded
+        return self.db.get(UserRequestStats, user_uuid, populate_existing=True)
+
+    def rebuild(self, user_id: UUID | str | None = None) -> int:
+        """
+        Recompute totals from deletion_requests, for one user or everyone
+
+        Replaces the rows in one transaction with a single INSERT ... SELECT ... GROUP BY.
+
+        Returns:
+            Number of users with stats
+        """
+        user_uuid = UUID(user_id) if isinstance(user_id, str) else user_id
+        seconds = response_seconds(self.db.get_bind().dialect.name)
+
+        def count_of(status: RequestStatus):
+            return func.sum(case((DeletionRequest.status == status, 1), else_=0))
+
+        totals = select(
+            DeletionRequest.user_id,
+            func.count(DeletionRequest.id),
+            *(count_of(status) for status in STATUS_COLUMNS),
+            func.count(seconds),
+            func.coalesce(func.sum(seconds), 0.0),
+            literal(datetime.utcnow(), UserRequestStats.updated_at.type),
+        ).group_by(DeletionRequest.user_id)
+
+        clear = delete(UserRequestStats)
+        if user_uuid:
+            totals = totals.where(DeletionRequest.user_id == user_uuid)
+            clear = clear.where(UserRequestStats.user_id == user_uuid)
+
+        self.db.flush()
+        self.db.execute(clear)
+        written = self.db.execute(
+            UserRequestStats.__table__.insert().from_select(
+                ["user_id", *COUNTER_COLUMNS, "updated_at"], totals
+            )
+        ).rowcount
+        self.db.commit()
+
+        logger.info(f"Rebuilt request stats for {written} users")
+        return written
@@ -0,0 +1,277 @@
+"""
+Request Status Projection
+Folds request_status_events into the tables the timeline and compliance analytics read
+"""
+
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.models.deletion_request import DeletionRequest, RequestStatus
+from app.models.event_gap import EventGap
+from app.models.event_watermark import EventWatermark
+from app.models.request_response_time import RequestResponseTime
+from app.models.request_status_daily import RequestStatusDaily
+from app.models.request_status_event import RequestStatusEvent
+
+logger = logging.getLogger(__name__)
+
+WATERMARK_NAME = "request_status"
+
+# Events consumed per statement batch
+BATCH_SIZE = 1000
+
+# How long to keep looking for a skipped event id. Ids are taken when the event is
+# inserted but become visible at commit, so a later id can show up first; a gap still
+# open after this long belongs to a transaction that rolled back.
+GAP_RETENTION_SECONDS = 86400
+
+
+def _insert(db: Session):
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert
+    if dialect == "sqlite":
+        return sqlite.insert
+    raise NotImplementedError(f"Request status projection does not support {dialect}")
+
+
+class RequestStatusProjection:
+    """
+    Keeps request_status_daily and request_response_times current from the event log
+
+    Each catch_up() reads only the events after the stored watermark and adds them to
+    the projected counts, so analytics never rescan the requests or the whole log.
+    Ids the watermark passes without seeing are kept in event_gaps and re-read on
+    every run, so an event committed after a later one is still applied.
+    """
+
+    def __init__(self, db: Session, batch_size: int = BATCH_SIZE):
+        self.db = db
+        self.batch_size = batch_size
+
+    def catch_up(self) -> int:
+        """
+        Apply the events committed since the last call, and commit
+
+        Runs are serialized by a row lock on the watermark; if another run holds it,
+        this returns straight away and readers see the projection as it stands.
+
+        Returns:
+            Number of events applied
+        """
+        self.db.flush()
+        watermark = self._lock_watermark()
+        if watermark is None:
+            self.db.commit()
+            return 0
+
+        table = RequestStatusEvent.__table__
+        applied = self._fill_gaps()
+        while True:
+            events = self.db.execute(
+                select(table)
+                .where(table.c.id > watermark.last_event_id)
+                .order_by(table.c.id)
+                .limit(self.batch_size)
+            ).all()
+            if events:
+                self._note_gaps(events, watermark.last_event_id)
+                self._apply(events)
+                watermark.last_event_id = events[-1].id
+                watermark.updated_at = datetime.utcnow()
+                applied += len(events)
+            if len(events) < self.batch_size:
+                break
+
+        self._expire_gaps()
+        self.db.commit()
+        if applied:
+            logger.info(f"Projected {applied} request status events")
+        return applied
+
+    def _lock_watermark(self) -> EventWatermark | None:
+        """The watermark row, locked for this transaction (None if another run has it)"""
+        query = (
+            select(EventWatermark)
+            .where(EventWatermark.name == WATERMARK_NAME)
+            .with_for_update(skip_locked=True)
+            .execution_options(populate_existing=True)
+        )
+        watermark = self.db.execute(query).scalar_one_or_none()
+        if watermark is None:
+            self.db.execute(
+                _insert(self.db)(EventWatermark.__table__)
+                .values(name=WATERMARK_NAME, last_event_id=0, updated_at=datetime.utcnow())
+                .on_conflict_do_nothing()
+            )
+            watermark = self.db.execute(query).scalar_one_or_none()
+        return watermark
+
+    def _note_gaps(self, events: list, last_event_id: int) -> None:
+        """Remember the ids missing before and between these events"""
+        now = datetime.utcnow()
+        missing = []
+        expected = last_event_id + 1
+        for event in events:
+            missing += range(expected, event.id)
+            expected = event.id + 1
+        if not missing:
+            return
+
+        logger.info(f"Request status projection skipping {len(missing)} unseen event ids")
+        for start in range(0, len(missing), self.batch_size):
+            rows = [
+                {"watermark_name": WATERMARK_NAME, "event_id": event_id, "noted_at": now}
+                for event_id in missing[start : start + self.batch_size]
+            ]
+            self.db.execute(
+                _insert(self.db)(EventGap.__table__).values(rows).on_conflict_do_nothing()
+            )
+
+    def _fill_gaps(self) -> int:
+        """
+        Apply the skipped events that have been committed since, and forget their ids
+
+        Applying them late is safe: the daily counts are sums, and a request's later
+        events can't have been committed before its earlier ones, because the flush
+        locks the request row (see app.services.request_snapshot).
+        """
+        gap_ids = self.db.scalars(
+            select(EventGap.event_id).where(EventGap.watermark_name == WATERMARK_NAME)
+        ).all()
+        table = RequestStatusEvent.__table__
+        applied = 0
+        for start in range(0, len(gap_ids), self.batch_size):
+            events = self.db.execute(
+                select(table)
+                .where(table.c.id.in_(gap_ids[start : start + self.batch_size]))
+                .order_by(table.c.id)
+            ).all()
+            if not events:
+                continue
+            self._apply(events)
+            self.db.execute(
+                delete(EventGap).where(
+                    EventGap.watermark_name == WATERMARK_NAME,
+                    EventGap.event_id.in_([event.id for event in events]),
+                )
+            )
+            applied += len(events)
+        return applied
+
+    def _expire_gaps(self) -> None:
+        """Stop looking for ids skipped so long ago that their transaction rolled back"""
+        expired = datetime.utcnow() - timedelta(seconds=GAP_RETENTION_SECONDS)
+        self.db.execute(
+            delete(EventGap).where(
+                EventGap.watermark_name == WATERMARK_NAME, EventGap.noted_at < expired
+            )
+        )
+
+    def _apply(self, events: list) -> None:
+        # (user, broker, day, status) -> [entered, exited]
+        daily: dict[tuple, list[int]] = defaultdict(lambda: [0, 0])
+        # Latest confirmation of each request, or None once it has left confirmed
+        confirmations = {}
+        for event in events:
+            day = event.occurred_at.date()
+            daily[(event.user_id, event.broker_id, day, event.to_status)][0] += 1
+            if event.from_status is not None:
+                daily[(event.user_id, event.broker_id, day, event.from_status)][1] += 1
+
+            if event.to_status == RequestStatus.CONFIRMED:
+                confirmations[event.deletion_request_id] = event
+            elif event.from_status == RequestStatus.CONFIRMED:
+                confirmations[event.deletion_request_id] = None
+
+        now = datetime.utcnow()
+        table = RequestStatusDaily.__table__
+        stmt = _insert(self.db)(table).values(
+            [
+                {
+                    "user_id": user_id,
+                    "broker_id": broker_id,
+                    "day": day,
+                    "status": status,
+                    "entered": entered,
+                    "exited": exited,
+                    "updated_at": now,
+                }
+                for (user_id, broker_id, day, status), (entered, exited) in daily.items()
+            ]
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["user_id", "broker_id", "day", "status"],
+            set_={
+                "entered": table.c.entered + stmt.excluded.entered,
+                "exited": table.c.exited + stmt.excluded.exited,
+                "updated_at": now,
+            },
+        )
+        self.db.execute(stmt)
+
+        if confirmations:
+            self._apply_confirmations(confirmations, now)
+
+    def _apply_confirmations(self, confirmations: dict, now: datetime) -> None:
+        """
+        Record the response time of newly confirmed requests, and drop unconfirmed ones
+
+        Times run from sent_at to confirmed_at, like the request stats. A confirmation
+        without confirmed_at (found by a scan, with no date of its own) stays untimed
+        rather than taking its event's time.
+        """
+        confirmed_ids = [request_id for request_id, event in confirmations.items() if event]
+        stored = {}
+        if confirmed_ids:
+            stored = {
+                row.id: row
+                for row in self.db.execute(
+                    select(
+                        DeletionRequest.id, DeletionRequest.sent_at, DeletionRequest.confirmed_at
+                    ).where(DeletionRequest.id.in_(confirmed_ids))
+                )
+            }
+
+        rows = []
+        for request_id in confirmed_ids:
+            event = confirmations[request_id]
+            request = stored.get(request_id)
+            if not (request and request.sent_at and request.confirmed_at):
+                continue
+            seconds = (request.confirmed_at - request.sent_at).total_seconds()
+            if seconds >= 0:
+                rows.append(
+                    {
+                        "deletion_request_id": request_id,
+                        "user_id": event.user_id,
+                        "broker_id": event.broker_id,
+                        "response_seconds": seconds,
+                        "updated_at": now,
+                    }
+                )
+
+        timed = {row["deletion_request_id"] for row in rows}
+        untimed = [request_id for request_id in confirmations if request_id not in timed]
+        if untimed:
+            self.db.execute(
+                delete(RequestResponseTime).where(
+                    RequestResponseTime.deletion_request_id.in_(untimed)
+                )
+            )
+        if rows:
+            table = RequestResponseTime.__table__
+            stmt = _insert(self.db)(table).values(rows)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["deletion_request_id"],
+                set_={
+                    "response_seconds": stmt.excluded.response_seconds,
+                    "updated_at": now,
+                },
+            )
+            self.db.execute(stmt)
@@ -0,0 +1,153 @@
+"""
+Request Transitions
+Changes deletion request statuses and appends them to request_status_events
+"""
+
+import uuid
+from datetime import datetime
+
+from sqlalchemy import event, insert, inspect
+from sqlalchemy.orm import Session
+
+from app.models.deletion_request import DeletionRequest, RequestStatus
+from app.models.request_status_event import RequestStatusEvent
+from app.services.request_snapshot import stored_requests
+
+# Timestamp column stamped when a request reaches each status
+STATUS_TIMESTAMPS = {
+    RequestStatus.SENT: "sent_at",
+    RequestStatus.CONFIRMED: "confirmed_at",
+    RequestStatus.REJECTED: "rejected_at",
+}
+
+# Key in a request's InstanceState.info holding its pending (source, at)
+_TRANSITION_KEY = "status_transition"
+
+
+def transition_request(
+    request: DeletionRequest,
+    status: RequestStatus,
+    *,
+    source: str,
+    at: datetime | None = None,
+    stamp: bool = True,
+) -> bool:
+    """
+    Move a request to a status
+
+    Sets the status and the matching timestamp column (sent_at, confirmed_at or
+    rejected_at). The event is appended when the change is flushed, with the given
+    source and time.
+
+    Args:
+        request: The request, new or loaded
+        status: Status to move to
+        source: What made the change, e.g. 'manual', 'email_sent', 'response_scan'
+        at: When the request reached the status (defaults to now)
+        stamp: Whether to set the timestamp column
+
+    Returns:
+        Whether the status changed
+    """
+    at = at or datetime.utcnow()
+    state = inspect(request)
+    changed = state.transient or state.pending or request.status != status
+    request.status = status
+    if stamp and status in STATUS_TIMESTAMPS:
+        setattr(request, STATUS_TIMESTAMPS[status], at)
+    if changed:
+        state.info[_TRANSITION_KEY] = (source, at)
+    return changed
+
+
+def _reached_at(request: DeletionRequest, status: RequestStatus) -> datetime | None:
+    column = STATUS_TIMESTAMPS.get(status)
+    return getattr(request, column) if column else None
+
+
+def _stamped_now(request: DeletionRequest, status: RequestStatus) -> datetime | None:
+    """The status's timestamp, if it's being set in this flush"""
+    column = STATUS_TIMESTAMPS.get(status)
+    if not column:
+        return None
+    added = inspect(request).attrs[column].history.added
+    return added[0] if added else None
+
+
+def _row(request: DeletionRequest, from_status, to_status, source: str, at: datetime) -> dict:
+    return {
+        "deletion_request_id": request.id,
+        "user_id": request.user_id,
+        "broker_id": request.broker_id,
+        "from_status": from_status,
+        "to_status": to_status,
+        "source": source,
+        "occurred_at": at,
+        "created_at": datetime.utcnow(),
+    }
+
+
+def _creation_events(request: DeletionRequest, source: str | None, at: datetime | None):
+    """
+    Events of a new request
+
+    A request created already past pending (found by a scan, or inserted directly) gets
+    its history from its timestamps: sent at sent_at, then on to its status.
+    """
+    status = RequestStatus(request.status) if request.status else RequestStatus.PENDING
+    source = source or request.source or "manual"
+    now = datetime.utcnow()
+    if status == RequestStatus.PENDING:
+        return [_row(request, None, status, source, at or request.created_at or now)]
+
+    events = []
+    previous = None
+    if request.sent_at and status != RequestStatus.SENT:
+        events.append(_row(request, None, RequestStatus.SENT, source, request.sent_at))
+        previous = RequestStatus.SENT
+    reached = _reached_at(request, status) or at or now
+    events.append(_row(request, previous, status, source, reached))
+    return events
+
+
+@event.listens_for(Session, "before_flush")
+def _record_status_events(session: Session, flush_context, instances) -> None:
+    """
+    Append an event for each request created or changing status in this flush
+
+    Status changes made without transition_request are recorded too (with source
+    'direct'), so the history stays complete. Old statuses come from the same locked
+    snapshot of the stored rows the request stats listener reads.
+    """
+    added = [obj for obj in session.new if isinstance(obj, DeletionRequest)]
+    changed = [
+        obj
+        for obj in session.dirty
+        if isinstance(obj, DeletionRequest) and inspect(obj).attrs.status.history.has_changes()
+    ]
+    if not (added or changed):
+        return
+
+    rows = []
+    for obj in added:
+        # The column default would only be applied by the flush itself
+        if obj.id is None:
+            obj.id = uuid.uuid4()
+        source, at = inspect(obj).info.pop(_TRANSITION_KEY, (None, None))
+        rows += _creation_events(obj, source, at)
+
+    if changed:
+        previous = stored_requests(session, flush_context)
+        for obj in changed:
+            source, at = inspect(obj).info.pop(_TRANSITION_KEY, ("direct", None))
+            row = previous.get(obj.id)
+            old = row.status if row is not None else None
+            status = RequestStatus(obj.status)
+            if old == status:
+                continue
+            if at is None:
+                at = _stamped_now(obj, status) or datetime.utcnow()
+            rows.append(_row(obj, old, status, source, at))
+
+    if rows:
+        session.connection().execute(insert(RequestStatusEvent), rows)
@@ -6,6 +6,7 @@ Classifies broker email responses based on keyword matching
 import re
 
 from app.models.broker_response import ResponseType
+from app.services.keyword_automaton import KeywordScan, get_keyword_automaton
 
 
 class ResponseDetector:
@@ -159,19 +160,33 @@ class ResponseDetector:
         "opt out by",
     ]
 
+    # Priority order used to pick the response type (Action Required surfaces even on ties)
+    PRIORITY = (
+        ResponseType.ACTION_REQUIRED,
+        ResponseType.CONFIRMATION,
+        ResponseType.REJECTION,
+        ResponseType.ACKNOWLEDGMENT,
+        ResponseType.REQUEST_INFO,
+    )
+
+    # Lowercase characters that case-insensitive regex matching treats as ASCII letters
+    CASE_FOLD = str.maketrans({"\u0131": "i", "\u017f": "s"})
+
     def __init__(self):
-        # Compile regex patterns for efficiency
-        self.confirmation_pattern = self._compile_pattern(self.CONFIRMATION_KEYWORDS)
-        self.rejection_pattern = self._compile_pattern(self.REJECTION_KEYWORDS)
-        self.acknowledgment_pattern = self._compile_pattern(self.ACKNOWLEDGMENT_KEYWORDS)
-        self.action_required_pattern = self._compile_pattern(self.ACTION_REQUIRED_KEYWORDS)
-        self.request_info_pattern = self._compile_pattern(self.REQUEST_INFO_KEYWORDS)
+        # One automaton covers every category, shared across detector instances
+        self.automaton = get_keyword_automaton(
+            (
+                (ResponseType.CONFIRMATION, tuple(self.CONFIRMATION_KEYWORDS)),
+                (ResponseType.REJECTION, tuple(self.REJECTION_KEYWORDS)),
+                (ResponseType.ACKNOWLEDGMENT, tuple(self.ACKNOWLEDGMENT_KEYWORDS)),
+                (ResponseType.ACTION_REQUIRED, tuple(self.ACTION_REQUIRED_KEYWORDS)),
+                (ResponseType.REQUEST_INFO, tuple(self.REQUEST_INFO_KEYWORDS)),
+            )
+        )
 
-    def _compile_pattern(self, keywords: list) -> re.Pattern:
-        """Compile a list of keywords into a single regex pattern"""
-        # Escape special regex characters and join with OR
-        pattern = "|".join(re.escape(kw) for kw in keywords)
-        return re.compile(pattern, re.IGNORECASE)
+    def scan_keywords(self, text: str) -> KeywordScan:
+        """Find all response keywords in text with a single pass"""
+        return self.automaton.scan(text.lower().translate(self.CASE_FOLD))
 
     def detect_response_type(
         self, subject: str | None, body: str | None
@@ -193,24 +208,15 @@ class ResponseDetector:
         if not text:
             return (ResponseType.UNKNOWN, 0.0)
 
-        # Count matches for each response type
+        # Count matches for each response type in one scan of the text
+        keyword_scan = self.scan_keywords(text)
         matches = {
-            ResponseType.ACTION_REQUIRED: len(self.action_required_pattern.findall(text)),
-            ResponseType.CONFIRMATION: len(self.confirmation_pattern.findall(text)),
-            ResponseType.REJECTION: len(self.rejection_pattern.findall(text)),
-            ResponseType.ACKNOWLEDGMENT: len(self.acknowledgment_pattern.findall(text)),
-            ResponseType.REQUEST_INFO: len(self.request_info_pattern.findall(text)),
+            response_type: keyword_scan.count(response_type) for response_type in self.PRIORITY
         }
 
         # Priority-based detection (Action Required should surface even when counts tie)
         detected_type = ResponseType.UNKNOWN
-        for response_type in (
-            ResponseType.ACTION_REQUIRED,
-            ResponseType.CONFIRMATION,
-            ResponseType.REJECTION,
-            ResponseType.ACKNOWLEDGMENT,
-            ResponseType.REQUEST_INFO,
-        ):
+        for response_type in self.PRIORITY:
             if matches[response_type] > 0:
                 detected_type = response_type
                 break
@@ -230,27 +236,16 @@ class ResponseDetector:
             match_ratio = max_matches / max(text_words / 10, 1)
             confidence = min(match_ratio * 0.3 + 0.4, 1.0)  # Scale to 0.4-1.0 range
 
-        # Boost confidence if matches found in subject (more reliable)
-        if subject and self._has_keyword_match(detected_type, subject.lower()):
+        # Boost confidence if matches found in subject (more reliable). The text starts
+        # with the subject, so hits ending within it are the subject's own matches.
+        if subject and keyword_scan.has_match(detected_type, end=len(subject.lower())):
             confidence = min(confidence + 0.15, 1.0)
 
         return (detected_type, round(confidence, 2))
 
     def _has_keyword_match(self, response_type: ResponseType, text: str) -> bool:
         """Check if text contains keywords for the given response type"""
-        pattern_map = {
-            ResponseType.CONFIRMATION: self.confirmation_pattern,
-            ResponseType.REJECTION: self.rejection_pattern,
-            ResponseType.ACKNOWLEDGMENT: self.acknowledgment_pattern,
-            ResponseType.ACTION_REQUIRED: self.action_required_pattern,
-            ResponseType.REQUEST_INFO: self.request_info_pattern,
-        }
-
-        pattern = pattern_map.get(response_type)
-        if not pattern:
-            return False
-
-        return bool(pattern.search(text))
+        return self.scan_keywords(text).has_match(response_type)
 
     def extract_case_number(self, text: str) -> str | None:
         """
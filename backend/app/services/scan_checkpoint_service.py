@@ -0,0 +1,167 @@
+from datetime import datetime, timedelta
+from uuid import UUID
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.email_scan import EmailScan
+from app.models.scan_checkpoint import ScanCheckpoint
+
+RECEIVED_PHASE = "received"
+SENT_PHASE = "sent"
+
+HISTORY_MODE = "history"
+FULL_MODE = "full"
+
+
+class ScanCheckpointService:
+    """Creates and advances the checkpoints that make inbox scans resumable"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get_checkpoint(self, user_id: str, scan_id: str) -> ScanCheckpoint | None:
+        """Get the checkpoint of a scan, if it has started"""
+        user_uuid = UUID(user_id) if isinstance(user_id, str) else user_id
+        return (
+            self.db.query(ScanCheckpoint)
+            .filter(ScanCheckpoint.user_id == user_uuid, ScanCheckpoint.scan_id == scan_id)
+            .first()
+        )
+
+    def start(self, user_id: str, scan_id: str) -> ScanCheckpoint:
+        """Get the scan's checkpoint to resume from, creating it on the first attempt"""
+        user_uuid = UUID(user_id) if isinstance(user_id, str) else user_id
+        checkpoint = self.get_checkpoint(user_uuid, scan_id)
+        if checkpoint is None:
+            checkpoint = ScanCheckpoint(
+                user_id=user_uuid,
+                scan_id=scan_id,
+                status="running",
+                phase=RECEIVED_PHASE,
+                attempts=0,
+                messages_listed=0,
+                emails_scanned=0,
+                broker_emails_found=0,
+                broker_message_ids=[],
+            )
+            self.db.add(checkpoint)
+        checkpoint.attempts += 1
+        self.db.commit()
+        return checkpoint
+
+    def begin_listing(
+        self,
+        checkpoint: ScanCheckpoint,
+        mode: str,
+        history_id: str | None,
+        sent_days_back: int,
+        query: str | None = None,
+    ) -> None:
+        """Record how received mail is listed, restarting the listing position"""
+        checkpoint.mode = mode
+        checkpoint.query = query
+        checkpoint.page_token = None
+        checkpoint.last_message_id = None
+        checkpoint.messages_listed = 0
+        checkpoint.history_id = history_id
+        checkpoint.sent_days_back = sent_days_back
+        self.db.commit()
+
+    def record_chunk(
+        self,
+        checkpoint: ScanCheckpoint,
+        messages: list[dict],
+        scans: list[EmailScan],
+        page_token: str | None = None,
+    ) -> None:
+        """
+        Advance the checkpoint past a processed chunk of listed messages
+
+        The caller commits, so the chunk's scans and the checkpoint land together.
+        """
+        if messages:
+            checkpoint.last_message_id = messages[-1]["id"]
+        checkpoint.page_token = page_token
+        if checkpoint.phase == RECEIVED_PHASE:
+            checkpoint.messages_listed += len(messages)
+        checkpoint.emails_scanned += len(scans)
+        checkpoint.broker_emails_found += sum(1 for scan in scans if scan.is_broker_email)
+
+        broker_message_ids = list(checkpoint.broker_message_ids or [])
+        for scan in scans:
+            if scan.broker_id and scan.gmail_message_id not in broker_message_ids:
+                broker_message_ids.append(scan.gmail_message_id)
+        # Reassign so the JSON column is seen as changed
+        checkpoint.broker_message_ids = broker_message_ids
+
+    def begin_phase(self, checkpoint: ScanCheckpoint, phase: str) -> None:
+        """Move the scan on to its next phase"""
+        checkpoint.phase = phase
+        checkpoint.page_token = None
+        checkpoint.last_message_id = None
+        self.db.commit()
+
+    def received_listing_done(self, checkpoint: ScanCheckpoint) -> bool:
+        """
+        Whether the full received listing was processed through its last page
+
+        The last page is committed without a next page token but with its last message,
+        a state a freshly begun listing never has; seeing it means the attempt failed
+        before moving on to the sent phase.
+        """
+        return (
+            checkpoint.mode == FULL_MODE
+            and checkpoint.page_token is None
+            and checkpoint.last_message_id is not None
+        )
+
+    def unprocessed(self, checkpoint: ScanCheckpoint | None, messages: list[dict]) -> list[dict]:
+        """Listed messages after the checkpoint's last processed one (all if it isn't listed)"""
+        if checkpoint is None or checkpoint.last_message_id is None:
+            return messages
+        message_ids = [message["id"] for message in messages]
+        if checkpoint.last_message_id not in message_ids:
+            return messages
+        return messages[message_ids.index(checkpoint.last_message_id) + 1 :]
+
+    def broker_scans(self, checkpoint: ScanCheckpoint) -> list[EmailScan]:
+        """Broker-linked scans recorded by every attempt of the scan, in discovery order"""
+        message_ids = checkpoint.broker_message_ids or []
+        if not message_ids:
+            return []
+        scans = {
+            scan.gmail_message_id: scan
+            for scan in self.db.query(EmailScan).filter(
+                EmailScan.user_id == checkpoint.user_id,
+                EmailScan.gmail_message_id.in_(message_ids),
+            )
+        }
+        return [scans[message_id] for message_id in message_ids if message_id in scans]
+
+    def complete(self, checkpoint: ScanCheckpoint) -> None:
+        """Mark the scan finished; the caller commits it with the scan's final writes"""
+        checkpoint.status = "completed"
+        checkpoint.page_token = None
+        checkpoint.completed_at = datetime.utcnow()
+
+    def purge(self, retention_days: int | None = None) -> int:
+        """
+        Delete checkpoints not updated within the retention period, and commit
+
+        Completed checkpoints are kept for a while so a retry of a finished scan is a
+        no-op; running ones that old belong to scans whose retries have given up.
+
+        Returns:
+            Number of checkpoints deleted
+        """
+        if retention_days is None:
+            retention_days = settings.scan_checkpoint_retention_days
+        cutoff = datetime.utcnow() - timedelta(days=retention_days)
+        deleted = (
+            self.db.query(ScanCheckpoint)
+            .filter(ScanCheckpoint.updated_at < cutoff)
+            .delete(synchronize_session=False)
+        )
+        self.db.commit()
+        return deleted
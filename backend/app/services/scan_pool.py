@@ -0,0 +1,152 @@
+"""
+Scan I/O Pool
+Bounded thread pool for concurrent Gmail calls made by scan tasks
+"""
+
+import math
+import threading
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import TypeVar
+
+from app.config import settings
+from app.models.user import User
+from app.services.gmail_client_cache import token_fingerprint
+from app.services.gmail_service import GmailService, MessageFetchResult
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class UserConcurrencyLimiter:
+    """Caps how many Gmail calls run at once for any single user in this process"""
+
+    def __init__(self, limit: int) -> None:
+        self.limit = max(limit, 1)
+        self._semaphores: dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+
+    def _semaphore(self, user_id: str) -> threading.BoundedSemaphore:
+        with self._lock:
+            semaphore = self._semaphores.get(user_id)
+            if semaphore is None:
+                semaphore = threading.BoundedSemaphore(self.limit)
+                self._semaphores[user_id] = semaphore
+            return semaphore
+
+    @contextmanager
+    def slot(self, user_id: str) -> Iterator[None]:
+        """Hold one of the user's concurrency slots for the duration of a call"""
+        semaphore = self._semaphore(str(user_id))
+        semaphore.acquire()
+        try:
+            yield
+        finally:
+            semaphore.release()
+
+
+class ScanIOPool:
+    """
+    Runs Gmail I/O for a scan on a small shared thread pool.
+
+    Only network calls are submitted: database sessions stay on the calling (task)
+    thread, which blocks until the submitted work has finished. The user's row is
+    loaded on the calling thread before submission so workers never trigger a lazy
+    load through the session.
+    """
+
+    # Don't split message fetches into batches smaller than this
+    MIN_FETCH_CHUNK_SIZE = 10
+
+    def __init__(
+        self,
+        max_workers: int | None = None,
+        limiter: UserConcurrencyLimiter | None = None,
+    ) -> None:
+        self.max_workers = max(max_workers or settings.gmail_scan_workers, 1)
+        self.limiter = limiter or user_concurrency_limiter
+        self._executor: ThreadPoolExecutor | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def width(self) -> int:
+        """How many calls can run at once for a single user"""
+        return min(self.max_workers, self.limiter.limit)
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="gmail-io"
+                )
+            return self._executor
+
+    def map(self, user: User, fn: Callable[[T], R], items: Iterable[T]) -> list[R | Exception]:
+        """
+        Call fn on every item concurrently, within the user's concurrency cap
+
+        Returns results in input order; an item whose call raised yields the exception.
+        """
+        items = list(items)
+        # Load id and token columns here so workers only read already-loaded attributes
+        user_id = str(user.id)
+        token_fingerprint(user)
+
+        def run(item: T) -> R | Exception:
+            with self.limiter.slot(user_id):
+                try:
+                    return fn(item)
+                except Exception as e:
+                    return e
+
+        if self.width == 1 or len(items) <= 1:
+            return [run(item) for item in items]
+
+        executor = self._get_executor()
+        return [future.result() for future in [executor.submit(run, item) for item in items]]
+
+    def fetch_messages(
+        self,
+        gmail_service: GmailService,
+        user: User,
+        message_ids: list[str],
+        format: str = "full",
+    ) -> list[MessageFetchResult]:
+        """Fetch messages as several batch requests issued concurrently"""
+        if not message_ids:
+            return []
+
+        chunk_size = min(
+            max(math.ceil(len(message_ids) / self.width), self.MIN_FETCH_CHUNK_SIZE),
+            GmailService.BATCH_SIZE,
+        )
+        chunks = [
+            message_ids[start : start + chunk_size]
+            for start in range(0, len(message_ids), chunk_size)
+        ]
+
+        results = []
+        for chunk, outcome in zip(
+            chunks,
+            self.map(
+                user, lambda ids: gmail_service.get_messages_batch(user, ids, format=format), chunks
+            ),
+            strict=True,
+        ):
+            if isinstance(outcome, Exception):
+                # Surface the failure per message so callers skip them like any other error
+                results.extend(MessageFetchResult(message_id=mid, error=outcome) for mid in chunk)
+            else:
+                results.extend(outcome)
+        return results
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+
+user_concurrency_limiter = UserConcurrencyLimiter(settings.gmail_user_max_concurrency)
+scan_io_pool = ScanIOPool()
@@ -0,0 +1,42 @@
+from datetime import datetime
+from uuid import UUID
+
+from sqlalchemy.orm import Session
+
+from app.models.gmail_sync_cursor import GmailSyncCursor
+
+INBOX_SCOPE = "inbox"
+RESPONSES_SCOPE = "responses"
+
+
+class SyncCursorService:
+    """Reads and advances per-user Gmail history cursors"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get_cursor(self, user_id: str, scope: str) -> GmailSyncCursor | None:
+        """Get the sync cursor for a user and scope, if one has been recorded"""
+        user_uuid = UUID(user_id) if isinstance(user_id, str) else user_id
+        return (
+            self.db.query(GmailSyncCursor)
+            .filter(GmailSyncCursor.user_id == user_uuid, GmailSyncCursor.scope == scope)
+            .first()
+        )
+
+    def save_cursor(self, user_id: str, scope: str, history_id: str) -> GmailSyncCursor:
+        """
+        Record the historyId a scan has caught up to
+
+        The caller owns the transaction; the cursor is committed with the scan results
+        so a failed scan never advances it.
+        """
+        user_uuid = UUID(user_id) if isinstance(user_id, str) else user_id
+        cursor = self.get_cursor(user_uuid, scope)
+        if cursor is None:
+            cursor = GmailSyncCursor(user_id=user_uuid, scope=scope, history_id=str(history_id))
+            self.db.add(cursor)
+        else:
+            cursor.history_id = str(history_id)
+        cursor.synced_at = datetime.utcnow()
+        return cursor
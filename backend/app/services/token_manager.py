@@ -0,0 +1,230 @@
+"""
+Token Manager
+Refreshes Gmail OAuth access tokens once per user across all workers and persists them
+"""
+
+import json
+import logging
+import threading
+import time
+import uuid
+from datetime import datetime
+
+import redis
+from cryptography.fernet import InvalidToken
+from google.auth import _helpers as google_auth_helpers
+from google.oauth2.credentials import Credentials
+from redis.exceptions import RedisError
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import sessionmaker
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models.user import User
+from app.utils.encryption import decrypt_token, encrypt_token
+
+# Deletes the refresh lock only if this worker still holds it
+_RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class ManagedCredentials(Credentials):
+    """
+    Google credentials whose refreshes go through the token manager
+
+    google-auth refreshes credentials itself when a token has expired or a call gets a
+    401 - inside googleapiclient clients, AsyncGmailClient and anything else holding
+    them. Routing refresh() through TokenManager means every one of those refreshes is
+    shared and persisted.
+    """
+
+    def __init__(self, *args, user_id: str | None = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.user_id = user_id
+
+    def refresh(self, request) -> None:
+        if self.user_id is None:
+            super().refresh(request)
+        else:
+            token_manager.refresh(self, request)
+
+    def _refresh_with_google(self, request) -> None:
+        super().refresh(request)
+
+
+class TokenManager:
+    """
+    Refreshes users' access tokens under a per-user Redis lock and shares the result.
+
+    The worker that takes the lock calls Google, writes the new token and its expiry to
+    the user's row and publishes them (encrypted) in Redis until they expire. Workers
+    that find the lock taken wait for that token instead of refreshing again; so do
+    callers holding a stale user row. Like RateLimiter, it falls back to refreshing
+    locally if Redis is unavailable.
+    """
+
+    KEY_PREFIX = "gmail_token"
+
+    # How often a waiting worker checks for the refreshed token
+    POLL_INTERVAL_SECONDS = 0.1
+
+    def __init__(
+        self,
+        client: redis.Redis | None = None,
+        session_factory: sessionmaker | None = None,
+        lock_seconds: int | None = None,
+        wait_seconds: float | None = None,
+    ) -> None:
+        self._logger = logging.getLogger(__name__)
+        self._client = client
+        self._session_factory = session_factory or SessionLocal
+        self.lock_seconds = lock_seconds or settings.gmail_token_refresh_lock_seconds
+        self.wait_seconds = (
+            settings.gmail_token_refresh_wait_seconds if wait_seconds is None else wait_seconds
+        )
+        self._release = None
+        self._lock = threading.Lock()
+
+    def _redis(self) -> redis.Redis:
+        with self._lock:
+            if self._client is None:
+                self._client = redis.Redis.from_url(settings.redis_url, decode_responses=True)
+            if self._release is None:
+                self._release = self._client.register_script(_RELEASE_SCRIPT)
+            return self._client
+
+    def _token_key(self, user_id: str) -> str:
+        return f"{self.KEY_PREFIX}:{user_id}"
+
+    def _lock_key(self, user_id: str) -> str:
+        return f"{self.KEY_PREFIX}:refresh_lock:{user_id}"
+
+    def refresh(self, credentials: ManagedCredentials, request) -> None:
+        """
+        Give credentials a fresh access token, calling Google only if no other worker has
+
+        Raises google.auth.exceptions.RefreshError when Google rejects the refresh token.
+        """
+        user_id = credentials.user_id
+        try:
+            client = self._redis()
+            if self._adopt_shared(client, credentials):
+                return
+
+            lock_value = uuid.uuid4().hex
+            if client.set(self._lock_key(user_id), lock_value, nx=True, ex=self.lock_seconds):
+                try:
+                    # Another worker may have finished refreshing just before we locked
+                    if not self._adopt_shared(client, credentials):
+                        self._refresh_and_store(client, credentials, request)
+                finally:
+                    self._release(keys=[self._lock_key(user_id)], args=[lock_value])
+                return
+
+            if self._wait_for_shared(client, credentials):
+                return
+            self._logger.warning("Token refresh for user %s not shared in time", user_id)
+        except RedisError as exc:
+            self._logger.warning("Token lock unavailable, refreshing locally: %s", exc)
+            client = None
+
+        self._refresh_and_store(client, credentials, request)
+
+    def _adopt_shared(self, client: redis.Redis, credentials: ManagedCredentials) -> bool:
+        """Take over the token another worker refreshed, if it's new and still valid"""
+        shared = client.get(self._token_key(credentials.user_id))
+        if not shared:
+            return False
+        data = json.loads(shared)
+        try:
+            token = decrypt_token(data["token"])
+        except InvalidToken:
+            # Encrypted with a key that's since been removed; refresh with Google instead
+            self._logger.warning(
+                "Shared token for user %s can't be decrypted, dropping it", credentials.user_id
+            )
+            client.delete(self._token_key(credentials.user_id))
+            return False
+        expiry = datetime.fromisoformat(data["expiry"])
+        # The caller's own token is the one that failed or expired
+        if token == credentials.token or self._expiring(expiry):
+            return False
+        credentials.token = token
+        credentials.expiry = expiry
+        return True
+
+    def _wait_for_shared(self, client: redis.Redis, credentials: ManagedCredentials) -> bool:
+        """Wait for the lock holder's token; gives up if it releases the lock without one"""
+        deadline = time.monotonic() + self.wait_seconds
+        while time.monotonic() < deadline:
+            time.sleep(self.POLL_INTERVAL_SECONDS)
+            if self._adopt_shared(client, credentials):
+                return True
+            if not client.exists(self._lock_key(credentials.user_id)):
+                return self._adopt_shared(client, credentials)
+        return False
+
+    def _refresh_and_store(
+        self, client: redis.Redis | None, credentials: ManagedCredentials, request
+    ) -> None:
+        """Refresh with Google, then persist the token and share it until it expires"""
+        credentials._refresh_with_google(request)
+        self._persist(credentials)
+        if client is None or credentials.expiry is None:
+            return
+
+        ttl = int((credentials.expiry - google_auth_helpers.utcnow()).total_seconds())
+        if ttl <= 0:
+            return
+        try:
+            client.set(
+                self._token_key(credentials.user_id),
+                json.dumps(
+                    {
+                        "token": encrypt_token(credentials.token),
+                        "expiry": credentials.expiry.isoformat(),
+                    }
+                ),
+                ex=ttl,
+            )
+        except RedisError as exc:
+            self._logger.warning("Could not share refreshed token: %s", exc)
+
+    def _persist(self, credentials: ManagedCredentials) -> None:
+        """Write the refreshed token and its expiry to the user's row"""
+        db = self._session_factory()
+        try:
+            user = db.query(User).filter(User.id == uuid.UUID(credentials.user_id)).first()
+            if user is None:
+                return
+            user.set_access_token(credentials.token)
+            user.access_token_expires_at = credentials.expiry
+            # Google may rotate the refresh token along with the access token
+            if credentials.refresh_token:
+                user.set_refresh_token(credentials.refresh_token)
+            db.commit()
+        except SQLAlchemyError as exc:
+            db.rollback()
+            self._logger.warning(
+                "Could not persist refreshed token for user %s: %s", credentials.user_id, exc
+            )
+        finally:
+            db.close()
+
+    def forget(self, user_id: str) -> None:
+        """Drop a user's shared token (tokens replaced by a new sign-in, or revoked)"""
+        try:
+            self._redis().delete(self._token_key(str(user_id)))
+        except RedisError as exc:
+            self._logger.warning("Could not drop shared token for user %s: %s", user_id, exc)
+
+    @staticmethod
+    def _expiring(expiry: datetime) -> bool:
+        return google_auth_helpers.utcnow() >= expiry - google_auth_helpers.REFRESH_THRESHOLD
+
+
+token_manager = TokenManager()
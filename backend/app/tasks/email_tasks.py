@@ -1,22 +1,55 @@
 import json
 import logging
 from datetime import datetime, timedelta
+from uuid import UUID
 
 from app.celery_app import celery_app
 from app.database import SessionLocal
+from app.exceptions import GmailHistoryUnavailableError
 from app.models.activity_log import ActivityType
 from app.models.broker_response import BrokerResponse, ResponseType
 from app.models.deletion_request import DeletionRequest, RequestStatus
 from app.models.user import User
 from app.services.activity_log_service import ActivityLogService
+from app.services.broker_domain_index import BrokerDomainIndex
 from app.services.broker_service import BrokerService
+from app.services.bulk_upsert import bulk_upsert
 from app.services.email_scanner import EmailScanner
+from app.services.gmail_query_planner import gmail_query_planner
 from app.services.gmail_service import GmailService
+from app.services.message_parser import parse_message
+from app.services.request_transitions import transition_request
 from app.services.response_detector import ResponseDetector
 from app.services.response_matcher import ResponseMatcher
+from app.services.scan_pool import scan_io_pool
+from app.services.sync_cursor_service import RESPONSES_SCOPE, SyncCursorService
 
 logger = logging.getLogger(__name__)
 
+# Columns a response scan writes for new BrokerResponse rows
+BROKER_RESPONSE_COLUMNS = [
+    "user_id",
+    "gmail_message_id",
+    "gmail_thread_id",
+    "sender_email",
+    "subject",
+    "body_text",
+    "received_date",
+    "response_type",
+    "confidence_score",
+    "deletion_request_id",
+    "matched_by",
+    "is_processed",
+    "processed_at",
+]
+# Columns re-classified when the response is already stored (an existing match is kept)
+BROKER_RESPONSE_UPDATE_COLUMNS = [
+    "response_type",
+    "confidence_score",
+    "is_processed",
+    "processed_at",
+]
+
 
 def _parse_email_date(date_str: str):
     """Parse email date string to datetime"""
@@ -28,11 +61,63 @@ def _parse_email_date(date_str: str):
         return None
 
 
+def _sender_broker_id(sender: str, domain_index: BrokerDomainIndex):
+    """Find the broker a From header belongs to (its domain or a subdomain of it)"""
+    sender_domain = sender.rsplit("@", 1)[-1].strip(" >") if "@" in sender else ""
+    match = domain_index.match_domain(sender_domain)
+    return match[0] if match else None
+
+
+def _fetch_new_broker_messages(
+    gmail_service: GmailService,
+    user: User,
+    start_history_id: str,
+    domain_index: BrokerDomainIndex,
+    broker_ids: set,
+) -> tuple[list[dict], str]:
+    """
+    Fetch inbox messages added since a history cursor that come from the given brokers
+
+    Headers are screened with a metadata fetch so only broker mail is downloaded in full.
+    """
+    added, history_id = gmail_service.list_history(
+        user, start_history_id, max_messages=500, label_id="INBOX"
+    )
+    if not added:
+        return [], history_id
+
+    metadata = scan_io_pool.fetch_messages(
+        gmail_service, user, [message["id"] for message in added], format="metadata"
+    )
+    broker_message_ids = [
+        result.message_id
+        for result in metadata
+        if result.ok
+        and _sender_broker_id(
+            gmail_service.get_message_headers(result.message).get("from", ""), domain_index
+        )
+        in broker_ids
+    ]
+    if not broker_message_ids:
+        return [], history_id
+
+    fetched = scan_io_pool.fetch_messages(gmail_service, user, broker_message_ids, format="full")
+    return [result.message for result in fetched if result.ok], history_id
+
+
 @celery_app.task(bind=True, max_retries=2)
-def scan_inbox_task(self, user_id: str, days_back: int = 90, max_emails: int = 100):
+def scan_inbox_task(
+    self, user_id: str, days_back: int = 90, max_emails: int = 100, incremental: bool = True
+):
     """
     Background task to scan user's inbox for data broker emails.
 
+    With incremental=True (default) only messages added since the user's previous scan
+    are fetched, falling back to a full scan when there is no usable history cursor.
+
+    The scan is checkpointed under the task ID and committed a page at a time, so a retry
+    resumes where the failed attempt stopped instead of re-fetching from Gmail.
+
     Updates task state with progress:
     - STARTED: Task began
     - PROGRESS: Includes processed/total counts
@@ -71,24 +156,33 @@ def scan_inbox_task(self, user_id: str, days_back: int = 90, max_emails: int = 1
             meta={"current": 0, "total": max_emails, "status": "Starting email scan..."},
         )
 
-        # Create scanner and run scan
+        # Create scanner and run scan; retries keep the task ID and resume its checkpoint.
+        # Only counts are needed here, so scanned emails aren't kept in memory
         scanner = EmailScanner(db)
-        scans = scanner.scan_inbox(user, days_back=days_back, max_emails=max_emails)
+        summary = scanner.scan_inbox_streaming(
+            user,
+            days_back=days_back,
+            max_emails=max_emails,
+            incremental=incremental,
+            scan_id=self.request.id,
+        )
 
-        # Count results
-        broker_count = sum(1 for s in scans if s.is_broker_email)
+        # Counts cover every attempt
+        total_scanned = summary.emails_scanned
+        broker_count = summary.broker_emails_found
 
         # Log task completion
         activity_service.log_activity(
             user_id=user_id,
             activity_type=ActivityType.EMAIL_SCANNED,
-            message=f"Email scan completed: {len(scans)} emails scanned, {broker_count} broker emails found",
+            message=f"Email scan completed: {total_scanned} emails scanned, {broker_count} broker emails found",
             details=f"Days back: {days_back}, Max emails: {max_emails}",
         )
+        db.commit()
 
         return {
             "status": "completed",
-            "total_scanned": len(scans),
+            "total_scanned": total_scanned,
             "broker_emails_found": broker_count,
             "user_id": user_id,
         }
@@ -122,6 +216,7 @@ def scan_inbox_task(self, user_id: str, days_back: int = 90, max_emails: int = 1
                     message=f"Email scan failed after {retry_count} retry attempts",
                     details=f"Error: {str(exc)}",
                 )
+            db.commit()
         except Exception:
             pass  # Don't fail on logging errors
 
@@ -142,13 +237,17 @@ def scan_inbox_task(self, user_id: str, days_back: int = 90, max_emails: int = 1
 
 
 @celery_app.task(bind=True, max_retries=2)
-def scan_for_responses_task(self, user_id: str, days_back: int = 7, source: str = "manual"):
+def scan_for_responses_task(
+    self, user_id: str, days_back: int = 7, source: str = "manual", incremental: bool = False
+):
     """
     Background task to scan for broker responses to deletion requests.
 
     Args:
         user_id: User ID to scan responses for
         days_back: Number of days to look back for responses (default: 7)
+        incremental: Only look at inbox messages added since the previous response scan.
+            Existing responses are then not re-classified; manual scans keep doing that.
 
     Returns:
         Dict with scan results including responses found and requests updated
@@ -196,6 +295,7 @@ def scan_for_responses_task(self, user_id: str, days_back: int = 7, source: str
             ),
             details=details,
         )
+        db.commit()
 
     try:
         logger.info(f"Starting response scan for user {user_id}")
@@ -282,18 +382,70 @@ def scan_for_responses_task(self, user_id: str, days_back: int = 7, source: str
         )
 
         # Query: from any broker domain, after the sent date, in inbox
-        domain_queries = " OR ".join(f"from:@{domain}" for domain in broker_domains)
-        query = f"({domain_queries}) after:{after_date} in:inbox"
-        logger.info(f"Gmail query: {query}")
+        # (split into several shorter queries when there are many domains)
+        queries = gmail_query_planner.plan(
+            "from",
+            (f"@{domain}" for domain in broker_domains),
+            suffix=f"after:{after_date} in:inbox",
+        )
+        logger.info(f"Gmail queries: {queries}")
 
         # Fetch messages
-        logger.info("Fetching messages from Gmail API")
-        messages = gmail_service.search_messages(user, query, max_results=50)
+        cursor_service = SyncCursorService(db)
+        cursor = cursor_service.get_cursor(user_id, RESPONSES_SCOPE) if incremental else None
+        messages = None
+        history_id = None
+
+        if cursor:
+            try:
+                logger.info(f"Fetching inbox history since {cursor.history_id}")
+                messages, history_id = _fetch_new_broker_messages(
+                    gmail_service,
+                    user,
+                    cursor.history_id,
+                    broker_service.get_domain_index(),
+                    broker_ids,
+                )
+            except GmailHistoryUnavailableError as e:
+                logger.info(f"Incremental sync unavailable, falling back to search: {str(e)}")
+
+        if messages is None:
+            logger.info("Fetching messages from Gmail API")
+            try:
+                history_id = gmail_service.get_history_id(user)
+            except Exception as e:
+                logger.warning(f"Could not fetch history ID: {str(e)}")
+            # List every query shard concurrently, then fetch the merged refs page by page
+            listing = gmail_query_planner.list_messages(
+                scan_io_pool,
+                user,
+                queries,
+                lambda query: gmail_service.list_messages(user, query, max_results=50),
+                max_results=50,
+            )
+            logger.info(f"Response search listing: {listing.summary()}")
+            messages = []
+            for page in listing.pages(GmailService.LIST_PAGE_SIZE):
+                fetched = scan_io_pool.fetch_messages(
+                    gmail_service, user, [msg["id"] for msg in page], format="full"
+                )
+                messages.extend(result.message for result in fetched if result.ok)
+
         logger.info(f"Found {len(messages)} messages to process")
 
         responses_created = 0
         responses_updated = 0
         requests_updated = 0
+        new_responses = []
+
+        # Check which messages were already processed, in one query
+        message_ids = [msg_data.get("id") for msg_data in messages]
+        existing_responses = {
+            response.gmail_message_id: response
+            for response in db.query(BrokerResponse).filter(
+                BrokerResponse.gmail_message_id.in_(message_ids)
+            )
+        }
 
         # Process each message
         for idx, msg_data in enumerate(messages):
@@ -308,22 +460,15 @@ def scan_for_responses_task(self, user_id: str, days_back: int = 7, source: str
 
             gmail_message_id = msg_data.get("id")
 
-            # Check if already processed
-            existing = (
-                db.query(BrokerResponse)
-                .filter(BrokerResponse.gmail_message_id == gmail_message_id)
-                .first()
-            )
-
-            # Extract email details using proper header parsing
-            headers = gmail_service.get_message_headers(msg_data)
-            sender = headers.get("from", "")
-            subject = headers.get("subject", "")
-            date_str = headers.get("date", "")
-            thread_id = msg_data.get("threadId")
+            existing = existing_responses.get(gmail_message_id)
 
-            # Get email body
-            body = gmail_service._extract_body(msg_data.get("payload", {}))
+            # Decode headers and body once (HTML-only emails fall back to the HTML's text)
+            parsed = parse_message(msg_data)
+            sender = parsed.sender
+            subject = parsed.subject
+            date_str = parsed.date
+            thread_id = parsed.thread_id
+            body = parsed.body_text
 
             # Detect response type
             response_type, confidence = response_detector.detect_response_type(subject, body)
@@ -339,9 +484,9 @@ def scan_for_responses_task(self, user_id: str, days_back: int = 7, source: str
                     f"Re-classified existing response {existing.id}: {response_type.value} ({confidence})"
                 )
             else:
-                # Create new BrokerResponse record
+                # Build the new BrokerResponse; it's written with the rest in one bulk insert
                 broker_response = BrokerResponse(
-                    user_id=user_id,
+                    user_id=user.id,
                     gmail_message_id=gmail_message_id,
                     gmail_thread_id=thread_id,
                     sender_email=sender,
@@ -351,14 +496,14 @@ def scan_for_responses_task(self, user_id: str, days_back: int = 7, source: str
                     response_type=response_type,
                     confidence_score=confidence,
                 )
-                db.add(broker_response)
-                responses_created += 1
+                existing_responses[gmail_message_id] = broker_response
+                new_responses.append(broker_response)
 
             # Match to deletion request (for both new and updated responses)
             request_id, matched_by = response_matcher.match_response_to_request(broker_response)
 
             if request_id:
-                broker_response.deletion_request_id = request_id
+                broker_response.deletion_request_id = UUID(request_id)
                 broker_response.matched_by = matched_by
 
                 # Auto-update request status if confidence is high enough
@@ -372,22 +517,49 @@ def scan_for_responses_task(self, user_id: str, days_back: int = 7, source: str
                         RequestStatus.ACTION_REQUIRED,
                     ):
                         if response_type == ResponseType.CONFIRMATION:
-                            request.status = RequestStatus.CONFIRMED
-                            request.confirmed_at = datetime.now()
+                            transition_request(
+                                request,
+                                RequestStatus.CONFIRMED,
+                                source="response_scan",
+                                at=datetime.now(),
+                            )
                             requests_updated += 1
                         elif response_type == ResponseType.REJECTION:
-                            request.status = RequestStatus.REJECTED
-                            request.rejected_at = datetime.now()
+                            transition_request(
+                                request,
+                                RequestStatus.REJECTED,
+                                source="response_scan",
+                                at=datetime.now(),
+                            )
                             requests_updated += 1
                         elif response_type == ResponseType.ACTION_REQUIRED:
-                            if request.status != RequestStatus.ACTION_REQUIRED:
-                                request.status = RequestStatus.ACTION_REQUIRED
+                            if transition_request(
+                                request, RequestStatus.ACTION_REQUIRED, source="response_scan"
+                            ):
                                 requests_updated += 1
 
             # Mark as processed
             broker_response.is_processed = True
             broker_response.processed_at = datetime.now()
 
+        # Insert the new responses in bulk; ones a concurrent scan stored first are
+        # re-classified instead of aborting the transaction on the unique message ID
+        result = bulk_upsert(
+            db,
+            BrokerResponse,
+            [
+                {column: getattr(response, column) for column in BROKER_RESPONSE_COLUMNS}
+                for response in new_responses
+            ],
+            update_columns=BROKER_RESPONSE_UPDATE_COLUMNS,
+        )
+        responses_created += result.inserted
+        responses_updated += result.updated
+
+        # Advance the sync cursor together with the processed responses
+        if history_id:
+            cursor_service.save_cursor(user_id, RESPONSES_SCOPE, history_id)
+
         # Commit all changes
         db.commit()
 
@@ -445,6 +617,7 @@ def scan_for_responses_task(self, user_id: str, days_back: int = 7, source: str
                     message=f"Response scan failed after {retry_count} retry attempts",
                     details=error_msg,
                 )
+            db.commit()
         except Exception:
             pass  # Don't fail on logging errors
 
@@ -516,10 +689,15 @@ def scan_all_users_for_responses(self):
                 pass  # Don't fail on logging errors
 
             # Trigger scan for each user asynchronously
-            result = scan_for_responses_task.delay(user_id_str, days_back=7, source="automated")
+            result = scan_for_responses_task.delay(
+                user_id_str, days_back=7, source="automated", incremental=True
+            )
             tasks_triggered.append({"user_id": user_id_str, "task_id": result.id})
             total_scanned += 1
 
+        # Write the per-user log entries in one insert
+        db.commit()
+
         return {
             "status": "completed",
             "users_scanned": total_scanned,
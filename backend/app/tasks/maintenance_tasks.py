@@ -0,0 +1,170 @@
+import logging
+
+from app.celery_app import celery_app
+from app.database import SessionLocal
+from app.services.activity_log_maintenance import ActivityLogMaintenance
+from app.services.key_rotation import KeyRotationService
+from app.services.request_stats import RequestStatsService
+from app.services.request_status_projection import RequestStatusProjection
+from app.services.scan_checkpoint_service import ScanCheckpointService
+
+logger = logging.getLogger(__name__)
+
+
+@celery_app.task(bind=True, max_retries=5)
+def rotate_encryption_keys_task(self, after_id: str | None = None, batch_size: int = 500):
+    """
+    Background task to re-encrypt stored tokens and Gemini keys with the current key.
+
+    Run after moving the old key to ENCRYPTION_PREVIOUS_KEYS and setting a new
+    ENCRYPTION_KEY. Batches are committed as they go; a retry resumes after the last
+    committed user instead of starting over.
+    """
+    db = SessionLocal()
+    service = KeyRotationService(db)
+
+    try:
+        logger.info(f"Starting encryption key rotation after user {after_id or '(start)'}")
+        result = service.reencrypt(after_id=after_id, batch_size=batch_size)
+
+        logger.info(
+            f"Key rotation completed: {result.users_scanned} users scanned, "
+            f"{result.values_rotated} values re-encrypted, "
+            f"{result.values_unreadable} unreadable"
+        )
+        return {
+            "status": "completed",
+            "users_scanned": result.users_scanned,
+            "values_rotated": result.values_rotated,
+            "values_unreadable": result.values_unreadable,
+        }
+
+    except Exception as exc:
+        db.rollback()
+        resume_after = service.result.last_user_id
+        logger.error(f"Key rotation failed after user {resume_after}: {str(exc)}")
+
+        retry_count = self.request.retries
+        if retry_count < self.max_retries:
+            countdown = 60 * (2**retry_count)
+            raise self.retry(
+                exc=exc,
+                countdown=countdown,
+                kwargs={
+                    "after_id": str(resume_after) if resume_after else None,
+                    "batch_size": batch_size,
+                },
+            )
+        raise
+
+    finally:
+        db.close()
+
+
+@celery_app.task(bind=True, max_retries=3)
+def maintain_activity_logs_task(self):
+    """
+    Background task to roll up recent activity logs and apply log retention.
+
+    Runs daily: creates upcoming monthly partitions, refreshes the daily rollups of
+    yesterday and today, and drops (or deletes) logs past ACTIVITY_LOG_RETENTION_DAYS.
+    Every step is idempotent, so a retry simply runs it again.
+    """
+    db = SessionLocal()
+
+    try:
+        result = ActivityLogMaintenance(db).run()
+        return {
+            "status": "completed",
+            "partitions_created": result.partitions_created,
+            "partitions_dropped": result.partitions_dropped,
+            "rows_deleted": result.rows_deleted,
+            "rollups_written": result.rollups_written,
+        }
+
+    except Exception as exc:
+        db.rollback()
+        logger.error(f"Activity log maintenance failed: {str(exc)}")
+
+        retry_count = self.request.retries
+        if retry_count < self.max_retries:
+            raise self.retry(exc=exc, countdown=15 * 60 * (2**retry_count))
+        raise
+
+    finally:
+        db.close()
+
+
+@celery_app.task(bind=True, max_retries=3)
+def rebuild_request_stats_task(self, user_id: str | None = None):
+    """
+    Background task to recompute user_request_stats from deletion_requests.
+
+    The table is normally kept current as requests change; run this after loading
+    requests outside the ORM or if the totals are ever suspected to have drifted.
+    Runs in one transaction, so a retry starts cleanly.
+    """
+    db = SessionLocal()
+
+    try:
+        users = RequestStatsService(db).rebuild(user_id=user_id)
+        return {"status": "completed", "users": users}
+
+    except Exception as exc:
+        db.rollback()
+        logger.error(f"Request stats rebuild failed: {str(exc)}")
+
+        retry_count = self.request.retries
+        if retry_count < self.max_retries:
+            raise self.retry(exc=exc, countdown=60 * (2**retry_count))
+        raise
+
+    finally:
+        db.close()
+
+
+@celery_app.task
+def project_request_status_events_task():
+    """
+    Background task to fold new request status events into the analytics projection.
+
+    Analytics reads catch the projection up themselves; running this every few minutes
+    keeps that catch-up small. Skips immediately if another catch-up is running.
+    """
+    db = SessionLocal()
+
+    try:
+        applied = RequestStatusProjection(db).catch_up()
+        return {"status": "completed", "events": applied}
+
+    except Exception as exc:
+        db.rollback()
+        logger.error(f"Request status projection failed: {str(exc)}")
+        raise
+
+    finally:
+        db.close()
+
+
+@celery_app.task
+def purge_scan_checkpoints_task():
+    """
+    Background task to delete old scan checkpoints.
+
+    Every scan task leaves a checkpoint behind; they're only needed while the scan can
+    still be retried, so ones older than SCAN_CHECKPOINT_RETENTION_DAYS are removed daily.
+    """
+    db = SessionLocal()
+
+    try:
+        deleted = ScanCheckpointService(db).purge()
+        logger.info(f"Purged {deleted} scan checkpoints")
+        return {"status": "completed", "deleted": deleted}
+
+    except Exception as exc:
+        db.rollback()
+        logger.error(f"Scan checkpoint purge failed: {str(exc)}")
+        raise
+
+    finally:
+        db.close()
@@ -0,0 +1,44 @@
+from functools import lru_cache
+
+from cryptography.fernet import Fernet, InvalidToken, MultiFernet
+
+from app.config import settings
+
+
+@lru_cache(maxsize=4)
+def _cipher(keys: tuple[str, ...]) -> MultiFernet:
+    return MultiFernet([Fernet(key.encode()) for key in keys])
+
+
+def get_cipher() -> MultiFernet:
+    """
+    Cipher for stored secrets, built once per key set
+
+    Encrypts with settings.encryption_key and decrypts with it or any of the
+    previous keys, so values encrypted before a key rotation stay readable.
+    """
+    return _cipher(tuple(settings.encryption_keys))
+
+
+def encrypt_token(token: str) -> str:
+    """Encrypt a token with the current key"""
+    return get_cipher().encrypt(token.encode()).decode()
+
+
+def decrypt_token(encrypted_token: str) -> str:
+    """Decrypt a token encrypted with the current or a previous key"""
+    return get_cipher().decrypt(encrypted_token.encode()).decode()
+
+
+def needs_rotation(encrypted_token: str) -> bool:
+    """Whether a token was encrypted with a key other than the current one"""
+    try:
+        _cipher((settings.encryption_key,)).decrypt(encrypted_token.encode())
+    except InvalidToken:
+        return True
+    return False
+
+
+def rotate_token(encrypted_token: str) -> str:
+    """Re-encrypt a token with the current key"""
+    return get_cipher().rotate(encrypted_token.encode()).decode()
@@ -15,6 +15,8 @@ os.environ.setdefault("ENCRYPTION_KEY", "dGVzdC1lbmNyeXB0aW9uLWtleS0zMmJ5dGVzISE
 os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
 os.environ.setdefault("REDIS_URL", "redis://localhost:6379/0")
 os.environ.setdefault("ENVIRONMENT", "test")
+# Tests have no Redis to pace Gmail calls against
+os.environ.setdefault("GMAIL_QUOTA_ENABLED", "false")
 
 from app.database import Base, get_db
 from app.main import app
@@ -23,6 +25,8 @@ from app.models.broker_response import BrokerResponse, ResponseType
 from app.models.data_broker import DataBroker
 from app.models.deletion_request import DeletionRequest, RequestStatus
 from app.models.user import User
+from app.services.auth_user_cache import auth_user_cache
+from app.services.broker_domain_index import broker_domain_index
 
 # Test database engine (SQLite in-memory)
 TEST_DATABASE_URL = "sqlite:///:memory:"
@@ -39,6 +43,8 @@ TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engin
 def db() -> Generator[Session, None, None]:
     """Create a fresh database session for each test"""
     Base.metadata.create_all(bind=engine)
+    broker_domain_index.invalidate()
+    auth_user_cache.clear()
     session = TestingSessionLocal()
     try:
         yield session
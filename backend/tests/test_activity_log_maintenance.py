@@ -0,0 +1,150 @@
+"""Tests for activity log rollups and retention"""
+
+from datetime import date, datetime, timedelta
+from unittest.mock import MagicMock, patch
+
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app.models.activity_daily_rollup import ActivityDailyRollup
+from app.models.activity_log import ActivityLog, ActivityType
+from app.models.user import User
+from app.services.activity_log_maintenance import ActivityLogMaintenance, partition_name
+
+TODAY = date(2026, 10, 18)
+
+
+def add_logs(db: Session, user: User, day: date, activity_type: ActivityType, count: int):
+    for i in range(count):
+        db.add(
+            ActivityLog(
+                user_id=user.id,
+                activity_type=activity_type,
+                message=f"Entry {i}",
+                created_at=datetime.combine(day, datetime.min.time()) + timedelta(hours=i),
+            )
+        )
+    db.commit()
+
+
+def rollup_counts(db: Session) -> dict:
+    return {
+        (rollup.day, rollup.activity_type): rollup.count
+        for rollup in db.query(ActivityDailyRollup).all()
+    }
+
+
+class TestRollup:
+    """Tests for ActivityLogMaintenance.rollup"""
+
+    def test_counts_per_type_and_day(self, db: Session, test_user: User):
+        """Test that each (user, type, day) gets one rollup row"""
+        yesterday = TODAY - timedelta(days=1)
+        add_logs(db, test_user, yesterday, ActivityType.BROKER_DETECTED, 3)
+        add_logs(db, test_user, yesterday, ActivityType.ERROR, 1)
+        add_logs(db, test_user, TODAY, ActivityType.BROKER_DETECTED, 2)
+
+        written = ActivityLogMaintenance(db).rollup(yesterday, TODAY + timedelta(days=1))
+        db.commit()
+
+        assert written == 3
+        assert rollup_counts(db) == {
+            (yesterday, ActivityType.BROKER_DETECTED): 3,
+            (yesterday, ActivityType.ERROR): 1,
+            (TODAY, ActivityType.BROKER_DETECTED): 2,
+        }
+
+    def test_rerun_overwrites(self, db: Session, test_user: User):
+        """Test that rolling a day up again replaces its counts"""
+        maintenance = ActivityLogMaintenance(db)
+        add_logs(db, test_user, TODAY, ActivityType.INFO, 1)
+        maintenance.rollup(TODAY, TODAY + timedelta(days=1))
+        add_logs(db, test_user, TODAY, ActivityType.INFO, 2)
+        maintenance.rollup(TODAY, TODAY + timedelta(days=1))
+        db.commit()
+
+        assert rollup_counts(db) == {(TODAY, ActivityType.INFO): 3}
+
+
+class TestRetention:
+    """Tests for ActivityLogMaintenance.run on an unpartitioned table"""
+
+    def test_expired_logs_deleted_and_rolled_up(self, db: Session, test_user: User):
+        """Test that logs past retention go, but their daily counts stay"""
+        old_day = TODAY - timedelta(days=40)
+        add_logs(db, test_user, old_day, ActivityType.EMAIL_SCANNED, 2)
+        add_logs(db, test_user, TODAY, ActivityType.EMAIL_SCANNED, 1)
+
+        result = ActivityLogMaintenance(db, retention_days=30).run(today=TODAY)
+
+        assert result.rows_deleted == 2
+        assert result.partitions_dropped == []
+        assert db.query(ActivityLog).count() == 1
+        assert rollup_counts(db) == {
+            (old_day, ActivityType.EMAIL_SCANNED): 2,
+            (TODAY, ActivityType.EMAIL_SCANNED): 1,
+        }
+
+    def test_zero_retention_keeps_logs(self, db: Session, test_user: User):
+        """Test that retention_days=0 disables deletion"""
+        add_logs(db, test_user, TODAY - timedelta(days=400), ActivityType.INFO, 1)
+
+        result = ActivityLogMaintenance(db, retention_days=0).run(today=TODAY)
+
+        assert result.rows_deleted == 0
+        assert db.query(ActivityLog).count() == 1
+
+    def test_partition_names(self):
+        """Test that partition names match the migration's"""
+        assert partition_name(date(2026, 1, 1)) == "activity_logs_p2026_01"
+
+    def test_partition_takes_rows_from_default(self):
+        """Test that a month's rows are moved out of the default partition before attaching"""
+        db = MagicMock()
+        db.execute.return_value.rowcount = 0
+
+        with patch.object(ActivityLogMaintenance, "_partitions", return_value={}):
+            created = ActivityLogMaintenance(db, partitions_ahead=0).ensure_partitions(TODAY)
+
+        statements = [str(call.args[0]) for call in db.execute.call_args_list]
+        assert created == ["activity_logs_p2026_10"]
+        assert statements[0].startswith("CREATE TABLE activity_logs_p2026_10 (LIKE")
+        assert "DELETE FROM activity_logs_default" in statements[1]
+        assert statements[2] == (
+            "ALTER TABLE activity_logs ATTACH PARTITION activity_logs_p2026_10 "
+            "FOR VALUES FROM ('2026-10-01') TO ('2026-11-01')"
+        )
+
+
+class TestDailyCountsEndpoint:
+    """Tests for GET /activities/daily"""
+
+    def test_returns_user_rollups(
+        self, client: TestClient, db: Session, test_user: User, auth_headers: dict
+    ):
+        """Test that the endpoint reads the current user's rollups"""
+        today = datetime.utcnow().date()
+        db.add_all(
+            [
+                ActivityDailyRollup(
+                    user_id=test_user.id,
+                    activity_type=ActivityType.BROKER_DETECTED,
+                    day=today,
+                    count=4,
+                ),
+                ActivityDailyRollup(
+                    user_id=test_user.id,
+                    activity_type=ActivityType.INFO,
+                    day=today - timedelta(days=90),
+                    count=1,
+                ),
+            ]
+        )
+        db.commit()
+
+        response = client.get("/activities/daily?days_back=30", headers=auth_headers)
+
+        assert response.status_code == 200
+        assert response.json() == [
+            {"day": today.isoformat(), "activity_type": "broker_detected", "count": 4}
+        ]
@@ -1,6 +1,7 @@
 """Tests for the activity log service"""
 
 from datetime import datetime, timedelta
+from unittest.mock import patch
 
 from sqlalchemy.orm import Session
 
@@ -67,6 +68,7 @@ class TestActivityLogServiceLogActivity:
             activity_type=ActivityType.INFO,
             message="Test activity",
         )
+        db.commit()
 
         # Query directly to verify persistence
         found = db.query(ActivityLog).filter(ActivityLog.id == activity.id).first()
@@ -236,3 +238,82 @@ class TestActivityLogServiceGetActivities:
         # Most recent should be first (Activity 2)
         assert activities[0].message == "Activity 2"
         assert activities[-1].message == "Activity 0"
+
+
+class TestActivityLogBuffering:
+    """Tests for buffered activity log writes"""
+
+    def test_entries_written_on_commit(self, db: Session, test_user: User):
+        """Test that buffered entries are written with the session's commit"""
+        service = ActivityLogService(db)
+        for i in range(3):
+            service.log_activity(
+                user_id=str(test_user.id),
+                activity_type=ActivityType.BROKER_DETECTED,
+                message=f"Broker {i}",
+            )
+
+        assert db.query(ActivityLog).count() == 0
+        db.commit()
+        assert db.query(ActivityLog).count() == 3
+
+    def test_rollback_discards_entries(self, db: Session, test_user: User):
+        """Test that entries buffered before a rollback aren't written by a later commit"""
+        service = ActivityLogService(db)
+        service.log_activity(
+            user_id=test_user.id, activity_type=ActivityType.ERROR, message="Failed attempt"
+        )
+
+        db.rollback()
+        db.commit()
+
+        assert db.query(ActivityLog).count() == 0
+
+    def test_single_insert_per_flush(self, db: Session, test_user: User):
+        """Test that the buffer is written in one multi-row insert"""
+        service = ActivityLogService(db)
+        for i in range(5):
+            service.log_activity(
+                user_id=test_user.id, activity_type=ActivityType.INFO, message=f"Entry {i}"
+            )
+
+        with patch.object(db, "execute", wraps=db.execute) as execute:
+            assert service.flush() == 5
+
+        execute.assert_called_once()
+        assert db.query(ActivityLog).count() == 5
+        assert service.flush() == 0
+
+    def test_full_buffer_is_flushed(self, db: Session, test_user: User):
+        """Test that filling the buffer writes it without committing"""
+        service = ActivityLogService(db, buffer_size=2)
+        for i in range(3):
+            service.log_activity(
+                user_id=test_user.id, activity_type=ActivityType.INFO, message=f"Entry {i}"
+            )
+
+        assert db.query(ActivityLog).count() == 2
+        db.rollback()
+        assert db.query(ActivityLog).count() == 0
+
+    def test_services_share_session_buffer(self, db: Session, test_user: User):
+        """Test that separate services on one session write together"""
+        for message in ("First", "Second"):
+            ActivityLogService(db).log_activity(
+                user_id=test_user.id, activity_type=ActivityType.INFO, message=message
+            )
+
+        assert ActivityLogService(db).flush() == 2
+
+    def test_sync_returns_persisted_entry(self, db: Session, test_user: User):
+        """Test that sync mode commits the entry and any buffered ones"""
+        service = ActivityLogService(db)
+        service.log_activity(user_id=test_user.id, activity_type=ActivityType.INFO, message="a")
+
+        activity = service.log_activity(
+            user_id=test_user.id, activity_type=ActivityType.ERROR, message="b", sync=True
+        )
+
+        assert activity in db
+        db.rollback()
+        assert db.query(ActivityLog).count() == 2
@@ -1,8 +1,10 @@
 """Tests for the analytics service"""
 
 from datetime import datetime, timedelta
+from unittest.mock import patch
 
 import pytest
+from sqlalchemy import event
 from sqlalchemy.orm import Session
 
 from app.models.broker_response import BrokerResponse, ResponseType
@@ -10,6 +12,7 @@ from app.models.data_broker import DataBroker
 from app.models.deletion_request import DeletionRequest, RequestStatus
 from app.models.user import User
 from app.services.analytics_service import AnalyticsService
+from app.services.request_status_projection import RequestStatusProjection
 
 
 class TestAnalyticsServiceUserStats:
@@ -208,6 +211,81 @@ class TestAnalyticsServiceBrokerRanking:
         assert rankings[1]["broker_name"] == "Low Success Broker"
         assert rankings[1]["success_rate"] == 25.0
 
+    def test_get_broker_ranking_response_time_percentiles(
+        self, db: Session, test_user: User, admin_user: User, test_broker: DataBroker
+    ):
+        """Test average, median and p90 response times, interpolated like percentile_cont"""
+        now = datetime.utcnow()
+        for user, days in [(test_user, 1), (test_user, 2), (test_user, 4), (admin_user, 10)]:
+            db.add(
+                DeletionRequest(
+                    user_id=user.id,
+                    broker_id=test_broker.id,
+                    status=RequestStatus.CONFIRMED,
+                    source="manual",
+                    sent_at=now - timedelta(days=days),
+                    confirmed_at=now,
+                )
+            )
+        # Unconfirmed requests don't count towards response times
+        db.add(
+            DeletionRequest(
+                user_id=test_user.id,
+                broker_id=test_broker.id,
+                status=RequestStatus.SENT,
+                source="manual",
+                sent_at=now - timedelta(days=30),
+            )
+        )
+        db.commit()
+
+        service = AnalyticsService(db)
+        (overall,) = service.get_broker_compliance_ranking(user_id=None)
+        (own,) = service.get_broker_compliance_ranking(test_user.id)
+
+        assert overall["avg_response_time_days"] == 4.2
+        assert overall["median_response_time_days"] == 3.0
+        assert overall["p90_response_time_days"] == 8.2
+        assert own["median_response_time_days"] == 2.0
+        assert own["p90_response_time_days"] == 3.6
+
+    def test_get_broker_ranking_single_query(self, db: Session, test_user: User):
+        """Test that a caught-up ranking is one statement, not reading the requests"""
+        now = datetime.utcnow()
+        for i in range(3):
+            broker = DataBroker(name=f"Broker {i}", domains=[f"b{i}.com"])
+            db.add(broker)
+            db.flush()
+            db.add(
+                DeletionRequest(
+                    user_id=test_user.id,
+                    broker_id=broker.id,
+                    status=RequestStatus.CONFIRMED,
+                    source="manual",
+                    sent_at=now - timedelta(days=i + 1),
+                    confirmed_at=now,
+                )
+            )
+        db.commit()
+        user_id = str(test_user.id)
+        RequestStatusProjection(db).catch_up()
+
+        statements = []
+
+        def listener(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(db.get_bind(), "before_cursor_execute", listener)
+        try:
+            with patch.object(RequestStatusProjection, "catch_up"):
+                rankings = AnalyticsService(db).get_broker_compliance_ranking(user_id)
+        finally:
+            event.remove(db.get_bind(), "before_cursor_execute", listener)
+
+        assert len(rankings) == 3
+        assert len(statements) == 1
+        assert "deletion_requests" not in statements[0]
+
 
 class TestAnalyticsServiceTimeline:
     """Tests for get_timeline_data method"""
@@ -0,0 +1,148 @@
+"""Tests for the async Gmail client"""
+
+import json
+from unittest.mock import MagicMock, patch
+
+import httpx
+import pytest
+
+from app.exceptions import GmailApiError, GmailHistoryUnavailableError, GmailQuotaExceededError
+from app.services.async_gmail_client import GMAIL_API_URL, AsyncGmailClient
+
+
+def make_client(handler, credentials=None) -> AsyncGmailClient:
+    """Build a client whose HTTP calls are answered by handler"""
+    if credentials is None:
+        credentials = MagicMock(valid=True, token="access-token", scopes=[])
+    http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return AsyncGmailClient(credentials, http_client=http_client, max_concurrency=4)
+
+
+class TestAsyncGmailClientListing:
+    """Tests for listing and fetching"""
+
+    async def test_iter_message_pages_follows_next_page_token(self):
+        """Test that pages are requested until nextPageToken runs out"""
+        requests = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            requests.append(request)
+            assert request.headers["Authorization"] == "Bearer access-token"
+            if "pageToken" not in request.url.params:
+                return httpx.Response(
+                    200, json={"messages": [{"id": "msg-1"}], "nextPageToken": "page-2"}
+                )
+            return httpx.Response(200, json={"messages": [{"id": "msg-2"}]})
+
+        client = make_client(handler)
+        pages = [page async for page in client.iter_message_pages("from:broker", 10)]
+
+        assert pages == [[{"id": "msg-1"}], [{"id": "msg-2"}]]
+        assert str(requests[0].url).startswith(f"{GMAIL_API_URL}/messages")
+        assert requests[0].url.params["q"] == "from:broker"
+        assert requests[1].url.params["pageToken"] == "page-2"
+
+    async def test_list_sent_messages_adds_in_sent(self):
+        """Test that sent listings are restricted to the sent folder"""
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            assert request.url.params["q"] == "in:sent to:@broker.com"
+            return httpx.Response(200, json={"messages": [{"id": "sent-1"}]})
+
+        client = make_client(handler)
+        assert await client.list_sent_messages("to:@broker.com") == [{"id": "sent-1"}]
+
+    async def test_get_messages_batch_keeps_order_and_errors(self):
+        """Test that concurrent fetches return per-message results in order"""
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            message_id = request.url.path.rsplit("/", 1)[-1]
+            if message_id == "missing":
+                return httpx.Response(404, json={"error": {"message": "Not Found"}})
+            return httpx.Response(200, json={"id": message_id})
+
+        client = make_client(handler)
+        results = await client.get_messages_batch(["msg-1", "missing", "msg-3"])
+
+        assert [r.message_id for r in results] == ["msg-1", "missing", "msg-3"]
+        assert [r.ok for r in results] == [True, False, True]
+        assert isinstance(results[1].error, GmailApiError)
+        assert results[1].error.status == 404
+
+
+class TestAsyncGmailClientErrors:
+    """Tests for auth refresh and error translation"""
+
+    async def test_refreshes_token_once_on_401(self):
+        """Test that a rejected token is refreshed and the call retried"""
+        credentials = MagicMock(valid=True, token="stale-token")
+
+        def refresh(request):
+            credentials.token = "fresh-token"
+
+        credentials.refresh.side_effect = refresh
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            if request.headers["Authorization"] == "Bearer stale-token":
+                return httpx.Response(401, json={"error": {"message": "Invalid Credentials"}})
+            return httpx.Response(200, json={"historyId": 1234})
+
+        client = make_client(handler, credentials)
+        assert await client.get_history_id() == "1234"
+        credentials.refresh.assert_called_once()
+
+    async def test_rate_limit_raises_quota_error(self):
+        """Test that Gmail rate limit responses raise GmailQuotaExceededError"""
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            body = {
+                "error": {
+                    "message": "User-rate limit exceeded",
+                    "errors": [{"reason": "userRateLimitExceeded"}],
+                }
+            }
+            return httpx.Response(429, json=body, headers={"Retry-After": "30"})
+
+        client = make_client(handler)
+        with pytest.raises(GmailQuotaExceededError) as exc_info:
+            await client.get_message("msg-1")
+
+        assert exc_info.value.retry_after == 30
+
+    async def test_expired_history_cursor(self):
+        """Test that a 404 from history.list means the cursor is unusable"""
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            return httpx.Response(
+                404, json={"error": {"message": "Requested entity was not found"}}
+            )
+
+        client = make_client(handler)
+        with pytest.raises(GmailHistoryUnavailableError):
+            await client.list_history("100")
+
+    async def test_send_email_posts_raw_message(self):
+        """Test sending a message through messages.send"""
+        credentials = MagicMock(
+            valid=True,
+            token="access-token",
+            scopes=["https://www.googleapis.com/auth/gmail.send"],
+        )
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            assert request.method == "POST"
+            assert "raw" in json.loads(request.content)
+            return httpx.Response(200, json={"id": "sent-1", "threadId": "thread-1"})
+
+        client = make_client(handler, credentials)
+        result = await client.send_email("me@example.com", "broker@example.com", "Hi", "Body")
+
+        assert result == {"message_id": "sent-1", "thread_id": "thread-1", "label_ids": []}
+
+    def test_shared_pool_uses_http2(self):
+        """Test that the default connection pool is created with HTTP/2 enabled"""
+        with patch("app.services.async_gmail_client._http_client", None):
+            from app.services import async_gmail_client
+
+            http_client = async_gmail_client.get_async_http_client()
+            assert http_client._transport._pool._http2 is True
@@ -0,0 +1,194 @@
+"""Tests for the auth user cache and the dependency that uses it"""
+
+import uuid
+from unittest.mock import MagicMock, patch
+
+import pytest
+from fastapi.testclient import TestClient
+from redis.exceptions import RedisError
+from sqlalchemy.orm import Session
+
+from app.models.user import User
+from app.services.auth_user_cache import AuthenticatedUser, AuthUserCache, auth_user_cache
+
+
+@pytest.fixture
+def mock_redis():
+    """Mock Redis client; the registered put script is mock_redis.put_script"""
+    client = MagicMock()
+    client.get.return_value = None
+    client.put_script = MagicMock(return_value=1)
+    client.register_script.return_value = client.put_script
+    return client
+
+
+def make_identity(**kwargs) -> AuthenticatedUser:
+    fields = {"id": uuid.uuid4(), "email": "user@example.com", "is_admin": False}
+    fields.update(kwargs)
+    fields.setdefault("has_tokens", True)
+    return AuthenticatedUser(**fields)
+
+
+class TestAuthUserCache:
+    """Tests for AuthUserCache"""
+
+    def test_local_hit_skips_redis(self, mock_redis):
+        """Test that a fresh process entry is served without asking Redis"""
+        cache = AuthUserCache(client=mock_redis)
+        identity = make_identity()
+        cache.put(identity, "0")
+        mock_redis.get.reset_mock()
+
+        assert cache.get(identity.id) == identity
+        mock_redis.get.assert_not_called()
+
+    def test_redis_hit_fills_process_tier(self, mock_redis):
+        """Test that an entry another process stored is read from Redis once"""
+        identity = make_identity(is_admin=True)
+        mock_redis.get.return_value = identity.to_json()
+        cache = AuthUserCache(client=mock_redis)
+
+        assert cache.get(str(identity.id)) == identity
+        assert cache.get(identity.id) == identity
+        mock_redis.get.assert_called_once_with(f"auth_user:{identity.id}")
+
+    def test_expired_local_entry_is_reloaded(self, mock_redis):
+        """Test that process entries only live for the local TTL"""
+        cache = AuthUserCache(client=mock_redis, local_ttl_seconds=5)
+        identity = make_identity()
+
+        with patch("app.services.auth_user_cache.time.monotonic", return_value=100.0):
+            cache.put(identity, "0")
+        with patch("app.services.auth_user_cache.time.monotonic", return_value=106.0):
+            assert cache.get(identity.id) is None
+
+    def test_put_checks_generation(self, mock_redis):
+        """Test that an entry invalidated while it was loaded isn't stored"""
+        mock_redis.put_script.return_value = 0
+        cache = AuthUserCache(client=mock_redis, ttl_seconds=60)
+        identity = make_identity()
+
+        cache.put(identity, "3")
+
+        call = mock_redis.put_script.call_args[1]
+        assert call["keys"] == [f"auth_user:{identity.id}", f"auth_user:generation:{identity.id}"]
+        assert call["args"] == ["3", identity.to_json(), 60]
+        mock_redis.get.return_value = None
+        assert cache.get(identity.id) is None
+
+    def test_invalidate_clears_everywhere(self, mock_redis):
+        """Test that invalidate bumps the generation, deletes and publishes"""
+        cache = AuthUserCache(client=mock_redis)
+        identity = make_identity()
+        cache.put(identity, "0")
+
+        cache.invalidate(identity.id)
+
+        pipeline = mock_redis.pipeline.return_value
+        pipeline.incr.assert_called_once_with(f"auth_user:generation:{identity.id}")
+        pipeline.delete.assert_called_once_with(f"auth_user:{identity.id}")
+        pipeline.publish.assert_called_once_with("auth_user:invalidate", str(identity.id))
+        pipeline.execute.assert_called_once()
+        assert cache.get(identity.id) is None
+
+    def test_published_invalidation_drops_local_entry(self, mock_redis):
+        """Test that an invalidation from another process evicts this process's entry"""
+        cache = AuthUserCache(client=mock_redis)
+        identity = make_identity()
+        cache.put(identity, "0")
+
+        handler = mock_redis.pubsub.return_value.subscribe.call_args[1]["auth_user:invalidate"]
+        handler({"type": "message", "data": str(identity.id)})
+
+        assert cache.get(identity.id) is None
+
+    def test_redis_error_uses_process_tier(self, mock_redis):
+        """Test that the cache fails open to the database and keeps short local entries"""
+        mock_redis.get.side_effect = RedisError("down")
+        cache = AuthUserCache(client=mock_redis)
+        identity = make_identity()
+
+        assert cache.get(identity.id) is None
+        assert cache.generation(identity.id) is None
+        cache.put(identity, None)
+
+        assert cache.get(identity.id) == identity
+        mock_redis.put_script.assert_not_called()
+
+    def test_bounded_size(self, mock_redis):
+        """Test that the least recently used entries are evicted first"""
+        cache = AuthUserCache(client=mock_redis, max_size=2)
+        first, second, third = make_identity(), make_identity(), make_identity()
+        for identity in (first, second, third):
+            cache.put(identity, "0")
+        mock_redis.get.return_value = None
+
+        assert cache.get(first.id) is None
+        assert cache.get(third.id) == third
+
+
+class TestGetCurrentIdentity:
+    """Tests for authenticating through the cache"""
+
+    def test_poll_skips_database_once_cached(
+        self, client: TestClient, db: Session, auth_headers: dict
+    ):
+        """Test that repeated task polls authenticate without querying the database"""
+        with patch("app.api.tasks.AsyncResult") as result:
+            result.return_value.status = "PENDING"
+            assert client.get("/tasks/task-1", headers=auth_headers).status_code == 200
+
+            with patch.object(db, "query", side_effect=AssertionError("database queried")):
+                response = client.get("/tasks/task-1", headers=auth_headers)
+
+        assert response.status_code == 200
+        assert response.json()["state"] == "PENDING"
+
+    def test_revocation_applies_after_invalidate(
+        self, client: TestClient, db: Session, test_user: User, auth_headers: dict
+    ):
+        """Test that revoked tokens are refused as soon as the entry is invalidated"""
+        with patch("app.api.tasks.AsyncResult") as result:
+            result.return_value.status = "PENDING"
+            assert client.get("/tasks/task-1", headers=auth_headers).status_code == 200
+
+            # What POST /admin/users/{id}/revoke-tokens does
+            test_user.encrypted_access_token = None
+            test_user.encrypted_refresh_token = None
+            db.commit()
+            auth_user_cache.invalidate(test_user.id)
+
+            response = client.get("/tasks/task-1", headers=auth_headers)
+
+        assert response.status_code == 401
+        assert response.json()["detail"] == "User must re-authenticate"
+
+    def test_role_change_applies_after_invalidate(
+        self, client: TestClient, db: Session, test_user: User, auth_headers: dict
+    ):
+        """Test that a promotion is seen by the next admin check"""
+        assert client.get("/admin/gmail-quota", headers=auth_headers).status_code == 403
+
+        # What PATCH /admin/users/{id}/role does
+        test_user.is_admin = True
+        db.commit()
+        auth_user_cache.invalidate(test_user.id)
+
+        with patch("app.api.admin.gmail_quota_governor") as governor:
+            governor.usage.return_value = {}
+            response = client.get("/admin/gmail-quota", headers=auth_headers)
+
+        assert response.status_code == 200
+
+    def test_unknown_user_is_rejected(self, client: TestClient, db: Session, test_user: User):
+        """Test that a token for a deleted user is refused"""
+        from app.dependencies.auth import create_access_token
+
+        token = create_access_token(
+            subject=str(uuid.uuid4()), email="x@example.com", is_admin=False
+        )
+
+        response = client.get("/tasks/task-1", headers={"Authorization": f"Bearer {token}"})
+
+        assert response.status_code == 401
+        assert auth_user_cache.get(test_user.id) is None
@@ -0,0 +1,111 @@
+"""Tests for the broker domain index"""
+
+from unittest.mock import patch
+
+from sqlalchemy.orm import Session
+
+from app.models.data_broker import DataBroker
+from app.schemas.broker import BrokerCreate
+from app.services.broker_detector import BrokerDetector
+from app.services.broker_domain_index import BrokerDomainIndex, broker_domain_index
+from app.services.broker_service import BrokerService
+
+
+def make_brokers() -> list[DataBroker]:
+    return [
+        DataBroker(
+            id="broker-1",
+            name="SpyOnYou",
+            domains=["spyonyou.com", "Spy-On-You.net"],
+            privacy_email="Privacy@SpyOnYou.com",
+        ),
+        DataBroker(id="broker-2", name="PeopleSearch Pro", domains=["peoplesearchpro.com"]),
+    ]
+
+
+class TestBrokerDomainIndex:
+    """Tests for BrokerDomainIndex lookups"""
+
+    def test_exact_match(self):
+        """Test that a broker domain matches itself"""
+        index = BrokerDomainIndex(make_brokers())
+        assert index.match_domain("spyonyou.com") == ("broker-1", "spyonyou.com")
+
+    def test_subdomain_match(self):
+        """Test that subdomains resolve to the parent broker domain"""
+        index = BrokerDomainIndex(make_brokers())
+        assert index.match_domain("mail.eu.spy-on-you.net") == ("broker-1", "spy-on-you.net")
+
+    def test_domains_are_normalized(self):
+        """Test that case, leading '@' and trailing dots are ignored"""
+        index = BrokerDomainIndex(make_brokers())
+        assert index.match_domain("@PeopleSearchPro.COM.") == ("broker-2", "peoplesearchpro.com")
+
+    def test_lookalike_domain_does_not_match(self):
+        """Test that a domain merely ending in a broker's name is not a match"""
+        index = BrokerDomainIndex(make_brokers())
+        assert index.match_domain("notspyonyou.com") is None
+        assert index.match_domain("com") is None
+        assert index.match_domain("") is None
+
+    def test_match_email_by_privacy_email_and_domain(self):
+        """Test resolving a recipient address to a broker"""
+        index = BrokerDomainIndex(make_brokers())
+        assert index.match_email("privacy@spyonyou.com") == "broker-1"
+        assert index.match_email("support@peoplesearchpro.com") == "broker-2"
+        assert index.match_email("someone@example.com") is None
+        assert index.match_email(None) is None
+
+    def test_detector_uses_index(self):
+        """Test that BrokerDetector resolves index hits to broker objects"""
+        brokers = make_brokers()
+        broker, confidence, notes = BrokerDetector().detect_broker(
+            "news@mail.peoplesearchpro.com",
+            "mail.peoplesearchpro.com",
+            "",
+            "",
+            "",
+            brokers,
+            BrokerDomainIndex(brokers),
+        )
+        assert broker is brokers[1]
+        assert confidence == 1.0
+        assert notes == "Direct domain match: peoplesearchpro.com"
+
+
+class TestBrokerDomainIndexCache:
+    """Tests for the shared, versioned index"""
+
+    def test_index_reused_while_table_unchanged(self, db: Session, test_broker: DataBroker):
+        """Test that the index is only built once for an unchanged broker table"""
+        first = broker_domain_index.get(db)
+        assert broker_domain_index.get(db) is first
+        assert first.match_domain("www.testbroker.com") == (test_broker.id, "testbroker.com")
+
+    def test_create_broker_rebuilds_index(self, db: Session, test_broker: DataBroker):
+        """Test that a newly created broker is visible to domain lookups"""
+        service = BrokerService(db)
+        assert service.get_broker_by_domain("newbroker.io") is None
+
+        service.create_broker(BrokerCreate(name="New Broker", domains=["newbroker.io"]))
+
+        broker = service.get_broker_by_domain("optout.newbroker.io")
+        assert broker is not None
+        assert broker.name == "New Broker"
+
+    def test_external_table_change_rebuilds_index(self, db: Session, test_broker: DataBroker):
+        """Test that brokers added by another process are picked up via the table version"""
+        first = broker_domain_index.get(db)
+
+        db.add(DataBroker(name="Other Broker", domains=["otherbroker.org"]))
+        db.commit()
+
+        rebuilt = broker_domain_index.get(db)
+        assert rebuilt is not first
+        assert rebuilt.match_domain("otherbroker.org") is not None
+
+    def test_load_brokers_from_json_invalidates_index(self, db: Session):
+        """Test that reloading the broker list drops the cached index"""
+        with patch.object(broker_domain_index, "invalidate") as mock_invalidate:
+            BrokerService(db).load_brokers_from_json()
+        mock_invalidate.assert_called_once()
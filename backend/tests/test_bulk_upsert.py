@@ -0,0 +1,127 @@
+"""Tests for bulk ON CONFLICT upserts"""
+
+import pytest
+from sqlalchemy.orm import Session
+
+from app.models.broker_response import BrokerResponse, ResponseType
+from app.models.email_scan import EmailScan
+from app.models.user import User
+from app.services.bulk_upsert import bulk_upsert
+
+
+def scan_row(user: User, message_id: str, subject: str = "Hello") -> dict:
+    return {
+        "user_id": user.id,
+        "gmail_message_id": message_id,
+        "sender_email": "privacy@testbroker.com",
+        "sender_domain": "testbroker.com",
+        "subject": subject,
+        "email_direction": "received",
+    }
+
+
+def response_row(user: User, message_id: str, response_type: ResponseType) -> dict:
+    return {
+        "user_id": user.id,
+        "gmail_message_id": message_id,
+        "sender_email": "privacy@testbroker.com",
+        "response_type": response_type,
+        "confidence_score": 0.5,
+    }
+
+
+class TestBulkUpsert:
+    """Tests for bulk_upsert"""
+
+    def test_inserts_rows_with_defaults(self, db: Session, test_user: User):
+        """New rows are inserted and counted, with column defaults applied"""
+        result = bulk_upsert(db, EmailScan, [scan_row(test_user, f"msg{i}") for i in range(3)])
+
+        assert (result.inserted, result.updated, result.written) == (3, 0, 3)
+        scans = db.query(EmailScan).all()
+        assert len(scans) == 3
+        assert len({scan.id for scan in scans}) == 3
+        assert all(scan.created_at is not None for scan in scans)
+
+    def test_conflicting_rows_are_skipped(self, db: Session, test_user: User):
+        """Without update columns, rows that already exist are left untouched"""
+        bulk_upsert(db, EmailScan, [scan_row(test_user, "msg1", subject="Original")])
+
+        result = bulk_upsert(
+            db,
+            EmailScan,
+            [scan_row(test_user, "msg1", subject="Changed"), scan_row(test_user, "msg2")],
+        )
+
+        assert (result.inserted, result.updated) == (1, 0)
+        scan = db.query(EmailScan).filter(EmailScan.gmail_message_id == "msg1").one()
+        assert scan.subject == "Original"
+
+    def test_conflicting_rows_are_updated(self, db: Session, test_user: User):
+        """With update columns, existing rows are overwritten and counted as updated"""
+        bulk_upsert(db, BrokerResponse, [response_row(test_user, "msg1", ResponseType.UNKNOWN)])
+
+        result = bulk_upsert(
+            db,
+            BrokerResponse,
+            [
+                response_row(test_user, "msg1", ResponseType.CONFIRMATION),
+                response_row(test_user, "msg2", ResponseType.REJECTION),
+            ],
+            update_columns=["response_type"],
+        )
+
+        assert (result.inserted, result.updated) == (1, 1)
+        db.expire_all()
+        response = db.query(BrokerResponse).filter(BrokerResponse.gmail_message_id == "msg1").one()
+        assert response.response_type == ResponseType.CONFIRMATION
+
+    def test_other_users_rows_are_not_updated(self, db: Session, test_user: User, admin_user: User):
+        """A message ID stored for another user is neither updated nor counted"""
+        bulk_upsert(db, BrokerResponse, [response_row(admin_user, "msg1", ResponseType.UNKNOWN)])
+
+        result = bulk_upsert(
+            db,
+            BrokerResponse,
+            [response_row(test_user, "msg1", ResponseType.CONFIRMATION)],
+            update_columns=["response_type"],
+        )
+
+        assert (result.inserted, result.updated) == (0, 0)
+        db.expire_all()
+        response = db.query(BrokerResponse).one()
+        assert response.user_id == admin_user.id
+        assert response.response_type == ResponseType.UNKNOWN
+
+    def test_repeated_keys_keep_last_row(self, db: Session, test_user: User):
+        """Rows repeating a message ID in one call are written once, last one winning"""
+        result = bulk_upsert(
+            db,
+            EmailScan,
+            [scan_row(test_user, "msg1", subject="First"), scan_row(test_user, "msg1", "Last")],
+        )
+
+        assert result.inserted == 1
+        assert db.query(EmailScan).one().subject == "Last"
+
+    def test_rows_are_written_in_chunks(self, db: Session, test_user: User):
+        """Rows beyond the chunk size go out in further statements"""
+        result = bulk_upsert(
+            db, EmailScan, [scan_row(test_user, f"msg{i}") for i in range(5)], chunk_size=2
+        )
+
+        assert result.inserted == 5
+        assert db.query(EmailScan).count() == 5
+
+    def test_mismatched_columns_raise(self, db: Session, test_user: User):
+        """Every row must name the same columns"""
+        rows = [scan_row(test_user, "msg1"), {**scan_row(test_user, "msg2"), "body_text": "x"}]
+
+        with pytest.raises(ValueError):
+            bulk_upsert(db, EmailScan, rows)
+
+    def test_empty_rows(self, db: Session):
+        """Nothing to write returns an empty result"""
+        result = bulk_upsert(db, EmailScan, [])
+
+        assert result.written == 0
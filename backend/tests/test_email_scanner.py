@@ -1,16 +1,24 @@
 """Tests for the email scanner service"""
 
 import base64
-from datetime import datetime
+from datetime import datetime, timedelta
 from unittest.mock import patch
 
+import pytest
+from sqlalchemy import event
 from sqlalchemy.orm import Session
 
+from app.exceptions import GmailHistoryUnavailableError
 from app.models.data_broker import DataBroker
 from app.models.deletion_request import DeletionRequest, RequestStatus
 from app.models.email_scan import EmailScan
+from app.models.gmail_sync_cursor import GmailSyncCursor
+from app.models.scan_checkpoint import ScanCheckpoint
 from app.models.user import User
-from app.services.email_scanner import EmailScanner
+from app.services.email_scanner import EmailScanner, ScanSummary
+from app.services.gmail_service import MessageFetchResult, MessagePage
+from app.services.scan_checkpoint_service import FULL_MODE, SENT_PHASE, ScanCheckpointService
+from app.services.sync_cursor_service import INBOX_SCOPE, SyncCursorService
 
 
 class TestEmailScannerHelpers:
@@ -56,85 +64,418 @@ class TestEmailScannerHelpers:
         # Service returns current time for invalid dates
         assert isinstance(date, datetime)
 
-    def test_extract_body_plain_text(self, db: Session):
-        """Test extracting plain text body"""
+
+class TestEmailScannerScanInbox:
+    """Tests for scan_inbox method"""
+
+    def test_scan_inbox_empty_gmail(self, db: Session, test_user: User):
+        """Test scanning inbox with no emails"""
         scanner = EmailScanner(db)
 
-        text = "This is the email body"
-        encoded = base64.urlsafe_b64encode(text.encode()).decode()
+        with patch.object(scanner.broker_service, "get_all_brokers", return_value=[]):
+            with patch.object(scanner.gmail_service, "iter_message_pages", return_value=[]):
+                with patch.object(
+                    scanner.gmail_service, "iter_sent_message_pages", return_value=[]
+                ):
+                    scans = scanner.scan_inbox(test_user)
 
-        message = {"payload": {"mimeType": "text/plain", "body": {"data": encoded}}}
+                    assert scans == []
+                    assert test_user.last_scan_at is not None
 
-        body_html, body_text = scanner._extract_body(message)
+    def test_scan_inbox_updates_last_scan(self, db: Session, test_user: User):
+        """Test that scan_inbox updates last_scan_at"""
+        scanner = EmailScanner(db)
+        original_last_scan = test_user.last_scan_at
 
-        assert body_text == text
-        assert body_html == ""
+        with patch.object(scanner.broker_service, "get_all_brokers", return_value=[]):
+            with patch.object(scanner.gmail_service, "iter_message_pages", return_value=[]):
+                with patch.object(
+                    scanner.gmail_service, "iter_sent_message_pages", return_value=[]
+                ):
+                    scanner.scan_inbox(test_user)
 
-    def test_extract_body_html(self, db: Session):
-        """Test extracting HTML body"""
+                    assert test_user.last_scan_at != original_last_scan
+
+
+class TestEmailScannerIncrementalSync:
+    """Tests for history-based incremental scanning"""
+
+    def test_full_scan_records_cursor(self, db: Session, test_user: User):
+        """Test that a full scan stores the mailbox historyId for the next run"""
         scanner = EmailScanner(db)
 
-        html = "<html><body>HTML content</body></html>"
-        encoded = base64.urlsafe_b64encode(html.encode()).decode()
+        with patch.object(scanner.broker_service, "get_all_brokers", return_value=[]):
+            with patch.object(scanner.gmail_service, "get_history_id", return_value="500"):
+                with patch.object(scanner.gmail_service, "iter_message_pages", return_value=[]):
+                    with patch.object(
+                        scanner.gmail_service, "iter_sent_message_pages", return_value=[]
+                    ):
+                        scanner.scan_inbox(test_user, incremental=True)
 
-        message = {"payload": {"mimeType": "text/html", "body": {"data": encoded}}}
+        cursor = SyncCursorService(db).get_cursor(test_user.id, INBOX_SCOPE)
+        assert cursor is not None
+        assert cursor.history_id == "500"
 
-        body_html, body_text = scanner._extract_body(message)
+    def test_incremental_scan_uses_history(self, db: Session, test_user: User):
+        """Test that a stored cursor replaces the date-window listing"""
+        db.add(GmailSyncCursor(user_id=test_user.id, scope=INBOX_SCOPE, history_id="500"))
+        db.commit()
+        scanner = EmailScanner(db)
 
-        assert "HTML content" in body_html
-        # Service also extracts text from HTML
-        assert isinstance(body_text, str)
+        with patch.object(scanner.broker_service, "get_all_brokers", return_value=[]):
+            with patch.object(
+                scanner.gmail_service, "list_history", return_value=([], "510")
+            ) as mock_history:
+                with patch.object(scanner.gmail_service, "iter_message_pages") as mock_list:
+                    with patch.object(
+                        scanner.gmail_service, "iter_sent_message_pages", return_value=[]
+                    ):
+                        scans = scanner.scan_inbox(test_user, max_emails=50, incremental=True)
 
-    def test_extract_body_multipart(self, db: Session):
-        """Test extracting from multipart message"""
+        assert scans == []
+        mock_history.assert_called_once_with(test_user, "500", max_messages=50)
+        mock_list.assert_not_called()
+        cursor = SyncCursorService(db).get_cursor(test_user.id, INBOX_SCOPE)
+        assert cursor.history_id == "510"
+
+    def test_incremental_scan_falls_back_when_cursor_expired(self, db: Session, test_user: User):
+        """Test that an expired cursor triggers a bounded full scan"""
+        db.add(GmailSyncCursor(user_id=test_user.id, scope=INBOX_SCOPE, history_id="1"))
+        db.commit()
         scanner = EmailScanner(db)
 
-        text = "Plain text content"
-        html = "<html>HTML content</html>"
-        text_encoded = base64.urlsafe_b64encode(text.encode()).decode()
-        html_encoded = base64.urlsafe_b64encode(html.encode()).decode()
+        with patch.object(scanner.broker_service, "get_all_brokers", return_value=[]):
+            with patch.object(
+                scanner.gmail_service,
+                "list_history",
+                side_effect=GmailHistoryUnavailableError("expired"),
+            ):
+                with patch.object(scanner.gmail_service, "get_history_id", return_value="900"):
+                    with patch.object(
+                        scanner.gmail_service, "iter_message_pages", return_value=[]
+                    ) as mock_list:
+                        with patch.object(
+                            scanner.gmail_service, "iter_sent_message_pages", return_value=[]
+                        ):
+                            scanner.scan_inbox(
+                                test_user, days_back=30, max_emails=40, incremental=True
+                            )
 
-        message = {
-            "payload": {
-                "parts": [
-                    {"mimeType": "text/plain", "body": {"data": text_encoded}},
-                    {"mimeType": "text/html", "body": {"data": html_encoded}},
-                ]
-            }
-        }
+        assert mock_list.call_args[0][2] == 40
+        cursor = SyncCursorService(db).get_cursor(test_user.id, INBOX_SCOPE)
+        assert cursor.history_id == "900"
 
-        body_html, body_text = scanner._extract_body(message)
+    def test_non_incremental_scan_ignores_cursor(self, db: Session, test_user: User):
+        """Test that incremental=False always lists the date window"""
+        db.add(GmailSyncCursor(user_id=test_user.id, scope=INBOX_SCOPE, history_id="500"))
+        db.commit()
+        scanner = EmailScanner(db)
 
-        assert body_text == text
-        assert body_html == html
+        with patch.object(scanner.broker_service, "get_all_brokers", return_value=[]):
+            with patch.object(scanner.gmail_service, "list_history") as mock_history:
+                with patch.object(scanner.gmail_service, "get_history_id", return_value="600"):
+                    with patch.object(scanner.gmail_service, "iter_message_pages", return_value=[]):
+                        with patch.object(
+                            scanner.gmail_service, "iter_sent_message_pages", return_value=[]
+                        ):
+                            scanner.scan_inbox(test_user)
 
+        mock_history.assert_not_called()
 
-class TestEmailScannerScanInbox:
-    """Tests for scan_inbox method"""
 
-    def test_scan_inbox_empty_gmail(self, db: Session, test_user: User):
-        """Test scanning inbox with no emails"""
+def record_scans(db: Session, test_user: User, direction: str = "received"):
+    """Stand-in for the page processors that records one EmailScan per listed message"""
+
+    def process(user, messages, all_brokers):
+        scans = []
+        for message in messages:
+            scan = EmailScan(
+                user_id=test_user.id,
+                gmail_message_id=message["id"],
+                email_direction=direction,
+                sender_email="sender@example.com",
+                sender_domain="example.com",
+            )
+            db.add(scan)
+            scans.append(scan)
+        return scans
+
+    return process
+
+
+class TestEmailScannerCheckpoints:
+    """Tests for checkpointed, resumable scans"""
+
+    def test_retry_resumes_from_page_token(self, db: Session, test_user: User):
+        """Test that committed pages survive a failure and the retry lists from the checkpoint"""
         scanner = EmailScanner(db)
+        calls = []
+
+        def iter_message_pages(user, query, max_results, page_token=None):
+            calls.append((query, max_results, page_token))
+            if page_token is None:
+                yield MessagePage([{"id": "msg-1"}, {"id": "msg-2"}], "token-2")
+                raise Exception("Connection reset")
+            yield MessagePage([{"id": "msg-3"}])
 
         with patch.object(scanner.broker_service, "get_all_brokers", return_value=[]):
-            with patch.object(scanner.gmail_service, "list_messages", return_value=[]):
+            with patch.object(
+                scanner.gmail_service, "get_history_id", return_value="700"
+            ) as mock_history_id:
+                with patch.object(
+                    scanner.gmail_service, "iter_message_pages", side_effect=iter_message_pages
+                ):
+                    with patch.object(
+                        scanner,
+                        "_process_received_messages",
+                        side_effect=record_scans(db, test_user),
+                    ):
+                        with patch.object(
+                            scanner.gmail_service, "list_sent_messages", return_value=[]
+                        ):
+                            with pytest.raises(Exception, match="Connection reset"):
+                                scanner.scan_inbox(test_user, max_emails=10, scan_id="task-1")
+                            db.rollback()
+
+                            checkpoint = ScanCheckpointService(db).get_checkpoint(
+                                test_user.id, "task-1"
+                            )
+                            assert checkpoint.page_token == "token-2"
+                            assert checkpoint.last_message_id == "msg-2"
+                            assert checkpoint.messages_listed == 2
+                            assert db.query(EmailScan).count() == 2
+
+                            scans = scanner.scan_inbox(test_user, max_emails=10, scan_id="task-1")
+
+        assert [scan.gmail_message_id for scan in scans] == ["msg-3"]
+        assert calls[1] == (calls[0][0], 8, "token-2")
+        mock_history_id.assert_called_once()
+        assert checkpoint.status == "completed"
+        assert checkpoint.attempts == 2
+        assert checkpoint.emails_scanned == 3
+        assert SyncCursorService(db).get_cursor(test_user.id, INBOX_SCOPE).history_id == "700"
+
+    def test_resume_after_last_received_page(self, db: Session, test_user: User):
+        """Test that a failure between the last received page and the sent phase isn't relisted"""
+        db.add(
+            ScanCheckpoint(
+                user_id=test_user.id,
+                scan_id="task-1",
+                mode=FULL_MODE,
+                query="after:2026/09/18",
+                last_message_id="msg-3",
+                messages_listed=3,
+                emails_scanned=3,
+                sent_days_back=30,
+            )
+        )
+        db.commit()
+        scanner = EmailScanner(db)
+
+        with patch.object(scanner.broker_service, "get_all_brokers", return_value=[]):
+            with patch.object(scanner.gmail_service, "iter_message_pages") as mock_list:
                 with patch.object(scanner.gmail_service, "list_sent_messages", return_value=[]):
-                    scans = scanner.scan_inbox(test_user)
+                    assert scanner.scan_inbox(test_user, scan_id="task-1") == []
+
+        mock_list.assert_not_called()
+        checkpoint = ScanCheckpointService(db).get_checkpoint(test_user.id, "task-1")
+        assert checkpoint.status == "completed"
+        assert checkpoint.messages_listed == 3
+        assert checkpoint.emails_scanned == 3
+
+    def test_completed_scan_is_not_rerun(self, db: Session, test_user: User):
+        """Test that a retry after the scan finished does no Gmail work"""
+        db.add(
+            ScanCheckpoint(
+                user_id=test_user.id, scan_id="task-1", status="completed", mode=FULL_MODE
+            )
+        )
+        db.commit()
+        scanner = EmailScanner(db)
 
-                    assert scans == []
-                    assert test_user.last_scan_at is not None
+        with patch.object(scanner.gmail_service, "iter_message_pages") as mock_list:
+            assert scanner.scan_inbox(test_user, scan_id="task-1") == []
 
-    def test_scan_inbox_updates_last_scan(self, db: Session, test_user: User):
-        """Test that scan_inbox updates last_scan_at"""
+        mock_list.assert_not_called()
+
+    def test_resume_in_sent_phase_skips_processed_messages(
+        self, db: Session, test_user: User, test_broker: DataBroker
+    ):
+        """Test that a scan resumed after the received phase continues the sent listing"""
+        earlier = EmailScan(
+            user_id=test_user.id,
+            broker_id=test_broker.id,
+            gmail_message_id="sent-1",
+            email_direction="sent",
+            sender_email=test_user.email,
+            sender_domain="example.com",
+        )
+        db.add(earlier)
+        db.add(
+            ScanCheckpoint(
+                user_id=test_user.id,
+                scan_id="task-1",
+                phase=SENT_PHASE,
+                mode=FULL_MODE,
+                history_id="800",
+                sent_days_back=30,
+                last_message_id="sent-1",
+                emails_scanned=5,
+                broker_message_ids=["sent-1"],
+            )
+        )
+        db.commit()
+        scanner = EmailScanner(db)
+        processed = []
+
+        def process_sent(user, messages, all_brokers):
+            processed.extend(message["id"] for message in messages)
+            return record_scans(db, test_user, "sent")(user, messages, all_brokers)
+
+        with patch.object(scanner.broker_service, "get_all_brokers", return_value=[test_broker]):
+            with patch.object(scanner.gmail_service, "iter_message_pages") as mock_list:
+                with patch.object(
+                    scanner.gmail_service,
+                    "list_sent_messages",
+                    return_value=[{"id": "sent-1"}, {"id": "sent-2"}],
+                ):
+                    with patch.object(scanner, "_process_sent_messages", side_effect=process_sent):
+                        with patch.object(
+                            scanner, "_auto_create_deletion_requests"
+                        ) as mock_auto_create:
+                            scanner.scan_inbox(test_user, scan_id="task-1")
+
+        mock_list.assert_not_called()
+        assert processed == ["sent-2"]
+        assert mock_auto_create.call_args[0][1] == [earlier]
+        checkpoint = ScanCheckpointService(db).get_checkpoint(test_user.id, "task-1")
+        assert checkpoint.emails_scanned == 6
+        assert SyncCursorService(db).get_cursor(test_user.id, INBOX_SCOPE).history_id == "800"
+
+    def test_purge_removes_old_checkpoints(self, db: Session, test_user: User):
+        """Test that checkpoints past retention are deleted and recent ones kept"""
+        service = ScanCheckpointService(db)
+        service.start(test_user.id, "task-old")
+        service.start(test_user.id, "task-new")
+        db.query(ScanCheckpoint).filter(ScanCheckpoint.scan_id == "task-old").update(
+            {"updated_at": datetime.utcnow() - timedelta(days=8)}
+        )
+        db.commit()
+
+        assert service.purge(retention_days=7) == 1
+        assert service.get_checkpoint(test_user.id, "task-old") is None
+        assert service.get_checkpoint(test_user.id, "task-new") is not None
+
+
+class TestEmailScannerStreaming:
+    """Tests for memory-bounded streaming scans"""
+
+    def test_streaming_scan_expunges_chunks_and_returns_summary(
+        self, db: Session, test_user: User, test_broker: DataBroker
+    ):
+        """Test that processed pages leave the session and only counts are returned"""
+        scanner = EmailScanner(db)
+        seen_in_session = []
+
+        def process(user, messages, all_brokers):
+            # Scans from earlier pages must be gone by the time the next page is processed
+            seen_in_session.append(
+                sum(isinstance(obj, EmailScan) for obj in db.identity_map.values())
+            )
+            scans = record_scans(db, test_user)(user, messages, all_brokers)
+            if messages[0]["id"] == "msg-1":
+                scans[0].broker_id = test_broker.id
+                scans[0].is_broker_email = True
+            return scans
+
+        pages = [MessagePage([{"id": "msg-1"}, {"id": "msg-2"}]), MessagePage([{"id": "msg-3"}])]
+
+        with patch.object(scanner.broker_service, "get_all_brokers", return_value=[test_broker]):
+            with patch.object(scanner.gmail_service, "get_history_id", return_value="900"):
+                with patch.object(scanner.gmail_service, "iter_message_pages", return_value=pages):
+                    with patch.object(scanner, "_process_received_messages", side_effect=process):
+                        with patch.object(
+                            scanner.gmail_service, "list_sent_messages", return_value=[]
+                        ):
+                            with patch.object(
+                                scanner, "_auto_create_deletion_requests"
+                            ) as mock_auto_create:
+                                summary = scanner.scan_inbox_streaming(test_user)
+
+        assert summary.emails_scanned == 3
+        assert summary.received_scanned == 3
+        assert summary.broker_emails_found == 1
+        assert summary.broker_message_ids == ["msg-1"]
+        assert seen_in_session == [0, 0]
+        broker_scans = mock_auto_create.call_args[0][1]
+        assert [scan.gmail_message_id for scan in broker_scans] == ["msg-1"]
+        assert db.query(EmailScan).count() == 3
+
+    def test_checkpointed_streaming_scan_reports_totals(self, db: Session, test_user: User):
+        """Test that a resumed streaming scan reports counts from every attempt"""
+        db.add(
+            ScanCheckpoint(
+                user_id=test_user.id,
+                scan_id="task-1",
+                phase=SENT_PHASE,
+                mode=FULL_MODE,
+                emails_scanned=40,
+                broker_emails_found=2,
+            )
+        )
+        db.commit()
         scanner = EmailScanner(db)
-        original_last_scan = test_user.last_scan_at
 
         with patch.object(scanner.broker_service, "get_all_brokers", return_value=[]):
-            with patch.object(scanner.gmail_service, "list_messages", return_value=[]):
-                with patch.object(scanner.gmail_service, "list_sent_messages", return_value=[]):
-                    scanner.scan_inbox(test_user)
+            summary = scanner.scan_inbox_streaming(test_user, scan_id="task-1")
 
-                    assert test_user.last_scan_at != original_last_scan
+        assert summary.emails_scanned == 40
+        assert summary.broker_emails_found == 2
+
+    def test_summary_dedupes_broker_ids_in_order(self, test_broker: DataBroker):
+        """Test that a broker message seen on several pages is listed once, in discovery order"""
+        summary = ScanSummary()
+
+        def scan(message_id: str) -> EmailScan:
+            return EmailScan(
+                gmail_message_id=message_id, broker_id=test_broker.id, email_direction="received"
+            )
+
+        summary.add([scan("msg-2"), scan("msg-1")])
+        summary.add([scan("msg-1"), scan("msg-3")])
+
+        assert summary.broker_message_ids == ["msg-2", "msg-1", "msg-3"]
+        assert summary.emails_scanned == 4
+
+    def test_streaming_chunk_not_reloaded_after_commit(self, db: Session, test_user: User):
+        """Test that counting a committed chunk doesn't reload its scans one by one"""
+        scanner = EmailScanner(db)
+        scanner._summary = ScanSummary()
+        checkpoint = ScanCheckpointService(db).start(test_user.id, "task-1")
+        scans = [
+            EmailScan(
+                user_id=test_user.id,
+                gmail_message_id=f"msg-{i}",
+                email_direction="received",
+                sender_email="privacy@example.com",
+                sender_domain="example.com",
+            )
+            for i in range(5)
+        ]
+        db.add_all(scans)
+        statements = []
+
+        def listener(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(db.get_bind(), "before_cursor_execute", listener)
+        try:
+            scanner._finish_chunk(checkpoint, [{"id": "msg-4"}], scans)
+        finally:
+            event.remove(db.get_bind(), "before_cursor_execute", listener)
+
+        assert scanner._summary.emails_scanned == 5
+        assert not [s for s in statements if s.startswith("SELECT") and "email_scans" in s]
 
 
 class TestEmailScannerReceivedEmails:
@@ -160,7 +501,7 @@ class TestEmailScannerReceivedEmails:
         scanner = EmailScanner(db)
 
         with patch.object(
-            scanner.gmail_service, "list_messages", return_value=[{"id": "existing-msg-123"}]
+            scanner.gmail_service, "iter_message_pages", return_value=[[{"id": "existing-msg-123"}]]
         ):
             scans = scanner._scan_received_emails(test_user, 90, 100, [test_broker])
 
@@ -168,6 +509,38 @@ class TestEmailScannerReceivedEmails:
             assert len(scans) == 1
             assert scans[0].id == existing_scan.id
 
+    def test_find_existing_scans_uses_chunked_in_queries(self, db: Session, test_user: User):
+        """Test that existing scans are resolved per chunk of IDs, not per message"""
+        for message_id in ("known-1", "known-2", "known-3"):
+            db.add(
+                EmailScan(
+                    user_id=test_user.id,
+                    gmail_message_id=message_id,
+                    email_direction="received",
+                    sender_email="broker@example.com",
+                    sender_domain="example.com",
+                )
+            )
+        db.commit()
+
+        scanner = EmailScanner(db)
+        statements = []
+
+        def listener(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(db.get_bind(), "before_cursor_execute", listener)
+        try:
+            with patch.object(EmailScanner, "EXISTENCE_CHECK_CHUNK_SIZE", 2):
+                existing = scanner._find_existing_scans(
+                    ["known-1", "unknown", "known-2", "known-3"]
+                )
+        finally:
+            event.remove(db.get_bind(), "before_cursor_execute", listener)
+
+        assert set(existing) == {"known-1", "known-2", "known-3"}
+        assert len(statements) == 2
+
     def test_scan_received_creates_new_scan(
         self, db: Session, test_user: User, test_broker: DataBroker
     ):
@@ -191,8 +564,12 @@ class TestEmailScannerReceivedEmails:
             },
         }
 
-        with patch.object(scanner.gmail_service, "list_messages", return_value=message_list):
-            with patch.object(scanner.gmail_service, "get_message", return_value=message_data):
+        with patch.object(scanner.gmail_service, "iter_message_pages", return_value=[message_list]):
+            with patch.object(
+                scanner.gmail_service,
+                "get_messages_batch",
+                return_value=[MessageFetchResult(message_id="new-msg-456", message=message_data)],
+            ):
                 with patch.object(
                     scanner.gmail_service,
                     "get_message_headers",
@@ -217,15 +594,164 @@ class TestEmailScannerReceivedEmails:
 
         message_list = [{"id": "error-msg-789"}]
 
-        with patch.object(scanner.gmail_service, "list_messages", return_value=message_list):
+        with patch.object(scanner.gmail_service, "iter_message_pages", return_value=[message_list]):
             with patch.object(
-                scanner.gmail_service, "get_message", side_effect=Exception("Gmail API error")
+                scanner.gmail_service,
+                "get_messages_batch",
+                return_value=[
+                    MessageFetchResult(
+                        message_id="error-msg-789", error=Exception("Gmail API error")
+                    )
+                ],
             ):
                 scans = scanner._scan_received_emails(test_user, 90, 100, [test_broker])
 
                 # Should return empty list, not crash
                 assert scans == []
 
+    def test_scan_received_fetches_in_one_batch(
+        self, db: Session, test_user: User, test_broker: DataBroker
+    ):
+        """Test that all listed messages are screened through a single metadata batch call"""
+        scanner = EmailScanner(db)
+
+        def make_message(message_id: str) -> dict:
+            return {
+                "id": message_id,
+                "threadId": f"thread-{message_id}",
+                "payload": {
+                    "headers": [
+                        {"name": "From", "value": "news@example.org"},
+                        {"name": "Subject", "value": f"Hello {message_id}"},
+                        {"name": "Date", "value": "Mon, 01 Jan 2024 12:00:00 +0000"},
+                    ],
+                    "mimeType": "text/plain",
+                    "body": {"data": base64.urlsafe_b64encode(b"Body").decode()},
+                },
+            }
+
+        message_list = [{"id": "batch-1"}, {"id": "batch-2"}, {"id": "batch-3"}]
+        batch_results = [
+            MessageFetchResult(message_id="batch-1", message=make_message("batch-1")),
+            MessageFetchResult(message_id="batch-2", error=Exception("Not found")),
+            MessageFetchResult(message_id="batch-3", message=make_message("batch-3")),
+        ]
+
+        with patch.object(scanner.gmail_service, "iter_message_pages", return_value=[message_list]):
+            with patch.object(
+                scanner.gmail_service, "get_messages_batch", return_value=batch_results
+            ) as mock_batch:
+                scans = scanner._scan_received_emails(test_user, 90, 100, [test_broker])
+
+                # Nothing looks like broker mail, so no full payload is downloaded
+                mock_batch.assert_called_once_with(
+                    test_user, ["batch-1", "batch-2", "batch-3"], format="metadata"
+                )
+                # Failed item is skipped, order of the rest is preserved
+                assert [s.gmail_message_id for s in scans] == ["batch-1", "batch-3"]
+                assert all(s.body_text is None for s in scans)
+
+    def test_scan_received_downloads_only_candidates(
+        self, db: Session, test_user: User, test_broker: DataBroker
+    ):
+        """Test that only messages passing metadata screening are fetched in full"""
+        scanner = EmailScanner(db)
+
+        def make_message(message_id: str, sender: str, subject: str, snippet: str) -> dict:
+            return {
+                "id": message_id,
+                "threadId": f"thread-{message_id}",
+                "snippet": snippet,
+                "payload": {
+                    "headers": [
+                        {"name": "From", "value": sender},
+                        {"name": "Subject", "value": subject},
+                        {"name": "Date", "value": "Mon, 01 Jan 2024 12:00:00 +0000"},
+                    ],
+                    "mimeType": "text/plain",
+                    "body": {"data": base64.urlsafe_b64encode(b"Full body").decode()},
+                },
+            }
+
+        messages = {
+            "from-broker": make_message(
+                "from-broker", f"privacy@{test_broker.domains[0]}", "Hello", "Hi there"
+            ),
+            "keyword": make_message(
+                "keyword", "news@example.org", "Update", "How to opt out of people search"
+            ),
+            "newsletter": make_message(
+                "newsletter", "news@example.org", "Weekly digest", "Top stories &amp; more"
+            ),
+        }
+        calls = []
+
+        def get_messages_batch(user, ids, format):
+            calls.append((format, ids))
+            results = []
+            for message_id in ids:
+                message = messages[message_id]
+                if format == "metadata":
+                    payload = {"headers": message["payload"]["headers"]}
+                    message = {**message, "payload": payload}
+                results.append(MessageFetchResult(message_id=message_id, message=message))
+            return results
+
+        with patch.object(
+            scanner.gmail_service,
+            "iter_message_pages",
+            return_value=[[{"id": message_id} for message_id in messages]],
+        ):
+            with patch.object(
+                scanner.gmail_service, "get_messages_batch", side_effect=get_messages_batch
+            ):
+                scans = scanner._scan_received_emails(test_user, 90, 100, [test_broker])
+
+        assert calls == [
+            ("metadata", ["from-broker", "keyword", "newsletter"]),
+            ("full", ["from-broker", "keyword"]),
+        ]
+        by_id = {scan.gmail_message_id: scan for scan in scans}
+        assert by_id["from-broker"].broker_id == test_broker.id
+        assert by_id["from-broker"].body_text == "Full body"
+        assert by_id["keyword"].body_text == "Full body"
+        assert by_id["newsletter"].body_text is None
+        assert by_id["newsletter"].body_preview == "Top stories & more"
+        assert by_id["newsletter"].is_broker_email is False
+
+    def test_scan_received_processes_each_page(
+        self, db: Session, test_user: User, test_broker: DataBroker
+    ):
+        """Test that every listed page is fetched and processed on its own"""
+        scanner = EmailScanner(db)
+        pages = [[{"id": "page1-msg"}], [{"id": "page2-msg"}]]
+
+        with patch.object(scanner.gmail_service, "iter_message_pages", return_value=pages):
+            with patch.object(
+                scanner.gmail_service,
+                "get_messages_batch",
+                side_effect=lambda user, ids, format: [
+                    MessageFetchResult(message_id=i, error=Exception("Not found")) for i in ids
+                ],
+            ) as mock_batch:
+                scanner._scan_received_emails(test_user, 90, 100, [test_broker])
+
+        assert [c[0][1] for c in mock_batch.call_args_list] == [["page1-msg"], ["page2-msg"]]
+
+    def test_scan_received_wraps_page_errors(
+        self, db: Session, test_user: User, test_broker: DataBroker
+    ):
+        """Test that a failure listing a later page is reported as a fetch failure"""
+        scanner = EmailScanner(db)
+
+        def pages(*args):
+            yield []
+            raise Exception("Page token expired")
+
+        with patch.object(scanner.gmail_service, "iter_message_pages", side_effect=pages):
+            with pytest.raises(Exception, match="Failed to fetch received emails"):
+                scanner._scan_received_emails(test_user, 90, 100, [test_broker])
+
 
 class TestEmailScannerSentEmails:
     """Tests for _scan_sent_broker_emails method"""
@@ -242,7 +768,9 @@ class TestEmailScannerSentEmails:
         """Test that sent email scan builds correct query"""
         scanner = EmailScanner(db)
 
-        with patch.object(scanner.gmail_service, "list_sent_messages", return_value=[]) as mock:
+        with patch.object(
+            scanner.gmail_service, "iter_sent_message_pages", return_value=[]
+        ) as mock:
             scanner._scan_sent_broker_emails(test_user, 90, 100, [test_broker])
 
             # Verify query includes broker domains and privacy email
@@ -269,7 +797,9 @@ class TestEmailScannerSentEmails:
         scanner = EmailScanner(db)
 
         with patch.object(
-            scanner.gmail_service, "list_sent_messages", return_value=[{"id": "sent-msg-123"}]
+            scanner.gmail_service,
+            "iter_sent_message_pages",
+            return_value=[[{"id": "sent-msg-123"}]],
         ):
             scans = scanner._scan_sent_broker_emails(test_user, 90, 100, [test_broker])
 
@@ -364,6 +894,166 @@ class TestEmailScannerAutoCreateRequests:
         requests = db.query(DeletionRequest).filter_by(broker_id=test_broker.id).all()
         assert len(requests) == 1
 
+    def test_auto_create_prefetches_only_needed_threads(
+        self, db: Session, test_user: User, test_broker: DataBroker
+    ):
+        """Test that only threads of sent emails getting a new request are downloaded"""
+        requested_broker = DataBroker(name="Already Requested", domains=["requested.com"])
+        db.add(requested_broker)
+        db.flush()
+        db.add(
+            DeletionRequest(
+                user_id=test_user.id,
+                broker_id=requested_broker.id,
+                status=RequestStatus.SENT,
+                source="manual",
+            )
+        )
+
+        scans = [
+            EmailScan(
+                user_id=test_user.id,
+                broker_id=broker_id,
+                gmail_message_id=f"sent-{thread_id}",
+                gmail_thread_id=thread_id,
+                email_direction="sent",
+                sender_email=test_user.email,
+                sender_domain="example.com",
+            )
+            for broker_id, thread_id in [
+                (test_broker.id, "thread-new"),
+                (test_broker.id, "thread-duplicate"),
+                (requested_broker.id, "thread-requested"),
+            ]
+        ]
+        db.add_all(scans)
+        db.commit()
+
+        scanner = EmailScanner(db)
+        confirmation = {
+            "payload": {
+                "headers": [
+                    {"name": "From", "value": "privacy@testbroker.com"},
+                    {"name": "Subject", "value": "Your data has been deleted"},
+                ],
+                "mimeType": "text/plain",
+                "body": {"data": base64.urlsafe_b64encode(b"Your data has been deleted").decode()},
+            }
+        }
+
+        with patch.object(
+            scanner.gmail_service, "get_thread_messages", return_value=[confirmation]
+        ) as mock_thread:
+            scanner._auto_create_deletion_requests(test_user, scans)
+
+        mock_thread.assert_called_once_with(test_user, "thread-new", format="metadata")
+        request = db.query(DeletionRequest).filter_by(broker_id=test_broker.id).one()
+        assert request.status == RequestStatus.CONFIRMED
+
+
+def metadata_reply(message_id: str, subject: str, snippet: str) -> dict:
+    """A broker reply as returned by a format="metadata" thread fetch"""
+    return {
+        "id": message_id,
+        "snippet": snippet,
+        "payload": {
+            "headers": [
+                {"name": "From", "value": "privacy@testbroker.com"},
+                {"name": "Subject", "value": subject},
+            ]
+        },
+    }
+
+
+class TestEmailScannerThreadAnalysis:
+    """Tests for metadata-first thread analysis and the per-scan thread cache"""
+
+    def test_confident_snippet_needs_no_body(self, db: Session, test_user: User):
+        """Test that a reply classified from its snippet is not downloaded"""
+        scanner = EmailScanner(db)
+        reply = metadata_reply("reply-1", "Deletion complete", "Your data has been deleted")
+
+        with patch.object(scanner.gmail_service, "get_thread_messages", return_value=[reply]):
+            with patch.object(scanner.gmail_service, "get_message") as mock_get:
+                status = scanner._analyze_thread_status(test_user, "thread-1", None)
+
+        assert status == RequestStatus.CONFIRMED
+        mock_get.assert_not_called()
+
+    def test_inconclusive_snippet_reads_full_body(self, db: Session, test_user: User):
+        """Test that an inconclusive snippet triggers one full fetch of that reply"""
+        scanner = EmailScanner(db)
+        reply = metadata_reply("reply-1", "Re: your request", "Thanks for contacting us")
+        full_reply = {
+            "id": "reply-1",
+            "payload": {
+                "mimeType": "text/plain",
+                "body": {
+                    "data": base64.urlsafe_b64encode(
+                        b"Thanks for contacting us. Your data has been deleted and removed."
+                    ).decode()
+                },
+            },
+        }
+
+        with patch.object(scanner.gmail_service, "get_thread_messages", return_value=[reply]):
+            with patch.object(
+                scanner.gmail_service, "get_message", return_value=full_reply
+            ) as mock_get:
+                status = scanner._analyze_thread_status(test_user, "thread-1", None)
+                scanner._analyze_thread_status(test_user, "thread-1", None)
+
+        assert status == RequestStatus.CONFIRMED
+        mock_get.assert_called_once_with(test_user, "reply-1")
+
+    def test_thread_fetched_once_per_scan(self, db: Session, test_user: User):
+        """Test that a thread shared by several scans is fetched once and reset per scan"""
+        scanner = EmailScanner(db)
+        reply = metadata_reply("reply-1", "Deletion complete", "Your data has been deleted")
+
+        with patch.object(
+            scanner.gmail_service, "get_thread_messages", return_value=[reply]
+        ) as mock_thread:
+            scanner._analyze_thread_status(test_user, "thread-1", None)
+            scanner._analyze_thread_status(test_user, "thread-1", None)
+            assert mock_thread.call_count == 1
+
+            scanner._reset_scan_caches()
+            scanner._analyze_thread_status(test_user, "thread-1", None)
+            assert mock_thread.call_count == 2
+
+    def test_prefetch_batches_inconclusive_replies(
+        self, db: Session, test_user: User, test_broker: DataBroker
+    ):
+        """Test that prefetching downloads bodies only for inconclusive replies"""
+        scan = EmailScan(
+            user_id=test_user.id,
+            broker_id=test_broker.id,
+            gmail_message_id="sent-1",
+            gmail_thread_id="thread-1",
+            email_direction="sent",
+            sender_email=test_user.email,
+            sender_domain="example.com",
+        )
+        db.add(scan)
+        db.commit()
+        scanner = EmailScanner(db)
+        thread = [
+            metadata_reply("clear", "Deletion complete", "Your data has been deleted"),
+            metadata_reply("unclear", "Re: your request", "Thanks for contacting us"),
+        ]
+
+        with patch.object(scanner.gmail_service, "get_thread_messages", return_value=thread):
+            with patch.object(
+                scanner.gmail_service,
+                "get_messages_batch",
+                return_value=[MessageFetchResult(message_id="unclear", error=Exception("gone"))],
+            ) as mock_batch:
+                scanner._prefetch_threads(test_user, [scan])
+
+        mock_batch.assert_called_once_with(test_user, ["unclear"], format="full")
+        assert scanner._reply_cache == {"unclear": None}
+
 
 class TestEmailScannerAnalysis:
     """Tests for email analysis methods"""
@@ -430,8 +1120,16 @@ class TestEmailScannerIntegration:
         }
 
         with patch.object(scanner.broker_service, "get_all_brokers", return_value=[test_broker]):
-            with patch.object(scanner.gmail_service, "list_messages", return_value=message_list):
-                with patch.object(scanner.gmail_service, "get_message", return_value=message_data):
+            with patch.object(
+                scanner.gmail_service, "iter_message_pages", return_value=[message_list]
+            ):
+                with patch.object(
+                    scanner.gmail_service,
+                    "get_messages_batch",
+                    return_value=[
+                        MessageFetchResult(message_id="broker-msg-1", message=message_data)
+                    ],
+                ):
                     with patch.object(
                         scanner.gmail_service,
                         "get_message_headers",
@@ -443,7 +1141,7 @@ class TestEmailScannerIntegration:
                         },
                     ):
                         with patch.object(
-                            scanner.gmail_service, "list_sent_messages", return_value=[]
+                            scanner.gmail_service, "iter_sent_message_pages", return_value=[]
                         ):
                             scans = scanner.scan_inbox(test_user)
 
@@ -460,3 +1158,94 @@ class TestEmailScannerIntegration:
                             # Auto-creation depends on broker detection confidence
                             # Just verify no errors occurred
                             assert isinstance(requests, list)
+
+
+class FakeAsyncGmailClient:
+    """In-memory stand-in for AsyncGmailClient"""
+
+    def __init__(self, received: list[dict], sent: list[dict] | None = None):
+        self.messages = {message["id"]: message for message in received + (sent or [])}
+        self.received = received
+        self.sent = sent or []
+
+    async def get_history_id(self) -> str:
+        return "5000"
+
+    async def iter_message_pages(self, query: str = "", max_results: int = 100):
+        if self.received:
+            yield [{"id": message["id"]} for message in self.received]
+
+    async def list_sent_messages(self, query: str = "", max_results: int = 100) -> list[dict]:
+        return [{"id": message["id"]} for message in self.sent]
+
+    async def get_messages_batch(self, message_ids: list[str], format: str = "full"):
+        return [
+            MessageFetchResult(message_id=message_id, message=self.messages[message_id])
+            for message_id in message_ids
+        ]
+
+    async def get_thread_messages(self, thread_id: str, format: str = "full") -> list[dict]:
+        return []
+
+
+class TestEmailScannerAsync:
+    """Tests for the async scan path used by the API"""
+
+    async def test_scan_inbox_async_creates_scans_and_cursor(
+        self, db: Session, test_user: User, test_broker: DataBroker
+    ):
+        """Test that the async scan stores broker emails and the history cursor"""
+        scanner = EmailScanner(db)
+        message = {
+            "id": "async-msg-1",
+            "threadId": "thread-1",
+            "payload": {
+                "headers": [
+                    {"name": "From", "value": f"privacy@{test_broker.domains[0]}"},
+                    {"name": "To", "value": test_user.email},
+                    {"name": "Subject", "value": "Your data request"},
+                    {"name": "Date", "value": "Mon, 01 Jan 2024 12:00:00 +0000"},
+                ],
+                "mimeType": "text/plain",
+                "body": {"data": base64.urlsafe_b64encode(b"We received it").decode()},
+            },
+        }
+
+        scans = await scanner.scan_inbox_async(
+            test_user, gmail_client=FakeAsyncGmailClient([message])
+        )
+
+        assert [scan.gmail_message_id for scan in scans] == ["async-msg-1"]
+        assert scans[0].broker_id == test_broker.id
+        assert db.query(EmailScan).filter_by(user_id=test_user.id).count() == 1
+        cursor = SyncCursorService(db).get_cursor(test_user.id, INBOX_SCOPE)
+        assert cursor.history_id == "5000"
+        assert test_user.last_scan_at is not None
+
+    async def test_scan_inbox_async_skips_existing(
+        self, db: Session, test_user: User, test_broker: DataBroker
+    ):
+        """Test that already-scanned messages are not fetched again"""
+        db.add(
+            EmailScan(
+                user_id=test_user.id,
+                gmail_message_id="async-msg-1",
+                sender_email="someone@example.com",
+                sender_domain="example.com",
+                email_direction="received",
+                body_text="Already downloaded",
+            )
+        )
+        db.commit()
+        scanner = EmailScanner(db)
+        client = FakeAsyncGmailClient([{"id": "async-msg-1"}])
+
+        async def no_fetch(message_ids, format="full"):
+            assert message_ids == []
+            return []
+
+        with patch.object(client, "get_messages_batch", side_effect=no_fetch):
+            scans = await scanner.scan_inbox_async(test_user, gmail_client=client)
+
+        assert len(scans) == 1
+        assert scans[0].gmail_message_id == "async-msg-1"
@@ -0,0 +1,94 @@
+"""Tests for email scan API endpoints"""
+
+from unittest.mock import AsyncMock, patch
+
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app.models.activity_log import ActivityLog, ActivityType
+from app.models.data_broker import DataBroker
+from app.models.email_scan import EmailScan
+from app.models.user import User
+from app.services.email_scanner import EmailScanner
+
+
+class TestScanEmails:
+    """Tests for POST /emails/scan"""
+
+    def test_scan_returns_results(
+        self,
+        client: TestClient,
+        db: Session,
+        test_user: User,
+        test_broker: DataBroker,
+        auth_headers: dict,
+    ):
+        """Test that the endpoint awaits the async scan and logs the result"""
+        scan = EmailScan(
+            user_id=test_user.id,
+            broker_id=test_broker.id,
+            gmail_message_id="msg-1",
+            sender_email="privacy@testbroker.com",
+            sender_domain="testbroker.com",
+            email_direction="received",
+            is_broker_email=True,
+            confidence_score=0.9,
+        )
+        db.add(scan)
+        db.commit()
+
+        with patch.object(
+            EmailScanner, "scan_inbox_async", new=AsyncMock(return_value=[scan])
+        ) as scan_inbox:
+            response = client.post(
+                "/emails/scan", json={"days_back": 30, "max_emails": 50}, headers=auth_headers
+            )
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["total_scanned"] == 1
+        assert data["broker_emails_found"] == 1
+        assert scan_inbox.await_args.kwargs == {"days_back": 30, "max_emails": 50}
+        assert (
+            db.query(ActivityLog).filter_by(activity_type=ActivityType.BROKER_DETECTED).count() == 1
+        )
+
+    def test_scan_failure_logs_error(self, client: TestClient, db: Session, auth_headers: dict):
+        """Test that a failed scan returns 500 and records an error activity"""
+        with patch.object(
+            EmailScanner,
+            "scan_inbox_async",
+            new=AsyncMock(side_effect=Exception("Gmail unavailable")),
+        ):
+            response = client.post("/emails/scan", json={}, headers=auth_headers)
+
+        assert response.status_code == 500
+        assert "Gmail unavailable" in response.json()["detail"]
+        assert db.query(ActivityLog).filter_by(activity_type=ActivityType.ERROR).count() == 1
+
+
+class TestScanHistory:
+    """Tests for GET /emails/scan-history"""
+
+    def test_pages_with_total(
+        self, client: TestClient, db: Session, test_user: User, auth_headers: dict
+    ):
+        """Test that each page carries the full count of scan entries"""
+        for i in range(3):
+            db.add(
+                ActivityLog(
+                    user_id=test_user.id,
+                    activity_type=ActivityType.EMAIL_SCANNED,
+                    message=f"Email scan completed: {i} emails scanned, 0 broker emails found",
+                )
+            )
+        db.add(ActivityLog(user_id=test_user.id, activity_type=ActivityType.INFO, message="x"))
+        db.commit()
+
+        first = client.get("/emails/scan-history?limit=2", headers=auth_headers).json()
+        past_end = client.get("/emails/scan-history?offset=5", headers=auth_headers).json()
+
+        assert len(first["items"]) == 2
+        assert first["total"] == 3
+        assert past_end["items"] == []
+        assert past_end["total"] == 3
@@ -0,0 +1,107 @@
+"""Tests for the Gmail API client cache"""
+
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app.models.user import User
+from app.services.gmail_client_cache import GmailClientCache, gmail_client_cache
+from app.services.gmail_service import GmailService
+
+
+@pytest.fixture(autouse=True)
+def clear_gmail_client_cache():
+    """Keep cached clients from leaking between tests"""
+    gmail_client_cache.clear()
+    yield
+    gmail_client_cache.clear()
+
+
+class TestGmailClientCache:
+    """Tests for GmailClientCache class"""
+
+    def test_get_returns_cached_client(self, test_user: User):
+        """Test that a stored client is returned for the same tokens"""
+        cache = GmailClientCache(max_size=4, ttl_seconds=60)
+        client = object()
+
+        cache.put(test_user, client)
+
+        assert cache.get(test_user) is client
+
+    def test_token_change_misses(self, test_user: User):
+        """Test that changing stored tokens stops returning the old client"""
+        cache = GmailClientCache(max_size=4, ttl_seconds=60)
+        cache.put(test_user, object())
+
+        test_user.encrypted_access_token = "rotated-token"
+
+        assert cache.get(test_user) is None
+
+    def test_put_replaces_clients_for_old_tokens(self, test_user: User):
+        """Test that only the latest tokens keep an entry per user"""
+        cache = GmailClientCache(max_size=4, ttl_seconds=60)
+        cache.put(test_user, object())
+        test_user.encrypted_access_token = "rotated-token"
+        cache.put(test_user, object())
+
+        assert len(cache) == 1
+
+    def test_entries_expire(self, test_user: User):
+        """Test that entries past their TTL are evicted"""
+        cache = GmailClientCache(max_size=4, ttl_seconds=60)
+
+        with patch("app.services.gmail_client_cache.time.monotonic", return_value=1000.0):
+            cache.put(test_user, object())
+        with patch("app.services.gmail_client_cache.time.monotonic", return_value=1061.0):
+            assert cache.get(test_user) is None
+
+        assert len(cache) == 0
+
+    def test_evicts_least_recently_used(self, test_user: User, admin_user: User):
+        """Test that the cache stays within max_size"""
+        cache = GmailClientCache(max_size=1, ttl_seconds=60)
+        cache.put(test_user, object())
+        cache.put(admin_user, object())
+
+        assert cache.get(test_user) is None
+        assert cache.get(admin_user) is not None
+
+    def test_invalidate(self, test_user: User):
+        """Test dropping all clients for a user"""
+        cache = GmailClientCache(max_size=4, ttl_seconds=60)
+        cache.put(test_user, object())
+
+        cache.invalidate(str(test_user.id))
+
+        assert cache.get(test_user) is None
+
+
+class TestGmailServiceClientReuse:
+    """Tests for GmailService.get_gmail_client"""
+
+    def test_client_built_once_per_user(self, test_user: User):
+        """Test that repeated calls reuse the cached client"""
+        service = GmailService()
+
+        with patch.object(service, "get_credentials") as mock_credentials:
+            with patch("app.services.gmail_service.build_from_document") as mock_build:
+                mock_build.return_value = MagicMock()
+
+                first = service.get_gmail_client(test_user)
+                second = service.get_gmail_client(test_user)
+
+                assert first is second
+                mock_build.assert_called_once()
+                mock_credentials.assert_called_once()
+
+    def test_client_built_from_bundled_discovery_document(self, test_user: User):
+        """Test that a real client is built offline from the static discovery document"""
+        service = GmailService()
+
+        with patch.object(test_user, "get_access_token", return_value="access-token"):
+            with patch.object(test_user, "get_refresh_token", return_value="refresh-token"):
+                client = service.get_gmail_client(test_user)
+
+        request = client.users().messages().get(userId="me", id="msg-1", format="metadata")
+        assert "gmail/v1/users/me/messages/msg-1" in request.uri
@@ -0,0 +1,155 @@
+"""Tests for the Gmail query planner"""
+
+import threading
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy.orm import Session
+
+from app.models.data_broker import DataBroker
+from app.models.user import User
+from app.services.email_scanner import EmailScanner
+from app.services.gmail_query_planner import GmailQueryPlanner
+from app.services.scan_pool import ScanIOPool, UserConcurrencyLimiter
+
+
+class TestGmailQueryPlannerPlan:
+    """Tests for splitting targets into queries"""
+
+    def test_short_target_list_is_one_query(self):
+        """Test that targets fitting the limit produce the classic single OR-query"""
+        planner = GmailQueryPlanner(max_query_length=200)
+
+        queries = planner.plan("to", ["@b.com", "@a.com", "@a.com"], suffix="after:2024/01/01")
+
+        assert queries == ["(to:@a.com OR to:@b.com) after:2024/01/01"]
+
+    def test_long_target_list_is_sharded(self):
+        """Test that every shard fits the limit and each target appears exactly once"""
+        planner = GmailQueryPlanner(max_query_length=120)
+        targets = [f"@broker-{i:03d}.example.com" for i in range(40)]
+
+        queries = planner.plan("from", targets, suffix="after:2024/01/01 in:inbox")
+
+        assert len(queries) > 1
+        assert all(len(query) <= 120 for query in queries)
+        terms = [term.strip("()") for query in queries for term in query.split(" ")]
+        assert sorted(t for t in terms if t.startswith("from:")) == [
+            f"from:{target}" for target in sorted(targets)
+        ]
+        assert all(query.endswith(") after:2024/01/01 in:inbox") for query in queries)
+
+    def test_prefix_counts_towards_limit(self):
+        """Test that shards leave room for the prefix the caller puts in front"""
+        planner = GmailQueryPlanner(max_query_length=120)
+        targets = [f"@broker-{i:03d}.example.com" for i in range(40)]
+
+        queries = planner.plan("to", targets, suffix="after:2024/01/01", prefix_length=8)
+
+        assert all(len(f"in:sent {query}") <= 120 for query in queries)
+        assert max(len(f"in:sent {query}") for query in queries) > 100
+
+    def test_no_targets(self):
+        """Test that an empty target list produces no queries"""
+        assert GmailQueryPlanner().plan("to", []) == []
+
+
+class TestGmailQueryPlannerListing:
+    """Tests for listing shards and merging the results"""
+
+    @pytest.fixture
+    def pool(self):
+        pool = ScanIOPool(max_workers=4, limiter=UserConcurrencyLimiter(4))
+        yield pool
+        pool.shutdown()
+
+    def test_list_messages_merges_and_dedupes(self, pool: ScanIOPool, test_user: User):
+        """Test that shard results are merged round-robin without duplicates"""
+        results = {
+            "q1": [{"id": "a"}, {"id": "b"}, {"id": "c"}],
+            "q2": [{"id": "b"}, {"id": "d"}],
+        }
+        planner = GmailQueryPlanner()
+
+        listing = planner.list_messages(pool, test_user, ["q1", "q2"], results.__getitem__, 10)
+
+        assert [m["id"] for m in listing.messages] == ["a", "b", "d", "c"]
+        assert [(t.query, t.messages) for t in listing.timings] == [("q1", 3), ("q2", 2)]
+        assert all(t.seconds >= 0 for t in listing.timings)
+        assert [[m["id"] for m in page] for page in listing.pages(3)] == [["a", "b", "d"], ["c"]]
+
+    def test_list_messages_respects_max_results(self, pool: ScanIOPool, test_user: User):
+        """Test that the merged listing is cut at max_results, taking from every shard"""
+        results = {
+            "q1": [{"id": "a1"}, {"id": "a2"}, {"id": "a3"}],
+            "q2": [{"id": "b1"}, {"id": "b2"}],
+        }
+
+        listing = GmailQueryPlanner().list_messages(
+            pool, test_user, ["q1", "q2"], results.__getitem__, 3
+        )
+
+        assert [m["id"] for m in listing.messages] == ["a1", "b1", "a2"]
+
+    def test_list_messages_runs_shards_concurrently(self, pool: ScanIOPool, test_user: User):
+        """Test that shard list calls overlap on the pool"""
+        barrier = threading.Barrier(3, timeout=5)
+
+        def list_fn(query: str) -> list[dict]:
+            barrier.wait()
+            return [{"id": query}]
+
+        listing = GmailQueryPlanner().list_messages(
+            pool, test_user, ["q1", "q2", "q3"], list_fn, 10
+        )
+
+        assert [m["id"] for m in listing.messages] == ["q1", "q2", "q3"]
+
+    def test_list_messages_raises_shard_error(self, pool: ScanIOPool, test_user: User):
+        """Test that a failed shard fails the listing"""
+
+        def list_fn(query: str) -> list[dict]:
+            if query == "q2":
+                raise Exception("Invalid query")
+            return []
+
+        with pytest.raises(Exception, match="Invalid query"):
+            GmailQueryPlanner().list_messages(pool, test_user, ["q1", "q2"], list_fn, 10)
+
+    async def test_alist_messages(self):
+        """Test the async variant merges the same way"""
+
+        async def list_fn(query: str) -> list[dict]:
+            return [{"id": f"{query}-1"}, {"id": "shared"}]
+
+        listing = await GmailQueryPlanner().alist_messages(["q1", "q2"], list_fn, 10)
+
+        assert [m["id"] for m in listing.messages] == ["q1-1", "q2-1", "shared"]
+        assert len(listing.timings) == 2
+
+
+class TestSentScanSharding:
+    """Tests for sharded sent-email listing in EmailScanner"""
+
+    def test_scan_sent_lists_every_shard(
+        self, db: Session, test_user: User, test_broker: DataBroker
+    ):
+        """Test that broker targets beyond the query limit are all searched"""
+        scanner = EmailScanner(db)
+        scanner.query_planner = GmailQueryPlanner(max_query_length=60)
+        queries = []
+
+        def list_sent_messages(user, query, max_results):
+            queries.append(query)
+            return []
+
+        with patch.object(
+            scanner.gmail_service, "list_sent_messages", side_effect=list_sent_messages
+        ):
+            scanner._scan_sent_broker_emails(test_user, 90, 100, [test_broker])
+
+        assert len(queries) > 1
+        searched = " ".join(queries)
+        assert "to:@testbroker.com" in searched
+        assert "to:@test-broker.net" in searched
+        assert "to:privacy@testbroker.com" in searched
@@ -0,0 +1,395 @@
+"""Tests for the Gmail quota governor"""
+
+from unittest.mock import MagicMock, Mock, patch
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from googleapiclient.errors import HttpError
+from redis.exceptions import RedisError
+
+from app.exceptions import GmailQuotaExceededError
+from app.models.user import User
+from app.services.async_gmail_client import AsyncGmailClient
+from app.services.gmail_client_cache import gmail_client_cache
+from app.services.gmail_quota import GmailQuotaGovernor, quota_error_from_http_error
+from app.services.gmail_service import GmailService
+
+
+def rate_limit_error(status: int = 429, retry_after: str | None = "7") -> HttpError:
+    resp = Mock()
+    resp.status = status
+    resp.headers = {"Retry-After": retry_after} if retry_after else {}
+    error = HttpError(resp=resp, content=b"")
+    error.error_details = [{"reason": "userRateLimitExceeded"}]
+    return error
+
+
+@pytest.fixture
+def mock_redis():
+    """Mock Redis client; the registered acquire script is mock_redis.script"""
+    with patch("app.services.gmail_quota.redis.Redis.from_url") as mock:
+        mock_client = MagicMock()
+        mock_client.script = MagicMock(return_value=0)
+        mock_client.register_script.return_value = mock_client.script
+        mock.return_value = mock_client
+        yield mock_client
+
+
+def make_governor(**kwargs) -> GmailQuotaGovernor:
+    options = {
+        "enabled": True,
+        "user_units_per_second": 250,
+        "project_units_per_second": 20_000,
+        "max_wait_seconds": 10,
+    }
+    options.update(kwargs)
+    return GmailQuotaGovernor(**options)
+
+
+class TestGmailQuotaGovernorAcquire:
+    """Tests for taking quota units from the buckets"""
+
+    def test_granted_immediately(self, mock_redis):
+        """Test that a granted call doesn't wait and charges the method's cost"""
+        governor = make_governor()
+
+        with patch("app.services.gmail_quota.time.sleep") as sleep:
+            with patch("app.services.gmail_quota.time.time", return_value=1_700_000_030):
+                assert governor.acquire("user-1", "messages.get", calls=3) == 0
+
+        sleep.assert_not_called()
+        call = mock_redis.script.call_args[1]
+        assert call["keys"] == [
+            "gmail_quota:user:user-1",
+            "gmail_quota:project",
+            "gmail_quota:blocked:user:user-1",
+            "gmail_quota:blocked:project",
+            f"gmail_quota:units:{1_700_000_030 // 60}",
+        ]
+        assert call["args"] == [15, 250, 250, 20_000, 20_000]
+
+    def test_waits_for_refill(self, mock_redis):
+        """Test that the caller sleeps for the wait the script reports, then retries"""
+        mock_redis.script.side_effect = [400, 0]
+        governor = make_governor()
+
+        with patch("app.services.gmail_quota.time.sleep") as sleep:
+            assert governor.acquire("user-1", "messages.list") == 0.4
+
+        sleep.assert_called_once_with(0.4)
+        assert mock_redis.script.call_count == 2
+
+    def test_raises_when_wait_exceeds_max(self, mock_redis):
+        """Test that a wait longer than max_wait_seconds raises instead of sleeping"""
+        mock_redis.script.return_value = 30_000
+        governor = make_governor(max_wait_seconds=5)
+
+        with patch("app.services.gmail_quota.time.sleep") as sleep:
+            with pytest.raises(GmailQuotaExceededError) as exc_info:
+                governor.acquire("user-1", "messages.send")
+
+        sleep.assert_not_called()
+        assert exc_info.value.retry_after == 30
+
+    def test_cost_above_capacity_charged_in_parts(self, mock_redis):
+        """Test that a batch costlier than the bucket is charged in full, a bucket at a time"""
+        # Each part after the first waits a second for the bucket to refill
+        mock_redis.script.side_effect = [0] + [1000, 0] * 4
+        governor = make_governor(user_units_per_second=100)
+
+        with patch("app.services.gmail_quota.time.sleep") as sleep:
+            assert governor.acquire("user-1", "messages.get", calls=100) == 4.0
+
+        charges = [call[1]["args"][0] for call in mock_redis.script.call_args_list]
+        assert charges == [100] * 9
+        assert sleep.call_count == 4
+
+    def test_remainder_charged(self, mock_redis):
+        """Test that a cost that isn't a multiple of the capacity is charged exactly"""
+        governor = make_governor(user_units_per_second=100)
+
+        governor.acquire("user-1", "messages.get", calls=30)
+
+        charges = [call[1]["args"][0] for call in mock_redis.script.call_args_list]
+        assert charges == [100, 50]
+
+    def test_disabled_skips_redis(self, mock_redis):
+        """Test that a disabled governor never talks to Redis"""
+        governor = make_governor(enabled=False)
+
+        assert governor.acquire("user-1", "messages.get") == 0
+        mock_redis.script.assert_not_called()
+
+    def test_fails_open_and_backs_off(self, mock_redis):
+        """Test that Redis errors let calls through and Redis is skipped for a while"""
+        mock_redis.script.side_effect = RedisError("Connection refused")
+        governor = make_governor()
+
+        assert governor.acquire("user-1", "messages.get") == 0
+        assert governor.acquire("user-1", "messages.get") == 0
+
+        assert mock_redis.script.call_count == 1
+        assert governor.usage()["available"] is False
+
+    async def test_acquire_async(self, mock_redis):
+        """Test that the async variant waits without blocking the loop"""
+        mock_redis.script.side_effect = [10, 0]
+        governor = make_governor()
+
+        assert await governor.acquire_async("user-1", "threads.get") == 0.01
+        assert mock_redis.script.call_count == 2
+        assert mock_redis.script.call_args[1]["args"][0] == 10
+
+
+class TestGmailQuotaGovernorPenalize:
+    """Tests for honouring Retry-After"""
+
+    def test_blocks_user_for_retry_after(self, mock_redis):
+        """Test that the user's block key expires after Retry-After"""
+        assert make_governor().penalize("user-1", 7) is True
+
+        mock_redis.set.assert_called_once_with("gmail_quota:blocked:user:user-1", 1, px=7000)
+
+    def test_default_block_and_project_block(self, mock_redis):
+        """Test the fallback block period and the project-wide block"""
+        make_governor().penalize(None)
+
+        mock_redis.set.assert_called_once_with("gmail_quota:blocked:project", 1, px=5000)
+
+    def test_redis_error(self, mock_redis):
+        """Test that a block that couldn't be recorded is reported"""
+        mock_redis.set.side_effect = RedisError("Connection refused")
+
+        assert make_governor().penalize("user-1", 7) is False
+
+
+class TestGmailQuotaGovernorUsage:
+    """Tests for the usage report"""
+
+    def test_usage(self, mock_redis):
+        """Test bucket levels, blocks and per-minute units"""
+        now_ms = 1_700_000_000_000
+        mock_redis.time.return_value = (now_ms // 1000, 0)
+        mock_redis.hmget.side_effect = [("19000", str(now_ms - 10)), ("50", str(now_ms - 100))]
+        mock_redis.pttl.side_effect = [-2, 3500]
+        mock_redis.mget.return_value = ["120", None, "80"]
+
+        usage = make_governor().usage("user-1", minutes=3)
+
+        assert usage["project"]["available_units"] == 19200
+        assert usage["project"]["blocked_for_seconds"] == 0
+        assert usage["user"]["available_units"] == 75
+        assert usage["user"]["blocked_for_seconds"] == 3.5
+        assert usage["units_per_minute"] == [120, 0, 80]
+        minute = now_ms // 60000
+        mock_redis.mget.assert_called_once_with(
+            [f"gmail_quota:units:{minute - offset}" for offset in range(3)]
+        )
+
+
+class TestQuotaErrorFromHttpError:
+    """Tests for recognising rate-limit responses"""
+
+    def test_rate_limit(self):
+        """Test that rate-limit errors carry Retry-After"""
+        error = quota_error_from_http_error(rate_limit_error(403, "12"))
+
+        assert isinstance(error, GmailQuotaExceededError)
+        assert error.retry_after == 12
+
+    def test_project_limit(self):
+        """Test that project-scoped reasons are told apart from per-user ones"""
+        project_error = rate_limit_error()
+        project_error.error_details = [{"reason": "quotaExceeded"}]
+
+        assert quota_error_from_http_error(project_error).project_wide is True
+        assert quota_error_from_http_error(rate_limit_error()).project_wide is False
+
+    def test_other_errors(self):
+        """Test that non rate-limit errors are not translated"""
+        not_found = Mock(status=404, headers={})
+        forbidden = rate_limit_error(403)
+        forbidden.error_details = [{"reason": "insufficientPermissions"}]
+
+        assert quota_error_from_http_error(HttpError(resp=not_found, content=b"")) is None
+        assert quota_error_from_http_error(forbidden) is None
+
+
+class TestGmailServiceQuota:
+    """Tests for quota pacing in GmailService"""
+
+    @pytest.fixture(autouse=True)
+    def governor(self):
+        gmail_client_cache.clear()
+        with patch("app.services.gmail_service.gmail_quota_governor") as governor:
+            governor.penalize.return_value = True
+            yield governor
+        gmail_client_cache.clear()
+
+    def test_calls_acquire_budget(self, test_user: User, governor):
+        """Test that each API call acquires its method's units for the user"""
+        service = GmailService()
+
+        with patch.object(service, "get_credentials"):
+            with patch("app.services.gmail_service.build_from_document") as mock_build:
+                mock_service = MagicMock()
+                mock_service.users().getProfile().execute.return_value = {"historyId": 42}
+                mock_build.return_value = mock_service
+
+                assert service.get_history_id(test_user) == "42"
+
+        governor.acquire.assert_called_once_with(test_user.id, "getProfile")
+
+    def test_rate_limited_call_is_retried_after_block(self, test_user: User, governor):
+        """Test that a 429 blocks the user for Retry-After and the call is retried"""
+        service = GmailService()
+
+        with patch.object(service, "get_credentials"):
+            with patch("app.services.gmail_service.build_from_document") as mock_build:
+                mock_service = MagicMock()
+                mock_service.users().messages().get().execute.side_effect = [
+                    rate_limit_error(),
+                    {"id": "msg-1"},
+                ]
+                mock_build.return_value = mock_service
+
+                assert service.get_message(test_user, "msg-1") == {"id": "msg-1"}
+
+        governor.penalize.assert_called_once_with(test_user.id, 7)
+        assert governor.acquire.call_count == 2
+
+    def test_project_rate_limit_blocks_project(self, test_user: User, governor):
+        """Test that a project-wide rate limit blocks every user, not just this one"""
+        service = GmailService()
+        project_error = rate_limit_error()
+        project_error.error_details = [{"reason": "rateLimitExceeded"}]
+
+        with patch.object(service, "get_credentials"):
+            with patch("app.services.gmail_service.build_from_document") as mock_build:
+                mock_service = MagicMock()
+                mock_service.users().messages().get().execute.side_effect = [
+                    project_error,
+                    {"id": "msg-1"},
+                ]
+                mock_build.return_value = mock_service
+
+                assert service.get_message(test_user, "msg-1") == {"id": "msg-1"}
+
+        governor.penalize.assert_called_once_with(None, 7)
+
+    def test_rate_limit_without_shared_block_raises(self, test_user: User, governor):
+        """Test that the call isn't retried when the block couldn't be recorded"""
+        governor.penalize.return_value = False
+        service = GmailService()
+
+        with patch.object(service, "get_credentials"):
+            with patch("app.services.gmail_service.build_from_document") as mock_build:
+                mock_service = MagicMock()
+                mock_service.users().messages().get().execute.side_effect = rate_limit_error()
+                mock_build.return_value = mock_service
+
+                with pytest.raises(GmailQuotaExceededError):
+                    service.get_message(test_user, "msg-1")
+
+        assert governor.acquire.call_count == 1
+
+    def test_batch_acquires_per_chunk_and_retries_rate_limited_items(
+        self, test_user: User, governor
+    ):
+        """Test that a batch is charged per inner call and rate-limited items are refetched"""
+        from tests.test_gmail_service import FakeBatchHttpRequest
+
+        service = GmailService()
+
+        with patch.object(service, "get_credentials"):
+            with patch("app.services.gmail_service.build_from_document") as mock_build:
+                mock_service = MagicMock()
+                mock_service.users().messages().get().execute.side_effect = [
+                    {"id": "msg-1"},
+                    rate_limit_error(retry_after="3"),
+                    {"id": "msg-3"},
+                    {"id": "msg-2"},
+                ]
+                mock_service.new_batch_http_request.side_effect = FakeBatchHttpRequest
+                mock_build.return_value = mock_service
+
+                results = service.get_messages_batch(test_user, ["msg-1", "msg-2", "msg-3"])
+
+        assert [r.message for r in results] == [{"id": "msg-1"}, {"id": "msg-2"}, {"id": "msg-3"}]
+        assert [c.kwargs["calls"] for c in governor.acquire.call_args_list] == [3, 1]
+        governor.penalize.assert_called_once_with(test_user.id, 3)
+
+    def test_send_is_not_retried(self, test_user: User, governor):
+        """Test that rate-limited sends surface to the caller for rescheduling"""
+        service = GmailService()
+
+        with patch.object(service, "has_send_permission", return_value=True):
+            with patch.object(service, "get_credentials"):
+                with patch("app.services.gmail_service.build_from_document") as mock_build:
+                    mock_service = MagicMock()
+                    mock_service.users().messages().send().execute.side_effect = rate_limit_error()
+                    mock_build.return_value = mock_service
+
+                    with pytest.raises(GmailQuotaExceededError):
+                        service.send_email(test_user, "privacy@broker.com", "Subject", "Body")
+
+        governor.acquire.assert_called_once_with(test_user.id, "messages.send")
+        governor.penalize.assert_called_once_with(test_user.id, 7)
+
+
+class TestAsyncGmailClientQuota:
+    """Tests for quota pacing in AsyncGmailClient"""
+
+    async def test_rate_limited_request_is_retried(self):
+        """Test that a 429 blocks the user and the request is retried"""
+        responses = [
+            httpx.Response(
+                429,
+                json={"error": {"errors": [{"reason": "userRateLimitExceeded"}]}},
+                headers={"Retry-After": "2"},
+            ),
+            httpx.Response(200, json={"historyId": 99}),
+        ]
+        http_client = httpx.AsyncClient(transport=httpx.MockTransport(lambda r: responses.pop(0)))
+        credentials = MagicMock(valid=True, token="access-token", scopes=[])
+        client = AsyncGmailClient(credentials, http_client=http_client, user_id="user-1")
+
+        with patch("app.services.async_gmail_client.gmail_quota_governor") as governor:
+            governor.acquire_async = MagicMock(side_effect=self._granted)
+            governor.penalize.return_value = True
+
+            assert await client.get_history_id() == "99"
+
+        assert [c.args for c in governor.acquire_async.call_args_list] == [
+            ("user-1", "getProfile"),
+            ("user-1", "getProfile"),
+        ]
+        governor.penalize.assert_called_once_with("user-1", 2)
+
+    @staticmethod
+    async def _granted(*args, **kwargs) -> float:
+        return 0.0
+
+
+class TestGmailQuotaEndpoint:
+    """Tests for GET /admin/gmail-quota"""
+
+    def test_requires_admin(self, client: TestClient, auth_headers: dict):
+        """Test that non-admin users are rejected"""
+        response = client.get("/admin/gmail-quota", headers=auth_headers)
+
+        assert response.status_code == 403
+
+    def test_returns_usage(self, client: TestClient, admin_auth_headers: dict):
+        """Test that admins get the governor's usage report"""
+        with patch("app.api.admin.gmail_quota_governor") as governor:
+            governor.usage.return_value = {"enabled": True, "units_per_minute": [10]}
+
+            response = client.get(
+                "/admin/gmail-quota", params={"user_id": "user-1"}, headers=admin_auth_headers
+            )
+
+        assert response.status_code == 200
+        assert response.json()["units_per_minute"] == [10]
+        governor.usage.assert_called_once_with("user-1")
@@ -1,17 +1,44 @@
 """Tests for the Gmail service"""
 
-import base64
 from unittest.mock import MagicMock, Mock, patch
 
 import pytest
 from google.oauth2.credentials import Credentials
 from googleapiclient.errors import HttpError
 
-from app.exceptions import GmailQuotaExceededError
+from app.exceptions import GmailHistoryUnavailableError, GmailQuotaExceededError
 from app.models.user import User
+from app.services.gmail_client_cache import gmail_client_cache
 from app.services.gmail_service import GmailService
 
 
+@pytest.fixture(autouse=True)
+def clear_gmail_client_cache():
+    """Keep cached clients (and their mocks) from leaking between tests"""
+    gmail_client_cache.clear()
+    yield
+    gmail_client_cache.clear()
+
+
+class FakeBatchHttpRequest:
+    """Local stand-in for the Gmail batch endpoint that runs queued requests on execute()"""
+
+    def __init__(self, callback):
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request, request_id=None):
+        self.requests.append((request_id, request))
+
+    def execute(self):
+        for request_id, request in self.requests:
+            try:
+                response, exception = request.execute(), None
+            except Exception as e:
+                response, exception = None, e
+            self.callback(request_id, response, exception)
+
+
 class TestGmailServiceOAuth:
     """Tests for OAuth-related methods"""
 
@@ -102,7 +129,7 @@ class TestGmailServiceMessages:
         service = GmailService()
 
         with patch.object(service, "get_credentials"):
-            with patch("app.services.gmail_service.build") as mock_build:
+            with patch("app.services.gmail_service.build_from_document") as mock_build:
                 mock_list = MagicMock()
                 mock_list.execute.return_value = {"messages": [{"id": "msg-1"}, {"id": "msg-2"}]}
                 mock_messages = MagicMock()
@@ -123,7 +150,7 @@ class TestGmailServiceMessages:
         service = GmailService()
 
         with patch.object(service, "get_credentials"):
-            with patch("app.services.gmail_service.build") as mock_build:
+            with patch("app.services.gmail_service.build_from_document") as mock_build:
                 mock_service = MagicMock()
                 mock_service.users().messages().list().execute.return_value = {}
                 mock_build.return_value = mock_service
@@ -132,12 +159,76 @@ class TestGmailServiceMessages:
 
                 assert messages == []
 
+    def test_iter_message_pages_follows_next_page_token(self, test_user: User):
+        """Test that listing keeps requesting pages until nextPageToken runs out"""
+        service = GmailService()
+
+        with patch.object(service, "get_credentials"):
+            with patch("app.services.gmail_service.build_from_document") as mock_build:
+                mock_service = MagicMock()
+                mock_list = mock_service.users().messages().list
+                mock_list.return_value.execute.side_effect = [
+                    {"messages": [{"id": "msg-1"}, {"id": "msg-2"}], "nextPageToken": "page-2"},
+                    {"messages": [{"id": "msg-3"}]},
+                ]
+                mock_build.return_value = mock_service
+
+                pages = list(service.iter_message_pages(test_user, "from:broker", 10, page_size=2))
+
+                assert pages == [[{"id": "msg-1"}, {"id": "msg-2"}], [{"id": "msg-3"}]]
+                first_call, second_call = mock_list.call_args_list[-2:]
+                assert "pageToken" not in first_call[1]
+                assert first_call[1]["maxResults"] == 2
+                assert second_call[1]["pageToken"] == "page-2"
+
+    def test_iter_message_pages_resumes_from_page_token(self, test_user: User):
+        """Test that pages carry the token of the next page and a listing can start from it"""
+        service = GmailService()
+
+        with patch.object(service, "get_credentials"):
+            with patch("app.services.gmail_service.build_from_document") as mock_build:
+                mock_service = MagicMock()
+                mock_list = mock_service.users().messages().list
+                mock_list.return_value.execute.side_effect = [
+                    {"messages": [{"id": "msg-3"}], "nextPageToken": "page-3"},
+                    {"messages": [{"id": "msg-4"}]},
+                ]
+                mock_build.return_value = mock_service
+                mock_list.reset_mock()
+
+                pages = list(service.iter_message_pages(test_user, "", 10, page_token="page-2"))
+
+                assert [page.next_page_token for page in pages] == ["page-3", None]
+                assert mock_list.call_args_list[0][1]["pageToken"] == "page-2"
+
+    def test_iter_message_pages_stops_at_max_results(self, test_user: User):
+        """Test that no further pages are requested once max_results refs are yielded"""
+        service = GmailService()
+
+        with patch.object(service, "get_credentials"):
+            with patch("app.services.gmail_service.build_from_document") as mock_build:
+                mock_service = MagicMock()
+                mock_list = mock_service.users().messages().list
+                mock_list.return_value.execute.side_effect = [
+                    {"messages": [{"id": "msg-1"}, {"id": "msg-2"}], "nextPageToken": "page-2"},
+                    {"messages": [{"id": "msg-3"}], "nextPageToken": "page-3"},
+                ]
+                mock_build.return_value = mock_service
+                mock_list.reset_mock()
+
+                messages = service.list_messages(test_user, max_results=3)
+
+                assert [m["id"] for m in messages] == ["msg-1", "msg-2", "msg-3"]
+                assert mock_list.call_count == 2
+                # The last request only asks for what is still needed
+                assert mock_list.call_args_list[1][1]["maxResults"] == 1
+
     def test_get_message(self, test_user: User):
         """Test getting a specific message"""
         service = GmailService()
 
         with patch.object(service, "get_credentials"):
-            with patch("app.services.gmail_service.build") as mock_build:
+            with patch("app.services.gmail_service.build_from_document") as mock_build:
                 mock_get = MagicMock()
                 mock_get.execute.return_value = {"id": "msg-123", "payload": {"headers": []}}
                 mock_messages = MagicMock()
@@ -186,7 +277,7 @@ class TestGmailServiceMessages:
         service = GmailService()
 
         with patch.object(service, "get_credentials"):
-            with patch("app.services.gmail_service.build") as mock_build:
+            with patch("app.services.gmail_service.build_from_document") as mock_build:
                 mock_service = MagicMock()
                 # List returns message IDs
                 mock_service.users().messages().list().execute.return_value = {
@@ -197,6 +288,7 @@ class TestGmailServiceMessages:
                     {"id": "msg-1", "payload": {"body": {"data": "dGVzdA=="}}},
                     {"id": "msg-2", "payload": {"body": {"data": "dGVzdDI="}}},
                 ]
+                mock_service.new_batch_http_request.side_effect = FakeBatchHttpRequest
                 mock_build.return_value = mock_service
 
                 messages = service.search_messages(test_user, query="from:broker", max_results=2)
@@ -210,7 +302,7 @@ class TestGmailServiceMessages:
         service = GmailService()
 
         with patch.object(service, "get_credentials"):
-            with patch("app.services.gmail_service.build") as mock_build:
+            with patch("app.services.gmail_service.build_from_document") as mock_build:
                 mock_service = MagicMock()
                 # List returns 3 message IDs
                 mock_service.users().messages().list().execute.return_value = {
@@ -222,6 +314,7 @@ class TestGmailServiceMessages:
                     Exception("Failed to fetch"),
                     {"id": "msg-3", "payload": {}},
                 ]
+                mock_service.new_batch_http_request.side_effect = FakeBatchHttpRequest
                 mock_build.return_value = mock_service
 
                 messages = service.search_messages(test_user, query="test", max_results=3)
@@ -232,89 +325,186 @@ class TestGmailServiceMessages:
                 assert messages[1]["id"] == "msg-3"
 
 
-class TestGmailServiceBodyExtraction:
-    """Tests for body extraction method"""
+class TestGmailServiceBatch:
+    """Tests for batched message fetching"""
+
+    def test_get_messages_batch_preserves_order_and_errors(self, test_user: User):
+        """Test that batch results come back in request order with per-item errors"""
+        service = GmailService()
+
+        with patch.object(service, "get_credentials"):
+            with patch("app.services.gmail_service.build_from_document") as mock_build:
+                mock_service = MagicMock()
+                mock_service.users().messages().get().execute.side_effect = [
+                    {"id": "msg-1"},
+                    Exception("Not found"),
+                    {"id": "msg-3"},
+                ]
+                mock_service.new_batch_http_request.side_effect = FakeBatchHttpRequest
+                mock_build.return_value = mock_service
+
+                results = service.get_messages_batch(
+                    test_user, ["msg-1", "msg-2", "msg-3"], format="metadata"
+                )
 
-    def test_extract_body_single_part(self):
-        """Test extracting body from single-part message"""
+                assert [r.message_id for r in results] == ["msg-1", "msg-2", "msg-3"]
+                assert results[0].ok and results[0].message == {"id": "msg-1"}
+                assert not results[1].ok
+                assert "Not found" in str(results[1].error)
+                assert results[2].message == {"id": "msg-3"}
+                call_kwargs = mock_service.users().messages().get.call_args[1]
+                assert call_kwargs["format"] == "metadata"
+                assert call_kwargs["metadataHeaders"] == GmailService.METADATA_HEADERS
+
+    def test_get_messages_batch_chunks_requests(self, test_user: User):
+        """Test that more than BATCH_SIZE IDs are split across batch requests"""
         service = GmailService()
+        batches = []
 
-        text = "This is the email body"
-        encoded = base64.urlsafe_b64encode(text.encode()).decode()
+        def make_batch(callback):
+            batch = FakeBatchHttpRequest(callback)
+            batches.append(batch)
+            return batch
 
-        payload = {"mimeType": "text/plain", "body": {"data": encoded}}
+        with patch.object(service, "get_credentials"):
+            with patch("app.services.gmail_service.build_from_document") as mock_build:
+                mock_service = MagicMock()
+                mock_service.users().messages().get().execute.return_value = {"id": "any"}
+                mock_service.new_batch_http_request.side_effect = make_batch
+                mock_build.return_value = mock_service
 
-        body = service._extract_body(payload)
+                message_ids = [f"msg-{i}" for i in range(GmailService.BATCH_SIZE + 5)]
+                results = service.get_messages_batch(test_user, message_ids)
 
-        assert body == text
+                assert [len(batch.requests) for batch in batches] == [GmailService.BATCH_SIZE, 5]
+                assert len(results) == len(message_ids)
+                assert all(result.ok for result in results)
 
-    def test_extract_body_multipart(self):
-        """Test extracting body from multi-part message"""
+    def test_get_messages_batch_whole_batch_failure(self, test_user: User):
+        """Test that a failed batch request marks every item in it as failed"""
         service = GmailService()
 
-        text = "This is the plain text body"
-        encoded = base64.urlsafe_b64encode(text.encode()).decode()
+        with patch.object(service, "get_credentials"):
+            with patch("app.services.gmail_service.build_from_document") as mock_build:
+                mock_service = MagicMock()
+                mock_service.new_batch_http_request().execute.side_effect = Exception(
+                    "Connection reset"
+                )
+                mock_build.return_value = mock_service
 
-        payload = {
-            "parts": [
-                {"mimeType": "text/html", "body": {"data": "PGh0bWw+PC9odG1sPg=="}},
-                {"mimeType": "text/plain", "body": {"data": encoded}},
-            ]
-        }
+                results = service.get_messages_batch(test_user, ["msg-1", "msg-2"])
+
+                assert len(results) == 2
+                assert all("Connection reset" in str(r.error) for r in results)
+
+    def test_get_messages_batch_empty(self, test_user: User):
+        """Test that no request is made for an empty ID list"""
+        service = GmailService()
+
+        with patch("app.services.gmail_service.build_from_document") as mock_build:
+            assert service.get_messages_batch(test_user, []) == []
+            mock_build.assert_not_called()
 
-        body = service._extract_body(payload)
 
-        assert body == text
+class TestGmailServiceHistory:
+    """Tests for incremental history sync methods"""
 
-    def test_extract_body_nested_parts(self):
-        """Test extracting body from nested multi-part message"""
+    def test_get_history_id(self, test_user: User):
+        """Test reading the current mailbox historyId"""
         service = GmailService()
 
-        text = "Nested plain text"
-        encoded = base64.urlsafe_b64encode(text.encode()).decode()
+        with patch.object(service, "get_credentials"):
+            with patch("app.services.gmail_service.build_from_document") as mock_build:
+                mock_service = MagicMock()
+                mock_service.users().getProfile().execute.return_value = {"historyId": 12345}
+                mock_build.return_value = mock_service
 
-        payload = {
-            "parts": [
-                {
-                    "mimeType": "multipart/alternative",
-                    "parts": [
-                        {"mimeType": "text/plain", "body": {"data": encoded}},
-                        {"mimeType": "text/html", "body": {"data": "PGh0bWw+PC9odG1sPg=="}},
-                    ],
-                }
-            ]
-        }
+                assert service.get_history_id(test_user) == "12345"
 
-        body = service._extract_body(payload)
+    def test_list_history_pages_and_filters(self, test_user: User):
+        """Test that history pages are followed and drafts/duplicates are skipped"""
+        service = GmailService()
 
-        assert body == text
+        with patch.object(service, "get_credentials"):
+            with patch("app.services.gmail_service.build_from_document") as mock_build:
+                mock_service = MagicMock()
+                mock_service.users().history().list().execute.side_effect = [
+                    {
+                        "history": [
+                            {"messagesAdded": [{"message": {"id": "m1", "labelIds": ["INBOX"]}}]},
+                            {"messagesAdded": [{"message": {"id": "d1", "labelIds": ["DRAFT"]}}]},
+                        ],
+                        "nextPageToken": "page-2",
+                        "historyId": "150",
+                    },
+                    {
+                        "history": [
+                            {"messagesAdded": [{"message": {"id": "m1", "labelIds": ["INBOX"]}}]},
+                            {"messagesAdded": [{"message": {"id": "m2", "labelIds": ["SENT"]}}]},
+                        ],
+                        "historyId": "200",
+                    },
+                ]
+                mock_build.return_value = mock_service
+
+                messages, history_id = service.list_history(test_user, "100")
 
-    def test_extract_body_no_text_plain(self):
-        """Test extracting body when no text/plain part exists"""
+                assert [m["id"] for m in messages] == ["m1", "m2"]
+                assert history_id == "200"
+                last_call = mock_service.users().history().list.call_args[1]
+                assert last_call["pageToken"] == "page-2"
+                assert last_call["startHistoryId"] == "100"
+
+    def test_list_history_no_changes(self, test_user: User):
+        """Test that a quiet mailbox returns no messages and keeps advancing the cursor"""
         service = GmailService()
 
-        payload = {"parts": [{"mimeType": "text/html", "body": {"data": "PGh0bWw+PC9odG1sPg=="}}]}
+        with patch.object(service, "get_credentials"):
+            with patch("app.services.gmail_service.build_from_document") as mock_build:
+                mock_service = MagicMock()
+                mock_service.users().history().list().execute.return_value = {"historyId": "101"}
+                mock_build.return_value = mock_service
 
-        body = service._extract_body(payload)
+                messages, history_id = service.list_history(test_user, "100")
 
-        assert body == ""
+                assert messages == []
+                assert history_id == "101"
 
-    def test_extract_body_invalid_base64(self):
-        """Test extracting body with invalid base64 data"""
+    def test_list_history_expired_cursor(self, test_user: User):
+        """Test that a 404 from history.list is reported as an unusable cursor"""
         service = GmailService()
 
-        payload = {"mimeType": "text/plain", "body": {"data": "invalid!!!"}}
+        with patch.object(service, "get_credentials"):
+            with patch("app.services.gmail_service.build_from_document") as mock_build:
+                mock_resp = Mock()
+                mock_resp.status = 404
+                mock_service = MagicMock()
+                mock_service.users().history().list().execute.side_effect = HttpError(
+                    resp=mock_resp, content=b"Requested entity was not found."
+                )
+                mock_build.return_value = mock_service
+
+                with pytest.raises(GmailHistoryUnavailableError):
+                    service.list_history(test_user, "1")
+
+    def test_list_history_too_many_changes(self, test_user: User):
+        """Test that exceeding max_messages is reported as an unusable cursor"""
+        service = GmailService()
+
+        with patch.object(service, "get_credentials"):
+            with patch("app.services.gmail_service.build_from_document") as mock_build:
+                mock_service = MagicMock()
+                mock_service.users().history().list().execute.return_value = {
+                    "history": [
+                        {"messagesAdded": [{"message": {"id": f"m{i}", "labelIds": ["INBOX"]}}]}
+                        for i in range(3)
+                    ],
+                    "historyId": "300",
+                }
+                mock_build.return_value = mock_service
 
-        # Should raise an exception for invalid base64
-        # The service doesn't handle this gracefully, which is acceptable
-        # as Gmail API should always return valid base64
-        try:
-            body = service._extract_body(payload)
-            # If it doesn't raise, it should at least return a string
-            assert isinstance(body, str)
-        except Exception:
-            # Invalid base64 raises an exception, which is expected
-            pass
+                with pytest.raises(GmailHistoryUnavailableError):
+                    service.list_history(test_user, "100", max_messages=2)
 
 
 class TestGmailServiceSendEmail:
@@ -352,7 +542,7 @@ class TestGmailServiceSendEmail:
 
         with patch.object(service, "has_send_permission", return_value=True):
             with patch.object(service, "get_credentials"):
-                with patch("app.services.gmail_service.build") as mock_build:
+                with patch("app.services.gmail_service.build_from_document") as mock_build:
                     mock_service = MagicMock()
                     mock_service.users().messages().send().execute.return_value = {
                         "id": "sent-msg-123",
@@ -378,7 +568,7 @@ class TestGmailServiceSendEmail:
 
         with patch.object(service, "has_send_permission", return_value=True):
             with patch.object(service, "get_credentials"):
-                with patch("app.services.gmail_service.build") as mock_build:
+                with patch("app.services.gmail_service.build_from_document") as mock_build:
                     mock_send = MagicMock()
                     mock_send.execute.return_value = {"id": "msg-1", "threadId": "thread-1"}
                     mock_messages = MagicMock()
@@ -420,7 +610,7 @@ class TestGmailServiceSendEmail:
 
         with patch.object(service, "has_send_permission", return_value=True):
             with patch.object(service, "get_credentials"):
-                with patch("app.services.gmail_service.build") as mock_build:
+                with patch("app.services.gmail_service.build_from_document") as mock_build:
                     # Create mock HttpError for quota exceeded
                     mock_resp = Mock()
                     mock_resp.status = 429
@@ -449,7 +639,7 @@ class TestGmailServiceSendEmail:
 
         with patch.object(service, "has_send_permission", return_value=True):
             with patch.object(service, "get_credentials"):
-                with patch("app.services.gmail_service.build") as mock_build:
+                with patch("app.services.gmail_service.build_from_document") as mock_build:
                     mock_resp = Mock()
                     mock_resp.status = 400
                     mock_resp.headers = {}
@@ -483,7 +673,7 @@ class TestGmailServiceSendEmail:
 
         with patch.object(service, "has_send_permission", return_value=True):
             with patch.object(service, "get_credentials"):
-                with patch("app.services.gmail_service.build") as mock_build:
+                with patch("app.services.gmail_service.build_from_document") as mock_build:
                     mock_service = MagicMock()
                     mock_service.users().messages().send().execute.side_effect = Exception(
                         "Network error"
@@ -510,7 +700,7 @@ class TestGmailServiceSentMessages:
         service = GmailService()
 
         with patch.object(service, "get_credentials"):
-            with patch("app.services.gmail_service.build") as mock_build:
+            with patch("app.services.gmail_service.build_from_document") as mock_build:
                 mock_service = MagicMock()
                 mock_service.users().messages().list().execute.return_value = {
                     "messages": [{"id": "sent-1", "threadId": "thread-1"}]
@@ -535,7 +725,7 @@ class TestGmailServiceThreads:
         service = GmailService()
 
         with patch.object(service, "get_credentials"):
-            with patch("app.services.gmail_service.build") as mock_build:
+            with patch("app.services.gmail_service.build_from_document") as mock_build:
                 mock_get = MagicMock()
                 mock_get.execute.return_value = {
                     "messages": [
@@ -561,7 +751,7 @@ class TestGmailServiceThreads:
         service = GmailService()
 
         with patch.object(service, "get_credentials"):
-            with patch("app.services.gmail_service.build") as mock_build:
+            with patch("app.services.gmail_service.build_from_document") as mock_build:
                 mock_service = MagicMock()
                 mock_service.users().threads().get().execute.side_effect = Exception(
                     "Thread not found"
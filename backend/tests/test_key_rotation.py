@@ -0,0 +1,174 @@
+"""Tests for the cached cipher and encryption key rotation"""
+
+from unittest.mock import MagicMock, patch
+
+import pytest
+from cryptography.fernet import Fernet, InvalidToken
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.user import User
+from app.services.key_rotation import KeyRotationService
+from app.utils.encryption import decrypt_token, encrypt_token, get_cipher, needs_rotation
+
+OLD_KEY = Fernet.generate_key().decode()
+NEW_KEY = Fernet.generate_key().decode()
+
+
+def use_keys(current: str, previous: str = ""):
+    return patch.multiple(settings, encryption_key=current, encryption_previous_keys=previous)
+
+
+def make_users(db: Session, count: int) -> list[User]:
+    users = []
+    for i in range(count):
+        user = User(email=f"user{i}@example.com", google_id=f"google-{i}")
+        user.set_access_token(f"access-{i}")
+        user.set_refresh_token(f"refresh-{i}")
+        db.add(user)
+        users.append(user)
+    db.commit()
+    return users
+
+
+class TestCipher:
+    """Tests for the module-level cipher"""
+
+    def test_cipher_is_reused(self):
+        """Test that the cipher is built once per key set"""
+        with use_keys(OLD_KEY):
+            assert get_cipher() is get_cipher()
+
+    def test_previous_keys_still_decrypt(self):
+        """Test that tokens encrypted before a rotation stay readable"""
+        with use_keys(OLD_KEY):
+            encrypted = encrypt_token("secret")
+
+        with use_keys(NEW_KEY, previous=OLD_KEY):
+            assert decrypt_token(encrypted) == "secret"
+            assert needs_rotation(encrypted)
+            assert not needs_rotation(encrypt_token("secret"))
+
+        with use_keys(NEW_KEY):
+            with pytest.raises(InvalidToken):
+                decrypt_token(encrypted)
+
+    def test_encryption_keys_setting(self):
+        """Test that previous keys are parsed from a comma-separated list"""
+        with use_keys("current", previous=" old-1, old-2 ,"):
+            assert settings.encryption_keys == ["current", "old-1", "old-2"]
+
+
+class TestKeyRotationService:
+    """Tests for KeyRotationService"""
+
+    def test_reencrypts_every_secret(self, db: Session):
+        """Test that tokens and Gemini keys move to the current key"""
+        with use_keys(OLD_KEY):
+            users = make_users(db, 3)
+            users[0].set_gemini_api_key("gemini-key")
+            db.commit()
+
+        with use_keys(NEW_KEY, previous=OLD_KEY):
+            result = KeyRotationService(db).reencrypt(batch_size=2)
+
+        assert result.completed
+        assert result.users_scanned == 3
+        assert result.values_rotated == 7
+        assert result.last_user_id == max(user.id for user in users)
+
+        db.expire_all()
+        with use_keys(NEW_KEY):
+            for i, user in enumerate(sorted(users, key=lambda u: u.email)):
+                assert user.get_access_token() == f"access-{i}"
+                assert user.get_refresh_token() == f"refresh-{i}"
+            assert users[0].get_gemini_api_key() == "gemini-key"
+
+    def test_rerun_skips_current_values(self, db: Session):
+        """Test that values already under the current key aren't rewritten"""
+        with use_keys(NEW_KEY):
+            make_users(db, 2)
+            result = KeyRotationService(db).reencrypt()
+
+        assert result.users_scanned == 2
+        assert result.values_rotated == 0
+
+    def test_resumes_after_user(self, db: Session):
+        """Test that a resumed run only touches users after the given ID"""
+        with use_keys(OLD_KEY):
+            users = sorted(make_users(db, 3), key=lambda u: u.id)
+            first_access_token = users[0].encrypted_access_token
+
+        with use_keys(NEW_KEY, previous=OLD_KEY):
+            result = KeyRotationService(db).reencrypt(after_id=str(users[0].id))
+
+        assert result.users_scanned == 2
+        db.expire_all()
+        assert users[0].encrypted_access_token == first_access_token
+
+    def test_progress_kept_on_failure(self, db: Session):
+        """Test that a failed batch leaves the last committed user as the resume point"""
+        with use_keys(OLD_KEY):
+            users = sorted(make_users(db, 3), key=lambda u: u.id)
+
+        service = KeyRotationService(db)
+        with use_keys(NEW_KEY, previous=OLD_KEY):
+            with patch.object(service, "_apply", side_effect=[None, RuntimeError("db down")]):
+                with pytest.raises(RuntimeError):
+                    service.reencrypt(batch_size=2)
+
+        assert service.result.last_user_id == users[1].id
+        assert not service.result.completed
+
+    def test_unreadable_values_are_skipped(self, db: Session):
+        """Test that values under an unknown key are counted and left alone"""
+        with use_keys(OLD_KEY):
+            make_users(db, 1)
+
+        with use_keys(NEW_KEY):
+            result = KeyRotationService(db).reencrypt()
+
+        assert result.values_rotated == 0
+        assert result.values_unreadable == 2
+
+    def test_concurrent_update_wins(self, db: Session):
+        """Test that a token replaced since it was read isn't overwritten"""
+        with use_keys(OLD_KEY):
+            (user,) = make_users(db, 1)
+
+        with use_keys(NEW_KEY, previous=OLD_KEY):
+            service = KeyRotationService(db)
+            rotated = service._rotated(user.id, "encrypted_access_token", "stale-ciphertext")
+            assert rotated is None  # unreadable values produce no update
+
+            change = service._rotated(
+                user.id, "encrypted_access_token", user.encrypted_access_token
+            )
+            user.set_access_token("from-new-sign-in")
+            db.commit()
+            service._apply({"encrypted_access_token": [change]})
+            db.commit()
+
+            db.expire_all()
+            assert user.get_access_token() == "from-new-sign-in"
+
+
+class TestRotateEncryptionKeysEndpoint:
+    """Tests for POST /admin/rotate-encryption-keys"""
+
+    def test_queues_rotation(self, client: TestClient, admin_auth_headers: dict):
+        """Test that admins can start the rotation job"""
+        with patch("app.api.admin.rotate_encryption_keys_task") as task:
+            task.delay.return_value = MagicMock(id="task-123")
+            response = client.post("/admin/rotate-encryption-keys", headers=admin_auth_headers)
+
+        assert response.status_code == 200
+        assert response.json() == {"task_id": "task-123", "status": "started"}
+        task.delay.assert_called_once_with()
+
+    def test_requires_admin(self, client: TestClient, auth_headers: dict):
+        """Test that regular users can't start it"""
+        response = client.post("/admin/rotate-encryption-keys", headers=auth_headers)
+
+        assert response.status_code == 403
@@ -0,0 +1,142 @@
+"""Tests for the keyword automaton and its use by the detectors"""
+
+import random
+import re
+
+import pytest
+
+from app.models.broker_response import ResponseType
+from app.services.broker_detector import BrokerDetector
+from app.services.keyword_automaton import KeywordAutomaton
+from app.services.response_detector import ResponseDetector
+
+
+class LegacyResponseDetector(ResponseDetector):
+    """The previous regex-based classification, kept as the reference implementation"""
+
+    PATTERNS = {
+        ResponseType.ACTION_REQUIRED: ResponseDetector.ACTION_REQUIRED_KEYWORDS,
+        ResponseType.CONFIRMATION: ResponseDetector.CONFIRMATION_KEYWORDS,
+        ResponseType.REJECTION: ResponseDetector.REJECTION_KEYWORDS,
+        ResponseType.ACKNOWLEDGMENT: ResponseDetector.ACKNOWLEDGMENT_KEYWORDS,
+        ResponseType.REQUEST_INFO: ResponseDetector.REQUEST_INFO_KEYWORDS,
+    }
+
+    def __init__(self):
+        self.patterns = {
+            response_type: re.compile("|".join(re.escape(kw) for kw in keywords), re.IGNORECASE)
+            for response_type, keywords in self.PATTERNS.items()
+        }
+
+    def detect_response_type(self, subject, body):
+        text = " ".join(filter(None, [subject or "", body or ""])).lower()
+        if not text:
+            return (ResponseType.UNKNOWN, 0.0)
+
+        matches = {t: len(p.findall(text)) for t, p in self.patterns.items()}
+        detected_type = next((t for t in self.PRIORITY if matches[t] > 0), None)
+        if detected_type is None:
+            return (ResponseType.UNKNOWN, 0.0)
+
+        match_ratio = matches[detected_type] / max(len(text.split()) / 10, 1)
+        confidence = min(match_ratio * 0.3 + 0.4, 1.0)
+        if subject and self.patterns[detected_type].search(subject.lower()):
+            confidence = min(confidence + 0.15, 1.0)
+        return (detected_type, round(confidence, 2))
+
+
+def random_texts(seed: int, count: int) -> list[str]:
+    """Generate texts dense in (overlapping, mixed-case, unicode-folded) keyword fragments"""
+    rng = random.Random(seed)
+    keywords = (
+        ResponseDetector.CONFIRMATION_KEYWORDS
+        + ResponseDetector.REJECTION_KEYWORDS
+        + ResponseDetector.ACKNOWLEDGMENT_KEYWORDS
+        + ResponseDetector.ACTION_REQUIRED_KEYWORDS
+        + ResponseDetector.REQUEST_INFO_KEYWORDS
+        + BrokerDetector.PRIVACY_KEYWORDS
+    )
+    noise = ["the", "your", "data", " ", "-", "\n", "ı", "ſ", "K", "İ", "X"]
+
+    texts = []
+    for _ in range(count):
+        parts = []
+        for _ in range(rng.randint(0, 12)):
+            piece = rng.choice(keywords) if rng.random() < 0.6 else rng.choice(noise)
+            if rng.random() < 0.3:
+                # Truncate or splice keywords so partial and overlapping matches occur
+                piece = piece[rng.randint(0, len(piece)) :]
+            if rng.random() < 0.2:
+                piece = piece.upper()
+            if rng.random() < 0.1:
+                piece = piece.replace("s", "ſ").replace("i", "ı")
+            parts.append(piece)
+        texts.append(rng.choice(["", " ", "  "]).join(parts))
+    return texts
+
+
+class TestKeywordAutomaton:
+    """Tests for KeywordAutomaton"""
+
+    def test_finds_overlapping_keywords_in_one_pass(self):
+        """Test that all occurrences, including overlapping ones, are reported"""
+        automaton = KeywordAutomaton([("a", ("he", "she", "hers")), ("b", ("his",))])
+        scan = automaton.scan("ushers his")
+
+        assert [(h.keyword_index, h.start, h.end) for h in scan.hits("a")] == [
+            (1, 1, 4),
+            (0, 2, 4),
+            (2, 2, 6),
+        ]
+        assert scan.positions("b") == [(7, 10)]
+        assert scan.matched_keywords("a") == {0, 1, 2}
+
+    def test_count_matches_regex_alternation(self):
+        """Test that counts follow leftmost, first-listed, non-overlapping semantics"""
+        keywords = ("removed", "removed from our list", "has been removed")
+        text = "it has been removed from our list and removed"
+        automaton = KeywordAutomaton([("c", keywords)])
+
+        expected = re.compile("|".join(map(re.escape, keywords))).findall(text)
+        assert automaton.scan(text).count("c") == len(expected) == 2
+
+    def test_has_match_with_end_bound(self):
+        """Test restricting matches to a prefix of the text"""
+        scan = KeywordAutomaton([("c", ("deleted",))]).scan("hello deleted")
+        assert scan.has_match("c")
+        assert not scan.has_match("c", end=5)
+        assert not scan.has_match("missing")
+
+
+class TestDetectorsMatchLegacyRegex:
+    """Differential tests: the automaton must classify exactly like the old regex path"""
+
+    @pytest.mark.parametrize("seed", range(5))
+    def test_response_detector_matches_regex(self, seed: int):
+        """Test ResponseDetector against the regex implementation on random texts"""
+        detector = ResponseDetector()
+        legacy = LegacyResponseDetector()
+        texts = random_texts(seed, 200)
+
+        for subject, body in zip(texts[::2], texts[1::2], strict=True):
+            assert detector.detect_response_type(subject, body) == legacy.detect_response_type(
+                subject, body
+            ), (subject, body)
+            assert detector.detect_response_type(None, body) == legacy.detect_response_type(
+                None, body
+            ), body
+
+    @pytest.mark.parametrize("seed", range(3))
+    def test_broker_detector_matches_substring_checks(self, seed: int):
+        """Test BrokerDetector keyword matches against per-keyword substring checks"""
+        detector = BrokerDetector()
+
+        for text in random_texts(seed, 200):
+            lowered = f"{text} ".lower()
+            expected = [kw for kw in BrokerDetector.PRIVACY_KEYWORDS if kw in lowered]
+            _, _, notes = detector.detect_broker("a@b.c", "b.c", text, "", "", [])
+
+            if expected:
+                assert notes == f"Keyword matches: {', '.join(expected[:5])}"
+            else:
+                assert notes == "No broker indicators found"
@@ -0,0 +1,170 @@
+"""Tests for Gmail message parsing"""
+
+import base64
+from unittest.mock import patch
+
+from app.services import message_parser
+from app.services.message_parser import (
+    build_preview,
+    html_to_text,
+    parse_message,
+    parse_payload,
+)
+
+
+def encode(text: str) -> str:
+    return base64.urlsafe_b64encode(text.encode()).decode()
+
+
+class TestParsePayload:
+    """Tests for locating body parts"""
+
+    def test_single_part_plain(self):
+        """Test extracting body from a single-part message"""
+        payload = {"mimeType": "text/plain", "body": {"data": encode("This is the email body")}}
+
+        assert parse_payload(payload) == ("This is the email body", "")
+
+    def test_single_part_html(self):
+        """Test extracting an HTML-only single-part message"""
+        html = "<html><body>HTML content</body></html>"
+        payload = {"mimeType": "text/html", "body": {"data": encode(html)}}
+
+        assert parse_payload(payload) == ("", html)
+
+    def test_multipart(self):
+        """Test that plain and HTML alternatives are both found, whatever their order"""
+        payload = {
+            "parts": [
+                {"mimeType": "text/html", "body": {"data": encode("<html></html>")}},
+                {"mimeType": "text/plain", "body": {"data": encode("Plain text content")}},
+            ]
+        }
+
+        assert parse_payload(payload) == ("Plain text content", "<html></html>")
+
+    def test_nested_parts(self):
+        """Test extracting bodies from nested multipart containers"""
+        payload = {
+            "parts": [
+                {
+                    "mimeType": "multipart/alternative",
+                    "parts": [
+                        {"mimeType": "text/plain", "body": {"data": encode("Nested plain text")}},
+                        {"mimeType": "text/html", "body": {"data": encode("<p>Nested</p>")}},
+                    ],
+                }
+            ]
+        }
+
+        assert parse_payload(payload) == ("Nested plain text", "<p>Nested</p>")
+
+    def test_first_part_wins_and_later_parts_are_not_decoded(self):
+        """Test that only the first part of each type is decoded"""
+        payload = {
+            "parts": [
+                {"mimeType": "text/plain", "body": {"data": encode("Main body")}},
+                {"mimeType": "text/html", "body": {"data": encode("<p>Main</p>")}},
+                {"mimeType": "text/plain", "body": {"data": encode("Forwarded body")}},
+            ]
+        }
+
+        with patch.object(
+            message_parser, "decode_part_data", wraps=message_parser.decode_part_data
+        ) as decode:
+            assert parse_payload(payload) == ("Main body", "<p>Main</p>")
+
+        assert decode.call_count == 2
+
+    def test_missing_padding_and_invalid_data(self):
+        """Test that unpadded data decodes and garbage yields an empty body"""
+        unpadded = encode("Hi").rstrip("=")
+
+        assert parse_payload({"mimeType": "text/plain", "body": {"data": unpadded}}) == ("Hi", "")
+        assert parse_payload({"mimeType": "text/plain", "body": {"data": "a"}}) == ("", "")
+
+
+class TestHtmlToText:
+    """Tests for HTML to text conversion"""
+
+    def test_extracts_text(self):
+        """Test that markup is removed"""
+        assert html_to_text("<html><body><p>Hello <b>world</b></p></body></html>") == "Hello world"
+
+    def test_drops_scripts_and_styles(self):
+        """Test that script and style contents are not treated as text"""
+        html = "<html><head><style>p {}</style></head><body>Hi<script>x()</script></body></html>"
+
+        assert html_to_text(html) == "Hi"
+
+    def test_empty_and_declared_encoding(self):
+        """Test empty input and documents with an XML encoding declaration"""
+        assert html_to_text("") == ""
+        assert html_to_text("   ") == ""
+        assert html_to_text('<?xml version="1.0" encoding="utf-8"?><p>Body</p>') == "Body"
+
+
+class TestParsedMessage:
+    """Tests for the ParsedMessage produced by parse_message"""
+
+    def test_headers_and_ids(self):
+        """Test that headers are exposed by lowercased name"""
+        message = {
+            "id": "msg-1",
+            "threadId": "thread-1",
+            "payload": {
+                "headers": [
+                    {"name": "From", "value": "privacy@broker.com"},
+                    {"name": "To", "value": "user@example.com"},
+                    {"name": "Subject", "value": "Your request"},
+                    {"name": "Date", "value": "Mon, 01 Jan 2024 12:00:00 +0000"},
+                ],
+            },
+        }
+
+        parsed = parse_message(message)
+
+        assert parsed.message_id == "msg-1"
+        assert parsed.thread_id == "thread-1"
+        assert parsed.sender == "privacy@broker.com"
+        assert parsed.recipient == "user@example.com"
+        assert parsed.subject == "Your request"
+        assert parsed.date == "Mon, 01 Jan 2024 12:00:00 +0000"
+        assert parsed.body_text == ""
+        assert parsed.preview == ""
+
+    def test_html_only_body_falls_back_to_html_text(self):
+        """Test that an HTML-only message gets its text from the HTML part"""
+        html = "<html><body><p>We have   removed\nyour data</p></body></html>"
+        parsed = parse_message(
+            {"payload": {"mimeType": "text/html", "body": {"data": encode(html)}}}
+        )
+
+        assert parsed.plain_text == ""
+        assert parsed.body_text == "We have   removed\nyour data"
+        assert parsed.preview == "We have removed your data"
+
+    def test_html_is_converted_once(self):
+        """Test that html_text, body_text and preview share one conversion"""
+        parsed = parse_message(
+            {"payload": {"mimeType": "text/html", "body": {"data": encode("<p>Body</p>")}}}
+        )
+
+        with patch.object(message_parser, "html_to_text", wraps=html_to_text) as convert:
+            assert parsed.html_text == "Body"
+            assert parsed.body_text == "Body"
+            assert parsed.preview == "Body"
+
+        assert convert.call_count == 1
+
+
+class TestBuildPreview:
+    """Tests for preview building"""
+
+    def test_truncates_with_ellipsis(self):
+        """Test that long text is cut to max_length and marked"""
+        assert build_preview("A" * 300, 100) == "A" * 100 + "..."
+
+    def test_collapses_whitespace(self):
+        """Test that runs of whitespace become single spaces"""
+        assert build_preview("  Hello    world\n\ntest  ", 50) == "Hello world test"
@@ -0,0 +1,213 @@
+"""Tests for the user_request_stats summary table"""
+
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock, patch
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.models.data_broker import DataBroker
+from app.models.deletion_request import DeletionRequest, RequestStatus
+from app.models.user import User
+from app.models.user_request_stats import UserRequestStats
+from app.services.analytics_service import AnalyticsService
+from app.services.deletion_request_service import DeletionRequestService
+from app.services.request_stats import COUNTER_COLUMNS, RequestStatsService
+
+
+def totals(db: Session, user: User) -> dict:
+    stats = RequestStatsService(db).get_stats(user.id)
+    return {column: getattr(stats, column) for column in COUNTER_COLUMNS} if stats else {}
+
+
+def add_request(db: Session, user: User, broker: DataBroker, **fields) -> DeletionRequest:
+    request = DeletionRequest(user_id=user.id, broker_id=broker.id, source="manual", **fields)
+    db.add(request)
+    db.commit()
+    return request
+
+
+class TestStatsKeptCurrent:
+    """Tests for the flush listener that maintains the totals"""
+
+    def test_new_request_counted(self, db: Session, test_user: User, test_broker: DataBroker):
+        """Test that a created request is counted under its status (pending by default)"""
+        add_request(db, test_user, test_broker)
+
+        stats = totals(db, test_user)
+        assert stats["total_requests"] == 1
+        assert stats["pending_count"] == 1
+
+    def test_status_change_moves_count(self, db: Session, test_user: User, test_broker: DataBroker):
+        """Test that update_request_status moves the request between counters"""
+        request = add_request(db, test_user, test_broker)
+        service = DeletionRequestService(db)
+
+        service.update_request_status(str(request.id), RequestStatus.SENT)
+        assert totals(db, test_user)["sent_count"] == 1
+        assert totals(db, test_user)["pending_count"] == 0
+
+        request.sent_at = datetime.utcnow() - timedelta(days=4)
+        db.commit()
+        service.update_request_status(str(request.id), RequestStatus.CONFIRMED)
+
+        stats = totals(db, test_user)
+        assert stats["total_requests"] == 1
+        assert stats["sent_count"] == 0
+        assert stats["confirmed_count"] == 1
+        assert stats["response_count"] == 1
+        assert abs(stats["response_seconds_sum"] - 4 * 86400) < 5
+
+    def test_rollback_discards_change(self, db: Session, test_user: User, test_broker: DataBroker):
+        """Test that the totals change in the same transaction as the request"""
+        request = add_request(db, test_user, test_broker)
+
+        request.status = RequestStatus.REJECTED
+        db.flush()
+        assert totals(db, test_user)["rejected_count"] == 1
+        db.rollback()
+
+        stats = totals(db, test_user)
+        assert stats["rejected_count"] == 0
+        assert stats["pending_count"] == 1
+
+    def test_unrelated_change_leaves_totals(
+        self, db: Session, test_user: User, test_broker: DataBroker
+    ):
+        """Test that edits to untracked fields don't touch the stats row"""
+        request = add_request(db, test_user, test_broker)
+        before = RequestStatsService(db).get_stats(test_user.id).updated_at
+
+        request.notes = "Called them"
+        db.commit()
+
+        assert RequestStatsService(db).get_stats(test_user.id).updated_at == before
+
+    def test_deleted_request_uncounted(self, db: Session, test_user: User, test_broker: DataBroker):
+        """Test that removing a request row subtracts it"""
+        request = add_request(db, test_user, test_broker, status=RequestStatus.SENT)
+
+        db.delete(request)
+        db.commit()
+
+        assert totals(db, test_user)["total_requests"] == 0
+        assert totals(db, test_user)["sent_count"] == 0
+
+    def test_concurrent_change_counted_once(
+        self, db: Session, test_user: User, test_broker: DataBroker
+    ):
+        """Test that a change committed by another session is replaced, not double-counted"""
+        request = add_request(db, test_user, test_broker, status=RequestStatus.SENT)
+        assert request.status == RequestStatus.SENT
+
+        other = sessionmaker(bind=db.get_bind())()
+        try:
+            other.get(DeletionRequest, request.id).status = RequestStatus.CONFIRMED
+            other.commit()
+        finally:
+            other.close()
+
+        locked_reads = []
+
+        def listener(conn, cursor, statement, parameters, context, executemany):
+            query = context.compiled.statement if context.compiled is not None else None
+            if getattr(query, "_for_update_arg", None) is not None:
+                locked_reads.append(statement)
+
+        event.listen(db.get_bind(), "before_cursor_execute", listener)
+        try:
+            request.status = RequestStatus.REJECTED
+            db.commit()
+        finally:
+            event.remove(db.get_bind(), "before_cursor_execute", listener)
+
+        stats = totals(db, test_user)
+        assert stats["total_requests"] == 1
+        assert stats["sent_count"] == 0
+        assert stats["confirmed_count"] == 0
+        assert stats["rejected_count"] == 1
+        assert any("deletion_requests" in statement for statement in locked_reads)
+
+
+class TestRebuild:
+    """Tests for RequestStatsService.rebuild"""
+
+    def test_rebuild_matches_incremental(
+        self,
+        db: Session,
+        test_user: User,
+        multiple_deletion_requests: list[DeletionRequest],
+    ):
+        """Test that recomputing from scratch gives the maintained totals"""
+        maintained = totals(db, test_user)
+
+        db.query(UserRequestStats).update({"confirmed_count": 99})
+        db.commit()
+        users = RequestStatsService(db).rebuild()
+
+        assert users == 1
+        rebuilt = totals(db, test_user)
+        assert rebuilt.keys() == maintained.keys()
+        for column, value in maintained.items():
+            assert abs(rebuilt[column] - value) < 1, column
+
+    def test_rebuild_one_user(
+        self, db: Session, test_user: User, admin_user: User, test_broker: DataBroker
+    ):
+        """Test that a single-user rebuild leaves other users alone"""
+        add_request(db, test_user, test_broker)
+        add_request(db, admin_user, test_broker)
+        db.query(UserRequestStats).update({"total_requests": 5})
+        db.commit()
+
+        RequestStatsService(db).rebuild(user_id=str(test_user.id))
+
+        assert totals(db, test_user)["total_requests"] == 1
+        assert totals(db, admin_user)["total_requests"] == 5
+
+
+class TestUserStatsFromSummary:
+    """Tests for AnalyticsService.get_user_stats reading the summary"""
+
+    def test_stats_read_one_row(
+        self,
+        db: Session,
+        test_user: User,
+        multiple_deletion_requests: list[DeletionRequest],
+    ):
+        """Test that the dashboard stats don't scan deletion_requests"""
+        user_id = str(test_user.id)
+        statements = []
+
+        def listener(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(db.get_bind(), "before_cursor_execute", listener)
+        try:
+            stats = AnalyticsService(db).get_user_stats(user_id)
+        finally:
+            event.remove(db.get_bind(), "before_cursor_execute", listener)
+
+        assert stats["total_requests"] == 7
+        assert len(statements) == 1
+        assert "deletion_requests" not in statements[0]
+
+
+class TestRebuildEndpoint:
+    """Tests for POST /admin/rebuild-request-stats"""
+
+    def test_queues_rebuild(self, client: TestClient, admin_auth_headers: dict):
+        """Test that admins can start the rebuild"""
+        with patch("app.api.admin.rebuild_request_stats_task") as task:
+            task.delay.return_value = MagicMock(id="task-456")
+            response = client.post("/admin/rebuild-request-stats", headers=admin_auth_headers)
+
+        assert response.status_code == 200
+        assert response.json() == {"task_id": "task-456", "status": "started"}
+
+    def test_requires_admin(self, client: TestClient, auth_headers: dict):
+        """Test that regular users can't start it"""
+        response = client.post("/admin/rebuild-request-stats", headers=auth_headers)
+
+        assert response.status_code == 403
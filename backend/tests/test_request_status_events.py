@@ -0,0 +1,333 @@
+"""Tests for request status events and the projection analytics read from them"""
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, func, insert, select
+from sqlalchemy.orm import Session
+
+from app.models.data_broker import DataBroker
+from app.models.deletion_request import DeletionRequest, RequestStatus
+from app.models.event_gap import EventGap
+from app.models.event_watermark import EventWatermark
+from app.models.request_response_time import RequestResponseTime
+from app.models.request_status_daily import RequestStatusDaily
+from app.models.request_status_event import RequestStatusEvent
+from app.models.user import User
+from app.services.analytics_service import AnalyticsService
+from app.services.deletion_request_service import DeletionRequestService
+from app.services.request_status_projection import (
+    GAP_RETENTION_SECONDS,
+    RequestStatusProjection,
+)
+from app.services.request_transitions import transition_request
+
+
+def add_request(db: Session, user: User, broker: DataBroker, **fields) -> DeletionRequest:
+    request = DeletionRequest(user_id=user.id, broker_id=broker.id, source="manual", **fields)
+    db.add(request)
+    db.commit()
+    return request
+
+
+def transitions(db: Session, request: DeletionRequest) -> list[tuple]:
+    events = (
+        db.query(RequestStatusEvent)
+        .filter(RequestStatusEvent.deletion_request_id == request.id)
+        .order_by(RequestStatusEvent.id)
+        .all()
+    )
+    return [(event.from_status, event.to_status, event.source) for event in events]
+
+
+class TestTransitionEvents:
+    """Tests for transition_request and the events appended on flush"""
+
+    def test_status_changes_appended(self, db: Session, test_user: User, test_broker: DataBroker):
+        """Test that each status change adds one event, in order"""
+        request = add_request(db, test_user, test_broker)
+        service = DeletionRequestService(db)
+
+        service.update_request_status(str(request.id), RequestStatus.SENT)
+        service.update_request_status(str(request.id), RequestStatus.CONFIRMED)
+
+        assert transitions(db, request) == [
+            (None, RequestStatus.PENDING, "manual"),
+            (RequestStatus.PENDING, RequestStatus.SENT, "manual"),
+            (RequestStatus.SENT, RequestStatus.CONFIRMED, "manual"),
+        ]
+
+    def test_same_status_not_appended(self, db: Session, test_user: User, test_broker: DataBroker):
+        """Test that re-applying the current status stamps it but records nothing"""
+        request = add_request(db, test_user, test_broker, status=RequestStatus.SENT)
+
+        changed = transition_request(request, RequestStatus.SENT, source="manual")
+        db.commit()
+
+        assert changed is False
+        assert len(transitions(db, request)) == 1
+
+    def test_event_uses_given_time(self, db: Session, test_user: User, test_broker: DataBroker):
+        """Test that the event and the timestamp column both take the transition time"""
+        request = add_request(db, test_user, test_broker, status=RequestStatus.SENT)
+        replied = datetime(2026, 10, 1, 12, 0)
+
+        transition_request(request, RequestStatus.REJECTED, source="ai_classify", at=replied)
+        db.commit()
+
+        event = db.query(RequestStatusEvent).order_by(RequestStatusEvent.id.desc()).first()
+        assert request.rejected_at == replied
+        assert event.occurred_at == replied
+        assert event.source == "ai_classify"
+
+    def test_direct_change_recorded(self, db: Session, test_user: User, test_broker: DataBroker):
+        """Test that a status assigned without transition_request still gets its event"""
+        request = add_request(db, test_user, test_broker)
+
+        request.status = RequestStatus.ACTION_REQUIRED
+        db.commit()
+
+        assert transitions(db, request)[-1] == (
+            RequestStatus.PENDING,
+            RequestStatus.ACTION_REQUIRED,
+            "direct",
+        )
+
+    def test_created_past_pending(self, db: Session, test_user: User, test_broker: DataBroker):
+        """Test that a request created confirmed gets its sent and confirmed events"""
+        sent = datetime.utcnow() - timedelta(days=3)
+        request = add_request(
+            db,
+            test_user,
+            test_broker,
+            status=RequestStatus.CONFIRMED,
+            sent_at=sent,
+            confirmed_at=datetime.utcnow(),
+        )
+
+        assert transitions(db, request) == [
+            (None, RequestStatus.SENT, "manual"),
+            (RequestStatus.SENT, RequestStatus.CONFIRMED, "manual"),
+        ]
+
+    def test_rollback_discards_events(self, db: Session, test_user: User, test_broker: DataBroker):
+        """Test that events are written in the transaction of the change"""
+        request = add_request(db, test_user, test_broker)
+
+        transition_request(request, RequestStatus.SENT, source="manual")
+        db.flush()
+        db.rollback()
+
+        assert len(transitions(db, request)) == 1
+
+    def test_old_rows_read_once(self, db: Session, test_user: User, test_broker: DataBroker):
+        """Test that the stats and event listeners share one locked read of the old rows"""
+        request = add_request(db, test_user, test_broker, status=RequestStatus.SENT)
+        locked_reads = []
+
+        def listener(conn, cursor, statement, parameters, context, executemany):
+            query = context.compiled.statement if context.compiled is not None else None
+            if getattr(query, "_for_update_arg", None) is not None:
+                locked_reads.append(statement)
+
+        event.listen(db.get_bind(), "before_cursor_execute", listener)
+        try:
+            transition_request(request, RequestStatus.CONFIRMED, source="manual")
+            db.commit()
+        finally:
+            event.remove(db.get_bind(), "before_cursor_execute", listener)
+
+        assert len(locked_reads) == 1
+        assert transitions(db, request)[-1] == (
+            RequestStatus.SENT,
+            RequestStatus.CONFIRMED,
+            "manual",
+        )
+
+
+class TestProjection:
+    """Tests for RequestStatusProjection.catch_up"""
+
+    def test_reads_only_new_events(self, db: Session, test_user: User, test_broker: DataBroker):
+        """Test that the watermark advances, so events are applied once"""
+        request = add_request(db, test_user, test_broker)
+        projection = RequestStatusProjection(db)
+
+        assert projection.catch_up() == 1
+        assert projection.catch_up() == 0
+
+        transition_request(request, RequestStatus.SENT, source="manual")
+        db.commit()
+
+        assert projection.catch_up() == 1
+        watermark = db.get(EventWatermark, "request_status")
+        assert watermark.last_event_id == db.query(func.max(RequestStatusEvent.id)).scalar()
+
+    def test_batches(self, db: Session, test_user: User, test_broker: DataBroker):
+        """Test that a backlog larger than a batch is applied completely"""
+        request = add_request(db, test_user, test_broker)
+        for status in (RequestStatus.SENT, RequestStatus.ACTION_REQUIRED, RequestStatus.SENT):
+            transition_request(request, status, source="manual")
+            db.commit()
+
+        assert RequestStatusProjection(db, batch_size=2).catch_up() == 4
+
+    def test_gap_filled_later(self, db: Session, test_user: User, test_broker: DataBroker):
+        """Test that an event committed after a later id is applied once it shows up"""
+        request = add_request(db, test_user, test_broker)
+        projection = RequestStatusProjection(db)
+        projection.catch_up()
+
+        def add_event(event_id: int, to_status: RequestStatus) -> None:
+            db.execute(
+                insert(RequestStatusEvent).values(
+                    id=event_id,
+                    deletion_request_id=request.id,
+                    user_id=test_user.id,
+                    broker_id=test_broker.id,
+                    from_status=RequestStatus.PENDING,
+                    to_status=to_status,
+                    source="manual",
+                    occurred_at=datetime.utcnow(),
+                    created_at=datetime.utcnow(),
+                )
+            )
+            db.commit()
+
+        add_event(5, RequestStatus.SENT)
+        assert projection.catch_up() == 1
+        assert db.scalars(select(EventGap.event_id).order_by(EventGap.event_id)).all() == [
+            2,
+            3,
+            4,
+        ]
+
+        add_event(3, RequestStatus.REJECTED)
+        assert projection.catch_up() == 1
+        assert projection.catch_up() == 0
+        assert db.scalars(select(EventGap.event_id).order_by(EventGap.event_id)).all() == [2, 4]
+        rejected = (
+            db.query(func.sum(RequestStatusDaily.entered))
+            .filter(RequestStatusDaily.status == RequestStatus.REJECTED)
+            .scalar()
+        )
+        assert rejected == 1
+
+    def test_old_gaps_forgotten(self, db: Session, test_user: User, test_broker: DataBroker):
+        """Test that ids missing past the retention period stop being looked for"""
+        add_request(db, test_user, test_broker)
+        expired = datetime.utcnow() - timedelta(seconds=GAP_RETENTION_SECONDS + 1)
+        db.add(EventGap(watermark_name="request_status", event_id=100, noted_at=expired))
+        db.add(EventGap(watermark_name="request_status", event_id=101))
+        db.commit()
+
+        RequestStatusProjection(db).catch_up()
+
+        assert db.scalars(select(EventGap.event_id)).all() == [101]
+
+    def test_unconfirmed_response_time_dropped(
+        self, db: Session, test_user: User, test_broker: DataBroker
+    ):
+        """Test that a request leaving confirmed no longer counts towards response times"""
+        request = add_request(
+            db, test_user, test_broker, status=RequestStatus.SENT, sent_at=datetime.utcnow()
+        )
+        transition_request(request, RequestStatus.CONFIRMED, source="manual")
+        db.commit()
+        RequestStatusProjection(db).catch_up()
+        assert db.query(RequestResponseTime).count() == 1
+
+        transition_request(request, RequestStatus.SENT, source="manual")
+        db.commit()
+        RequestStatusProjection(db).catch_up()
+
+        assert db.query(RequestResponseTime).count() == 0
+
+    def test_discovered_confirmation_untimed(
+        self, db: Session, test_user: User, test_broker: DataBroker
+    ):
+        """Test that a request found already confirmed gets no response time"""
+        sent = datetime.utcnow() - timedelta(days=3)
+        request = DeletionRequest(
+            user_id=test_user.id, broker_id=test_broker.id, source="auto_discovered", sent_at=sent
+        )
+        # As the scanner creates it: dated by the scanned (sent) email, not stamped
+        transition_request(
+            request, RequestStatus.CONFIRMED, source="auto_discovered", at=sent, stamp=False
+        )
+        db.add(request)
+        db.commit()
+
+        ranking = AnalyticsService(db).get_broker_compliance_ranking(str(test_user.id))[0]
+
+        assert db.query(RequestResponseTime).count() == 0
+        assert ranking["confirmations"] == 1
+        assert ranking["avg_response_time_days"] is None
+        assert ranking["median_response_time_days"] is None
+
+
+class TestProjectedAnalytics:
+    """Tests for the analytics read from the projection"""
+
+    def test_timeline_shows_every_status(
+        self, db: Session, test_user: User, test_broker: DataBroker
+    ):
+        """Test that the timeline counts requests reaching each status, not just current state"""
+        now = datetime.utcnow()
+        request = add_request(db, test_user, test_broker)
+        transition_request(request, RequestStatus.SENT, source="manual", at=now - timedelta(days=5))
+        db.commit()
+        transition_request(
+            request,
+            RequestStatus.ACTION_REQUIRED,
+            source="response_scan",
+            at=now - timedelta(days=2),
+        )
+        db.commit()
+        transition_request(request, RequestStatus.REJECTED, source="response_scan", at=now)
+        db.commit()
+
+        timeline = AnalyticsService(db).get_timeline_data(str(test_user.id), days=30)
+
+        by_date = {entry["date"]: entry for entry in timeline}
+        assert by_date[(now - timedelta(days=5)).date().isoformat()]["requests_sent"] == 1
+        assert by_date[(now - timedelta(days=2)).date().isoformat()]["actions_required"] == 1
+        assert by_date[now.date().isoformat()]["rejections_received"] == 1
+        assert by_date[now.date().isoformat()]["requests_created"] == 1
+
+    def test_read_leaves_caller_transaction(
+        self, db: Session, test_user: User, test_broker: DataBroker
+    ):
+        """Test that catching up on a read doesn't commit the reader's pending work"""
+        add_request(db, test_user, test_broker)
+        db.add(DeletionRequest(user_id=test_user.id, broker_id=test_broker.id, source="manual"))
+
+        timeline = AnalyticsService(db).get_timeline_data(str(test_user.id), days=30)
+        db.rollback()
+
+        assert timeline[0]["requests_created"] == 1
+        assert db.query(DeletionRequest).count() == 1
+
+    def test_ranking_counts_current_status(
+        self, db: Session, test_user: User, test_broker: DataBroker
+    ):
+        """Test that compliance counts follow requests as they move"""
+        request = add_request(
+            db,
+            test_user,
+            test_broker,
+            status=RequestStatus.SENT,
+            sent_at=datetime.utcnow() - timedelta(days=2),
+        )
+        service = AnalyticsService(db)
+        transition_request(request, RequestStatus.REJECTED, source="manual")
+        db.commit()
+        assert service.get_broker_compliance_ranking(str(test_user.id))[0]["rejected"] == 1
+
+        transition_request(request, RequestStatus.CONFIRMED, source="manual")
+        db.commit()
+
+        ranking = service.get_broker_compliance_ranking(str(test_user.id))[0]
+        assert ranking["total_requests"] == 1
+        assert ranking["rejected"] == 0
+        assert ranking["confirmations"] == 1
+        assert ranking["avg_response_time_days"] == 2.0
@@ -0,0 +1,130 @@
+"""Tests for the scan I/O pool"""
+
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+from app.models.user import User
+from app.services.gmail_client_cache import GmailClientCache
+from app.services.gmail_service import GmailService, MessageFetchResult
+from app.services.scan_pool import ScanIOPool, UserConcurrencyLimiter
+
+
+class TestScanIOPool:
+    """Tests for ScanIOPool.map"""
+
+    def test_map_preserves_order_and_captures_errors(self, test_user: User):
+        """Test that results come back in input order with exceptions in place"""
+        pool = ScanIOPool(max_workers=4, limiter=UserConcurrencyLimiter(4))
+
+        def work(item: int) -> int:
+            time.sleep(0.01 * (5 - item))
+            if item == 2:
+                raise ValueError("boom")
+            return item * 10
+
+        try:
+            results = pool.map(test_user, work, range(5))
+        finally:
+            pool.shutdown()
+
+        assert results[:2] == [0, 10]
+        assert isinstance(results[2], ValueError)
+        assert results[3:] == [30, 40]
+
+    def test_map_runs_concurrently_within_user_cap(self, test_user: User):
+        """Test that calls overlap but never exceed the per-user limit"""
+        pool = ScanIOPool(max_workers=6, limiter=UserConcurrencyLimiter(3))
+        lock = threading.Lock()
+        running = 0
+        peak = 0
+
+        def work(item: int) -> int:
+            nonlocal running, peak
+            with lock:
+                running += 1
+                peak = max(peak, running)
+            time.sleep(0.02)
+            with lock:
+                running -= 1
+            return item
+
+        try:
+            pool.map(test_user, work, range(12))
+        finally:
+            pool.shutdown()
+
+        assert pool.width == 3
+        assert 1 < peak <= 3
+
+    def test_single_worker_runs_inline(self, test_user: User):
+        """Test that a width of one never starts worker threads"""
+        pool = ScanIOPool(max_workers=1, limiter=UserConcurrencyLimiter(4))
+        threads = pool.map(test_user, lambda _: threading.get_ident(), range(3))
+
+        assert set(threads) == {threading.get_ident()}
+
+
+class TestScanIOPoolFetchMessages:
+    """Tests for concurrent message fetching"""
+
+    def test_fetch_messages_splits_into_concurrent_batches(self, test_user: User):
+        """Test that ids are split by pool width and results keep their order"""
+        pool = ScanIOPool(max_workers=4, limiter=UserConcurrencyLimiter(4))
+        gmail_service = MagicMock()
+        gmail_service.get_messages_batch.side_effect = lambda user, ids, format: [
+            MessageFetchResult(message_id=mid, message={"id": mid}) for mid in ids
+        ]
+        message_ids = [f"msg-{i}" for i in range(80)]
+
+        try:
+            results = pool.fetch_messages(gmail_service, test_user, message_ids)
+        finally:
+            pool.shutdown()
+
+        assert [r.message_id for r in results] == message_ids
+        assert gmail_service.get_messages_batch.call_count == 4
+
+    def test_fetch_messages_reports_failed_batch_per_message(self, test_user: User):
+        """Test that a failed batch marks only its own messages as errors"""
+        pool = ScanIOPool(max_workers=2, limiter=UserConcurrencyLimiter(2))
+        gmail_service = MagicMock()
+
+        def get_batch(user, ids, format):
+            if "msg-0" in ids:
+                raise Exception("Quota exceeded")
+            return [MessageFetchResult(message_id=mid, message={"id": mid}) for mid in ids]
+
+        gmail_service.get_messages_batch.side_effect = get_batch
+        message_ids = [f"msg-{i}" for i in range(20)]
+
+        try:
+            results = pool.fetch_messages(gmail_service, test_user, message_ids)
+        finally:
+            pool.shutdown()
+
+        assert [r.ok for r in results] == [False] * 10 + [True] * 10
+        assert str(results[0].error) == "Quota exceeded"
+
+    def test_worker_threads_get_their_own_gmail_client(self, test_user: User):
+        """Test that the client cache never hands one thread's client to another"""
+        pool = ScanIOPool(max_workers=2, limiter=UserConcurrencyLimiter(2))
+        service = GmailService()
+        barrier = threading.Barrier(2)
+
+        def get_client(_):
+            barrier.wait(timeout=5)
+            return service.get_gmail_client(test_user)
+
+        with patch("app.services.gmail_service.gmail_client_cache", GmailClientCache(16, 60)):
+            with patch.object(service, "get_credentials"):
+                with patch(
+                    "app.services.gmail_service.build_from_document",
+                    side_effect=lambda *args, **kwargs: MagicMock(),
+                ):
+                    try:
+                        clients = pool.map(test_user, get_client, range(2))
+                    finally:
+                        pool.shutdown()
+
+        assert clients[0] is not clients[1]
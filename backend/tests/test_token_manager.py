@@ -0,0 +1,231 @@
+"""Tests for the OAuth token manager"""
+
+import json
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock, patch
+
+import pytest
+from cryptography.fernet import Fernet
+from redis.exceptions import RedisError
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.config import settings
+from app.models.user import User
+from app.services.gmail_service import GmailService
+from app.services.token_manager import ManagedCredentials, TokenManager
+from app.utils.encryption import decrypt_token, encrypt_token
+
+
+@pytest.fixture(autouse=True)
+def encryption_key():
+    """A real Fernet key, so refreshed tokens can be encrypted and read back"""
+    with patch.object(settings, "encryption_key", Fernet.generate_key().decode()):
+        yield
+
+
+@pytest.fixture
+def mock_redis():
+    """Mock Redis client; the registered release script is mock_redis.release"""
+    client = MagicMock()
+    client.get.return_value = None
+    client.set.return_value = True
+    client.release = MagicMock(return_value=1)
+    client.register_script.return_value = client.release
+    return client
+
+
+def make_manager(client, db: Session, **kwargs) -> TokenManager:
+    options = {"lock_seconds": 30, "wait_seconds": 1}
+    options.update(kwargs)
+    return TokenManager(client=client, session_factory=sessionmaker(bind=db.get_bind()), **options)
+
+
+def make_credentials(user: User, token: str = "stale-token") -> ManagedCredentials:
+    return ManagedCredentials(
+        token=token,
+        refresh_token="refresh-token",
+        token_uri="https://oauth2.googleapis.com/token",
+        client_id="client-id",
+        client_secret="client-secret",
+        expiry=datetime.utcnow() - timedelta(minutes=1),
+        user_id=str(user.id),
+    )
+
+
+def google_refresh(token: str = "fresh-token", expires_in: int = 3600):
+    """Stand-in for the call to Google's token endpoint"""
+
+    def refresh(credentials, request):
+        credentials.token = token
+        credentials.expiry = datetime.utcnow() + timedelta(seconds=expires_in)
+
+    return patch.object(
+        ManagedCredentials, "_refresh_with_google", autospec=True, side_effect=refresh
+    )
+
+
+def shared_token(token: str, expires_in: int = 3600) -> str:
+    expiry = datetime.utcnow() + timedelta(seconds=expires_in)
+    return json.dumps({"token": encrypt_token(token), "expiry": expiry.isoformat()})
+
+
+class TestManagedCredentials:
+    """Tests for how credentials hand refreshes to the token manager"""
+
+    def test_get_credentials_carries_expiry_and_user(self, db: Session, test_user: User):
+        """Test that credentials know their expiry and which user they belong to"""
+        expiry = datetime.utcnow() + timedelta(minutes=30)
+        test_user.access_token_expires_at = expiry
+
+        with patch.object(test_user, "get_access_token", return_value="access-token"):
+            with patch.object(test_user, "get_refresh_token", return_value="refresh-token"):
+                credentials = GmailService().get_credentials(test_user)
+
+        assert isinstance(credentials, ManagedCredentials)
+        assert credentials.expiry == expiry
+        assert credentials.user_id == str(test_user.id)
+        assert credentials.valid
+
+    def test_refresh_goes_through_token_manager(self, test_user: User):
+        """Test that google-auth's own refreshes are routed to the token manager"""
+        credentials = make_credentials(test_user)
+
+        with patch("app.services.token_manager.token_manager") as manager:
+            credentials.refresh("request")
+
+        manager.refresh.assert_called_once_with(credentials, "request")
+
+
+class TestTokenManagerRefresh:
+    """Tests for TokenManager.refresh"""
+
+    def test_refreshes_persists_and_shares(self, db: Session, test_user: User, mock_redis):
+        """Test that the lock holder refreshes once, stores the token and shares it"""
+        manager = make_manager(mock_redis, db)
+        credentials = make_credentials(test_user)
+
+        with google_refresh() as refresh:
+            manager.refresh(credentials, "request")
+
+        refresh.assert_called_once_with(credentials, "request")
+        assert credentials.token == "fresh-token"
+        lock_key = f"gmail_token:refresh_lock:{test_user.id}"
+        assert mock_redis.set.call_args_list[0][0][0] == lock_key
+        assert mock_redis.set.call_args_list[0][1] == {"nx": True, "ex": 30}
+        mock_redis.release.assert_called_once()
+        assert mock_redis.release.call_args[1]["keys"] == [lock_key]
+
+        key, value = mock_redis.set.call_args_list[1][0]
+        assert key == f"gmail_token:{test_user.id}"
+        assert decrypt_token(json.loads(value)["token"]) == "fresh-token"
+        assert 3500 < mock_redis.set.call_args_list[1][1]["ex"] <= 3600
+
+        db.refresh(test_user)
+        assert test_user.get_access_token() == "fresh-token"
+        assert test_user.get_refresh_token() == "refresh-token"
+        assert test_user.access_token_expires_at == credentials.expiry
+
+    def test_adopts_token_refreshed_elsewhere(self, db: Session, test_user: User, mock_redis):
+        """Test that a token another worker refreshed is reused without calling Google"""
+        mock_redis.get.return_value = shared_token("shared-token")
+        manager = make_manager(mock_redis, db)
+        credentials = make_credentials(test_user)
+
+        with google_refresh() as refresh:
+            manager.refresh(credentials, "request")
+
+        refresh.assert_not_called()
+        mock_redis.set.assert_not_called()
+        assert credentials.token == "shared-token"
+        assert credentials.valid
+
+    def test_ignores_shared_token_that_failed(self, db: Session, test_user: User, mock_redis):
+        """Test that the shared token is refreshed again when it's the one being replaced"""
+        mock_redis.get.return_value = shared_token("stale-token")
+        manager = make_manager(mock_redis, db)
+        credentials = make_credentials(test_user, token="stale-token")
+
+        with google_refresh() as refresh:
+            manager.refresh(credentials, "request")
+
+        refresh.assert_called_once()
+        assert credentials.token == "fresh-token"
+
+    def test_ignores_expiring_shared_token(self, db: Session, test_user: User, mock_redis):
+        """Test that a shared token about to expire isn't adopted"""
+        mock_redis.get.return_value = shared_token("shared-token", expires_in=60)
+        manager = make_manager(mock_redis, db)
+        credentials = make_credentials(test_user)
+
+        with google_refresh() as refresh:
+            manager.refresh(credentials, "request")
+
+        refresh.assert_called_once()
+
+    def test_undecryptable_shared_token_dropped(self, db: Session, test_user: User, mock_redis):
+        """Test that a shared token under a removed key is discarded and Google is called"""
+        expiry = datetime.utcnow() + timedelta(hours=1)
+        old_key = Fernet(Fernet.generate_key())
+        mock_redis.get.return_value = json.dumps(
+            {"token": old_key.encrypt(b"shared-token").decode(), "expiry": expiry.isoformat()}
+        )
+        manager = make_manager(mock_redis, db)
+        credentials = make_credentials(test_user)
+
+        with google_refresh() as refresh:
+            manager.refresh(credentials, "request")
+
+        refresh.assert_called_once()
+        mock_redis.delete.assert_any_call(manager._token_key(str(test_user.id)))
+        assert credentials.token == "fresh-token"
+
+    def test_waits_for_lock_holder(self, db: Session, test_user: User, mock_redis):
+        """Test that a worker finding the lock taken waits for the holder's token"""
+        mock_redis.set.return_value = False
+        mock_redis.get.side_effect = [None, None, shared_token("shared-token")]
+        manager = make_manager(mock_redis, db)
+        credentials = make_credentials(test_user)
+
+        with patch("app.services.token_manager.time.sleep"):
+            with google_refresh() as refresh:
+                manager.refresh(credentials, "request")
+
+        refresh.assert_not_called()
+        assert credentials.token == "shared-token"
+
+    def test_refreshes_when_holder_gives_up(self, db: Session, test_user: User, mock_redis):
+        """Test that waiting stops once the lock is released without a shared token"""
+        mock_redis.set.return_value = False
+        mock_redis.exists.return_value = 0
+        manager = make_manager(mock_redis, db)
+        credentials = make_credentials(test_user)
+
+        with patch("app.services.token_manager.time.sleep") as sleep:
+            with google_refresh() as refresh:
+                manager.refresh(credentials, "request")
+
+        sleep.assert_called_once()
+        refresh.assert_called_once()
+        assert credentials.token == "fresh-token"
+
+    def test_redis_error_refreshes_locally(self, db: Session, test_user: User, mock_redis):
+        """Test that the refresh still happens and is persisted without Redis"""
+        mock_redis.get.side_effect = RedisError("down")
+        manager = make_manager(mock_redis, db)
+        credentials = make_credentials(test_user)
+
+        with google_refresh() as refresh:
+            manager.refresh(credentials, "request")
+
+        refresh.assert_called_once()
+        mock_redis.set.assert_not_called()
+        db.refresh(test_user)
+        assert test_user.get_access_token() == "fresh-token"
+
+    def test_forget_drops_shared_token(self, db: Session, test_user: User, mock_redis):
+        """Test that forget deletes the user's shared token"""
+        manager = make_manager(mock_redis, db)
+
+        manager.forget(str(test_user.id))
+
+        mock_redis.delete.assert_called_once_with(f"gmail_token:{test_user.id}")
@@ -216,6 +216,20 @@ export function AnalyticsDashboard() {
                   name="Confirmations"
                   strokeWidth={2}
                 />
+                <Line
+                  type="monotone"
+                  dataKey="actions_required"
+                  stroke="#eab308"
+                  name="Action Required"
+                  strokeWidth={2}
+                />
+                <Line
+                  type="monotone"
+                  dataKey="rejections_received"
+                  stroke="#ef4444"
+                  name="Rejections"
+                  strokeWidth={2}
+                />
               </LineChart>
             </ResponsiveContainer>
           ) : (
@@ -268,7 +282,15 @@ export function AnalyticsDashboard() {
                           {Math.round(broker.success_rate)}%
                         </Badge>
                         {broker.avg_response_time_days !== null && (
-                          <div className="flex items-center gap-1 text-sm text-muted-foreground">
+                          <div
+                            className="flex items-center gap-1 text-sm text-muted-foreground"
+                            title={
+                              broker.median_response_time_days !== null &&
+                              broker.p90_response_time_days !== null
+                                ? `Median ${broker.median_response_time_days.toFixed(1)}d, p90 ${broker.p90_response_time_days.toFixed(1)}d`
+                                : undefined
+                            }
+                          >
                             <Clock className="h-3 w-3" />
                             {broker.avg_response_time_days.toFixed(1)}d
                           </div>
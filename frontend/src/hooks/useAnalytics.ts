@@ -18,12 +18,17 @@ export interface BrokerRanking {
   confirmations: number
   success_rate: number
   avg_response_time_days: number | null
+  median_response_time_days: number | null
+  p90_response_time_days: number | null
 }
 
 export interface TimelineData {
   date: string
+  requests_created: number
   requests_sent: number
+  actions_required: number
   confirmations_received: number
+  rejections_received: number
 }
 
 export interface ResponseDistribution {
@@ -266,14 +266,30 @@ export const handlers = [
         confirmations: 3,
         success_rate: 60,
         avg_response_time_days: 2,
+        median_response_time_days: 2,
+        p90_response_time_days: 3.5,
       },
     ])
   }),
 
   http.get('/analytics/timeline', () => {
     return HttpResponse.json([
-      { date: '2024-01-01', requests_sent: 5, confirmations_received: 2 },
-      { date: '2024-01-02', requests_sent: 3, confirmations_received: 1 },
+      {
+        date: '2024-01-01',
+        requests_created: 0,
+        requests_sent: 5,
+        actions_required: 0,
+        confirmations_received: 2,
+        rejections_received: 0,
+      },
+      {
+        date: '2024-01-02',
+        requests_created: 0,
+        requests_sent: 3,
+        actions_required: 0,
+        confirmations_received: 1,
+        rejections_received: 0,
+      },
     ])
   }),
 